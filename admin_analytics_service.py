@@ -6,8 +6,8 @@ Provides comprehensive analytics and reporting for the admin dashboard
 from datetime import datetime, timedelta
 from sqlalchemy import func, and_, or_
 from models import db, User, Opportunity, Application, Meeting, Referral, Lead
-import csv
-import io
+from export_service import ExportService, EXPORT_FORMATS
+from cohort_service import CohortService
 
 
 class AdminAnalyticsService:
@@ -71,3 +71,79 @@ class AdminAnalyticsService:
             'period_total': current_count,
             'previous_period_total': previous_count
         }
+
+    @staticmethod
+    def get_cohort_retention(weeks=12, role=None):
+        """Get weekly signup cohorts x weeks-since-signup retention"""
+        weeks = max(1, min(weeks, 52))
+        return CohortService.get_retention(weeks, role)
+
+    @staticmethod
+    def _export_query(analytics_type, start_date):
+        """Build the header and column-only query for an analytics export"""
+        if analytics_type == 'users':
+            header = ['id', 'name', 'email', 'role', 'country', 'region', 'company', 'created_at']
+            query = db.session.query(
+                User.id, User.name, User.email, User.role,
+                User.country, User.region, User.company, User.created_at
+            ).filter(User.created_at >= start_date).order_by(User.id)
+        elif analytics_type == 'referrals':
+            header = ['id', 'enabler_id', 'startup_id', 'opportunity_id', 'startup_name',
+                      'startup_email', 'is_link_referral', 'status', 'created_at']
+            query = db.session.query(
+                Referral.id, Referral.enabler_id, Referral.startup_id, Referral.opportunity_id,
+                Referral.startup_name, Referral.startup_email, Referral.is_link_referral,
+                Referral.status, Referral.created_at
+            ).filter(Referral.created_at >= start_date).order_by(Referral.id)
+        elif analytics_type == 'applications':
+            header = ['id', 'startup_id', 'opportunity_id', 'applied_by_id', 'status', 'created_at']
+            query = db.session.query(
+                Application.id, Application.startup_id, Application.opportunity_id,
+                Application.applied_by_id, Application.status, Application.created_at
+            ).filter(Application.created_at >= start_date).order_by(Application.id)
+        elif analytics_type == 'meetings':
+            header = ['id', 'title', 'created_by_id', 'access_type', 'status',
+                      'scheduled_at', 'duration_minutes', 'created_at']
+            query = db.session.query(
+                Meeting.id, Meeting.title, Meeting.created_by_id, Meeting.access_type,
+                Meeting.status, Meeting.scheduled_at, Meeting.duration_minutes, Meeting.created_at
+            ).filter(Meeting.created_at >= start_date).order_by(Meeting.id)
+        elif analytics_type == 'leads':
+            header = ['id', 'type', 'name', 'email', 'company', 'subject', 'status', 'created_at']
+            query = db.session.query(
+                Lead.id, Lead.type, Lead.name, Lead.email,
+                Lead.company, Lead.subject, Lead.status, Lead.created_at
+            ).filter(Lead.created_at >= start_date).order_by(Lead.id)
+        elif analytics_type == 'user_growth':
+            header = ['date', 'role', 'count']
+            day = func.date(User.created_at)
+            query = db.session.query(
+                day.label('date'), User.role, func.count(User.id)
+            ).filter(User.created_at >= start_date).group_by(day, User.role).order_by(day)
+        else:
+            raise ValueError(f"Unknown analytics type: {analytics_type}")
+
+        return header, query
+
+    @staticmethod
+    def export_analytics(analytics_type, days=30, format='csv'):
+        """
+        Stream analytics rows for the given period
+        
+        Args:
+            analytics_type: users, referrals, applications, meetings, leads or user_growth
+            days: Look-back window in days
+            format: csv or ndjson
+        
+        Returns:
+            Generator of str chunks
+        """
+        if format not in EXPORT_FORMATS:
+            raise ValueError(f"Unsupported export format: {format}")
+
+        start_date = datetime.utcnow() - timedelta(days=days)
+
+        # Resolve the query eagerly so bad types fail before the response starts
+        header, query = AdminAnalyticsService._export_query(analytics_type, start_date)
+
+        return ExportService.stream(header, ExportService.iter_rows(query), format)
@@ -5,9 +5,9 @@ Provides bulk action capabilities for efficient admin management
 
 from models import db, User, Opportunity, Application, Meeting, Referral, Lead
 from datetime import datetime
-from sqlalchemy import and_, or_
-import csv
-from io import StringIO
+from sqlalchemy import and_, or_, case
+from export_service import ExportService, EXPORT_FORMATS
+from enabler_service import EnablerService
 
 
 class AdminBulkOperationsService:
@@ -115,61 +115,51 @@ class AdminBulkOperationsService:
     @staticmethod
     def bulk_export_users(user_ids=None, format='csv'):
         """
-        Bulk export users to CSV
+        Bulk export users
         
         Args:
             user_ids: List of user IDs to export (None = all)
-            format: Export format (csv, json)
+            format: Export format (csv, ndjson, json)
         
         Returns:
-            CSV or JSON string
+            Generator of chunks for csv/ndjson, dict for json
         """
-        query = User.query
+        header = ['id', 'full_name', 'email', 'role', 'company', 'country', 'created_at', 'status']
+        labels = ['ID', 'Full Name', 'Email', 'Role', 'Company', 'Country', 'Created At', 'Status']
+        
+        # Select plain columns so rows stream without building ORM objects
+        query = db.session.query(
+            User.id,
+            User.name,
+            User.email,
+            User.role,
+            User.company,
+            User.country,
+            User.created_at,
+            case((User.is_active == False, 'inactive'), else_='active')
+        ).order_by(User.id)
         
         if user_ids:
             query = query.filter(User.id.in_(user_ids))
         
-        users = query.all()
-        
-        if format == 'csv':
-            output = StringIO()
-            writer = csv.writer(output)
-            
-            # Header
-            writer.writerow([
-                'ID', 'Full Name', 'Email', 'Role', 'Company', 
-                'Country', 'Created At', 'Status'
-            ])
-            
-            # Data
-            for user in users:
-                writer.writerow([
-                    user.id,
-                    user.full_name,
-                    user.email,
-                    user.role,
-                    user.company if hasattr(user, 'company') else '',
-                    user.country if hasattr(user, 'country') else '',
-                    user.created_at.isoformat() if user.created_at else '',
-                    getattr(user, 'status', 'active')
-                ])
-            
-            return output.getvalue()
+        if format in EXPORT_FORMATS:
+            return ExportService.stream(header, ExportService.iter_rows(query), format, labels)
         
         elif format == 'json':
+            users = [
+                {
+                    'id': row[0],
+                    'full_name': row[1],
+                    'email': row[2],
+                    'role': row[3],
+                    'company': row[4],
+                    'country': row[5],
+                    'created_at': row[6].isoformat() if row[6] else None
+                }
+                for row in ExportService.iter_rows(query)
+            ]
             return {
-                'users': [
-                    {
-                        'id': user.id,
-                        'full_name': user.full_name,
-                        'email': user.email,
-                        'role': user.role,
-                        'company': user.company if hasattr(user, 'company') else None,
-                        'country': user.country if hasattr(user, 'country') else None,
-                        'created_at': user.created_at.isoformat() if user.created_at else None
-                    }
-                    for user in users
-                ],
+                'users': users,
                 'total': len(users)
             }
 
@@ -511,11 +501,18 @@ class AdminBulkOperationsService:
                     'updated_count': 0
                 }
             
+            # Capture previous statuses so enabler counters move in the same transaction
+            previous = db.session.query(
+                Referral.enabler_id, Referral.created_at, Referral.status
+            ).filter(Referral.id.in_(referral_ids)).all()
+            
             result = Referral.query.filter(Referral.id.in_(referral_ids)).update(
                 {'status': status},
                 synchronize_session=False
             )
             
+            EnablerService.record_bulk_status_change(previous, status)
+            
             db.session.commit()
             
             return {
@@ -3,40 +3,43 @@ Admin Advanced Search Service
 Provides comprehensive search and filtering capabilities for admin dashboard
 """
 
-from sqlalchemy import or_, and_, func
-from models import db, User, Opportunity, Application, Meeting, Referral, Lead, Message
+from sqlalchemy import or_, and_, func, text
+from sqlalchemy.exc import OperationalError
+from models import db, User, Startup, Opportunity, Application, Meeting, Referral, Lead, Message
 from datetime import datetime, timedelta
+from search_index_service import SearchIndexService
+import json
+import time
+
+
+# How search_* totals are computed:
+#   exact     - COUNT(*) over the filtered query
+#   estimated - planner row estimate (Postgres EXPLAIN; SQLite falls back to capped)
+#   capped    - exact up to SEARCH_COUNT_CAP, reported as "1000+" beyond it
+SEARCH_COUNT_MODES = ('exact', 'estimated', 'capped')
+DEFAULT_COUNT_MODE = 'capped'
+SEARCH_COUNT_CAP = 1000
+
+# Totals for identical filter specs are reused for this long
+SEARCH_COUNT_CACHE_TTL = 30
+SEARCH_COUNT_CACHE_MAX = 1000
+
+# (entity, mode, filters) -> (expires_at, total, mode used, capped)
+_count_cache = {}
 
 
 class AdminSearchService:
     """Service for advanced search and filtering"""
 
     @staticmethod
-    def search_users(query=None, role=None, date_from=None, date_to=None, status=None, limit=50, offset=0):
-        """
-        Advanced user search with multiple filters
-        
-        Args:
-            query: Search term (name, email, company)
-            role: Filter by role (startup, corporate, enabler, admin)
-            date_from: Filter by registration date (from)
-            date_to: Filter by registration date (to)
-            status: Filter by status (active, inactive)
-            limit: Results per page
-            offset: Pagination offset
-        """
+    def filter_users(query=None, role=None, date_from=None, date_to=None, status=None):
+        """Build the filtered User query behind search_users (no ordering/paging)"""
         search = User.query
         
         # Text search
         if query:
-            search_term = f"%{query}%"
-            search = search.filter(
-                or_(
-                    User.full_name.ilike(search_term),
-                    User.email.ilike(search_term),
-                    User.company.ilike(search_term),
-                    User.username.ilike(search_term)
-                )
+            search = AdminSearchService._text_filter(
+                search, 'user', query, [User.name, User.email, User.company]
             )
         
         # Role filter
@@ -53,17 +56,36 @@ class AdminSearchService:
         if status and hasattr(User, 'status'):
             search = search.filter(User.status == status)
         
-        # Get total count before pagination
-        total = search.count()
+        return search
+
+    @staticmethod
+    def search_users(query=None, role=None, date_from=None, date_to=None, status=None, limit=50, offset=0, count_mode=None):
+        """
+        Advanced user search with multiple filters
         
-        # Apply pagination
-        results = search.order_by(User.created_at.desc()).limit(limit).offset(offset).all()
+        Args:
+            query: Search term (name, email, company)
+            role: Filter by role (startup, corporate, enabler, admin)
+            date_from: Filter by registration date (from)
+            date_to: Filter by registration date (to)
+            status: Filter by status (active, inactive)
+            limit: Results per page
+            offset: Pagination offset
+            count_mode: How 'total' is computed: exact, estimated or capped (default)
+        """
+        filters = dict(query=query, role=role, date_from=date_from, date_to=date_to, status=status)
+        search = AdminSearchService.filter_users(**filters)
+        
+        # One extra row answers has_more; the total comes from the count strategy
+        results, page = AdminSearchService._paginate(
+            'users', filters, search, User.created_at.desc(), limit, offset, count_mode
+        )
         
         return {
             'results': [
                 {
                     'id': user.id,
-                    'full_name': user.full_name,
+                    'full_name': user.name,
                     'email': user.email,
                     'role': user.role,
                     'company': user.company,
@@ -72,37 +94,19 @@ class AdminSearchService:
                 }
                 for user in results
             ],
-            'total': total,
-            'limit': limit,
-            'offset': offset,
-            'has_more': total > (offset + limit)
+            **page
         }
 
     @staticmethod
-    def search_programs(query=None, type=None, status=None, date_from=None, date_to=None, limit=50, offset=0):
-        """
-        Advanced program search with multiple filters
-        
-        Args:
-            query: Search term (title, description)
-            type: Filter by type (accelerator, grant, pilot, challenge, corporate_vc)
-            status: Filter by status (draft, published, closed)
-            date_from: Filter by creation date (from)
-            date_to: Filter by creation date (to)
-            limit: Results per page
-            offset: Pagination offset
-        """
+    def filter_programs(query=None, type=None, status=None, date_from=None, date_to=None):
+        """Build the filtered Opportunity query behind search_programs (no ordering/paging)"""
         search = Opportunity.query
         
         # Text search
         if query:
-            search_term = f"%{query}%"
-            search = search.filter(
-                or_(
-                    Opportunity.title.ilike(search_term),
-                    Opportunity.description.ilike(search_term),
-                    Opportunity.benefits.ilike(search_term)
-                )
+            search = AdminSearchService._text_filter(
+                search, 'program', query,
+                [Opportunity.title, Opportunity.description, Opportunity.benefits]
             )
         
         # Type filter
@@ -119,11 +123,30 @@ class AdminSearchService:
         if date_to:
             search = search.filter(Opportunity.created_at <= date_to)
         
-        # Get total count
-        total = search.count()
+        return search
+
+    @staticmethod
+    def search_programs(query=None, type=None, status=None, date_from=None, date_to=None, limit=50, offset=0, count_mode=None):
+        """
+        Advanced program search with multiple filters
         
-        # Apply pagination
-        results = search.order_by(Opportunity.created_at.desc()).limit(limit).offset(offset).all()
+        Args:
+            query: Search term (title, description)
+            type: Filter by type (accelerator, grant, pilot, challenge, corporate_vc)
+            status: Filter by status (draft, published, closed)
+            date_from: Filter by creation date (from)
+            date_to: Filter by creation date (to)
+            limit: Results per page
+            offset: Pagination offset
+            count_mode: How 'total' is computed: exact, estimated or capped (default)
+        """
+        filters = dict(query=query, type=type, status=status, date_from=date_from, date_to=date_to)
+        search = AdminSearchService.filter_programs(**filters)
+        
+        # One extra row answers has_more; the total comes from the count strategy
+        results, page = AdminSearchService._paginate(
+            'programs', filters, search, Opportunity.created_at.desc(), limit, offset, count_mode
+        )
         
         return {
             'results': [
@@ -139,37 +162,19 @@ class AdminSearchService:
                 }
                 for prog in results
             ],
-            'total': total,
-            'limit': limit,
-            'offset': offset,
-            'has_more': total > (offset + limit)
+            **page
         }
 
     @staticmethod
-    def search_applications(query=None, status=None, program_id=None, date_from=None, date_to=None, limit=50, offset=0):
-        """
-        Advanced application search with multiple filters
-        
-        Args:
-            query: Search term (startup name)
-            status: Filter by status
-            program_id: Filter by specific program
-            date_from: Filter by submission date (from)
-            date_to: Filter by submission date (to)
-            limit: Results per page
-            offset: Pagination offset
-        """
+    def filter_applications(query=None, status=None, program_id=None, date_from=None, date_to=None):
+        """Build the filtered Application query behind search_applications (no ordering/paging)"""
         search = Application.query
         
-        # Join with User for startup name search
+        # Join with Startup for startup name search
         if query:
             search_term = f"%{query}%"
-            search = search.join(User, User.id == Application.startup_id).filter(
-                or_(
-                    User.full_name.ilike(search_term),
-                    User.email.ilike(search_term),
-                    User.company.ilike(search_term)
-                )
+            search = search.join(Startup, Startup.id == Application.startup_id).filter(
+                Startup.name.ilike(search_term)
             )
         
         # Status filter
@@ -186,11 +191,30 @@ class AdminSearchService:
         if date_to:
             search = search.filter(Application.created_at <= date_to)
         
-        # Get total count
-        total = search.count()
+        return search
+
+    @staticmethod
+    def search_applications(query=None, status=None, program_id=None, date_from=None, date_to=None, limit=50, offset=0, count_mode=None):
+        """
+        Advanced application search with multiple filters
+        
+        Args:
+            query: Search term (startup name)
+            status: Filter by status
+            program_id: Filter by specific program
+            date_from: Filter by submission date (from)
+            date_to: Filter by submission date (to)
+            limit: Results per page
+            offset: Pagination offset
+            count_mode: How 'total' is computed: exact, estimated or capped (default)
+        """
+        filters = dict(query=query, status=status, program_id=program_id, date_from=date_from, date_to=date_to)
+        search = AdminSearchService.filter_applications(**filters)
         
-        # Apply pagination
-        results = search.order_by(Application.created_at.desc()).limit(limit).offset(offset).all()
+        # One extra row answers has_more; the total comes from the count strategy
+        results, page = AdminSearchService._paginate(
+            'applications', filters, search, Application.created_at.desc(), limit, offset, count_mode
+        )
         
         return {
             'results': [
@@ -203,36 +227,18 @@ class AdminSearchService:
                 }
                 for app in results
             ],
-            'total': total,
-            'limit': limit,
-            'offset': offset,
-            'has_more': total > (offset + limit)
+            **page
         }
 
     @staticmethod
-    def search_meetings(query=None, status=None, access_type=None, date_from=None, date_to=None, limit=50, offset=0):
-        """
-        Advanced meeting search with multiple filters
-        
-        Args:
-            query: Search term (title, description)
-            status: Filter by status
-            access_type: Filter by access type
-            date_from: Filter by scheduled date (from)
-            date_to: Filter by scheduled date (to)
-            limit: Results per page
-            offset: Pagination offset
-        """
+    def filter_meetings(query=None, status=None, access_type=None, date_from=None, date_to=None):
+        """Build the filtered Meeting query behind search_meetings (no ordering/paging)"""
         search = Meeting.query
         
         # Text search
         if query:
-            search_term = f"%{query}%"
-            search = search.filter(
-                or_(
-                    Meeting.title.ilike(search_term),
-                    Meeting.description.ilike(search_term)
-                )
+            search = AdminSearchService._text_filter(
+                search, 'meeting', query, [Meeting.title, Meeting.description]
             )
         
         # Status filter
@@ -249,11 +255,30 @@ class AdminSearchService:
         if date_to:
             search = search.filter(Meeting.scheduled_at <= date_to)
         
-        # Get total count
-        total = search.count()
+        return search
+
+    @staticmethod
+    def search_meetings(query=None, status=None, access_type=None, date_from=None, date_to=None, limit=50, offset=0, count_mode=None):
+        """
+        Advanced meeting search with multiple filters
         
-        # Apply pagination
-        results = search.order_by(Meeting.scheduled_at.desc()).limit(limit).offset(offset).all()
+        Args:
+            query: Search term (title, description)
+            status: Filter by status
+            access_type: Filter by access type
+            date_from: Filter by scheduled date (from)
+            date_to: Filter by scheduled date (to)
+            limit: Results per page
+            offset: Pagination offset
+            count_mode: How 'total' is computed: exact, estimated or capped (default)
+        """
+        filters = dict(query=query, status=status, access_type=access_type, date_from=date_from, date_to=date_to)
+        search = AdminSearchService.filter_meetings(**filters)
+        
+        # One extra row answers has_more; the total comes from the count strategy
+        results, page = AdminSearchService._paginate(
+            'meetings', filters, search, Meeting.scheduled_at.desc(), limit, offset, count_mode
+        )
         
         return {
             'results': [
@@ -269,35 +294,28 @@ class AdminSearchService:
                 }
                 for meeting in results
             ],
-            'total': total,
-            'limit': limit,
-            'offset': offset,
-            'has_more': total > (offset + limit)
+            **page
         }
 
     @staticmethod
-    def search_referrals(query=None, status=None, enabler_id=None, date_from=None, date_to=None, limit=50, offset=0):
-        """
-        Advanced referral search with multiple filters
-        
-        Args:
-            query: Search term (enabler name, startup name)
-            status: Filter by status
-            enabler_id: Filter by specific enabler
-            date_from: Filter by creation date (from)
-            date_to: Filter by creation date (to)
-            limit: Results per page
-            offset: Pagination offset
-        """
+    def filter_referrals(query=None, status=None, enabler_id=None, date_from=None, date_to=None):
+        """Build the filtered Referral query behind search_referrals (no ordering/paging)"""
         search = Referral.query
         
-        # Text search (join with users for names)
-        if query:
+        # Text search (enabler name, or the referred startup's name/email)
+        if query and SearchIndexService.can_search(query):
+            search = search.filter(
+                or_(
+                    Referral.enabler_id.in_(SearchIndexService.match_ids('user', query)),
+                    Referral.id.in_(SearchIndexService.match_ids('referral', query))
+                )
+            )
+        elif query:
             search_term = f"%{query}%"
             search = search.join(
                 User, User.id == Referral.enabler_id
             ).filter(
-                User.full_name.ilike(search_term)
+                User.name.ilike(search_term)
             )
         
         # Status filter
@@ -314,11 +332,30 @@ class AdminSearchService:
         if date_to:
             search = search.filter(Referral.created_at <= date_to)
         
-        # Get total count
-        total = search.count()
+        return search
+
+    @staticmethod
+    def search_referrals(query=None, status=None, enabler_id=None, date_from=None, date_to=None, limit=50, offset=0, count_mode=None):
+        """
+        Advanced referral search with multiple filters
         
-        # Apply pagination
-        results = search.order_by(Referral.created_at.desc()).limit(limit).offset(offset).all()
+        Args:
+            query: Search term (enabler name, startup name)
+            status: Filter by status
+            enabler_id: Filter by specific enabler
+            date_from: Filter by creation date (from)
+            date_to: Filter by creation date (to)
+            limit: Results per page
+            offset: Pagination offset
+            count_mode: How 'total' is computed: exact, estimated or capped (default)
+        """
+        filters = dict(query=query, status=status, enabler_id=enabler_id, date_from=date_from, date_to=date_to)
+        search = AdminSearchService.filter_referrals(**filters)
+        
+        # One extra row answers has_more; the total comes from the count strategy
+        results, page = AdminSearchService._paginate(
+            'referrals', filters, search, Referral.created_at.desc(), limit, offset, count_mode
+        )
         
         return {
             'results': [
@@ -332,38 +369,18 @@ class AdminSearchService:
                 }
                 for ref in results
             ],
-            'total': total,
-            'limit': limit,
-            'offset': offset,
-            'has_more': total > (offset + limit)
+            **page
         }
 
     @staticmethod
-    def search_leads(query=None, type=None, is_read=None, date_from=None, date_to=None, limit=50, offset=0):
-        """
-        Advanced lead search with multiple filters
-        
-        Args:
-            query: Search term (name, email, company, message)
-            type: Filter by type (demo, investor, contact)
-            is_read: Filter by read status (True/False)
-            date_from: Filter by creation date (from)
-            date_to: Filter by creation date (to)
-            limit: Results per page
-            offset: Pagination offset
-        """
+    def filter_leads(query=None, type=None, is_read=None, date_from=None, date_to=None):
+        """Build the filtered Lead query behind search_leads (no ordering/paging)"""
         search = Lead.query
         
         # Text search
         if query:
-            search_term = f"%{query}%"
-            search = search.filter(
-                or_(
-                    Lead.name.ilike(search_term),
-                    Lead.email.ilike(search_term),
-                    Lead.company.ilike(search_term),
-                    Lead.message.ilike(search_term)
-                )
+            search = AdminSearchService._text_filter(
+                search, 'lead', query, [Lead.name, Lead.email, Lead.company, Lead.message]
             )
         
         # Type filter
@@ -380,11 +397,30 @@ class AdminSearchService:
         if date_to:
             search = search.filter(Lead.created_at <= date_to)
         
-        # Get total count
-        total = search.count()
+        return search
+
+    @staticmethod
+    def search_leads(query=None, type=None, is_read=None, date_from=None, date_to=None, limit=50, offset=0, count_mode=None):
+        """
+        Advanced lead search with multiple filters
         
-        # Apply pagination
-        results = search.order_by(Lead.created_at.desc()).limit(limit).offset(offset).all()
+        Args:
+            query: Search term (name, email, company, message)
+            type: Filter by type (demo, investor, contact)
+            is_read: Filter by read status (True/False)
+            date_from: Filter by creation date (from)
+            date_to: Filter by creation date (to)
+            limit: Results per page
+            offset: Pagination offset
+            count_mode: How 'total' is computed: exact, estimated or capped (default)
+        """
+        filters = dict(query=query, type=type, is_read=is_read, date_from=date_from, date_to=date_to)
+        search = AdminSearchService.filter_leads(**filters)
+        
+        # One extra row answers has_more; the total comes from the count strategy
+        results, page = AdminSearchService._paginate(
+            'leads', filters, search, Lead.created_at.desc(), limit, offset, count_mode
+        )
         
         return {
             'results': [
@@ -400,10 +436,7 @@ class AdminSearchService:
                 }
                 for lead in results
             ],
-            'total': total,
-            'limit': limit,
-            'offset': offset,
-            'has_more': total > (offset + limit)
+            **page
         }
 
     @staticmethod
@@ -418,49 +451,26 @@ class AdminSearchService:
         Returns:
             Dictionary with results from all entity types
         """
-        search_term = f"%{query}%"
-        
-        # Search users
-        users = User.query.filter(
-            or_(
-                User.full_name.ilike(search_term),
-                User.email.ilike(search_term),
-                User.company.ilike(search_term)
-            )
-        ).limit(limit).all()
-        
-        # Search programs
-        programs = Opportunity.query.filter(
-            or_(
-                Opportunity.title.ilike(search_term),
-                Opportunity.description.ilike(search_term)
-            )
-        ).limit(limit).all()
-        
-        # Search meetings
-        meetings = Meeting.query.filter(
-            or_(
-                Meeting.title.ilike(search_term),
-                Meeting.description.ilike(search_term)
-            )
-        ).limit(limit).all()
-        
-        # Search leads
-        leads = Lead.query.filter(
-            or_(
-                Lead.name.ilike(search_term),
-                Lead.email.ilike(search_term),
-                Lead.company.ilike(search_term),
-                Lead.message.ilike(search_term)
-            )
-        ).limit(limit).all()
+        # Ranked full-text matches, best first
+        users = AdminSearchService._ranked(
+            'user', User, query, limit, [User.name, User.email, User.company]
+        )
+        programs = AdminSearchService._ranked(
+            'program', Opportunity, query, limit, [Opportunity.title, Opportunity.description]
+        )
+        meetings = AdminSearchService._ranked(
+            'meeting', Meeting, query, limit, [Meeting.title, Meeting.description]
+        )
+        leads = AdminSearchService._ranked(
+            'lead', Lead, query, limit, [Lead.name, Lead.email, Lead.company, Lead.message]
+        )
         
         return {
             'query': query,
             'users': [
                 {
                     'id': u.id,
-                    'name': u.full_name,
+                    'name': u.name,
                     'email': u.email,
                     'role': u.role,
                     'type': 'user'
@@ -500,6 +510,132 @@ class AdminSearchService:
             'total_results': len(users) + len(programs) + len(meetings) + len(leads)
         }
 
+    @staticmethod
+    def _text_filter(search, entity_type, query, columns):
+        """Restrict a query to rows matching the text (full-text index, else ILIKE)"""
+        if SearchIndexService.can_search(query):
+            model = columns[0].class_
+            return search.filter(model.id.in_(SearchIndexService.match_ids(entity_type, query)))
+        
+        search_term = f"%{query}%"
+        return search.filter(or_(*[column.ilike(search_term) for column in columns]))
+
+    @staticmethod
+    def _ranked(entity_type, model, query, limit, columns):
+        """Top matches for one entity type, ordered by relevance when indexed"""
+        if not SearchIndexService.can_search(query):
+            search_term = f"%{query}%"
+            return model.query.filter(
+                or_(*[column.ilike(search_term) for column in columns])
+            ).limit(limit).all()
+        
+        ids = SearchIndexService.search(entity_type, query, limit)
+        if not ids:
+            return []
+        rows = {row.id: row for row in model.query.filter(model.id.in_(ids)).all()}
+        return [rows[id] for id in ids if id in rows]
+
+    @staticmethod
+    def _paginate(entity_type, filters, search, order_by, limit, offset, count_mode=None):
+        """
+        Fetch one page plus its total using the requested count strategy
+
+        has_more comes from fetching limit + 1 rows, never from the total.
+
+        Returns:
+            (rows, page dict with total, total_mode, total_display, limit, offset, has_more)
+        """
+        count_mode = count_mode if count_mode in SEARCH_COUNT_MODES else DEFAULT_COUNT_MODE
+        
+        rows = search.order_by(order_by).limit(limit + 1).offset(offset).all()
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        
+        if not has_more and (rows or offset == 0):
+            # Last page: the total is known without counting
+            total, mode, capped = offset + len(rows), 'exact', False
+        else:
+            total, mode, capped = AdminSearchService._count(entity_type, filters, search, count_mode)
+            # An estimate can undershoot what we have already seen
+            total = max(total, offset + len(rows) + (1 if has_more else 0))
+        
+        if capped:
+            display = f"{SEARCH_COUNT_CAP:,}+"
+        elif mode == 'estimated':
+            display = f"~{total:,}"
+        else:
+            display = f"{total:,}"
+        
+        return rows, {
+            'total': total,
+            'total_mode': mode,
+            'total_display': display,
+            'limit': limit,
+            'offset': offset,
+            'has_more': has_more
+        }
+
+    @staticmethod
+    def _count(entity_type, filters, search, count_mode):
+        """Total for a filtered query, cached briefly per filter spec"""
+        key = (entity_type, count_mode, json.dumps(filters, sort_keys=True, default=str))
+        now = time.monotonic()
+        cached = _count_cache.get(key)
+        if cached and cached[0] > now:
+            return cached[1:]
+        
+        search = search.order_by(None)
+        result = None
+        
+        if count_mode == 'estimated':
+            estimate = AdminSearchService._estimate_rows(search, filters)
+            if estimate is not None:
+                result = (estimate, 'estimated', False)
+            else:
+                count_mode = 'capped'
+        
+        if count_mode == 'capped':
+            # Count at most CAP + 1 rows: the database stops scanning there
+            entity = search.column_descriptions[0]['entity']
+            bounded = search.with_entities(entity.id).limit(SEARCH_COUNT_CAP + 1).subquery()
+            count = db.session.query(func.count()).select_from(bounded).scalar()
+            result = (min(count, SEARCH_COUNT_CAP), 'capped', count > SEARCH_COUNT_CAP)
+        elif result is None:
+            result = (search.count(), 'exact', False)
+        
+        if len(_count_cache) >= SEARCH_COUNT_CACHE_MAX:
+            for stale in [k for k, v in _count_cache.items() if v[0] <= now]:
+                del _count_cache[stale]
+            if len(_count_cache) >= SEARCH_COUNT_CACHE_MAX:
+                _count_cache.clear()
+        _count_cache[key] = (now + SEARCH_COUNT_CACHE_TTL,) + result
+        return result
+
+    @staticmethod
+    def _estimate_rows(search, filters):
+        """Row estimate from planner statistics (None when unavailable)"""
+        connection = db.session.connection()
+        
+        if connection.dialect.name == 'postgresql':
+            compiled = search.statement.compile(dialect=connection.dialect)
+            plan = connection.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {compiled}", compiled.params).scalar()
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            return int(plan[0]['Plan']['Plan Rows'])
+        
+        # SQLite only keeps whole-table counts (sqlite_stat1, after ANALYZE)
+        if connection.dialect.name == 'sqlite' and all(value is None for value in filters.values()):
+            table = search.column_descriptions[0]['entity'].__tablename__
+            try:
+                stat = connection.execute(
+                    text("SELECT stat FROM sqlite_stat1 WHERE tbl = :table LIMIT 1"), {"table": table}
+                ).scalar()
+            except OperationalError:
+                return None
+            return int(stat.split()[0]) if stat else None
+        
+        return None
+
     @staticmethod
     def save_search(user_id, name, entity_type, filters):
         """
@@ -512,15 +648,10 @@ class AdminSearchService:
             filters: Dictionary of filter parameters
         
         Returns:
-            Saved search ID
+            Result dict with the saved search ID
         """
-        # This would require a SavedSearch model
-        # For now, return a placeholder
-        return {
-            'success': True,
-            'message': 'Search saved successfully',
-            'search_id': None  # Would be actual ID from database
-        }
+        from saved_search_service import SavedSearchService
+        return SavedSearchService.create(user_id, name, entity_type, filters)
 
     @staticmethod
     def get_filter_options():
@@ -6,11 +6,14 @@ Handles event tracking and metrics calculation for real-time analytics
 from extensions import db
 from models import (
     AnalyticsEvent, StartupMetrics, Startup, Application, 
-    Referral, ReferralClick, Connection, Message
+    Referral, Connection
 )
 from datetime import datetime, timedelta, date
 import json
 from sqlalchemy import func
+from rollup_service import RollupService
+from visitor_sketch_service import VisitorSketchService
+from ecosystem_fit_service import EcosystemFitService, FIT_LABELS
 
 
 class AnalyticsService:
@@ -37,6 +40,14 @@ class AnalyticsService:
                 event_metadata=json.dumps(metadata or {})
             )
             db.session.add(event)
+            
+            if event_type == 'profile_view' and startup_id:
+                metadata = metadata or {}
+                VisitorSketchService.record_visit(
+                    'startup', startup_id,
+                    VisitorSketchService.visitor_key(user_id, metadata.get('ip_address'), metadata.get('user_agent'))
+                )
+            
             db.session.commit()
             return True
         except Exception as e:
@@ -61,20 +72,21 @@ class AnalyticsService:
         start_date = end_date - timedelta(days=days)
         
         # 1. FUNNEL DATA (Real data)
+        # Event-sourced counts come from the daily rollups
+        RollupService.refresh()
+        
         # Profile views from analytics events
-        profile_views = AnalyticsEvent.query.filter(
-            AnalyticsEvent.startup_id == startup_id,
-            AnalyticsEvent.event_type == 'profile_view',
-            AnalyticsEvent.created_at >= start_date
-        ).count()
+        profile_views = RollupService.get_total(
+            'analytics_events', 'startup', startup_id, 'profile_view', start=start_date
+        )
         
         # Referral clicks
-        referral_clicks = db.session.query(func.count(ReferralClick.id)).join(
-            Referral, ReferralClick.referral_id == Referral.id
-        ).filter(
-            Referral.startup_id == startup_id,
-            ReferralClick.clicked_at >= start_date
-        ).scalar() or 0
+        referral_clicks = RollupService.get_total(
+            'referral_clicks', 'startup', startup_id, 'referral_click', start=start_date
+        )
+        
+        # Unique viewers from the daily HyperLogLog sketches
+        unique_viewers = VisitorSketchService.unique_visitors('startup', startup_id, start=start_date)
         
         # Referrals received
         referrals_received = Referral.query.filter(
@@ -118,6 +130,7 @@ class AnalyticsService:
             'radar': radar_data,
             'summary': {
                 'profile_views': profile_views,
+                'unique_viewers': unique_viewers['estimate'],
                 'referrals_received': referrals_received,
                 'applications_filed': applications_filed,
                 'applications_selected': applications_selected,
@@ -212,60 +225,15 @@ class AnalyticsService:
     
     @staticmethod
     def _calculate_ecosystem_fit(startup):
-        """Calculate ecosystem fit scores for radar chart"""
-        sectors_count = len(json.loads(startup.sectors or '[]'))
-        
-        # Tech Score (based on sectors and innovation)
-        tech_score = 70 + (min(sectors_count, 3) * 10)
-        
-        # Market Score (based on stage and traction)
-        if startup.stage in ('seed', 'series_a'):
-            market_score = 85
-        elif startup.stage in ('pre_seed', 'idea'):
-            market_score = 65
-        else:
-            market_score = 75
-        
-        # Team Score (based on team size and info)
-        team_score = 60
-        if startup.team_size:
-            try:
-                size = int(startup.team_size.split('-')[0] if '-' in startup.team_size else startup.team_size)
-                if size >= 5:
-                    team_score = 85
-                elif size >= 3:
-                    team_score = 75
-            except:
-                pass
-        if startup.team_info and len(startup.team_info) > 100:
-            team_score += 10
-        
-        # Capital Score (based on funding and financials)
-        capital_score = 60
-        if startup.funding:
-            if 'series' in startup.funding.lower():
-                capital_score = 90
-            elif 'seed' in startup.funding.lower():
-                capital_score = 75
-        if startup.financials and len(startup.financials) > 100:
-            capital_score += 10
-        
-        # Product Score (based on description, demo, traction)
-        product_score = 70
-        if startup.demo_url:
-            product_score += 10
-        if startup.traction and len(startup.traction) > 100:
-            product_score += 15
+        """Calculate ecosystem fit scores for radar chart, with nightly peer ranks"""
+        percentiles = EcosystemFitService.get_percentiles(startup.id)
+        sector = percentiles['sector'] if percentiles else None
         
         return {
-            'labels': ['Tech', 'Market', 'Team', 'Capital', 'Product'],
-            'values': [
-                min(tech_score, 100),
-                min(market_score, 100),
-                min(team_score, 100),
-                min(capital_score, 100),
-                min(product_score, 100)
-            ]
+            'labels': FIT_LABELS,
+            'values': EcosystemFitService.score_startup(startup),
+            'percentiles': percentiles,
+            'peer_average': EcosystemFitService.get_peer_average(sector)
         }
     
     @staticmethod
@@ -300,11 +268,10 @@ class AnalyticsService:
             return False  # Already created today
         
         # Calculate metrics
-        profile_views = AnalyticsEvent.query.filter(
-            AnalyticsEvent.startup_id == startup_id,
-            AnalyticsEvent.event_type == 'profile_view',
-            func.date(AnalyticsEvent.created_at) == today
-        ).count()
+        tomorrow = today + timedelta(days=1)
+        profile_views = RollupService.get_total(
+            'analytics_events', 'startup', startup_id, 'profile_view', start=today, end=tomorrow
+        )
         
         referrals_received = Referral.query.filter(
             Referral.startup_id == startup_id,
@@ -323,15 +290,13 @@ class AnalyticsService:
         ).count()
         
         # Messages
-        messages_sent = Message.query.filter(
-            Message.sender_id == startup.founder_id,
-            func.date(Message.created_at) == today
-        ).count()
+        messages_sent = RollupService.get_total(
+            'messages', 'user', startup.founder_id, 'message_sent', start=today, end=tomorrow
+        )
         
-        messages_received = Message.query.filter(
-            Message.recipient_id == startup.founder_id,
-            func.date(Message.created_at) == today
-        ).count()
+        messages_received = RollupService.get_total(
+            'messages', 'user', startup.founder_id, 'message_received', start=today, end=tomorrow
+        )
         
         # Connections
         connections_made = Connection.query.filter(
@@ -374,6 +339,12 @@ class AnalyticsService:
     @staticmethod
     def create_snapshots_for_all_startups():
         """Create daily snapshots for all startups (run as cron job)"""
+        # Bring the rollups fully up to date before reading them
+        RollupService.run_incremental()
+        
+        # Rank every startup against its sector and stage in one pass
+        EcosystemFitService.refresh()
+        
         startups = Startup.query.all()
         created_count = 0
         
@@ -18,6 +18,7 @@ from routes.meetings import bp as meetings_bp, web_bp as meetings_web_bp
 from routes.notifications import bp as notifications_bp
 from routes.messages import bp as messages_bp, web_bp as messages_web_bp
 from routes.connections import bp as connections_bp
+from routes.typeahead import bp as typeahead_bp
 
 from routes.enablers import bp as enablers_bp, connector_web_bp
 from routes.corporate import corporate_bp, corporate_web_bp
@@ -96,6 +97,7 @@ def create_app():
     app.register_blueprint(messages_bp)
     app.register_blueprint(messages_web_bp)
     app.register_blueprint(connections_bp)
+    app.register_blueprint(typeahead_bp)
     
     # NEW: Payment and Messaging blueprints
     # Payment routes temporarily disabled - razorpay integration removed
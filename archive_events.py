@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Archive expired event rows to compressed NDJSON under instance/archive/
+
+Retention per table comes from Config.RETENTION_DAYS (RETENTION_DAYS_* env vars).
+Also prunes the saved-search change log (search_changes).
+
+Usage:
+  python archive_events.py                         # all tables (daily cron)
+  python archive_events.py notifications           # one table
+  python archive_events.py --partition [table...]  # one-off: convert to monthly partitions (Postgres)
+"""
+
+import sys
+
+from app import create_app
+from extensions import db
+from retention_service import RetentionService, RETENTION_TABLES
+from saved_search_service import SavedSearchService, SEARCH_CHANGE_RETENTION_DAYS
+
+
+def main():
+    args = sys.argv[1:]
+    partition = '--partition' in args
+    tables = [arg for arg in args if not arg.startswith('--')] or list(RETENTION_TABLES)
+
+    unknown = [table for table in tables if table not in RETENTION_TABLES]
+    if unknown:
+        print(f"❌ Unknown table(s): {', '.join(unknown)}")
+        print(f"   Valid tables: {', '.join(RETENTION_TABLES)}")
+        return False
+
+    app = create_app()
+
+    with app.app_context():
+        db.create_all()
+
+        if partition:
+            print("🔧 Converting tables to monthly partitions...")
+            for table in tables:
+                result = RetentionService.partition_table(table)
+                if result["success"]:
+                    print(f"✅ {table}: {result.get('message') or str(result['partitions']) + ' partitions'}")
+                else:
+                    print(f"❌ {table}: {result['error']}")
+            return True
+
+        print(f"📦 Archiving expired rows to {RetentionService.archive_dir()}...")
+        for table, result in RetentionService.run(tables).items():
+            if result["success"]:
+                print(f"✅ {table} ({result['strategy'] or 'kept forever'}): "
+                      f"{result['archived']} rows, {result['partitions_dropped']} partitions dropped")
+            else:
+                print(f"❌ {table}: {result['error']}")
+
+        pruned = SavedSearchService.prune_changes()
+        print(f"🧹 Saved search change log: {pruned} rows older than {SEARCH_CHANGE_RETENTION_DAYS} days pruned")
+
+    return True
+
+
+if __name__ == "__main__":
+    main()
@@ -2,6 +2,7 @@
 from flask import Blueprint, request, redirect, url_for, render_template, jsonify, session, current_app
 from models import User, Referral, Startup
 from extensions import db, login_manager, limiter
+from enabler_service import EnablerService
 from flask_login import login_user, logout_user, login_required, current_user
 import google.auth.transport.requests
 import google.oauth2.id_token
@@ -84,7 +85,9 @@ def login():
                 ref.startup_id = user.startups[0].id
                 ref.startup_name = user.name
                 ref.startup_email = user.email
+                previous_status = ref.status
                 ref.status = 'accepted'
+                EnablerService.record_referral_status_change(ref, previous_status)
                 db.session.commit()
         session.pop('referral_token', None)
 
@@ -239,7 +242,9 @@ def register():
                     ref.startup_id = user.startups[0].id
                 ref.startup_name = user.name
                 ref.startup_email = user.email
+                previous_status = ref.status
                 ref.status = 'accepted'
+                EnablerService.record_referral_status_change(ref, previous_status)
                 db.session.commit()
                 print("REGISTRATION: Updated referral record")
             session.pop('referral_token', None)
@@ -478,7 +483,9 @@ def google_callback():
                         ref.startup_id = user.startups[0].id
                     ref.startup_name = user.name
                     ref.startup_email = user.email
+                    previous_status = ref.status
                     ref.status = 'accepted'
+                    EnablerService.record_referral_status_change(ref, previous_status)
                     db.session.commit()
                 session.pop('oauth_referral_token', None)
             
@@ -642,7 +649,9 @@ def google_signup_complete():
                     ref.startup_id = user.startups[0].id
                 ref.startup_name = user.name
                 ref.startup_email = user.email
+                previous_status = ref.status
                 ref.status = 'accepted'
+                EnablerService.record_referral_status_change(ref, previous_status)
                 db.session.commit()
             session.pop('oauth_referral_token', None)
         
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Benchmark admin search: ILIKE scans vs the full-text index
+
+Builds a throwaway SQLite database with synthetic leads (the widest searchable
+table), indexes it, and times both paths for a few typeahead-style queries.
+Never touches the application database.
+
+Usage:
+  python benchmark_search.py              # 1,000,000 rows
+  python benchmark_search.py 100000       # custom size
+"""
+
+import os
+import random
+import sys
+import tempfile
+import time
+from unittest.mock import patch
+
+WORDS = [
+    'acme', 'solar', 'fintech', 'health', 'robotics', 'agri', 'cloud', 'mobility',
+    'edtech', 'quantum', 'logistics', 'retail', 'biotech', 'water', 'energy', 'legal',
+    'insure', 'gaming', 'climate', 'textile', 'drone', 'pharma', 'data', 'security'
+]
+NAMES = ['anita', 'rahul', 'priya', 'arjun', 'meera', 'vikram', 'sara', 'kiran', 'dev', 'lena']
+QUERIES = ['an', 'priya', 'solar en', 'robotics cloud', 'zzz']
+REPEATS = 5
+
+
+def populate(db, Lead, rows):
+    random.seed(42)
+    batch = []
+    for i in range(rows):
+        name = f"{random.choice(NAMES)} {random.choice(NAMES).title()}{i}"
+        company = f"{random.choice(WORDS).title()} {random.choice(WORDS).title()}"
+        batch.append({
+            "type": random.choice(['demo', 'investor', 'contact']),
+            "name": name,
+            "email": f"{name.split()[0]}{i}@{company.split()[0].lower()}.com",
+            "company": company,
+            "message": ' '.join(random.choice(WORDS) for _ in range(12)),
+            "is_read": False
+        })
+        if len(batch) == 10000:
+            db.session.execute(Lead.__table__.insert(), batch)
+            batch = []
+    if batch:
+        db.session.execute(Lead.__table__.insert(), batch)
+    db.session.commit()
+
+
+def timed(fn):
+    started = time.perf_counter()
+    for _ in range(REPEATS):
+        result = fn()
+    return (time.perf_counter() - started) / REPEATS * 1000, result
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+
+    path = os.path.join(tempfile.mkdtemp(), 'search_benchmark.db')
+    os.environ['DATABASE_URL'] = f"sqlite:///{path}"
+
+    from app import create_app
+    from extensions import db
+    from models import Lead
+    from admin_search_service import AdminSearchService
+    from search_index_service import SearchIndexService
+
+    app = create_app()
+
+    with app.app_context():
+        db.create_all()
+
+        print(f"🔧 Inserting {rows:,} leads into {path}...")
+        populate(db, Lead, rows)
+
+        started = time.perf_counter()
+        SearchIndexService.rebuild()
+        print(f"✅ Index built in {time.perf_counter() - started:.1f}s")
+
+        print(f"\n{'query':<18}{'ILIKE ms':>12}{'FTS ms':>12}{'hits':>10}")
+        for query in QUERIES:
+            with patch.object(SearchIndexService, 'available', return_value=False):
+                ilike_ms, _ = timed(lambda: AdminSearchService.search_leads(query=query, limit=20))
+
+            fts_ms, result = timed(lambda: AdminSearchService.search_leads(query=query, limit=20))
+
+            print(f"{query:<18}{ilike_ms:>12.1f}{fts_ms:>12.1f}{result['total']:>10,}")
+
+        typeahead_ms, _ = timed(lambda: AdminSearchService.global_search('pri', limit=10))
+        print(f"\n⏱️  global_search('pri') with index: {typeahead_ms:.1f} ms")
+
+    os.remove(path)
+    return True
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,337 @@
+"""
+Cohort Service
+Weekly signup-cohort retention matrices, maintained incrementally
+
+Activity rows (analytics events, messages, applications, referrals) are
+streamed in id order above a per-source watermark. Each batch is reduced to
+distinct (user, week) pairs; pairs not seen before are recorded in
+user_activity_weeks and counted into cohort_retention cells with a NumPy
+bincount, so serving the matrix only reads a few hundred small rows.
+"""
+
+from datetime import date, datetime, timedelta
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+
+from counter_service import CounterService
+from extensions import db
+from models import (
+    User, AnalyticsEvent, Message, Application, Referral,
+    UserActivityWeek, CohortRetention, RollupWatermark
+)
+from rollup_service import RollupService, ROLLUP_SETTLE_SECONDS
+
+
+# Raw rows consumed per batch
+COHORT_BATCH_SIZE = 5000
+
+# Dashboard reads trigger a bounded catch-up at most this often per process
+COHORT_REFRESH_INTERVAL = 300
+COHORT_REFRESH_MAX_BATCHES = 4
+
+# users feeds cohort sizes; the rest count as activity
+COHORT_SOURCES = ('users', 'analytics_events', 'messages', 'applications', 'referrals')
+
+_last_refresh = {'at': 0.0}
+
+
+class CohortService:
+    """Service for building and reading weekly cohort retention"""
+
+    # ==========================================
+    # AGGREGATION
+    # ==========================================
+
+    @staticmethod
+    def run_incremental(sources=None, batch_size=COHORT_BATCH_SIZE, max_batches=None):
+        """
+        Fold new signups and activity above each source's watermark into the cohorts
+
+        Args:
+            sources: Sources to process (None = all)
+            batch_size: Raw rows read per batch
+            max_batches: Stop after this many batches per source (None = until caught up)
+
+        Returns:
+            dict: Rows consumed per source
+        """
+        processed = {}
+        for source in sources or COHORT_SOURCES:
+            processed[source] = 0
+            batches = 0
+            while max_batches is None or batches < max_batches:
+                count = CohortService._process_batch(source, batch_size)
+                if not count:
+                    break
+                processed[source] += count
+                batches += 1
+        return processed
+
+    @staticmethod
+    def refresh():
+        """Throttled catch-up used by dashboard reads (see RollupService.run_throttled)"""
+        RollupService.run_throttled(
+            _last_refresh, COHORT_REFRESH_INTERVAL,
+            lambda: CohortService.run_incremental(max_batches=COHORT_REFRESH_MAX_BATCHES), 'cohorts'
+        )
+
+    @staticmethod
+    def rebuild():
+        """
+        Drop and recompute all cohort data from the raw tables (backfill)
+
+        Returns:
+            dict: Rows consumed per source
+        """
+        CohortRetention.query.delete(synchronize_session=False)
+        UserActivityWeek.query.delete(synchronize_session=False)
+        RollupWatermark.query.filter(
+            RollupWatermark.source.in_([CohortService._watermark_key(s) for s in COHORT_SOURCES])
+        ).delete(synchronize_session=False)
+        db.session.commit()
+        return CohortService.run_incremental()
+
+    @staticmethod
+    def _process_batch(source, batch_size):
+        """Aggregate one batch for a source in its own transaction; returns rows consumed"""
+        try:
+            with db.engine.connect() as connection:
+                with connection.begin() as transaction:
+                    consumed = CohortService._fold_batch(connection, source, batch_size)
+                    if not consumed:
+                        transaction.rollback()
+                    return consumed
+        except IntegrityError:
+            # Another worker recorded the same activity weeks first
+            return 0
+
+    @staticmethod
+    def _fold_batch(connection, source, batch_size):
+        """Fold the next batch above the watermark through a connection; 0 when nothing was folded"""
+        key = CohortService._watermark_key(source)
+        watermark = RollupService.get_watermark(key, connection)
+        rows = CohortService._fetch_rows(connection, source, watermark, batch_size)
+        if not rows:
+            return 0
+
+        cutoff = datetime.utcnow() - timedelta(seconds=ROLLUP_SETTLE_SECONDS)
+        settled = []
+        for row in rows:
+            if row[1] is not None and row[1] > cutoff:
+                break
+            settled.append(row)
+        if not settled:
+            return 0
+
+        last_id = settled[-1][0]
+        usable = [row for row in settled if row[1] is not None and row[2] is not None]
+
+        if usable:
+            if source == 'users':
+                cells = CohortService._signup_cells(usable)
+            else:
+                cells = CohortService._activity_cells(connection, usable)
+            CounterService.upsert_increments(
+                CohortRetention, ['cohort_week', 'role', 'week_offset', 'metric'], cells, ['value'], connection
+            )
+
+        return len(settled) if RollupService.advance_watermark(connection, key, watermark, last_id) else 0
+
+    @staticmethod
+    def _signup_cells(rows):
+        """Count (id, created_at, role) user rows into cohort-size cells"""
+        weeks = CohortService._week_index([created_at for _, created_at, _ in rows])
+        roles = np.array([role or 'unknown' for _, _, role in rows], dtype=str)
+        return CohortService._count_cells(weeks, roles, np.zeros(len(rows), dtype=np.int64), 'signups')
+
+    @staticmethod
+    def _activity_cells(connection, rows):
+        """Record new (user, week) pairs from (id, ts, user_id) rows and count them"""
+        user_ids = np.array([user_id for _, _, user_id in rows], dtype=np.int64)
+        weeks = CohortService._week_index([ts for _, ts, _ in rows])
+
+        # Distinct (user, week) pairs within the batch
+        pairs = np.unique(np.column_stack([user_ids, weeks]), axis=0)
+
+        # Drop pairs already recorded by earlier batches or other sources
+        unique_users = np.unique(pairs[:, 0]).tolist()
+        seen = set(
+            tuple(row) for row in connection.execute(
+                select(UserActivityWeek.user_id, UserActivityWeek.week).where(
+                    UserActivityWeek.user_id.in_(unique_users),
+                    UserActivityWeek.week >= CohortService._week_date(pairs[:, 1].min()),
+                    UserActivityWeek.week <= CohortService._week_date(pairs[:, 1].max())
+                )
+            )
+        )
+        new_pairs = [
+            (int(user_id), int(week)) for user_id, week in pairs
+            if (int(user_id), CohortService._week_date(week)) not in seen
+        ]
+        if not new_pairs:
+            return []
+
+        connection.execute(
+            UserActivityWeek.__table__.insert(),
+            [{"user_id": user_id, "week": CohortService._week_date(week)} for user_id, week in new_pairs]
+        )
+
+        # Look up each user's cohort and role
+        users = {
+            user_id: (created_at, role)
+            for user_id, created_at, role in connection.execute(
+                select(User.id, User.created_at, User.role).where(User.id.in_(unique_users))
+            )
+            if created_at is not None
+        }
+        new_pairs = [(user_id, week) for user_id, week in new_pairs if user_id in users]
+        if not new_pairs:
+            return []
+
+        cohorts = CohortService._week_index([users[user_id][0] for user_id, _ in new_pairs])
+        roles = np.array([users[user_id][1] or 'unknown' for user_id, _ in new_pairs], dtype=str)
+        offsets = np.array([week for _, week in new_pairs], dtype=np.int64) - cohorts
+
+        # Activity logged before signup (e.g. imported data) has no cohort column
+        keep = offsets >= 0
+        return CohortService._count_cells(cohorts[keep], roles[keep], offsets[keep], 'active')
+
+    @staticmethod
+    def _count_cells(cohorts, roles, offsets, metric):
+        """Accumulate (cohort, role, offset) triples into cell rows with one bincount"""
+        if len(cohorts) == 0:
+            return []
+
+        cohort_values, cohort_codes = np.unique(cohorts, return_inverse=True)
+        role_values, role_codes = np.unique(roles, return_inverse=True)
+        width = int(offsets.max()) + 1
+
+        flat = (cohort_codes * len(role_values) + role_codes) * width + offsets
+        counts = np.bincount(flat)
+
+        cells = []
+        for index in np.flatnonzero(counts):
+            cell, offset = divmod(int(index), width)
+            cohort_code, role_code = divmod(cell, len(role_values))
+            cells.append({
+                "cohort_week": CohortService._week_date(cohort_values[cohort_code]),
+                "role": str(role_values[role_code]),
+                "week_offset": offset,
+                "metric": metric,
+                "value": int(counts[index])
+            })
+        return cells
+
+    @staticmethod
+    def _fetch_rows(connection, source, after_id, limit):
+        """Read the next batch as (id, timestamp, user_id-or-role) tuples"""
+        if source == 'users':
+            query = select(User.id, User.created_at, User.role).where(User.id > after_id).order_by(User.id)
+        elif source == 'analytics_events':
+            query = select(
+                AnalyticsEvent.id, AnalyticsEvent.created_at, AnalyticsEvent.user_id
+            ).where(AnalyticsEvent.id > after_id).order_by(AnalyticsEvent.id)
+        elif source == 'messages':
+            query = select(
+                Message.id, Message.created_at, Message.sender_id
+            ).where(Message.id > after_id).order_by(Message.id)
+        elif source == 'applications':
+            query = select(
+                Application.id, Application.created_at, Application.applied_by_id
+            ).where(Application.id > after_id).order_by(Application.id)
+        elif source == 'referrals':
+            query = select(
+                Referral.id, Referral.created_at, Referral.enabler_id
+            ).where(Referral.id > after_id).order_by(Referral.id)
+        else:
+            raise ValueError(f"Unknown cohort source: {source}")
+
+        return connection.execute(query.limit(limit)).all()
+
+    @staticmethod
+    def _watermark_key(source):
+        return f"cohort:{source}"
+
+    @staticmethod
+    def _week_index(timestamps):
+        """Weeks since 0001-01-01 (a Monday), so week boundaries fall on Mondays"""
+        ordinals = np.array([ts.toordinal() for ts in timestamps], dtype=np.int64)
+        return (ordinals - 1) // 7
+
+    @staticmethod
+    def _week_date(week_index):
+        """Monday of a week index"""
+        return date.fromordinal(int(week_index) * 7 + 1)
+
+    # ==========================================
+    # READS
+    # ==========================================
+
+    @staticmethod
+    def get_retention(weeks=12, role=None):
+        """
+        Get the weekly cohort retention matrix
+
+        Args:
+            weeks: Number of most recent signup cohorts (and offsets) to return
+            role: Restrict to one role (None = all roles combined)
+
+        Returns:
+            dict: Cohorts with sizes, active counts and retention rates per week offset
+        """
+        CohortService.refresh()
+
+        current_week = int(CohortService._week_index([datetime.utcnow()])[0])
+        first_week = current_week - weeks + 1
+
+        query = db.session.query(
+            CohortRetention.cohort_week, CohortRetention.week_offset,
+            CohortRetention.metric, CohortRetention.value
+        ).filter(
+            CohortRetention.cohort_week >= CohortService._week_date(first_week),
+            CohortRetention.week_offset < weeks
+        )
+        if role:
+            query = query.filter(CohortRetention.role == role)
+        cells = query.all()
+
+        sizes = np.zeros(weeks, dtype=np.int64)
+        active = np.zeros((weeks, weeks), dtype=np.int64)
+        for cohort_week, offset, metric, value in cells:
+            row = int(CohortService._week_index([cohort_week])[0]) - first_week
+            if metric == 'signups':
+                sizes[row] += value
+            else:
+                active[row, offset] += value
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            rates = np.where(sizes[:, None] > 0, active * 100.0 / sizes[:, None], 0.0)
+
+        cohorts = []
+        for row in range(weeks):
+            elapsed = weeks - row  # Offsets this cohort has lived through
+            cohorts.append({
+                "cohort_week": CohortService._week_date(first_week + row).isoformat(),
+                "size": int(sizes[row]),
+                "active": active[row, :elapsed].tolist(),
+                "retention": [round(float(rate), 1) for rate in rates[row, :elapsed]]
+            })
+
+        # Size-weighted average over the cohorts old enough to reach each offset
+        average = []
+        for offset in range(weeks):
+            eligible = sizes[:weeks - offset]
+            total = int(eligible.sum())
+            average.append(round(float(active[:weeks - offset, offset].sum()) * 100.0 / total, 1) if total else 0.0)
+
+        roles = [r for (r,) in db.session.query(CohortRetention.role).distinct().order_by(CohortRetention.role)]
+
+        return {
+            "weeks": weeks,
+            "role": role,
+            "roles": roles,
+            "cohorts": cohorts,
+            "average_retention": average
+        }
@@ -51,3 +51,12 @@ class Config:
     # Local Storage Configuration
     UPLOAD_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static', 'uploads')
     MAX_CONTENT_LENGTH = int(os.environ.get('MAX_CONTENT_LENGTH', 16 * 1024 * 1024))  # 16MB default
+    
+    # Event Retention Configuration (days kept in the live tables before archiving)
+    RETENTION_DAYS = {
+        'analytics_events': int(os.environ.get('RETENTION_DAYS_ANALYTICS_EVENTS', 365)),
+        'referral_clicks': int(os.environ.get('RETENTION_DAYS_REFERRAL_CLICKS', 365)),
+        'security_logs': int(os.environ.get('RETENTION_DAYS_SECURITY_LOGS', 180)),
+        'notifications': int(os.environ.get('RETENTION_DAYS_NOTIFICATIONS', 90)),
+    }
+    ARCHIVE_FOLDER = os.environ.get('ARCHIVE_FOLDER')  # Default: <instance>/archive
@@ -0,0 +1,168 @@
+"""
+Connection Graph Service
+In-process adjacency sets of accepted connections
+
+Each user maps to {friend_id: (connection_id, accepted_at)}, so connection
+lists, degree counts and mutual-connection queries never scan the
+connections table. Mutual connections iterate the smaller of the two
+adjacency sets and probe the larger one: O(min(deg(a), deg(b))).
+
+The graph is built lazily on first use and patched on commit whenever a
+connection is accepted, rejected or deleted through the ORM. A periodic full
+rebuild (CACHE_REBUILD_INTERVAL) picks up writes that bypass it.
+"""
+
+from collections import Counter
+import threading
+import time
+
+from sqlalchemy import inspect
+
+from extensions import db
+from models import Connection
+from session_hooks import SessionHooks
+
+
+_graph = {'adjacency': {}, 'built_at': None}
+_lock = threading.Lock()
+
+
+class ConnectionGraphService:
+    """Service for accepted-connection graph queries"""
+
+    @staticmethod
+    def connections(user_id):
+        """
+        Accepted connections of a user
+
+        Returns:
+            dict: {friend_id: (connection_id, accepted_at)}
+        """
+        ConnectionGraphService._ensure_built()
+        with _lock:
+            return dict(_graph['adjacency'].get(user_id, {}))
+
+    @staticmethod
+    def degree(user_id):
+        """Number of accepted connections"""
+        ConnectionGraphService._ensure_built()
+        with _lock:
+            return len(_graph['adjacency'].get(user_id, ()))
+
+    @staticmethod
+    def mutual(user_a, user_b):
+        """
+        Users connected to both
+
+        Returns:
+            list: User IDs, ascending
+        """
+        ConnectionGraphService._ensure_built()
+        with _lock:
+            adjacency = _graph['adjacency']
+            first, second = adjacency.get(user_a, {}), adjacency.get(user_b, {})
+            if len(first) > len(second):
+                first, second = second, first
+            return sorted(friend_id for friend_id in first if friend_id in second and friend_id not in (user_a, user_b))
+
+    @staticmethod
+    def mutual_counts(user_id):
+        """
+        Mutual connection counts with every user two hops away
+
+        Returns:
+            Counter: {user_id: connections shared with user_id}; includes direct
+                     connections that share a friend, never user_id itself
+        """
+        ConnectionGraphService._ensure_built()
+        counts = Counter()
+        with _lock:
+            adjacency = _graph['adjacency']
+            for friend_id in adjacency.get(user_id, ()):
+                counts.update(adjacency.get(friend_id, {}).keys())
+        counts.pop(user_id, None)
+        return counts
+
+    @staticmethod
+    def neighbourhood(user_ids):
+        """
+        Users connected to any of user_ids, as currently cached
+
+        Never rebuilds, so it is safe to call from session hooks.
+
+        Returns:
+            set: User IDs
+        """
+        with _lock:
+            adjacency = _graph['adjacency']
+            return set().union(*(adjacency.get(user_id, ()) for user_id in user_ids))
+
+    @staticmethod
+    def is_connected(user_a, user_b):
+        ConnectionGraphService._ensure_built()
+        with _lock:
+            return user_b in _graph['adjacency'].get(user_a, ())
+
+    # ==========================================
+    # GRAPH MAINTENANCE
+    # ==========================================
+
+    @staticmethod
+    def rebuild():
+        """Reload every accepted connection from the database"""
+        adjacency = {}
+        for row in db.session.query(
+            Connection.id, Connection.requester_id, Connection.recipient_id, Connection.accepted_at
+        ).filter(Connection.status == 'accepted'):
+            adjacency.setdefault(row.requester_id, {})[row.recipient_id] = (row.id, row.accepted_at)
+            adjacency.setdefault(row.recipient_id, {})[row.requester_id] = (row.id, row.accepted_at)
+
+        with _lock:
+            _graph['adjacency'] = adjacency
+            _graph['built_at'] = time.monotonic()
+
+        return sum(len(friends) for friends in adjacency.values()) // 2
+
+    @staticmethod
+    def _ensure_built():
+        if SessionHooks.is_stale(_graph['built_at']):
+            ConnectionGraphService.rebuild()
+
+    @staticmethod
+    def _apply(changes):
+        """Patch adjacency with committed connections ((id, accepted_at) or None = not accepted)"""
+        with _lock:
+            if _graph['built_at'] is None:
+                return
+            adjacency = _graph['adjacency']
+            for (user_a, user_b), edge in changes.items():
+                for one, other in ((user_a, user_b), (user_b, user_a)):
+                    if edge is None:
+                        friends = adjacency.get(one)
+                        if friends is not None:
+                            friends.pop(other, None)
+                            if not friends:
+                                del adjacency[one]
+                    else:
+                        adjacency.setdefault(one, {})[other] = edge
+
+    @staticmethod
+    def _collect(session, pending):
+        """Snapshot connection status changes; applied only once the commit succeeds"""
+        for obj in list(session.new) + list(session.dirty):
+            if not isinstance(obj, Connection):
+                continue
+            if obj not in session.new and not any(
+                inspect(obj).attrs[field].history.has_changes()
+                for field in ('status', 'accepted_at', 'requester_id', 'recipient_id')
+            ):
+                continue
+            edge = (obj.id, obj.accepted_at) if obj.status == 'accepted' else None
+            pending[(obj.requester_id, obj.recipient_id)] = edge
+
+        for obj in session.deleted:
+            if isinstance(obj, Connection):
+                pending[(obj.requester_id, obj.recipient_id)] = None
+
+
+SessionHooks.on_commit('connection_graph', [Connection], ConnectionGraphService._collect, ConnectionGraphService._apply)
@@ -0,0 +1,334 @@
+"""
+Connection Suggestion Service
+In-process "people you may know" engine over sectors and the connection graph
+
+The engine keeps, in memory:
+
+    sector -> {founder_id: startups in that sector}    (inverted index)
+    role / region -> {user_id}
+
+and reads accepted connections from ConnectionGraphService.
+
+A user's candidates are scored as
+
+    10 per mutual connection (friends-of-friends)
+     5 per sector shared with the candidate's startups
+     3 when the candidate's role fits (founders: enablers and corporates)
+     2 for the same region
+
+and the best SUGGESTION_CACHE_SIZE are cached per user, padded with other
+active users. Admins, inactive users and anyone the user already has a
+connection row with (pending, accepted or declined) are never suggested; those
+rows are read per request. Committed connection and startup sector changes
+drop only the cached lists they affect, and user changes drop them all; the
+periodic full rebuild (CACHE_REBUILD_INTERVAL) picks up bulk edits that
+bypass the ORM.
+"""
+
+from collections import Counter
+import heapq
+import json
+import threading
+import time
+
+from sqlalchemy import inspect, or_
+
+from connection_graph_service import ConnectionGraphService
+from extensions import db
+from models import User, Startup, Connection
+from session_hooks import SessionHooks
+
+
+SUGGESTION_WEIGHTS = {
+    'mutual': 10.0,
+    'sector': 5.0,
+    'role': 3.0,
+    'region': 2.0,
+}
+
+# Roles the app treats as founders (see auth.py), and the roles suggested to them
+SUGGESTION_FOUNDER_ROLES = ('founder', 'startup')
+SUGGESTION_FOUNDER_FIT_ROLES = ('enabler', 'corporate')
+
+# Roles never suggested to anyone
+SUGGESTION_EXCLUDED_ROLES = ('admin',)
+
+# Candidates cached per user (the largest page served)
+SUGGESTION_CACHE_SIZE = 50
+
+SUGGESTION_USER_FIELDS = ('role', 'region', 'is_active')
+SUGGESTION_STARTUP_FIELDS = ('founder_id', 'sectors')
+
+_state = {'built_at': None}
+_lock = threading.Lock()
+
+
+class ConnectionSuggestionService:
+    """Service for ranked connection suggestions"""
+
+    @staticmethod
+    def suggest(user_id, limit=10):
+        """
+        Best connection candidates for a user
+
+        Args:
+            user_id: User asking for suggestions
+            limit: Max suggestions (capped at SUGGESTION_CACHE_SIZE)
+
+        Returns:
+            list: dicts of user_id, score, mutual_connections and shared_sectors, best first
+        """
+        ConnectionSuggestionService._ensure_built()
+        limit = max(1, min(limit, SUGGESTION_CACHE_SIZE))
+        linked = ConnectionSuggestionService._linked(user_id)
+
+        with _lock:
+            cached = _state['cache'].get(user_id)
+        if cached is None:
+            mutual = ConnectionGraphService.mutual_counts(user_id)
+            with _lock:
+                cached = ConnectionSuggestionService._compute(user_id, linked, mutual)
+                _state['cache'][user_id] = cached
+
+        with _lock:
+            # Users deactivated or connected since the list was cached are skipped
+            results = []
+            for score, candidate_id, mutual, shared in cached:
+                if candidate_id in linked or not ConnectionSuggestionService._eligible(candidate_id):
+                    continue
+                results.append({
+                    'user_id': candidate_id,
+                    'score': score,
+                    'mutual_connections': mutual,
+                    'shared_sectors': shared
+                })
+                if len(results) >= limit:
+                    break
+
+        return results
+
+    @staticmethod
+    def _compute(user_id, linked, mutual):
+        """
+        Score every candidate for a user (caller holds the lock)
+
+        Args:
+            user_id: User asking for suggestions
+            linked: Users with any connection row to user_id
+            mutual: ConnectionGraphService.mutual_counts(user_id)
+        """
+        role, region, _ = _state['users'].get(user_id, (None, None, False))
+        excluded = linked | {user_id}
+
+        shared = Counter()
+        for sector in ConnectionSuggestionService._founder_sectors(user_id):
+            shared.update(_state['sector_founders'].get(sector, {}).keys())
+
+        role_fit = set()
+        if role in SUGGESTION_FOUNDER_ROLES:
+            for fit in SUGGESTION_FOUNDER_FIT_ROLES:
+                role_fit |= _state['by_role'].get(fit, set())
+        same_region = _state['by_region'].get(region, set()) if region else set()
+
+        scored = []
+        for candidate_id in set(mutual) | set(shared) | role_fit | same_region:
+            if candidate_id in excluded or not ConnectionSuggestionService._eligible(candidate_id):
+                continue
+            score = (
+                SUGGESTION_WEIGHTS['mutual'] * mutual[candidate_id]
+                + SUGGESTION_WEIGHTS['sector'] * shared[candidate_id]
+                + (SUGGESTION_WEIGHTS['role'] if candidate_id in role_fit else 0.0)
+                + (SUGGESTION_WEIGHTS['region'] if candidate_id in same_region else 0.0)
+            )
+            scored.append((score, -candidate_id, mutual[candidate_id], shared[candidate_id]))
+
+        best = [
+            (score, -negative_id, mutual_count, shared_count)
+            for score, negative_id, mutual_count, shared_count in heapq.nlargest(SUGGESTION_CACHE_SIZE, scored)
+        ]
+
+        # Pad with other eligible users, oldest accounts first
+        if len(best) < SUGGESTION_CACHE_SIZE:
+            taken = {candidate_id for _, candidate_id, _, _ in best} | excluded
+            for candidate_id in _state['user_ids']:
+                if candidate_id not in taken and ConnectionSuggestionService._eligible(candidate_id):
+                    best.append((0.0, candidate_id, 0, 0))
+                    if len(best) >= SUGGESTION_CACHE_SIZE:
+                        break
+
+        return best
+
+    @staticmethod
+    def _eligible(candidate_id):
+        """Whether a user may be suggested at all (caller holds the lock)"""
+        role, _, is_active = _state['users'].get(candidate_id, (None, None, False))
+        return is_active and role not in SUGGESTION_EXCLUDED_ROLES
+
+    @staticmethod
+    def _linked(user_id):
+        """Users with any connection row (pending, accepted or declined) to user_id"""
+        rows = db.session.query(Connection.requester_id, Connection.recipient_id).filter(
+            or_(Connection.requester_id == user_id, Connection.recipient_id == user_id)
+        )
+        return {other for row in rows for other in row if other != user_id}
+
+    @staticmethod
+    def _founder_sectors(user_id):
+        sectors = set()
+        for startup_id in _state['founder_startups'].get(user_id, ()):
+            sectors |= _state['startups'][startup_id][1]
+        return sectors
+
+    @staticmethod
+    def _parse_sectors(value):
+        try:
+            sectors = json.loads(value) if isinstance(value, str) else value
+        except ValueError:
+            return frozenset()
+        if not isinstance(sectors, list):
+            return frozenset()
+        return frozenset(sector for sector in sectors if isinstance(sector, str) and sector)
+
+    # ==========================================
+    # INDEX MAINTENANCE
+    # ==========================================
+
+    @staticmethod
+    def rebuild():
+        """Reload users and startups from the database"""
+        state = {
+            'users': {}, 'by_role': {}, 'by_region': {}, 'user_ids': [],
+            'startups': {}, 'founder_startups': {}, 'sector_founders': {},
+            'cache': {}
+        }
+
+        for row in db.session.query(User.id, User.role, User.region, User.is_active).order_by(User.id):
+            ConnectionSuggestionService._set_user(state, row.id, (row.role, row.region, bool(row.is_active)))
+        for row in db.session.query(Startup.id, Startup.founder_id, Startup.sectors):
+            ConnectionSuggestionService._set_startup(
+                state, row.id, (row.founder_id, ConnectionSuggestionService._parse_sectors(row.sectors))
+            )
+
+        state['built_at'] = time.monotonic()
+        with _lock:
+            _state.clear()
+            _state.update(state)
+
+        return len(state['users'])
+
+    @staticmethod
+    def _ensure_built():
+        if SessionHooks.is_stale(_state['built_at']):
+            ConnectionSuggestionService.rebuild()
+
+    @staticmethod
+    def _set_user(state, user_id, values):
+        """Index a user's (role, region, is_active); None removes them"""
+        old = state['users'].pop(user_id, None)
+        if old:
+            state['by_role'].get(old[0], set()).discard(user_id)
+            state['by_region'].get(old[1], set()).discard(user_id)
+        if values is None:
+            return
+        state['users'][user_id] = values
+        state['by_role'].setdefault(values[0], set()).add(user_id)
+        if values[1]:
+            state['by_region'].setdefault(values[1], set()).add(user_id)
+        if old is None:
+            state['user_ids'].append(user_id)
+
+    @staticmethod
+    def _set_startup(state, startup_id, values):
+        """Index a startup's (founder_id, sectors); None removes it. Returns touched sectors"""
+        old = state['startups'].pop(startup_id, None)
+        touched = set()
+        if old:
+            founder_id, sectors = old
+            state['founder_startups'].get(founder_id, set()).discard(startup_id)
+            for sector in sectors:
+                founders = state['sector_founders'][sector]
+                founders[founder_id] -= 1
+                if founders[founder_id] <= 0:
+                    del founders[founder_id]
+            touched |= sectors
+        if values is not None and values[0] is not None:
+            founder_id, sectors = values
+            state['startups'][startup_id] = values
+            state['founder_startups'].setdefault(founder_id, set()).add(startup_id)
+            for sector in sectors:
+                founders = state['sector_founders'].setdefault(sector, {})
+                founders[founder_id] = founders.get(founder_id, 0) + 1
+            touched |= sectors
+        return touched
+
+    @staticmethod
+    def _apply(changes):
+        """Patch the index with committed changes and drop the cached lists they affect"""
+        with _lock:
+            if _state['built_at'] is None:
+                return
+            stale = set()
+
+            for user_id, values in changes['users'].items():
+                ConnectionSuggestionService._set_user(_state, user_id, values)
+
+            for startup_id, values in changes['startups'].items():
+                old = _state['startups'].get(startup_id)
+                founders = {values[0] if values else None, old[0] if old else None}
+                for sector in ConnectionSuggestionService._set_startup(_state, startup_id, values):
+                    founders |= set(_state['sector_founders'].get(sector, {}))
+                stale |= founders
+
+            # Both users, plus everyone for whom either is a friend-of-friend. The
+            # graph has already applied this commit, and anyone who stopped being
+            # a friend of either is an endpoint of another changed connection.
+            for pair in changes['connections']:
+                stale |= set(pair) | ConnectionGraphService.neighbourhood(pair)
+
+            if changes['users']:
+                # A user's role, region or activation can move them in or out of
+                # anyone's list (role fit, same region, padding); the startups and
+                # connections committed alongside are indexed above all the same
+                _state['cache'].clear()
+                return
+            for user_id in stale:
+                _state['cache'].pop(user_id, None)
+
+    @staticmethod
+    def _collect(session, pending):
+        """Snapshot changed users and startups, and the endpoints of changed connections"""
+        for obj in list(session.new) + list(session.dirty):
+            if isinstance(obj, User):
+                fields = SUGGESTION_USER_FIELDS
+            elif isinstance(obj, Startup):
+                fields = SUGGESTION_STARTUP_FIELDS
+            elif isinstance(obj, Connection):
+                fields = ('status', 'requester_id', 'recipient_id')
+            else:
+                continue
+            if obj not in session.new and not any(
+                inspect(obj).attrs[field].history.has_changes() for field in fields
+            ):
+                continue
+
+            if isinstance(obj, User):
+                pending['users'][obj.id] = (obj.role, obj.region, bool(obj.is_active))
+            elif isinstance(obj, Startup):
+                pending['startups'][obj.id] = (obj.founder_id, ConnectionSuggestionService._parse_sectors(obj.sectors))
+            else:
+                pending['connections'].add((obj.requester_id, obj.recipient_id))
+
+        for obj in session.deleted:
+            if isinstance(obj, User):
+                pending['users'][obj.id] = None
+            elif isinstance(obj, Startup):
+                pending['startups'][obj.id] = None
+            elif isinstance(obj, Connection):
+                pending['connections'].add((obj.requester_id, obj.recipient_id))
+
+
+SessionHooks.on_commit(
+    'connection_suggestions', [User, Startup, Connection],
+    ConnectionSuggestionService._collect, ConnectionSuggestionService._apply,
+    pending=lambda: {'users': {}, 'startups': {}, 'connections': set()}
+)
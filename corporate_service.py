@@ -10,11 +10,51 @@ from models import (
     User, Startup, Opportunity, Application,
     StartupMatch, Deal, DealActivity, CorporateProfile, CorporateAnalytics
 )
-from sqlalchemy import func, and_, or_, desc
+from sqlalchemy import func, and_, desc, literal
+from rollup_service import RollupService
+from counter_service import CounterService
+from analytics_service import AnalyticsService
+from startup_search_service import StartupSearchService
+from match_scoring_service import MatchScoringService, MATCH_DEFAULT_SCORE
+from match_matrix_service import MatchMatrixService, MATCH_MATRIX_MIN_SCORE
+import numpy as np
 import json
 import secrets
 
 
+# Activity type -> CorporateAnalytics counter column
+ACTIVITY_COUNTERS = {
+    'startup_viewed': 'startups_viewed',
+    'startup_contacted': 'startups_contacted',
+    'startup_connected': 'startups_connected',
+    'deal_created': 'deals_created',
+    'deal_moved': 'deals_moved',
+    'deal_closed_won': 'deals_closed_won',
+    'deal_closed_lost': 'deals_closed_lost',
+    'application_reviewed': 'applications_reviewed',
+    'application_shortlisted': 'applications_shortlisted',
+    'application_rejected': 'applications_rejected',
+    'meeting_scheduled': 'meetings_scheduled',
+    'message_sent': 'messages_sent',
+}
+
+# Activities that also accumulate a deal value
+ACTIVITY_VALUE_COLUMNS = {
+    'deal_created': 'total_deal_value',
+    'deal_closed_won': 'closed_deal_value',
+}
+
+# Discovery ranking: share of the blended score taken by text relevance when searching
+DISCOVER_TEXT_WEIGHT = 0.5
+DISCOVER_PAGE_SIZE = 20
+
+# CorporateAnalytics columns recomputed by reconcile_daily_analytics
+RECONCILED_COLUMNS = [
+    'deals_created', 'deals_moved', 'deals_closed_won', 'deals_closed_lost',
+    'total_deal_value', 'closed_deal_value',
+]
+
+
 class CorporateService:
     """Service layer for corporate dashboard operations"""
 
@@ -29,6 +69,9 @@ class CorporateService:
             # Get corporate profile
             profile = CorporateProfile.query.filter_by(user_id=corporate_id).first()
             
+            # Catch up on queued match rescoring (throttled)
+            MatchMatrixService.refresh()
+            
             # Get total startups count
             total_startups = Startup.query.count()
             
@@ -104,79 +147,125 @@ class CorporateService:
 
     @staticmethod
     def discover_startups(corporate_id, filters=None):
-        """Get matched startups with scores"""
+        """
+        Get the startups that best match a corporate, ranked over the whole population
+
+        Without a search term this is an indexed read of the persisted match
+        matrix (startup_matches, maintained by MatchMatrixService) ordered by
+        match score. With one, the ranking blends the structured match score
+        with BM25 relevance over name, description, problem, solution and
+        traction, scored online.
+
+        Args:
+            corporate_id: Corporate user ID
+            filters: Optional search, sector, stage and page
+
+        Returns:
+            dict: success, startups (top DISCOVER_PAGE_SIZE for the page) and total evaluated
+        """
         try:
+            filters = filters or {}
+            page = max(1, filters.get('page') or 1)
+
             # Get corporate profile for matching
             profile = CorporateProfile.query.filter_by(user_id=corporate_id).first()
             
-            # Build query
-            query = Startup.query
+            if not filters.get('search'):
+                return CorporateService._discover_from_matrix(corporate_id, profile, filters, page)
             
-            # Apply filters
-            if filters:
-                if filters.get('search'):
-                    search_term = f"%{filters['search']}%"
-                    query = query.filter(
-                        or_(
-                            Startup.name.ilike(search_term),
-                            Startup.description.ilike(search_term)
-                        )
-                    )
-                
+            # Text relevance for every startup containing a search term
+            text_scores = StartupSearchService.score(filters['search'])
+            if not text_scores:
+                return {"success": True, "startups": [], "total": 0}
+            
+            # Score every startup against the profile in one vectorized pass
+            features = MatchScoringService.features()
+            match_scores = MatchScoringService.score_all(profile, features)
+            eligible = features['alive'].copy()
+            
+            if filters.get('sector') or filters.get('stage'):
+                query = db.session.query(Startup.id)
                 if filters.get('sector'):
                     query = query.filter(Startup.sectors.contains(filters['sector']))
-                
                 if filters.get('stage'):
-                    query = query.filter_by(stage=filters['stage'])
+                    query = query.filter(Startup.stage == filters['stage'])
+                eligible &= np.isin(features['ids'], [row.id for row in query])
+            
+            relevance = np.zeros(len(features['ids']))
+            positions = features['positions']
+            hits = [(positions[startup_id], score) for startup_id, score in text_scores.items() if startup_id in positions]
+            if hits:
+                hit_positions, hit_scores = zip(*hits)
+                relevance[list(hit_positions)] = 100.0 * np.array(hit_scores) / max(hit_scores)
+            matched = np.zeros(len(features['ids']), dtype=bool)
+            matched[[position for position, _ in hits]] = True
+            eligible &= matched
+            ranking = (1 - DISCOVER_TEXT_WEIGHT) * match_scores + DISCOVER_TEXT_WEIGHT * relevance
             
-            # Get startups
-            startups = query.limit(50).all()
+            # argpartition top-k over the whole population, then this page
+            best = MatchScoringService.top_k(ranking, features['ids'], page * DISCOVER_PAGE_SIZE, eligible)
+            best = best[(page - 1) * DISCOVER_PAGE_SIZE:]
+            
+            ids = [int(features['ids'][position]) for position in best]
+            startups = {s.id: s for s in Startup.query.filter(Startup.id.in_(ids)).all()} if ids else {}
             
-            # Calculate match scores
             results = []
-            for startup in startups:
-                match_score = CorporateService.calculate_match_score(profile, startup)
-                
-                # Check if match already exists
-                existing_match = StartupMatch.query.filter_by(
-                    corporate_id=corporate_id,
-                    startup_id=startup.id
-                ).first()
-                
-                if not existing_match and match_score > 50:  # Only create if score > 50
-                    # Create match record
-                    match = StartupMatch(
-                        corporate_id=corporate_id,
-                        startup_id=startup.id,
-                        match_score=match_score,
-                        match_factors=json.dumps({
-                            "sector": 0.4,
-                            "stage": 0.3,
-                            "location": 0.2,
-                            "funding": 0.1
-                        }),
-                        status='discovered'
-                    )
-                    db.session.add(match)
-                
+            for position in best:
+                startup = startups.get(int(features['ids'][position]))
+                if not startup:
+                    continue
                 startup_dict = startup.to_dict()
-                startup_dict['match_score'] = match_score
+                startup_dict['match_score'] = float(match_scores[position])
+                startup_dict['relevance_score'] = round(float(relevance[position]), 1)
+                startup_dict['score'] = round(float(ranking[position]), 1)
                 results.append(startup_dict)
             
-            db.session.commit()
-            
-            # Sort by match score
-            results.sort(key=lambda x: x['match_score'], reverse=True)
-            
             return {
                 "success": True,
-                "startups": results[:20],  # Top 20
-                "total": len(results)
+                "startups": results,
+                "total": int(eligible.sum())
             }
         except Exception as e:
             db.session.rollback()
             return {"success": False, "error": str(e)}
 
+    @staticmethod
+    def _discover_from_matrix(corporate_id, profile, filters, page):
+        """Page of stored matches, best first (index on corporate_id, match_score)"""
+        if profile:
+            query = db.session.query(StartupMatch.match_score, Startup).join(
+                Startup, Startup.id == StartupMatch.startup_id
+            ).filter(
+                StartupMatch.corporate_id == corporate_id,
+                StartupMatch.match_score > MATCH_MATRIX_MIN_SCORE
+            )
+            order = (desc(StartupMatch.match_score), StartupMatch.startup_id)
+        else:
+            # Without a profile every startup scores the default
+            query = db.session.query(literal(MATCH_DEFAULT_SCORE), Startup)
+            order = (Startup.id,)
+        
+        if filters.get('sector'):
+            query = query.filter(Startup.sectors.contains(filters['sector']))
+        if filters.get('stage'):
+            query = query.filter(Startup.stage == filters['stage'])
+        
+        total = query.count()
+        rows = query.order_by(*order).offset((page - 1) * DISCOVER_PAGE_SIZE).limit(DISCOVER_PAGE_SIZE).all()
+        
+        results = []
+        for match_score, startup in rows:
+            startup_dict = startup.to_dict()
+            startup_dict['match_score'] = match_score
+            startup_dict['score'] = round(match_score, 1)
+            results.append(startup_dict)
+        
+        return {
+            "success": True,
+            "startups": results,
+            "total": total
+        }
+
     @staticmethod
     def calculate_match_score(corporate_profile, startup):
         """Calculate 0-100 match score between corporate and startup"""
@@ -701,6 +790,7 @@ class CorporateService:
                 db.session.add(match)
             CorporateService.track_activity(corporate_id, 'startup_viewed')
             db.session.commit()
+            AnalyticsService.track_event('profile_view', user_id=corporate_id, startup_id=startup_id)
             return {"success": True, "viewed_at": match.viewed_at.isoformat()}
         except Exception as e:
             db.session.rollback()
@@ -749,7 +839,7 @@ class CorporateService:
             db.session.flush()
             activity = DealActivity(deal_id=deal.id, activity_type='created', description=f"Deal created in {deal.stage} stage", created_by=corporate_id)
             db.session.add(activity)
-            CorporateService.track_activity(corporate_id, 'deal_created')
+            CorporateService.track_activity(corporate_id, 'deal_created', deal.value or 0.0)
             db.session.commit()
             return {"success": True, "deal": deal.to_dict()}
         except Exception as e:
@@ -765,9 +855,11 @@ class CorporateService:
             old_stage = deal.stage
             deal.stage = new_stage
             deal.updated_at = datetime.utcnow()
-            activity = DealActivity(deal_id=deal_id, activity_type='stage_change', description=f"Moved from {old_stage} to {new_stage}", created_by=corporate_id)
+            activity = DealActivity(deal_id=deal_id, activity_type='stage_change', description=f"Moved from {old_stage} to {new_stage}", old_stage=old_stage, new_stage=new_stage, created_by=corporate_id)
             db.session.add(activity)
             CorporateService.track_activity(corporate_id, 'deal_moved')
+            if new_stage in ('closed_won', 'closed_lost') and old_stage != new_stage:
+                CorporateService.track_activity(corporate_id, f"deal_{new_stage}", deal.value or 0.0)
             db.session.commit()
             return {"success": True, "deal": deal.to_dict()}
         except Exception as e:
@@ -885,24 +977,60 @@ class CorporateService:
             return {"success": False, "error": str(e)}
     
     @staticmethod
-    def track_activity(corporate_id, activity_type):
+    def track_activity(corporate_id, activity_type, value=0.0):
+        """Atomically bump today's counter for an activity (caller commits)"""
+        column = ACTIVITY_COUNTERS.get(activity_type)
+        if not column:
+            return
+        deltas = {column: 1}
+        if activity_type in ACTIVITY_VALUE_COLUMNS and value:
+            deltas[ACTIVITY_VALUE_COLUMNS[activity_type]] = value
+        CounterService.increment(CorporateAnalytics, {"corporate_id": corporate_id, "date": datetime.utcnow().date()}, deltas)
+    
+    @staticmethod
+    def reconcile_daily_analytics(day=None, corporate_ids=None):
+        """
+        Recompute the deal-flow counters of CorporateAnalytics for a day
+        
+        Only columns with a raw source (deals and their stage-change activities)
+        are repaired; view/contact counters have no event log to rebuild from.
+        
+        Args:
+            day: UTC date to repair (default today)
+            corporate_ids: Restrict to these corporates (None = all)
+        
+        Returns:
+            dict: success flag and number of rows written
+        """
         try:
-            today = date.today()
-            analytics = CorporateAnalytics.query.filter_by(corporate_id=corporate_id, date=today).first()
-            if not analytics:
-                analytics = CorporateAnalytics(corporate_id=corporate_id, date=today)
-                db.session.add(analytics)
-            if activity_type == 'startup_viewed':
-                analytics.startups_viewed += 1
-            elif activity_type == 'startup_contacted':
-                analytics.startups_contacted += 1
-            elif activity_type == 'deal_created':
-                analytics.deals_created += 1
-            elif activity_type == 'deal_moved':
-                analytics.deals_moved += 1
+            day = day or datetime.utcnow().date()
+            start = datetime(day.year, day.month, day.day)
+            end = start + timedelta(days=1)
+            rows = {}
+            def row(corporate_id):
+                return rows.setdefault(corporate_id, {"corporate_id": corporate_id, "date": day, **dict.fromkeys(RECONCILED_COLUMNS, 0)})
+            def scoped(query, column):
+                return query.filter(column.in_(corporate_ids)) if corporate_ids else query
+            for (corporate_id,) in scoped(db.session.query(CorporateAnalytics.corporate_id).filter(CorporateAnalytics.date == day), CorporateAnalytics.corporate_id):
+                row(corporate_id)
+            created = scoped(db.session.query(Deal.corporate_id, func.count(Deal.id), func.sum(Deal.value)).filter(Deal.created_at >= start, Deal.created_at < end), Deal.corporate_id).group_by(Deal.corporate_id)
+            for corporate_id, count, total_value in created:
+                row(corporate_id)["deals_created"] = count
+                row(corporate_id)["total_deal_value"] = total_value or 0.0
+            moves = scoped(db.session.query(Deal.corporate_id, DealActivity.new_stage, func.count(DealActivity.id), func.sum(Deal.value)).join(Deal, DealActivity.deal_id == Deal.id).filter(DealActivity.activity_type == 'stage_change', DealActivity.created_at >= start, DealActivity.created_at < end), Deal.corporate_id).group_by(Deal.corporate_id, DealActivity.new_stage)
+            for corporate_id, new_stage, count, moved_value in moves:
+                row(corporate_id)["deals_moved"] += count
+                if new_stage == 'closed_won':
+                    row(corporate_id)["deals_closed_won"] += count
+                    row(corporate_id)["closed_deal_value"] += moved_value or 0.0
+                elif new_stage == 'closed_lost':
+                    row(corporate_id)["deals_closed_lost"] += count
+            CounterService.upsert_replace(CorporateAnalytics, ["corporate_id", "date"], list(rows.values()), RECONCILED_COLUMNS)
             db.session.commit()
+            return {"success": True, "rows": len(rows)}
         except Exception as e:
             db.session.rollback()
+            return {"success": False, "error": str(e)}
     
     @staticmethod
     def get_analytics(corporate_id, period='6m'):
@@ -911,15 +1039,22 @@ class CorporateService:
             end_date = date.today()
             start_date = end_date - timedelta(days=months * 30)
             analytics = CorporateAnalytics.query.filter(and_(CorporateAnalytics.corporate_id == corporate_id, CorporateAnalytics.date >= start_date, CorporateAnalytics.date <= end_date)).order_by(CorporateAnalytics.date).all()
-            totals = {"startups_viewed": sum(a.startups_viewed for a in analytics), "startups_contacted": sum(a.startups_contacted for a in analytics), "deals_created": sum(a.deals_created for a in analytics), "applications_reviewed": sum(a.applications_reviewed for a in analytics)}
+            RollupService.refresh()
+            messages_series = RollupService.get_series("messages", "user", corporate_id, "message_sent", start=start_date, end=end_date + timedelta(days=1))
+            totals = {"startups_viewed": sum(a.startups_viewed for a in analytics), "startups_contacted": sum(a.startups_contacted for a in analytics), "deals_created": sum(a.deals_created for a in analytics), "applications_reviewed": sum(a.applications_reviewed for a in analytics), "messages_sent": sum(value for _, value in messages_series)}
             monthly_data = {}
-            for record in analytics:
-                month_key = record.date.strftime("%Y-%m")
+            def month_bucket(day):
+                month_key = day.strftime("%Y-%m")
                 if month_key not in monthly_data:
-                    monthly_data[month_key] = {"month": record.date.strftime("%b %Y"), "startups_viewed": 0, "deals_created": 0, "applications_reviewed": 0}
-                monthly_data[month_key]["startups_viewed"] += record.startups_viewed
-                monthly_data[month_key]["deals_created"] += record.deals_created
-                monthly_data[month_key]["applications_reviewed"] += record.applications_reviewed
-            return {"success": True, "totals": totals, "monthly_data": list(monthly_data.values())}
+                    monthly_data[month_key] = {"month": day.strftime("%b %Y"), "startups_viewed": 0, "deals_created": 0, "applications_reviewed": 0, "messages_sent": 0}
+                return monthly_data[month_key]
+            for record in analytics:
+                month = month_bucket(record.date)
+                month["startups_viewed"] += record.startups_viewed
+                month["deals_created"] += record.deals_created
+                month["applications_reviewed"] += record.applications_reviewed
+            for bucket, value in messages_series:
+                month_bucket(bucket)["messages_sent"] += value
+            return {"success": True, "totals": totals, "monthly_data": [monthly_data[key] for key in sorted(monthly_data)]}
         except Exception as e:
             return {"success": False, "error": str(e)}
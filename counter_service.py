@@ -0,0 +1,105 @@
+"""
+Counter Service
+Atomic insert-or-increment upserts for aggregate/counter tables
+"""
+
+from sqlalchemy import func
+
+from extensions import db
+
+
+# Rows per multi-row upsert statement
+UPSERT_CHUNK_SIZE = 500
+
+
+class CounterService:
+    """Dialect-aware upserts that never read-modify-write in Python"""
+
+    @staticmethod
+    def increment(model, keys, deltas, connection=None):
+        """
+        Atomically add deltas to the row identified by keys, creating it if missing
+
+        Args:
+            model: Model with a unique constraint over the key columns
+            keys: Dict of key column values
+            deltas: Dict of column -> amount to add
+            connection: Connection to write through (None = the request session)
+        """
+        deltas = {col: amount for col, amount in deltas.items() if amount}
+        if not deltas:
+            return
+        CounterService.upsert_increments(model, list(keys), [{**keys, **deltas}], list(deltas), connection)
+
+    @staticmethod
+    def upsert_increments(model, key_columns, rows, increment_columns, connection=None):
+        """
+        Insert rows or add their values onto existing rows, atomically
+
+        Args:
+            model: Model whose table has a unique constraint on key_columns
+            key_columns: Conflict target column names
+            rows: List of dicts with identical keys (key tuples must be unique)
+            increment_columns: Columns to add to on conflict
+            connection: Connection to write through (None = the request session)
+        """
+        CounterService._upsert(
+            model, key_columns, rows,
+            lambda table, excluded: {
+                col: func.coalesce(table.c[col], 0) + excluded[col] for col in increment_columns
+            },
+            connection
+        )
+
+    @staticmethod
+    def upsert_replace(model, key_columns, rows, update_columns, connection=None):
+        """
+        Insert rows or overwrite the given columns of existing rows
+
+        Args:
+            model: Model whose table has a unique constraint on key_columns
+            key_columns: Conflict target column names
+            rows: List of dicts with identical keys (key tuples must be unique)
+            update_columns: Columns to overwrite on conflict
+            connection: Connection to write through (None = the request session)
+        """
+        CounterService._upsert(
+            model, key_columns, rows,
+            lambda table, excluded: {col: excluded[col] for col in update_columns},
+            connection
+        )
+
+    @staticmethod
+    def _upsert(model, key_columns, rows, build_set, connection=None):
+        """Run INSERT ... ON CONFLICT DO UPDATE, chunked"""
+        if not rows:
+            return
+
+        table = model.__table__
+        executor = connection if connection is not None else db.session
+        dialect = (connection if connection is not None else db.session.get_bind()).dialect.name
+
+        if dialect in ('postgresql', 'sqlite'):
+            if dialect == 'postgresql':
+                from sqlalchemy.dialects.postgresql import insert
+            else:
+                from sqlalchemy.dialects.sqlite import insert
+
+            for start in range(0, len(rows), UPSERT_CHUNK_SIZE):
+                stmt = insert(table).values(rows[start:start + UPSERT_CHUNK_SIZE])
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=key_columns,
+                    set_=build_set(table, stmt.excluded)
+                )
+                executor.execute(stmt)
+            return
+
+        # Generic fallback: update in place, insert when nothing matched
+        for row in rows:
+            where = [table.c[col] == row[col] for col in key_columns]
+            result = executor.execute(
+                table.update().where(*where).values(build_set(table, row))
+            )
+            if result.rowcount == 0:
+                executor.execute(table.insert().values(row))
+
@@ -0,0 +1,285 @@
+"""
+Ecosystem Fit Service
+Vectorized ecosystem-fit scoring and peer percentiles across all startups
+
+Scores are computed for every startup in one NumPy pass (nightly, alongside
+the metric snapshots) and stored with each startup's "top X%" rank within its
+primary sector and its stage, so the dashboard radar reads one row per request.
+"""
+
+from datetime import datetime
+import json
+
+import numpy as np
+from sqlalchemy import func
+
+from extensions import db
+from models import Startup, EcosystemFitScore
+from counter_service import CounterService
+
+
+FIT_LABELS = ['Tech', 'Market', 'Team', 'Capital', 'Product']
+FIT_COLUMNS = ['tech_score', 'market_score', 'team_score', 'capital_score', 'product_score']
+
+# Free-text fields longer than this count as "filled in" for a bonus
+FIT_DETAIL_MIN_LENGTH = 100
+
+# Sum of the five capped scores ranges 0..500
+FIT_TOTAL_RANGE = 501
+
+
+class EcosystemFitService:
+    """Service for batch ecosystem-fit scoring and sector/stage percentiles"""
+
+    @staticmethod
+    def score_startup(startup):
+        """
+        Score a single startup with the same vectorized rules as the batch
+
+        Args:
+            startup: Startup instance
+
+        Returns:
+            list: Tech, Market, Team, Capital, Product scores
+        """
+        length = lambda text: len(text) if text else 0
+        row = (
+            startup.id, startup.sectors, startup.stage, startup.team_size,
+            length(startup.team_info), startup.funding, length(startup.financials),
+            bool(startup.demo_url), length(startup.traction)
+        )
+        features = EcosystemFitService._to_arrays([row])
+        return EcosystemFitService.score(features)[0].tolist()
+
+    @staticmethod
+    def score(features):
+        """
+        Compute the five fit scores for every startup at once
+
+        Args:
+            features: Dict of aligned NumPy arrays (see _to_arrays)
+
+        Returns:
+            ndarray: (n, 5) int array of scores capped at 100
+        """
+        detail = FIT_DETAIL_MIN_LENGTH
+
+        # Tech: sector breadth
+        tech = 70 + np.minimum(features['sectors_count'], 3) * 10
+
+        # Market: stage
+        stage = features['stage']
+        market = np.select(
+            [np.isin(stage, ['seed', 'series_a']), np.isin(stage, ['pre_seed', 'idea'])],
+            [85, 65],
+            default=75
+        )
+
+        # Team: size band plus detailed team info
+        size = features['team_size']
+        team = np.select([size >= 5, size >= 3], [85, 75], default=60)
+        team = team + np.where(features['team_info_length'] > detail, 10, 0)
+
+        # Capital: funding round plus detailed financials
+        funding = features['funding']
+        capital = np.select(
+            [np.char.find(funding, 'series') >= 0, np.char.find(funding, 'seed') >= 0],
+            [90, 75],
+            default=60
+        )
+        capital = capital + np.where(features['financials_length'] > detail, 10, 0)
+
+        # Product: demo and traction
+        product = (
+            70
+            + np.where(features['has_demo'], 10, 0)
+            + np.where(features['traction_length'] > detail, 15, 0)
+        )
+
+        scores = np.column_stack([tech, market, team, capital, product])
+        return np.minimum(scores, 100).astype(np.int64)
+
+    @staticmethod
+    def top_percent(groups, totals):
+        """
+        Rank each startup within its peer group as "top X%"
+
+        Args:
+            groups: Array of group labels (sector or stage)
+            totals: Int array of summed fit scores (0..FIT_TOTAL_RANGE-1)
+
+        Returns:
+            tuple: (top_percent int array, peer group size int array)
+        """
+        if len(totals) == 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+
+        _, codes = np.unique(groups, return_inverse=True)
+        keys = codes * FIT_TOTAL_RANGE + totals
+        ordered = np.sort(keys)
+
+        # Peers scoring at least as high, counting the startup itself
+        group_end = codes * FIT_TOTAL_RANGE + (FIT_TOTAL_RANGE - 1)
+        at_or_above = (
+            np.searchsorted(ordered, group_end, side='right')
+            - np.searchsorted(ordered, keys, side='left')
+        )
+        peers = np.bincount(codes)[codes]
+
+        top = np.ceil(at_or_above * 100.0 / peers).astype(np.int64)
+        return top, peers
+
+    @staticmethod
+    def refresh():
+        """
+        Recompute fit scores and percentiles for all startups (run nightly)
+
+        Returns:
+            dict: success and number of startups scored
+        """
+        try:
+            features = EcosystemFitService._load_features()
+            count = len(features['id'])
+            if count == 0:
+                return {"success": True, "scored": 0}
+
+            scores = EcosystemFitService.score(features)
+            totals = scores.sum(axis=1)
+            sector_top, sector_peers = EcosystemFitService.top_percent(features['sector'], totals)
+            stage_top, stage_peers = EcosystemFitService.top_percent(features['stage'], totals)
+
+            now = datetime.utcnow()
+            rows = []
+            for i in range(count):
+                sector = features['sector'][i] or None
+                stage = features['stage'][i] or None
+                row = dict(zip(FIT_COLUMNS, scores[i].tolist()))
+                row.update({
+                    "startup_id": int(features['id'][i]),
+                    "overall_score": round(float(totals[i]) / len(FIT_COLUMNS), 1),
+                    "sector": sector,
+                    "sector_top_percent": int(sector_top[i]) if sector else None,
+                    "sector_peers": int(sector_peers[i]) if sector else 0,
+                    "stage": stage,
+                    "stage_top_percent": int(stage_top[i]) if stage else None,
+                    "stage_peers": int(stage_peers[i]) if stage else 0,
+                    "computed_at": now
+                })
+                rows.append(row)
+
+            CounterService.upsert_replace(
+                EcosystemFitScore, ['startup_id'], rows,
+                [col for col in rows[0] if col != 'startup_id']
+            )
+            db.session.commit()
+
+            return {"success": True, "scored": count}
+
+        except Exception as e:
+            db.session.rollback()
+            return {"success": False, "error": str(e)}
+
+    @staticmethod
+    def get_percentiles(startup_id):
+        """
+        Get the stored sector/stage ranking for a startup
+
+        Args:
+            startup_id: Startup ID
+
+        Returns:
+            dict or None: Latest nightly ranking
+        """
+        fit = EcosystemFitScore.query.get(startup_id)
+        if not fit:
+            return None
+
+        return {
+            "sector": fit.sector,
+            "sector_top_percent": fit.sector_top_percent,
+            "sector_peers": fit.sector_peers,
+            "stage": fit.stage,
+            "stage_top_percent": fit.stage_top_percent,
+            "stage_peers": fit.stage_peers,
+            "computed_at": fit.computed_at.isoformat() if fit.computed_at else None
+        }
+
+    @staticmethod
+    def get_peer_average(sector):
+        """Average stored scores across a sector (None = all startups)"""
+        query = db.session.query(
+            *[func.avg(getattr(EcosystemFitScore, col)) for col in FIT_COLUMNS]
+        )
+        if sector:
+            query = query.filter(EcosystemFitScore.sector == sector)
+
+        averages = query.first()
+        if not averages or averages[0] is None:
+            return None
+        return [round(float(value)) for value in averages]
+
+    @staticmethod
+    def _load_features():
+        """Load scoring inputs for all startups without pulling long text columns"""
+        rows = db.session.query(
+            Startup.id, Startup.sectors, Startup.stage, Startup.team_size,
+            func.coalesce(func.length(Startup.team_info), 0),
+            Startup.funding,
+            func.coalesce(func.length(Startup.financials), 0),
+            func.coalesce(func.length(Startup.demo_url), 0) > 0,
+            func.coalesce(func.length(Startup.traction), 0)
+        ).all()
+        return EcosystemFitService._to_arrays(rows)
+
+    @staticmethod
+    def _to_arrays(rows):
+        """Turn (id, sectors, stage, team_size, ...) rows into aligned arrays"""
+        ids, sectors_count, primary_sector, stages, team_sizes = [], [], [], [], []
+        team_info_length, funding, financials_length, has_demo, traction_length = [], [], [], [], []
+
+        for (startup_id, sectors, stage, team_size, team_info_len,
+             funding_round, financials_len, demo, traction_len) in rows:
+            sectors = EcosystemFitService._parse_sectors(sectors)
+
+            ids.append(startup_id)
+            sectors_count.append(len(sectors))
+            primary_sector.append(str(sectors[0]) if sectors else '')
+            stages.append(stage or '')
+            team_sizes.append(EcosystemFitService._parse_team_size(team_size))
+            team_info_length.append(team_info_len or 0)
+            funding.append((funding_round or '').lower())
+            financials_length.append(financials_len or 0)
+            has_demo.append(bool(demo))
+            traction_length.append(traction_len or 0)
+
+        return {
+            'id': np.array(ids, dtype=np.int64),
+            'sectors_count': np.array(sectors_count, dtype=np.int64),
+            'sector': np.array(primary_sector, dtype=str),
+            'stage': np.array(stages, dtype=str),
+            'team_size': np.array(team_sizes, dtype=np.int64),
+            'team_info_length': np.array(team_info_length, dtype=np.int64),
+            'funding': np.array(funding, dtype=str),
+            'financials_length': np.array(financials_length, dtype=np.int64),
+            'has_demo': np.array(has_demo, dtype=bool),
+            'traction_length': np.array(traction_length, dtype=np.int64)
+        }
+
+    @staticmethod
+    def _parse_sectors(sectors):
+        """Sectors are stored as a JSON list"""
+        try:
+            parsed = json.loads(sectors or '[]')
+        except (TypeError, ValueError):
+            return []
+        return parsed if isinstance(parsed, list) else []
+
+    @staticmethod
+    def _parse_team_size(team_size):
+        """Lower bound of a team size like '3-5' or '12'; -1 when unknown"""
+        if not team_size:
+            return -1
+        try:
+            return int(team_size.split('-')[0] if '-' in team_size else team_size)
+        except ValueError:
+            return -1
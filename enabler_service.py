@@ -10,9 +10,34 @@ from models import (
     User, Referral, ReferralClick, Opportunity, Application, Startup,
     RewardTransaction, EnablerAnalytics, EnablerLevel
 )
-from sqlalchemy import func, and_, or_
+from sqlalchemy import func, and_, or_, case
+from rollup_service import RollupService
+from counter_service import CounterService
+from session_hooks import SessionHooks
+from visitor_sketch_service import VisitorSketchService
 import secrets
 import json
+import time
+
+
+# Referral status -> EnablerAnalytics counter column
+REFERRAL_STATUS_COUNTERS = {
+    "accepted": "referrals_accepted",
+    "rejected": "referrals_rejected",
+    "successful": "referrals_successful",
+}
+
+# EnablerAnalytics columns recomputed by reconcile_daily_analytics
+RECONCILED_COLUMNS = [
+    "referrals_count", "referrals_accepted", "referrals_rejected", "referrals_successful",
+    "clicks_count", "conversions_count", "conversion_rate",
+    "earnings_amount", "pending_amount", "points_earned",
+]
+
+# Per-enabler analytics cache: enabler_id -> (expires_at, result)
+# Dropped whenever a commit writes referrals or opportunities
+ANALYTICS_CACHE_TTL = 300
+_analytics_cache = {}
 
 
 class EnablerService:
@@ -49,6 +74,7 @@ class EnablerService:
             )
 
             db.session.add(referral)
+            EnablerService.record_referral_created(referral)
             db.session.commit()
 
             EnablerService._ensure_enabler_level(enabler_id)
@@ -96,6 +122,7 @@ class EnablerService:
             )
 
             db.session.add(referral)
+            EnablerService.record_referral_created(referral)
             db.session.commit()
 
             return {
@@ -128,6 +155,8 @@ class EnablerService:
             )
 
             db.session.add(click)
+            EnablerService.record_referral_click(referral)
+            VisitorSketchService.record_visit("referral", referral.id, VisitorSketchService.visitor_key(user_id, ip_address, user_agent))
             db.session.commit()
 
             return {
@@ -696,14 +725,16 @@ class EnablerService:
             opportunity = Opportunity.query.get(referral.opportunity_id)
             transaction = RewardTransaction(enabler_id=referral.enabler_id, referral_id=referral_id, type="cash", amount_money=reward_amount, amount_points=reward_points, status="pending", startup_name=referral.startup_name, program_name=opportunity.title if opportunity else "Unknown", description=f"Referral reward for {referral.startup_name}")
             db.session.add(transaction)
+            previous_status = referral.status
             referral.status = "successful"
             level = EnablerLevel.query.filter_by(enabler_id=referral.enabler_id).first()
             if level:
                 level.successful_referrals += 1
                 level.points += reward_points
                 level.total_earnings += reward_amount
+            EnablerService.record_referral_status_change(referral, previous_status)
+            EnablerService._increment_daily(referral.enabler_id, datetime.utcnow().date(), pending_amount=reward_amount, points_earned=reward_points)
             db.session.commit()
-            EnablerService._update_daily_analytics(referral.enabler_id)
             return {"success": True, "transaction": transaction.to_dict(), "message": "Reward calculated successfully"}
         except Exception as e:
             db.session.rollback()
@@ -769,16 +800,18 @@ class EnablerService:
                 start_date = datetime.utcnow() - timedelta(days=7)
             else:
                 start_date = datetime(2020, 1, 1)
-            referrals = Referral.query.filter(Referral.enabler_id == enabler_id, Referral.created_at >= start_date).all()
-            total_referrals = len(referrals)
+            referrals_query = Referral.query.filter(Referral.enabler_id == enabler_id, Referral.created_at >= start_date)
+            total_referrals = referrals_query.count()
             rewards = EnablerService.get_rewards_summary(enabler_id)
             confirmed_earnings = rewards["data"]["all_time_earnings"] if rewards["success"] else 0
             level = EnablerLevel.query.filter_by(enabler_id=enabler_id).first()
             flc_points = level.points if level else 0
-            successful = len([r for r in referrals if r.status == "successful"])
+            successful = referrals_query.filter(Referral.status == "successful").count()
             conversion_rate = (successful / total_referrals) if total_referrals > 0 else 0
+            RollupService.refresh()
+            link_clicks = RollupService.get_total("referral_clicks", "enabler", enabler_id, "referral_click", start=start_date)
             recent_referrals = []
-            for ref in referrals[:5]:
+            for ref in referrals_query.order_by(Referral.created_at.desc()).limit(5).all():
                 opp = Opportunity.query.get(ref.opportunity_id)
                 app_status = None
                 if ref.startup_id:
@@ -786,40 +819,51 @@ class EnablerService:
                     if app:
                         app_status = app.status
                 recent_referrals.append({"startup_name": ref.startup_name, "program_name": opp.title if opp else "Unknown Program", "status": ref.status, "application_status": app_status, "created_at": ref.created_at.isoformat(), "reward": "₹2,500" if ref.status == "successful" else "Pending"})
-            return {"success": True, "data": {"summary": {"total_referrals": total_referrals, "confirmed_earnings": round(confirmed_earnings, 2), "flc_points": flc_points, "conversion_rate": round(conversion_rate, 2)}, "recent_referrals": recent_referrals}}
+            return {"success": True, "data": {"summary": {"total_referrals": total_referrals, "confirmed_earnings": round(confirmed_earnings, 2), "flc_points": flc_points, "conversion_rate": round(conversion_rate, 2), "link_clicks": link_clicks}, "recent_referrals": recent_referrals}}
         except Exception as e:
             return {"success": False, "message": str(e)}
     
     @staticmethod
     def get_analytics(enabler_id):
         try:
-            referrals = Referral.query.filter_by(enabler_id=enabler_id).all()
-            submitted = len([r for r in referrals if r.status in ["pending", "accepted", "successful"]])
-            shortlisted = len([r for r in referrals if r.status in ["accepted", "successful"]])
-            completed = len([r for r in referrals if r.status == "successful"])
+            cached = _analytics_cache.get(enabler_id)
+            if cached and cached[0] > time.monotonic():
+                return cached[1]
+            status_counts = dict(db.session.query(Referral.status, func.count(Referral.id)).filter(Referral.enabler_id == enabler_id).group_by(Referral.status).all())
+            submitted = sum(status_counts.get(s, 0) for s in ["pending", "accepted", "successful"])
+            shortlisted = sum(status_counts.get(s, 0) for s in ["accepted", "successful"])
+            completed = status_counts.get("successful", 0)
             conversion = (completed / submitted * 100) if submitted > 0 else 0
-            unique_startups = len(set(r.startup_id for r in referrals if r.startup_id))
+            unique_startups = db.session.query(func.count(func.distinct(Referral.startup_id))).filter(Referral.enabler_id == enabler_id, Referral.startup_id.isnot(None)).scalar() or 0
             avg_programs = submitted / unique_startups if unique_startups > 0 else 0
+            # One row per referred opportunity; sectors are decoded once per program, not per referral
+            per_opportunity = db.session.query(Opportunity.sectors, func.count(Referral.id), func.sum(case((Referral.status == "successful", 1), else_=0))).join(Opportunity, Referral.opportunity_id == Opportunity.id).filter(Referral.enabler_id == enabler_id, Opportunity.sectors.isnot(None)).group_by(Opportunity.id, Opportunity.sectors).all()
             sector_stats = {}
-            for ref in referrals:
-                opp = Opportunity.query.get(ref.opportunity_id)
-                if opp and opp.sectors:
-                    sectors = json.loads(opp.sectors)
-                    for sector in sectors:
-                        if sector not in sector_stats:
-                            sector_stats[sector] = {"total": 0, "successful": 0}
-                        sector_stats[sector]["total"] += 1
-                        if ref.status == "successful":
-                            sector_stats[sector]["successful"] += 1
+            for sectors_json, total, successful in per_opportunity:
+                for sector in json.loads(sectors_json or "[]"):
+                    if sector not in sector_stats:
+                        sector_stats[sector] = {"total": 0, "successful": 0}
+                    sector_stats[sector]["total"] += total
+                    sector_stats[sector]["successful"] += successful or 0
             sectors = []
             for sector, stats in sector_stats.items():
                 conversion_rate = (stats["successful"] / stats["total"] * 100) if stats["total"] > 0 else 0
                 sectors.append({"name": sector, "conversion": round(conversion_rate, 1)})
             sectors.sort(key=lambda x: x["conversion"], reverse=True)
-            return {"success": True, "data": {"referral_stats": {"submitted": submitted, "shortlisted": shortlisted, "completed": completed, "conversion": round(conversion, 1), "unique_startups": unique_startups, "avg_programs_per_startup": round(avg_programs, 1), "avg_decision_time": 21}, "sectors": sectors[:5], "signals": {"emerging": "Climate & sustainability programs", "best_days": "Tue–Thu", "best_time": "10am–1pm IST"}}}
+            result = {"success": True, "data": {"referral_stats": {"submitted": submitted, "shortlisted": shortlisted, "completed": completed, "conversion": round(conversion, 1), "unique_startups": unique_startups, "avg_programs_per_startup": round(avg_programs, 1), "avg_decision_time": 21}, "sectors": sectors[:5], "signals": {"emerging": "Climate & sustainability programs", "best_days": "Tue–Thu", "best_time": "10am–1pm IST"}}}
+            _analytics_cache[enabler_id] = (time.monotonic() + ANALYTICS_CACHE_TTL, result)
+            return result
         except Exception as e:
             return {"success": False, "message": str(e)}
     
+    @staticmethod
+    def invalidate_analytics_cache(enabler_id=None):
+        """Drop cached analytics for one enabler (None = all enablers)"""
+        if enabler_id is None:
+            _analytics_cache.clear()
+        else:
+            _analytics_cache.pop(enabler_id, None)
+    
     @staticmethod
     def get_link_tracking_stats(enabler_id):
         try:
@@ -902,23 +946,112 @@ class EnablerService:
     
     @staticmethod
     def _update_daily_analytics(enabler_id):
+        """Recount one enabler's analytics row for today (repair path)"""
+        return EnablerService.reconcile_daily_analytics(enabler_ids=[enabler_id])
+    
+    # ==========================================
+    # DAILY ANALYTICS COUNTERS
+    # ==========================================
+    
+    @staticmethod
+    def record_referral_created(referral):
+        """Count a new referral on today's analytics row (caller commits)"""
+        EnablerService._increment_daily(referral.enabler_id, datetime.utcnow().date(), referrals_count=1)
+    
+    @staticmethod
+    def record_referral_status_change(referral, previous_status):
+        """
+        Move a referral between status counters (caller commits)
+        
+        Status counters live on the row for the day the referral was created,
+        matching what reconcile_daily_analytics recomputes.
+        """
+        if previous_status != referral.status:
+            EnablerService.record_bulk_status_change([(referral.enabler_id, referral.created_at, previous_status)], referral.status)
+    
+    @staticmethod
+    def record_bulk_status_change(referrals, new_status):
+        """
+        Apply status counter moves for many referrals in one upsert (caller commits)
+        
+        Args:
+            referrals: Iterable of (enabler_id, created_at, previous_status)
+            new_status: Status every referral is moving to
+        """
+        # Bulk UPDATEs bypass the flush: drop cached analytics on commit all the same
+        SessionHooks.touch(db.session, 'enabler_analytics')
+        columns = list(REFERRAL_STATUS_COUNTERS.values())
+        deltas = {}
+        for enabler_id, created_at, previous_status in referrals:
+            if previous_status == new_status:
+                continue
+            key = (enabler_id, (created_at or datetime.utcnow()).date())
+            row = deltas.setdefault(key, dict.fromkeys(columns, 0))
+            if previous_status in REFERRAL_STATUS_COUNTERS:
+                row[REFERRAL_STATUS_COUNTERS[previous_status]] -= 1
+            if new_status in REFERRAL_STATUS_COUNTERS:
+                row[REFERRAL_STATUS_COUNTERS[new_status]] += 1
+        rows = [{"enabler_id": key[0], "date": key[1], **row} for key, row in deltas.items() if any(row.values())]
+        CounterService.upsert_increments(EnablerAnalytics, ["enabler_id", "date"], rows, columns)
+    
+    @staticmethod
+    def record_referral_click(referral):
+        """Count a referral link click on today's analytics row (caller commits)"""
+        EnablerService._increment_daily(referral.enabler_id, datetime.utcnow().date(), clicks_count=1)
+    
+    @staticmethod
+    def _increment_daily(enabler_id, day, **deltas):
+        CounterService.increment(EnablerAnalytics, {"enabler_id": enabler_id, "date": day}, deltas)
+    
+    @staticmethod
+    def reconcile_daily_analytics(day=None, enabler_ids=None):
+        """
+        Recompute EnablerAnalytics counters for a day from the raw tables
+        
+        Args:
+            day: UTC date to repair (default today)
+            enabler_ids: Restrict to these enablers (None = all)
+        
+        Returns:
+            dict: success flag and number of rows written
+        """
         try:
-            today = date.today()
-            analytics = EnablerAnalytics.query.filter_by(enabler_id=enabler_id, date=today).first()
-            if not analytics:
-                analytics = EnablerAnalytics(enabler_id=enabler_id, date=today)
-                db.session.add(analytics)
-            referrals_today = Referral.query.filter(Referral.enabler_id == enabler_id, func.date(Referral.created_at) == today).all()
-            analytics.referrals_count = len(referrals_today)
-            analytics.referrals_accepted = len([r for r in referrals_today if r.status == "accepted"])
-            analytics.referrals_successful = len([r for r in referrals_today if r.status == "successful"])
-            clicks_today = db.session.query(ReferralClick).join(Referral).filter(Referral.enabler_id == enabler_id, func.date(ReferralClick.clicked_at) == today).count()
-            conversions_today = db.session.query(ReferralClick).join(Referral).filter(Referral.enabler_id == enabler_id, func.date(ReferralClick.clicked_at) == today, ReferralClick.applied == True).count()
-            analytics.clicks_count = clicks_today
-            analytics.conversions_count = conversions_today
-            analytics.conversion_rate = (conversions_today / clicks_today * 100) if clicks_today > 0 else 0
-            earnings_today = db.session.query(func.sum(RewardTransaction.amount_money)).filter(RewardTransaction.enabler_id == enabler_id, func.date(RewardTransaction.created_at) == today, RewardTransaction.type.in_(["cash", "bonus"]), RewardTransaction.status == "settled").scalar() or 0
-            analytics.earnings_amount = earnings_today
+            day = day or datetime.utcnow().date()
+            start = datetime(day.year, day.month, day.day)
+            end = start + timedelta(days=1)
+            rows = {}
+            def row(enabler_id):
+                return rows.setdefault(enabler_id, {"enabler_id": enabler_id, "date": day, **dict.fromkeys(RECONCILED_COLUMNS, 0)})
+            def scoped(query, column):
+                return query.filter(column.in_(enabler_ids)) if enabler_ids else query
+            for (enabler_id,) in scoped(db.session.query(EnablerAnalytics.enabler_id).filter(EnablerAnalytics.date == day), EnablerAnalytics.enabler_id):
+                row(enabler_id)
+            referral_counts = scoped(db.session.query(Referral.enabler_id, Referral.status, func.count(Referral.id)).filter(Referral.created_at >= start, Referral.created_at < end), Referral.enabler_id).group_by(Referral.enabler_id, Referral.status)
+            for enabler_id, status, count in referral_counts:
+                row(enabler_id)["referrals_count"] += count
+                if status in REFERRAL_STATUS_COUNTERS:
+                    row(enabler_id)[REFERRAL_STATUS_COUNTERS[status]] += count
+            click_counts = scoped(db.session.query(Referral.enabler_id, func.count(ReferralClick.id), func.sum(case((ReferralClick.applied == True, 1), else_=0))).join(Referral, ReferralClick.referral_id == Referral.id).filter(ReferralClick.clicked_at >= start, ReferralClick.clicked_at < end), Referral.enabler_id).group_by(Referral.enabler_id)
+            for enabler_id, clicks, conversions in click_counts:
+                row(enabler_id)["clicks_count"] = clicks
+                row(enabler_id)["conversions_count"] = conversions or 0
+            reward_sums = scoped(db.session.query(RewardTransaction.enabler_id, RewardTransaction.type, RewardTransaction.status, func.sum(RewardTransaction.amount_money), func.sum(RewardTransaction.amount_points)).filter(RewardTransaction.created_at >= start, RewardTransaction.created_at < end), RewardTransaction.enabler_id).group_by(RewardTransaction.enabler_id, RewardTransaction.type, RewardTransaction.status)
+            for enabler_id, tx_type, status, money, points in reward_sums:
+                if tx_type in ["cash", "bonus"] and status == "settled":
+                    row(enabler_id)["earnings_amount"] += money or 0
+                if tx_type in ["cash", "bonus"] and status == "pending":
+                    row(enabler_id)["pending_amount"] += money or 0
+                if tx_type in ["cash", "points", "bonus"]:
+                    row(enabler_id)["points_earned"] += points or 0
+            for values in rows.values():
+                clicks = values["clicks_count"]
+                values["conversion_rate"] = (values["conversions_count"] / clicks * 100) if clicks > 0 else 0
+            CounterService.upsert_replace(EnablerAnalytics, ["enabler_id", "date"], list(rows.values()), RECONCILED_COLUMNS)
             db.session.commit()
+            return {"success": True, "rows": len(rows)}
         except Exception as e:
             db.session.rollback()
+            return {"success": False, "message": str(e)}
+
+
+SessionHooks.invalidate_on_commit('enabler_analytics', [Referral, Opportunity], EnablerService.invalidate_analytics_cache)
@@ -0,0 +1,101 @@
+"""
+Export Service
+Streams large result sets as CSV or NDJSON without materializing them in memory
+"""
+
+import csv
+import json
+from datetime import date, datetime
+from io import StringIO
+
+
+# Rows fetched per round-trip from the server-side cursor
+EXPORT_BATCH_SIZE = 1000
+
+# Supported streaming formats -> (mimetype, file extension)
+EXPORT_FORMATS = {
+    'csv': ('text/csv', 'csv'),
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+}
+
+
+class ExportService:
+    """Generator helpers for constant-memory exports"""
+
+    @staticmethod
+    def iter_rows(query, batch_size=EXPORT_BATCH_SIZE):
+        """
+        Iterate a query in fixed-size batches through a server-side cursor
+
+        Args:
+            query: SQLAlchemy query, ideally selecting plain columns
+            batch_size: Rows buffered per fetch
+
+        Returns:
+            Iterator of result rows
+        """
+        return query.yield_per(batch_size)
+
+    @staticmethod
+    def stream(header, rows, format='csv', labels=None):
+        """
+        Stream rows in the requested format
+
+        Args:
+            header: Column names, used as NDJSON keys (and CSV header unless labels is given)
+            rows: Iterable of row tuples in header order
+            format: csv or ndjson
+            labels: Optional display names for the CSV header row
+
+        Returns:
+            Generator of str chunks
+        """
+        if format == 'csv':
+            return ExportService.stream_csv(labels or header, rows)
+        if format == 'ndjson':
+            return ExportService.stream_ndjson(header, rows)
+        raise ValueError(f"Unsupported export format: {format}")
+
+    @staticmethod
+    def stream_csv(header, rows):
+        """Yield a CSV header followed by one encoded line per row"""
+        buffer = StringIO()
+        writer = csv.writer(buffer)
+
+        writer.writerow(header)
+        yield buffer.getvalue()
+
+        for row in rows:
+            buffer.seek(0)
+            buffer.truncate(0)
+            writer.writerow([ExportService._format_value(value, '') for value in row])
+            yield buffer.getvalue()
+
+    @staticmethod
+    def stream_ndjson(header, rows):
+        """Yield one JSON object per line, keyed by header"""
+        for row in rows:
+            record = {
+                key: ExportService._format_value(value, None)
+                for key, value in zip(header, row)
+            }
+            yield json.dumps(record) + '\n'
+
+    @staticmethod
+    def mimetype(format):
+        """Get the response mimetype for a streaming format"""
+        return EXPORT_FORMATS[format][0]
+
+    @staticmethod
+    def filename(basename, format):
+        """Build an attachment filename for a streaming format"""
+        return f"{basename}.{EXPORT_FORMATS[format][1]}"
+
+    @staticmethod
+    def _format_value(value, empty):
+        """Convert a column value to something csv/json can serialize"""
+        if value is None:
+            return empty
+        if isinstance(value, (datetime, date)):
+            return value.isoformat()
+        return value
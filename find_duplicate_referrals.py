@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+"""
+Platform-wide near-duplicate referral report (MinHash + LSH)
+
+Usage:
+  python find_duplicate_referrals.py                 # print duplicate clusters
+  python find_duplicate_referrals.py --cross-enabler # only clusters spanning enablers
+  python find_duplicate_referrals.py --rebuild       # recompute LSH buckets first (after bulk imports)
+"""
+
+import sys
+import time
+
+from app import create_app
+from extensions import db
+from referral_dedup_service import ReferralDedupService
+
+
+def main():
+    args = sys.argv[1:]
+    app = create_app()
+
+    with app.app_context():
+        db.create_all()
+
+        if '--rebuild' in args:
+            print("🔧 Rebuilding referral LSH buckets...")
+            started = time.perf_counter()
+            count = ReferralDedupService.rebuild()
+            print(f"✅ {count} referrals indexed in {time.perf_counter() - started:.1f}s")
+
+        report = ReferralDedupService.duplicate_report(cross_enabler_only='--cross-enabler' in args)
+        print(f"🔍 {report['total_clusters']} duplicate clusters covering {report['total_referrals']} referrals")
+
+        for cluster in report["clusters"]:
+            scope = "cross-enabler" if cluster["cross_enabler"] else "single enabler"
+            print(f"\n⚠️  {cluster['size']} referrals ({scope}, matched on {', '.join(cluster['matched_on'])})")
+            for ref in cluster["referrals"]:
+                print(f"   #{ref['id']} enabler {ref['enabler_id']}: {ref['startup_name']} <{ref['startup_email']}> [{ref['status']}]")
+
+    return True
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,322 @@
+"""
+Match Matrix Service
+Maintains corporate-startup match scores in startup_matches offline
+
+Every corporate-startup pair scoring above MATCH_MATRIX_MIN_SCORE is stored in
+startup_matches, so corporate discovery is an indexed read on
+(corporate_id, match_score). Pairs a corporate has already interacted with
+(viewed, contacted, ...) are always kept and rescored.
+
+CorporateProfile and Startup writes made through the ORM queue their id in
+match_matrix_changes. process_changes() then rescores only what changed: one
+row (a corporate against every startup, vectorized) per changed profile and
+one column (every corporate against a startup) per changed startup, written
+with bulk INSERT ... ON CONFLICT upserts. Run it from cron
+(refresh_match_matrix.py); dashboards also trigger a throttled catch-up.
+"""
+
+from datetime import datetime
+import json
+
+from sqlalchemy import delete, func, inspect, select
+
+from counter_service import CounterService
+from extensions import db
+from match_scoring_service import MatchScoringService, MATCH_FEATURE_FIELDS
+from models import CorporateProfile, Startup, StartupMatch, MatchMatrixChange
+from rollup_service import RollupService
+from session_hooks import SessionHooks
+
+
+# Pairs scoring at or below this are not stored (unless already interacted with)
+MATCH_MATRIX_MIN_SCORE = 50.0
+
+# Factor weights recorded with every stored match
+MATCH_MATRIX_FACTORS = json.dumps({
+    "sector": 0.4,
+    "stage": 0.3,
+    "location": 0.2,
+    "funding": 0.1
+})
+
+# Profile fields that affect a corporate's scores
+MATCH_PROFILE_FIELDS = ('innovation_focus', 'preferred_stages', 'investment_range_min', 'investment_range_max')
+
+# Queued changes read per batch
+MATCH_MATRIX_BATCH_SIZE = 1000
+
+# More changed startups than this in one batch -> rescore every row instead
+MATCH_MATRIX_FULL_THRESHOLD = 2000
+
+# Dashboards trigger a bounded catch-up at most this often per process
+MATCH_MATRIX_REFRESH_INTERVAL = 60
+MATCH_MATRIX_REFRESH_MAX_BATCHES = 2
+
+_last_refresh = {'at': 0.0}
+
+
+class MatchMatrixService:
+    """Service for maintaining the persisted corporate-startup match matrix"""
+
+    # ==========================================
+    # CHANGE PROCESSING
+    # ==========================================
+
+    @staticmethod
+    def process_changes(batch_size=MATCH_MATRIX_BATCH_SIZE, max_batches=None):
+        """
+        Rescore the rows and columns of queued corporates and startups
+
+        Each batch runs in its own transaction on a dedicated connection.
+
+        Args:
+            batch_size: Queued changes read per batch
+            max_batches: Stop after this many batches (None = until the queue is empty)
+
+        Returns:
+            dict: corporates and startups rescored, full rebuilds run
+        """
+        processed = {"corporates": 0, "startups": 0, "rebuilds": 0}
+        batches = 0
+
+        while max_batches is None or batches < max_batches:
+            with db.engine.connect() as connection:
+                with connection.begin():
+                    if not MatchMatrixService._process_batch(connection, batch_size, processed):
+                        break
+            batches += 1
+
+        return processed
+
+    @staticmethod
+    def refresh():
+        """Throttled catch-up used by dashboard reads (see RollupService.run_throttled)"""
+        RollupService.run_throttled(
+            _last_refresh, MATCH_MATRIX_REFRESH_INTERVAL,
+            lambda: MatchMatrixService.process_changes(max_batches=MATCH_MATRIX_REFRESH_MAX_BATCHES), 'match matrix'
+        )
+
+    @staticmethod
+    def rebuild(connection=None):
+        """
+        Rescore every corporate against every startup (backfill)
+
+        Args:
+            connection: Connection to write through (None = a new transaction, committed here)
+
+        Returns:
+            int: Corporates rescored
+        """
+        if connection is None:
+            with db.engine.connect() as connection:
+                with connection.begin():
+                    return MatchMatrixService.rebuild(connection)
+
+        corporate_ids = {row.user_id for row in connection.execute(select(CorporateProfile.user_id))}
+        # Corporates whose profile was removed still have rows to clean up
+        corporate_ids |= {row.corporate_id for row in connection.execute(select(StartupMatch.corporate_id).distinct())}
+
+        return MatchMatrixService.recompute_corporates(connection, corporate_ids)
+
+    @staticmethod
+    def _process_batch(connection, batch_size, processed):
+        """Rescore one batch of queued changes and dequeue it; False when the queue is empty"""
+        changes = connection.execute(
+            select(MatchMatrixChange.id, MatchMatrixChange.entity_type, MatchMatrixChange.entity_id)
+            .order_by(MatchMatrixChange.id).limit(batch_size)
+        ).all()
+        if not changes:
+            return False
+
+        corporate_ids = {c.entity_id for c in changes if c.entity_type == 'corporate'}
+        startup_ids = {c.entity_id for c in changes if c.entity_type == 'startup'}
+
+        if len(startup_ids) > MATCH_MATRIX_FULL_THRESHOLD:
+            MatchMatrixService.rebuild(connection)
+            processed["rebuilds"] += 1
+        else:
+            # Columns first: rows then see any corporates changed in the same batch
+            processed["startups"] += MatchMatrixService.recompute_startups(connection, startup_ids)
+            processed["corporates"] += MatchMatrixService.recompute_corporates(connection, corporate_ids)
+
+        connection.execute(delete(MatchMatrixChange.__table__).where(MatchMatrixChange.id <= changes[-1].id))
+        return True
+
+    # ==========================================
+    # RECOMPUTATION
+    # ==========================================
+
+    @staticmethod
+    def recompute_corporates(connection, corporate_ids, features=None):
+        """
+        Rescore whole rows: each corporate against every startup (caller commits)
+
+        Args:
+            connection: Connection to read and write through
+            corporate_ids: Corporate user IDs
+            features: Encoded startups (default: every startup, read through connection)
+
+        Returns:
+            int: Corporates rescored
+        """
+        if not corporate_ids:
+            return 0
+
+        # Not MatchScoringService.features(): the in-process cache misses
+        # startups written by other processes, whose rows would then be
+        # dropped as stale
+        features = features or MatchMatrixService._encode_startups(connection)
+        profiles = {
+            p.user_id: p for p in connection.execute(
+                select(CorporateProfile.__table__).where(CorporateProfile.user_id.in_(list(corporate_ids)))
+            )
+        }
+
+        for corporate_id in corporate_ids:
+            stamp = datetime.utcnow()
+            scores = MatchScoringService.score_all(profiles.get(corporate_id), features)
+            keep = features['alive'] & (scores > MATCH_MATRIX_MIN_SCORE)
+
+            kept = {int(features['ids'][p]): float(scores[p]) for p in keep.nonzero()[0]}
+            for startup_id in MatchMatrixService._interacted(connection, StartupMatch.corporate_id == corporate_id):
+                position = features['positions'].get(startup_id)
+                if position is not None and startup_id not in kept:
+                    kept[startup_id] = float(scores[position])
+
+            MatchMatrixService._upsert(
+                connection, [(corporate_id, startup_id, score) for startup_id, score in kept.items()], stamp
+            )
+            MatchMatrixService._delete_stale(connection, StartupMatch.corporate_id == corporate_id, stamp)
+
+        return len(corporate_ids)
+
+    @staticmethod
+    def recompute_startups(connection, startup_ids):
+        """
+        Rescore whole columns: every corporate against each startup (caller commits)
+
+        Args:
+            connection: Connection to read and write through
+            startup_ids: Startup IDs
+
+        Returns:
+            int: Startups rescored
+        """
+        if not startup_ids:
+            return 0
+
+        stamp = datetime.utcnow()
+        features = MatchMatrixService._encode_startups(connection, startup_ids)
+
+        scope = StartupMatch.startup_id.in_(list(startup_ids))
+        interacted = MatchMatrixService._interacted(connection, scope, pairs=True)
+
+        matches = []
+        if len(features['ids']):
+            for profile in connection.execute(select(CorporateProfile.__table__)):
+                scores = MatchScoringService.score_all(profile, features)
+                for position, startup_id in enumerate(features['ids'].tolist()):
+                    score = float(scores[position])
+                    if score > MATCH_MATRIX_MIN_SCORE or (profile.user_id, startup_id) in interacted:
+                        matches.append((profile.user_id, startup_id, score))
+
+        MatchMatrixService._upsert(connection, matches, stamp)
+        MatchMatrixService._delete_stale(connection, scope, stamp)
+        return len(startup_ids)
+
+    @staticmethod
+    def _encode_startups(connection, startup_ids=None):
+        """Encode startups (default: all of them) as read through connection"""
+        query = select(Startup.id, Startup.sectors, Startup.stage, Startup.country).order_by(Startup.id)
+        if startup_ids is not None:
+            query = query.where(Startup.id.in_(list(startup_ids)))
+        return MatchScoringService.encode(connection.execute(query).all())
+
+    @staticmethod
+    def _interacted(connection, scope, pairs=False):
+        """Startup ids (or (corporate_id, startup_id) pairs) with non-discovered matches in scope"""
+        rows = connection.execute(
+            select(StartupMatch.corporate_id, StartupMatch.startup_id).where(
+                scope, StartupMatch.status != 'discovered'
+            )
+        )
+        if pairs:
+            return {(row.corporate_id, row.startup_id) for row in rows}
+        return {row.startup_id for row in rows}
+
+    @staticmethod
+    def _upsert(connection, matches, stamp):
+        """Bulk upsert (corporate_id, startup_id, score) triples, keeping status and notes"""
+        CounterService.upsert_replace(
+            StartupMatch,
+            ["corporate_id", "startup_id"],
+            [
+                {
+                    "corporate_id": corporate_id,
+                    "startup_id": startup_id,
+                    "match_score": round(score, 2),
+                    "match_factors": MATCH_MATRIX_FACTORS,
+                    "status": "discovered",
+                    "created_at": stamp,
+                    "updated_at": stamp
+                }
+                for corporate_id, startup_id, score in matches
+            ],
+            ["match_score", "match_factors", "updated_at"],
+            connection
+        )
+
+    @staticmethod
+    def _delete_stale(connection, scope, stamp):
+        """Drop untouched discovered matches in scope that were not rewritten at stamp"""
+        connection.execute(
+            delete(StartupMatch.__table__).where(
+                scope,
+                StartupMatch.status == 'discovered',
+                StartupMatch.updated_at < stamp
+            )
+        )
+
+    # ==========================================
+    # CHANGE QUEUE
+    # ==========================================
+
+    @staticmethod
+    def pending_count():
+        """Queued changes not yet processed"""
+        return db.session.query(func.count(MatchMatrixChange.id)).scalar() or 0
+
+    @staticmethod
+    def _after_flush(session, flush_context):
+        """Queue corporates and startups whose match inputs changed"""
+        changes = []
+        for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+            if isinstance(obj, CorporateProfile):
+                fields, entity = MATCH_PROFILE_FIELDS, ('corporate', obj.user_id)
+            elif isinstance(obj, Startup):
+                fields, entity = MATCH_FEATURE_FIELDS, ('startup', obj.id)
+            else:
+                continue
+            if obj in session.dirty and not any(inspect(obj).attrs[f].history.has_changes() for f in fields):
+                continue
+            if entity[1] is not None:
+                changes.append(entity)
+
+        if not changes:
+            return
+
+        connection = session.connection()
+        if not SessionHooks.table_ready(connection, MatchMatrixChange.__tablename__):
+            return
+
+        now = datetime.utcnow()
+        connection.execute(
+            MatchMatrixChange.__table__.insert(),
+            [
+                {"entity_type": entity_type, "entity_id": entity_id, "changed_at": now}
+                for entity_type, entity_id in dict.fromkeys(changes)
+            ]
+        )
+
+
+SessionHooks.on_flush([CorporateProfile, Startup], MatchMatrixService._after_flush)
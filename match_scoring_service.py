@@ -0,0 +1,272 @@
+"""
+Match Scoring Service
+Vectorized corporate-startup match scores over the whole startup population
+
+Startup matching features are encoded once into aligned NumPy arrays: a
+0/1 startup x sector matrix, categorical stage codes and a has-country
+flag. Scoring one corporate profile against every startup is then a single
+matrix-vector product plus a few element-wise operations, with the same rules
+as CorporateService.calculate_match_score:
+
+    sector overlap   40 * |common sectors| / |corporate sectors|
+    preferred stage  30
+    funding range    15 (corporate has a min and max)
+    country set      10
+
+The encoded features live in-process, are patched on commit for Startup writes
+made through the ORM, and are fully rebuilt every CACHE_REBUILD_INTERVAL.
+"""
+
+import json
+import threading
+import time
+
+import numpy as np
+from sqlalchemy import inspect
+
+from extensions import db
+from models import Startup
+from session_hooks import SessionHooks
+
+
+# Score when the corporate has no profile yet
+MATCH_DEFAULT_SCORE = 50.0
+
+MATCH_FEATURE_FIELDS = ('sectors', 'stage', 'country')
+
+_features = {'built_at': None}
+_lock = threading.Lock()
+
+
+class MatchScoringService:
+    """Service for scoring one corporate against every startup at once"""
+
+    # ==========================================
+    # SCORING
+    # ==========================================
+
+    @staticmethod
+    def score_all(profile, features=None):
+        """
+        Match score of every startup for a corporate profile
+
+        Args:
+            profile: CorporateProfile (or None)
+            features: Encoded startups (default: the cached population)
+
+        Returns:
+            ndarray: float scores aligned with features['ids']
+        """
+        features = features or MatchScoringService.features()
+        size = len(features['ids'])
+
+        if not profile:
+            return np.full(size, MATCH_DEFAULT_SCORE)
+
+        scores = np.zeros(size)
+
+        # Sector alignment (40%)
+        corp_sectors = MatchScoringService._parse_list(profile.innovation_focus)
+        if corp_sectors:
+            wanted = np.zeros(len(features['sector_vocab']), dtype=np.int32)
+            for sector in set(corp_sectors):
+                column = features['sector_vocab'].get(sector)
+                if column is not None:
+                    wanted[column] = 1
+            common = features['sectors'] @ wanted
+            scores += 40.0 * common / len(corp_sectors)
+
+        # Stage preference (30%)
+        preferred = MatchScoringService._parse_list(profile.preferred_stages)
+        if preferred:
+            codes = [features['stage_vocab'][stage] for stage in set(preferred) if stage in features['stage_vocab']]
+            scores += np.where(np.isin(features['stages'], codes), 30.0, 0.0)
+
+        # Funding range (20%) - simplified until startups report a funding amount
+        if profile.investment_range_min and profile.investment_range_max:
+            scores += 15.0
+
+        # Location (10%)
+        scores += np.where(features['has_country'], 10.0, 0.0)
+
+        return np.clip(scores, 0.0, 100.0)
+
+    @staticmethod
+    def top_k(scores, ids, k, mask=None):
+        """
+        Positions of the k best scores (ties broken by lower id), best first
+
+        argpartition finds the k-th best score in linear time; only rows at or
+        above it are sorted.
+
+        Args:
+            scores: Score per startup
+            ids: Startup id per position
+            k: Number of results
+            mask: Optional boolean array of eligible positions
+
+        Returns:
+            ndarray: Positions into scores/ids
+        """
+        eligible = np.flatnonzero(mask) if mask is not None else np.arange(len(scores))
+        if k <= 0 or not len(eligible):
+            return eligible[:0]
+
+        if len(eligible) > k:
+            kth = -np.partition(-scores[eligible], k - 1)[k - 1]
+            eligible = eligible[scores[eligible] >= kth]
+
+        order = np.lexsort((ids[eligible], -scores[eligible]))
+        return eligible[order[:k]]
+
+    @staticmethod
+    def _parse_list(value):
+        """JSON list column (or list) -> list; anything unparseable -> []"""
+        if not value:
+            return []
+        if isinstance(value, str):
+            try:
+                value = json.loads(value)
+            except ValueError:
+                return []
+        if not isinstance(value, list):
+            return []
+        return [item for item in value if isinstance(item, (str, int, float))]
+
+    # ==========================================
+    # FEATURES
+    # ==========================================
+
+    @staticmethod
+    def features():
+        """The encoded startup population, rebuilding it when stale"""
+        with _lock:
+            built_at = _features['built_at']
+            snapshot = dict(_features)
+        if SessionHooks.is_stale(built_at):
+            MatchScoringService.rebuild()
+            with _lock:
+                snapshot = dict(_features)
+        return snapshot
+
+    @staticmethod
+    def rebuild():
+        """Encode every startup from the database"""
+        rows = db.session.query(Startup.id, Startup.sectors, Startup.stage, Startup.country).order_by(Startup.id).all()
+        encoded = MatchScoringService.encode(rows)
+        encoded['built_at'] = time.monotonic()
+
+        with _lock:
+            _features.clear()
+            _features.update(encoded)
+
+        return len(rows)
+
+    @staticmethod
+    def encode(rows):
+        """
+        Encode (id, sectors JSON, stage, country) rows into scoring arrays
+
+        Returns:
+            dict: ids, sectors (0/1 matrix), stages (int codes, -1 = none),
+                  has_country, alive, positions and the sector/stage vocabularies
+        """
+        sector_vocab, stage_vocab = {}, {}
+        cells, stages = [], []
+
+        for position, (_, sectors, stage, _) in enumerate(rows):
+            for sector in set(MatchScoringService._parse_list(sectors)):
+                cells.append((position, sector_vocab.setdefault(sector, len(sector_vocab))))
+            stages.append(stage_vocab.setdefault(stage, len(stage_vocab)) if stage is not None else -1)
+
+        matrix = np.zeros((len(rows), len(sector_vocab)), dtype=np.int8)
+        if cells:
+            positions, columns = zip(*cells)
+            matrix[list(positions), list(columns)] = 1
+
+        ids = np.array([row[0] for row in rows], dtype=np.int64)
+        return {
+            'ids': ids,
+            'sectors': matrix,
+            'stages': np.array(stages, dtype=np.int32),
+            'has_country': np.array([bool(row[3]) for row in rows], dtype=bool),
+            'alive': np.ones(len(rows), dtype=bool),
+            'positions': {int(startup_id): position for position, startup_id in enumerate(ids)},
+            'sector_vocab': sector_vocab,
+            'stage_vocab': stage_vocab
+        }
+
+    @staticmethod
+    def _apply(changes):
+        """Patch the cached features with committed startups (None = deleted)"""
+        with _lock:
+            if _features['built_at'] is None:
+                return
+            features = dict(_features)
+
+            new_ids = [startup_id for startup_id, values in changes.items()
+                       if values is not None and startup_id not in features['positions']]
+            if new_ids:
+                # Grow every array once for the whole batch
+                count = len(new_ids)
+                features['ids'] = np.concatenate([features['ids'], np.array(new_ids, dtype=np.int64)])
+                features['sectors'] = np.vstack([
+                    features['sectors'], np.zeros((count, features['sectors'].shape[1]), dtype=np.int8)
+                ])
+                features['stages'] = np.concatenate([features['stages'], np.full(count, -1, dtype=np.int32)])
+                features['has_country'] = np.concatenate([features['has_country'], np.zeros(count, dtype=bool)])
+                features['alive'] = np.concatenate([features['alive'], np.ones(count, dtype=bool)])
+                features['positions'] = dict(features['positions'])
+                for offset, startup_id in enumerate(new_ids):
+                    features['positions'][startup_id] = len(features['ids']) - count + offset
+            else:
+                for key in ('sectors', 'stages', 'has_country', 'alive'):
+                    features[key] = features[key].copy()
+
+            for startup_id, values in changes.items():
+                position = features['positions'].get(startup_id)
+                if position is None:
+                    continue
+                if values is None:
+                    features['alive'][position] = False
+                    continue
+
+                sectors, stage, country = values
+                row = np.zeros(features['sectors'].shape[1], dtype=np.int8)
+                for sector in set(MatchScoringService._parse_list(sectors)):
+                    if sector not in features['sector_vocab']:
+                        features['sector_vocab'] = {**features['sector_vocab'], sector: len(features['sector_vocab'])}
+                        features['sectors'] = np.hstack([
+                            features['sectors'], np.zeros((len(features['ids']), 1), dtype=np.int8)
+                        ])
+                        row = np.append(row, 0)
+                    row[features['sector_vocab'][sector]] = 1
+                features['sectors'][position] = row
+
+                if stage is not None and stage not in features['stage_vocab']:
+                    features['stage_vocab'] = {**features['stage_vocab'], stage: len(features['stage_vocab'])}
+                features['stages'][position] = features['stage_vocab'][stage] if stage is not None else -1
+                features['has_country'][position] = bool(country)
+                features['alive'][position] = True
+
+            # Readers holding the previous snapshot keep consistent arrays
+            _features.update(features)
+
+    @staticmethod
+    def _collect(session, pending):
+        """Snapshot changed startups; applied only once the commit succeeds"""
+        for obj in list(session.new) + list(session.dirty):
+            if not isinstance(obj, Startup):
+                continue
+            if obj not in session.new and not any(
+                inspect(obj).attrs[field].history.has_changes() for field in MATCH_FEATURE_FIELDS
+            ):
+                continue
+            pending[obj.id] = (obj.sectors, obj.stage, obj.country)
+
+        for obj in session.deleted:
+            if isinstance(obj, Startup):
+                pending[obj.id] = None
+
+
+SessionHooks.on_commit('match_features', [Startup], MatchScoringService._collect, MatchScoringService._apply)
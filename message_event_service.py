@@ -0,0 +1,93 @@
+"""
+Message Event Service
+Pushes message_new / message_read events to participants over Socket.IO
+
+Every connected client sits in a private room of its user (user_<id>) on the
+MESSAGE_EVENTS_NAMESPACE namespace, joined server-side on an authenticated
+connect (see routes/messages.py). Message inserts and read-flag flips are
+snapshotted on flush and emitted only once the transaction commits, so every
+send and read path (MessageService, the messages API, bulk mark-all-read)
+is covered and nothing is pushed for a rolled-back write:
+
+    message_new   -> sender and recipient rooms   {message}
+    message_read  -> sender and reader rooms      {reader_id, thread_ids, message_ids}
+
+Clients refresh what they show from the REST API on an event and fall back
+to polling only while the socket is disconnected.
+"""
+
+from sqlalchemy import inspect
+
+from extensions import socketio
+from models import Message
+from session_hooks import SessionHooks
+
+
+MESSAGE_EVENTS_NAMESPACE = '/messages'
+
+# Message columns sent with message_new (no relationship loads during flush)
+MESSAGE_EVENT_FIELDS = ('id', 'sender_id', 'recipient_id', 'subject', 'body', 'message_type', 'thread_id', 'is_read')
+
+
+class MessageEventService:
+    """Service for real-time message events"""
+
+    @staticmethod
+    def room(user_id):
+        """Private Socket.IO room of a user"""
+        return f'user_{user_id}'
+
+    @staticmethod
+    def emit(event_name, payload, user_ids):
+        """Emit an event to the rooms of the given users; never raises"""
+        for user_id in set(user_ids):
+            try:
+                socketio.emit(
+                    event_name, payload,
+                    to=MessageEventService.room(user_id), namespace=MESSAGE_EVENTS_NAMESPACE
+                )
+            except Exception as e:
+                print(f"Failed to emit {event_name} to user {user_id}: {e}")
+
+    # ==========================================
+    # ORM HOOKS
+    # ==========================================
+
+    @staticmethod
+    def _collect(session, pending):
+        """Snapshot new messages and read flips; emitted only once the commit succeeds"""
+        for obj in session.new:
+            if isinstance(obj, Message):
+                payload = {field: getattr(obj, field) for field in MESSAGE_EVENT_FIELDS}
+                payload['created_at'] = obj.created_at.isoformat() if obj.created_at else None
+                pending['new'].append(payload)
+
+        for obj in session.dirty:
+            if not isinstance(obj, Message) or not obj.is_read:
+                continue
+            if not inspect(obj).attrs.is_read.history.has_changes():
+                continue
+            # Grouped per (reader, sender) so a bulk read is one event per pair
+            read = pending['read'].setdefault((obj.recipient_id, obj.sender_id), {'thread_ids': set(), 'message_ids': []})
+            read['message_ids'].append(obj.id)
+            if obj.thread_id:
+                read['thread_ids'].add(obj.thread_id)
+
+    @staticmethod
+    def _apply(pending):
+        """Emit the events of a committed snapshot"""
+        for message in pending['new']:
+            MessageEventService.emit('message_new', {'message': message}, (message['sender_id'], message['recipient_id']))
+
+        for (reader_id, sender_id), read in pending['read'].items():
+            MessageEventService.emit('message_read', {
+                'reader_id': reader_id,
+                'thread_ids': sorted(read['thread_ids']),
+                'message_ids': read['message_ids']
+            }, (reader_id, sender_id))
+
+
+SessionHooks.on_commit(
+    'message_events', [Message], MessageEventService._collect, MessageEventService._apply,
+    pending=lambda: {'new': [], 'read': {}}
+)
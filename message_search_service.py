@@ -0,0 +1,302 @@
+"""
+Message Search Service
+Full-text message search scoped to the searching user's mailbox
+
+Each message is indexed once (SQLite FTS5 or Postgres tsvector + GIN) with its
+participants, so a search only walks the caller's own messages. Per-side soft
+deletes are checked against the messages table at query time, which keeps the
+index append-mostly.
+
+Results are ordered by relevance decayed by age, and paginated with an opaque
+cursor that pins the scoring time, so pages stay stable while new mail arrives.
+"""
+
+import base64
+from datetime import datetime
+import json
+
+from sqlalchemy import inspect, text
+
+from export_service import ExportService
+from extensions import db
+from models import Message
+from search_index_service import SearchIndexService, SEARCH_MAX_TERMS, SEARCH_REBUILD_BATCH
+from session_hooks import SessionHooks
+
+
+MESSAGE_INDEX_TABLE = 'message_search_index'
+
+# Relevance is divided by (1 + age_in_days / half-life)
+MESSAGE_RECENCY_HALF_LIFE_DAYS = 30.0
+
+# Subject matches outrank body matches
+MESSAGE_SUBJECT_WEIGHT = 5.0
+
+MESSAGE_SEARCH_MAX_LIMIT = 50
+
+
+class MessageSearchService:
+    """Service for indexing and searching messages"""
+
+    # ==========================================
+    # SEARCH
+    # ==========================================
+
+    @staticmethod
+    def search(user_id, query, cursor=None, limit=20):
+        """
+        Search the user's non-deleted sent and received messages
+
+        Args:
+            user_id: Searching user
+            query: Free-text search (every term is prefix-matched)
+            cursor: next_cursor from the previous page
+            limit: Page size (max MESSAGE_SEARCH_MAX_LIMIT)
+
+        Returns:
+            dict: messages, next_cursor and has_more
+        """
+        limit = max(1, min(limit, MESSAGE_SEARCH_MAX_LIMIT))
+        state = MessageSearchService._decode_cursor(cursor) if cursor else {}
+        as_of = datetime.fromisoformat(state['as_of']) if state.get('as_of') else datetime.utcnow()
+
+        if MessageSearchService.available() and SearchIndexService.tokens(query):
+            rows = MessageSearchService._ranked_page(user_id, query, as_of, state, limit + 1)
+        else:
+            rows = MessageSearchService._scan_page(user_id, query, state, limit + 1)
+
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+
+        messages = {m.id: m for m in Message.query.filter(Message.id.in_([row[0] for row in rows])).all()}
+
+        next_cursor = None
+        if has_more:
+            last_id, last_score = rows[-1]
+            next_cursor = MessageSearchService._encode_cursor({
+                "as_of": as_of.isoformat(), "score": last_score, "id": last_id
+            })
+
+        return {
+            "messages": [messages[message_id].to_dict() for message_id, _ in rows if message_id in messages],
+            "next_cursor": next_cursor,
+            "has_more": has_more
+        }
+
+    @staticmethod
+    def available():
+        """Whether the message index exists on this database"""
+        return MessageSearchService._ready(db.session.get_bind())
+
+    @staticmethod
+    def _ready(bind):
+        return bind.dialect.name in ('sqlite', 'postgresql') and SessionHooks.table_ready(bind, MESSAGE_INDEX_TABLE)
+
+    @staticmethod
+    def _ranked_page(user_id, query, as_of, state, limit):
+        """One page of (id, score) from the index, best first"""
+        terms = SearchIndexService.tokens(query)[:SEARCH_MAX_TERMS]
+        params = {
+            "user_id": user_id,
+            "as_of": as_of,
+            "half_life": MESSAGE_RECENCY_HALF_LIFE_DAYS,
+            "cursor_score": state.get('score'),
+            "cursor_id": state.get('id'),
+            "limit": limit
+        }
+
+        if db.session.get_bind().dialect.name == 'sqlite':
+            # Participant token narrows the posting lists before term matching
+            params["match"] = f'participants : "u{user_id}" AND {{subject body}} : (' + ' '.join(
+                f'"{term}"*' for term in terms
+            ) + ')'
+            params["as_of"] = as_of.isoformat(sep=' ')
+            scored = (
+                f"SELECT m.id AS id, "
+                f"-bm25({MESSAGE_INDEX_TABLE}, 0.0, {MESSAGE_SUBJECT_WEIGHT}, 1.0) "
+                f"/ (1.0 + (julianday(:as_of) - julianday(m.created_at)) / :half_life) AS score "
+                f"FROM {MESSAGE_INDEX_TABLE} JOIN messages m ON m.id = {MESSAGE_INDEX_TABLE}.rowid "
+                f"WHERE {MESSAGE_INDEX_TABLE} MATCH :match "
+                f"AND m.created_at <= :as_of "
+                f"AND ((m.sender_id = :user_id AND coalesce(m.is_deleted_by_sender, 0) = 0) "
+                f"OR (m.recipient_id = :user_id AND coalesce(m.is_deleted_by_recipient, 0) = 0))"
+            )
+        else:
+            params["match"] = ' & '.join(f"{term}:*" for term in terms)
+            scored = (
+                f"SELECT m.id AS id, "
+                f"ts_rank(i.document, to_tsquery('simple', :match)) "
+                f"/ (1.0 + extract(epoch FROM (:as_of - m.created_at)) / 86400.0 / :half_life) AS score "
+                f"FROM {MESSAGE_INDEX_TABLE} i JOIN messages m ON m.id = i.message_id "
+                f"WHERE i.document @@ to_tsquery('simple', :match) "
+                f"AND m.created_at <= :as_of "
+                f"AND ((i.sender_id = :user_id AND coalesce(m.is_deleted_by_sender, false) = false) "
+                f"OR (i.recipient_id = :user_id AND coalesce(m.is_deleted_by_recipient, false) = false))"
+            )
+
+        boundary = "coalesce((SELECT score FROM scored WHERE id = :cursor_id), :cursor_score)"
+
+        # Corpus statistics drift as mail arrives, shifting every score a little;
+        # comparing against the cursor row's current score keeps pages contiguous
+        sql = (
+            f"WITH scored AS ({scored}) "
+            f"SELECT id, score FROM scored "
+            f"WHERE :cursor_id IS NULL OR score < {boundary} "
+            f"OR (score = {boundary} AND id < :cursor_id) "
+            f"ORDER BY score DESC, id DESC LIMIT :limit"
+        )
+        return [(row[0], float(row[1])) for row in db.session.execute(text(sql), params)]
+
+    @staticmethod
+    def _scan_page(user_id, query, state, limit):
+        """ILIKE fallback until the index is built: newest first"""
+        search = db.session.query(Message.id).filter(
+            db.or_(
+                db.and_(Message.sender_id == user_id, Message.is_deleted_by_sender == False),
+                db.and_(Message.recipient_id == user_id, Message.is_deleted_by_recipient == False)
+            ),
+            db.or_(
+                Message.subject.ilike(f'%{query}%'),
+                Message.body.ilike(f'%{query}%')
+            )
+        )
+        if state.get('id'):
+            search = search.filter(Message.id < state['id'])
+        return [(row.id, None) for row in search.order_by(Message.id.desc()).limit(limit)]
+
+    @staticmethod
+    def _encode_cursor(state):
+        return base64.urlsafe_b64encode(json.dumps(state).encode('utf-8')).decode('ascii')
+
+    @staticmethod
+    def _decode_cursor(cursor):
+        try:
+            return json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        except (ValueError, UnicodeError):
+            raise ValueError("Invalid cursor")
+
+    # ==========================================
+    # MAINTENANCE
+    # ==========================================
+
+    @staticmethod
+    def rebuild():
+        """
+        Drop, recreate and repopulate the message index
+
+        Returns:
+            int: Messages indexed
+        """
+        connection = db.session.connection()
+        dialect = connection.dialect.name
+        if dialect not in ('sqlite', 'postgresql'):
+            raise ValueError(f"Full-text search is not supported on {dialect}")
+
+        connection.execute(text(f"DROP TABLE IF EXISTS {MESSAGE_INDEX_TABLE}"))
+        if dialect == 'sqlite':
+            connection.execute(text(
+                f"CREATE VIRTUAL TABLE {MESSAGE_INDEX_TABLE} USING fts5("
+                f"participants, subject, body, prefix='2 3', tokenize='unicode61 remove_diacritics 2')"
+            ))
+        else:
+            connection.execute(text(
+                f"CREATE TABLE {MESSAGE_INDEX_TABLE} ("
+                f"message_id INTEGER PRIMARY KEY, "
+                f"sender_id INTEGER NOT NULL, recipient_id INTEGER NOT NULL, "
+                f"subject TEXT, body TEXT, "
+                f"document TSVECTOR GENERATED ALWAYS AS ("
+                f"setweight(to_tsvector('simple', coalesce(subject, '')), 'A') || "
+                f"setweight(to_tsvector('simple', coalesce(body, '')), 'B')) STORED)"
+            ))
+
+        query = db.session.query(
+            Message.id, Message.sender_id, Message.recipient_id, Message.subject, Message.body
+        ).order_by(Message.id)
+
+        batch, count = [], 0
+        for row in ExportService.iter_rows(query):
+            batch.append(MessageSearchService._document(*row))
+            if len(batch) >= SEARCH_REBUILD_BATCH:
+                MessageSearchService._insert(connection, batch)
+                count += len(batch)
+                batch = []
+        if batch:
+            MessageSearchService._insert(connection, batch)
+            count += len(batch)
+
+        if dialect == 'postgresql':
+            connection.execute(text(
+                f"CREATE INDEX ix_{MESSAGE_INDEX_TABLE}_document ON {MESSAGE_INDEX_TABLE} USING GIN (document)"
+            ))
+            connection.execute(text(
+                f"CREATE INDEX ix_{MESSAGE_INDEX_TABLE}_sender ON {MESSAGE_INDEX_TABLE} (sender_id)"
+            ))
+            connection.execute(text(
+                f"CREATE INDEX ix_{MESSAGE_INDEX_TABLE}_recipient ON {MESSAGE_INDEX_TABLE} (recipient_id)"
+            ))
+
+        db.session.commit()
+        SessionHooks.invalidate_tables(MESSAGE_INDEX_TABLE)
+        return count
+
+    @staticmethod
+    def _document(message_id, sender_id, recipient_id, subject, body):
+        return {
+            "message_id": message_id,
+            "sender_id": sender_id,
+            "recipient_id": recipient_id,
+            "participants": f"u{sender_id} u{recipient_id}",
+            "subject": ' '.join(SearchIndexService.tokens(subject)),
+            "body": ' '.join(SearchIndexService.tokens(body))
+        }
+
+    @staticmethod
+    def _insert(connection, documents):
+        if connection.dialect.name == 'sqlite':
+            sql = (
+                f"INSERT INTO {MESSAGE_INDEX_TABLE} (rowid, participants, subject, body) "
+                f"VALUES (:message_id, :participants, :subject, :body)"
+            )
+        else:
+            sql = (
+                f"INSERT INTO {MESSAGE_INDEX_TABLE} (message_id, sender_id, recipient_id, subject, body) "
+                f"VALUES (:message_id, :sender_id, :recipient_id, :subject, :body)"
+            )
+        connection.execute(text(sql), documents)
+
+    @staticmethod
+    def _delete(connection, message_ids):
+        key = 'rowid' if connection.dialect.name == 'sqlite' else 'message_id'
+        connection.execute(
+            text(f"DELETE FROM {MESSAGE_INDEX_TABLE} WHERE {key} = :message_id"),
+            [{"message_id": message_id} for message_id in message_ids]
+        )
+
+    @staticmethod
+    def _after_flush(session, flush_context):
+        """Index new messages; re-index edited ones; drop hard-deleted ones"""
+        changed = [obj for obj in session.new if isinstance(obj, Message)]
+        changed += [
+            obj for obj in session.dirty
+            if isinstance(obj, Message) and any(
+                inspect(obj).attrs[field].history.has_changes() for field in ('subject', 'body')
+            )
+        ]
+        removed = [obj.id for obj in session.deleted if isinstance(obj, Message) and obj.id is not None]
+        if not changed and not removed:
+            return
+
+        connection = session.connection()
+        if not MessageSearchService._ready(connection):
+            return
+
+        documents = [
+            MessageSearchService._document(m.id, m.sender_id, m.recipient_id, m.subject, m.body)
+            for m in changed
+        ]
+        MessageSearchService._delete(connection, removed + [doc["message_id"] for doc in documents])
+        if documents:
+            MessageSearchService._insert(connection, documents)
+
+
+SessionHooks.on_flush([Message], MessageSearchService._after_flush)
@@ -8,6 +8,7 @@ from datetime import datetime
 from extensions import db
 from models import User, Referral, Opportunity, Startup
 from sqlalchemy import or_, and_
+from user_counter_service import UserCounterService
 
 
 class MessageService:
@@ -105,10 +106,7 @@ class MessageService:
                     "total": total,
                     "total_pages": (total + per_page - 1) // per_page
                 },
-                "unread_count": Message.query.filter_by(
-                    recipient_id=user_id,
-                    is_read=False
-                ).count()
+                "unread_count": UserCounterService.unread_messages(user_id)
             }
 
         except Exception as e:
@@ -507,14 +505,7 @@ Best regards,
     def get_unread_count(user_id):
         """Get unread message count"""
         try:
-            from models import Message
-            
-            count = Message.query.filter_by(
-                recipient_id=user_id,
-                is_read=False
-            ).count()
-
-            return {"success": True, "count": count}
+            return {"success": True, "count": UserCounterService.unread_messages(user_id)}
 
         except Exception as e:
             return {"success": False, "message": str(e)}
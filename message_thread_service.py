@@ -0,0 +1,206 @@
+"""
+Message Thread Service
+Maintains message_threads, the per-participant conversation summaries behind the inbox
+
+Each (thread_id, participant) row holds the other participant, the latest
+message visible to that participant, and how many messages they can see and
+have not read. Rows are written in the same transaction as the messages
+themselves, from an after_flush hook, so every send, read and delete path
+keeps them current:
+
+    new message        counts += 1 / unread += 1 and last message advanced (UPDATE)
+    read flag flipped  unread -= 1 (or += 1)
+    deleted / moved    the thread's rows are recomputed from messages
+
+A read flag whose previous value was never loaded (expired or deferred) gives
+no delta to apply, so that thread is recomputed as well.
+
+A thread with no summary row yet (first message, or history from before the
+table existed) is recomputed instead of incremented. rebuild() backfills or
+repairs everything.
+"""
+
+from datetime import datetime
+
+from sqlalchemy import inspect, case, func, select, update, delete
+from sqlalchemy.orm import joinedload
+
+from extensions import db
+from models import Message, MessageThread, User
+from session_hooks import SessionHooks
+
+
+# Thread ids recomputed per query
+THREAD_RECOMPUTE_CHUNK = 500
+
+# Message fields whose change requires recomputing the thread
+THREAD_RECOMPUTE_FIELDS = ('is_deleted_by_sender', 'is_deleted_by_recipient', 'thread_id', 'sender_id', 'recipient_id')
+
+
+class MessageThreadService:
+    """Service for inbox thread summaries"""
+
+    @staticmethod
+    def list_threads(user_id):
+        """
+        Conversation threads of a user, latest activity first (one indexed query)
+
+        Returns:
+            list: (MessageThread, other User, latest Message) tuples
+        """
+        return db.session.query(MessageThread, User, Message).join(
+            User, User.id == MessageThread.other_user_id
+        ).join(
+            Message, Message.id == MessageThread.last_message_id
+        ).options(
+            joinedload(Message.sender), joinedload(Message.recipient)
+        ).filter(
+            MessageThread.user_id == user_id
+        ).order_by(MessageThread.last_message_at.desc(), MessageThread.id.desc()).all()
+
+    @staticmethod
+    def rebuild():
+        """
+        Recompute every thread summary from messages
+
+        Returns:
+            int: Threads summarized
+        """
+        connection = db.session.connection()
+        thread_ids = [row[0] for row in connection.execute(
+            select(Message.thread_id).where(Message.thread_id.isnot(None)).distinct()
+        )]
+        connection.execute(delete(MessageThread.__table__))
+        for start in range(0, len(thread_ids), THREAD_RECOMPUTE_CHUNK):
+            MessageThreadService._recompute(connection, thread_ids[start:start + THREAD_RECOMPUTE_CHUNK])
+        db.session.commit()
+        SessionHooks.invalidate_tables(MessageThread.__tablename__)
+        return len(thread_ids)
+
+    # ==========================================
+    # MAINTENANCE
+    # ==========================================
+
+    @staticmethod
+    def _recompute(connection, thread_ids):
+        """Replace the summary rows of threads with values aggregated from messages"""
+        if not thread_ids:
+            return
+        table = MessageThread.__table__
+        rows = connection.execute(
+            select(
+                Message.id, Message.thread_id, Message.sender_id, Message.recipient_id, Message.is_read,
+                Message.is_deleted_by_sender, Message.is_deleted_by_recipient, Message.created_at
+            ).where(Message.thread_id.in_(thread_ids)).order_by(Message.created_at, Message.id)
+        ).all()
+
+        summaries = {}
+        for row in rows:
+            for user_id, other_id, deleted in (
+                (row.sender_id, row.recipient_id, row.is_deleted_by_sender),
+                (row.recipient_id, row.sender_id, row.is_deleted_by_recipient),
+            ):
+                if deleted:
+                    continue
+                summary = summaries.setdefault((row.thread_id, user_id), {
+                    "thread_id": row.thread_id, "user_id": user_id, "message_count": 0, "unread_count": 0
+                })
+                summary["message_count"] += 1
+                if user_id == row.recipient_id and not row.is_read:
+                    summary["unread_count"] += 1
+                # Rows are in time order: the last one wins
+                summary.update(other_user_id=other_id, last_message_id=row.id, last_message_at=row.created_at)
+                if row.sender_id == row.recipient_id:
+                    break
+
+        connection.execute(delete(table).where(table.c.thread_id.in_(thread_ids)))
+        if summaries:
+            now = datetime.utcnow()
+            connection.execute(table.insert(), [dict(summary, updated_at=now) for summary in summaries.values()])
+
+    @staticmethod
+    def _increment(connection, key, delta):
+        """Apply a count/unread/last-message delta to an existing row; False if there is none"""
+        table = MessageThread.__table__
+        values = {
+            "message_count": table.c.message_count + delta["count"],
+            "unread_count": case(
+                (table.c.unread_count + delta["unread"] < 0, 0),
+                else_=table.c.unread_count + delta["unread"]
+            ),
+            "updated_at": datetime.utcnow()
+        }
+        if delta.get("last_id") is not None:
+            newer = delta["last_id"] > func.coalesce(table.c.last_message_id, 0)
+            values.update(
+                last_message_id=case((newer, delta["last_id"]), else_=table.c.last_message_id),
+                last_message_at=case((newer, delta["last_at"]), else_=table.c.last_message_at),
+                other_user_id=case((newer, delta["other_id"]), else_=table.c.other_user_id)
+            )
+        result = connection.execute(
+            update(table).where(table.c.thread_id == key[0], table.c.user_id == key[1]).values(**values)
+        )
+        return result.rowcount > 0
+
+    @staticmethod
+    def _after_flush(session, flush_context):
+        """Update the summaries of threads touched by this flush, in the same transaction"""
+        deltas, recompute = {}, set()
+
+        def delta(thread_id, user_id):
+            return deltas.setdefault((thread_id, user_id), {"count": 0, "unread": 0})
+
+        for obj in session.new:
+            if not isinstance(obj, Message) or not obj.thread_id:
+                continue
+            unread = 0 if obj.is_read else 1
+            if obj.sender_id == obj.recipient_id:
+                participants = [(obj.sender_id, obj.recipient_id, unread)]
+            else:
+                participants = [(obj.sender_id, obj.recipient_id, 0), (obj.recipient_id, obj.sender_id, unread)]
+            for user_id, other_id, unread in participants:
+                change = delta(obj.thread_id, user_id)
+                change["count"] += 1
+                change["unread"] += unread
+                if change.get("last_id") is None or obj.id > change["last_id"]:
+                    change.update(last_id=obj.id, last_at=obj.created_at, other_id=other_id)
+
+        for obj in session.dirty:
+            if not isinstance(obj, Message):
+                continue
+            state = inspect(obj)
+            if any(state.attrs[field].history.has_changes() for field in THREAD_RECOMPUTE_FIELDS):
+                recompute.update(t for t in state.attrs.thread_id.history.sum() if t)
+                continue
+            read = state.attrs.is_read.history
+            if not obj.thread_id or not read.has_changes() or obj.is_deleted_by_recipient:
+                continue
+            if not read.deleted:
+                recompute.add(obj.thread_id)
+            elif bool(read.deleted[0]) != bool(obj.is_read):
+                delta(obj.thread_id, obj.recipient_id)["unread"] += -1 if obj.is_read else 1
+
+        for obj in session.deleted:
+            if isinstance(obj, Message) and obj.thread_id:
+                recompute.add(obj.thread_id)
+
+        if not deltas and not recompute:
+            return
+
+        connection = session.connection()
+        if not SessionHooks.table_ready(connection, MessageThread.__tablename__):
+            return
+
+        for thread_user, change in deltas.items():
+            if thread_user[0] in recompute:
+                continue
+            if not MessageThreadService._increment(connection, thread_user, change):
+                # No summary yet: build it from the messages, this one included
+                recompute.add(thread_user[0])
+
+        recompute = list(recompute)
+        for start in range(0, len(recompute), THREAD_RECOMPUTE_CHUNK):
+            MessageThreadService._recompute(connection, recompute[start:start + THREAD_RECOMPUTE_CHUNK])
+
+
+SessionHooks.on_flush([Message], MessageThreadService._after_flush)
@@ -1180,6 +1180,7 @@ class StartupMatch(db.Model):
     # Unique constraint
     __table_args__ = (
         db.UniqueConstraint('corporate_id', 'startup_id', name='unique_corporate_startup_match'),
+        db.Index('ix_startup_matches_corporate_score', 'corporate_id', 'match_score'),
     )
 
     def to_dict(self):
@@ -1462,3 +1463,408 @@ class SecurityLog(db.Model):
             "user_agent": self.user_agent,
             "created_at": self.created_at.isoformat()
         }
+
+
+# -----------------------------------------
+# METRIC ROLLUP MODEL (Hourly/Daily event aggregates)
+# -----------------------------------------
+class MetricRollup(db.Model):
+    __tablename__ = "metric_rollups"
+
+    id = db.Column(db.Integer, primary_key=True)
+    source = db.Column(db.String(50), nullable=False)  # analytics_events, referral_clicks, messages
+    entity_type = db.Column(db.String(30), nullable=False)  # startup, user, enabler, referral
+    entity_id = db.Column(db.Integer, nullable=False)
+    metric = db.Column(db.String(100), nullable=False)
+    granularity = db.Column(db.String(10), nullable=False)  # hour, day
+    bucket = db.Column(db.DateTime, nullable=False)  # Bucket start (UTC)
+    value = db.Column(db.Integer, default=0, nullable=False)
+
+    __table_args__ = (
+        db.UniqueConstraint('source', 'entity_type', 'entity_id', 'metric', 'granularity', 'bucket',
+                            name='unique_metric_rollup_bucket'),
+    )
+
+    def to_dict(self):
+        return {
+            "source": self.source,
+            "entity_type": self.entity_type,
+            "entity_id": self.entity_id,
+            "metric": self.metric,
+            "granularity": self.granularity,
+            "bucket": self.bucket.isoformat(),
+            "value": self.value
+        }
+
+
+# -----------------------------------------
+# ROLLUP WATERMARK MODEL (Last aggregated row per source)
+# -----------------------------------------
+class RollupWatermark(db.Model):
+    __tablename__ = "rollup_watermarks"
+
+    source = db.Column(db.String(50), primary_key=True)
+    last_id = db.Column(db.Integer, default=0, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def to_dict(self):
+        return {
+            "source": self.source,
+            "last_id": self.last_id,
+            "updated_at": self.updated_at.isoformat() if self.updated_at else None
+        }
+
+
+# -----------------------------------------
+# VISITOR SKETCH MODEL (Daily HyperLogLog of unique visitors)
+# -----------------------------------------
+class VisitorSketch(db.Model):
+    __tablename__ = "visitor_sketches"
+
+    id = db.Column(db.Integer, primary_key=True)
+    entity_type = db.Column(db.String(30), nullable=False)  # referral, startup
+    entity_id = db.Column(db.Integer, nullable=False)
+    day = db.Column(db.Date, nullable=False)
+    registers = db.Column(db.LargeBinary, nullable=False)  # zlib-compressed HLL registers
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (
+        db.UniqueConstraint('entity_type', 'entity_id', 'day', name='unique_visitor_sketch_day'),
+    )
+
+    def to_dict(self):
+        return {
+            "entity_type": self.entity_type,
+            "entity_id": self.entity_id,
+            "day": self.day.isoformat(),
+            "size_bytes": len(self.registers or b""),
+            "updated_at": self.updated_at.isoformat() if self.updated_at else None
+        }
+
+
+# -----------------------------------------
+# ECOSYSTEM FIT SCORE MODEL (Nightly batch scores + peer percentiles)
+# -----------------------------------------
+class EcosystemFitScore(db.Model):
+    __tablename__ = "ecosystem_fit_scores"
+
+    startup_id = db.Column(db.Integer, db.ForeignKey("startups.id"), primary_key=True)
+
+    tech_score = db.Column(db.Integer, default=0)
+    market_score = db.Column(db.Integer, default=0)
+    team_score = db.Column(db.Integer, default=0)
+    capital_score = db.Column(db.Integer, default=0)
+    product_score = db.Column(db.Integer, default=0)
+    overall_score = db.Column(db.Float, default=0.0)
+
+    # Peer groups: primary sector and stage
+    sector = db.Column(db.String(120))
+    stage = db.Column(db.String(120))
+    sector_top_percent = db.Column(db.Integer)  # "Top X%" within sector
+    sector_peers = db.Column(db.Integer, default=0)
+    stage_top_percent = db.Column(db.Integer)  # "Top X%" within stage
+    stage_peers = db.Column(db.Integer, default=0)
+
+    computed_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def to_dict(self):
+        return {
+            "startup_id": self.startup_id,
+            "tech_score": self.tech_score,
+            "market_score": self.market_score,
+            "team_score": self.team_score,
+            "capital_score": self.capital_score,
+            "product_score": self.product_score,
+            "overall_score": self.overall_score,
+            "sector": self.sector,
+            "stage": self.stage,
+            "sector_top_percent": self.sector_top_percent,
+            "sector_peers": self.sector_peers,
+            "stage_top_percent": self.stage_top_percent,
+            "stage_peers": self.stage_peers,
+            "computed_at": self.computed_at.isoformat() if self.computed_at else None
+        }
+
+
+# -----------------------------------------
+# USER ACTIVITY WEEK MODEL (Weeks in which a user was active)
+# -----------------------------------------
+class UserActivityWeek(db.Model):
+    __tablename__ = "user_activity_weeks"
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
+    week = db.Column(db.Date, nullable=False)  # Monday of the active week
+
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'week', name='unique_user_activity_week'),
+    )
+
+    def to_dict(self):
+        return {
+            "user_id": self.user_id,
+            "week": self.week.isoformat()
+        }
+
+
+# -----------------------------------------
+# COHORT RETENTION MODEL (Weekly signup cohort x weeks-since-signup cells)
+# -----------------------------------------
+class CohortRetention(db.Model):
+    __tablename__ = "cohort_retention"
+
+    id = db.Column(db.Integer, primary_key=True)
+    cohort_week = db.Column(db.Date, nullable=False)  # Monday of the signup week
+    role = db.Column(db.String(40), nullable=False)
+    week_offset = db.Column(db.Integer, nullable=False)  # Weeks since signup
+    metric = db.Column(db.String(20), nullable=False)  # signups (offset 0), active
+    value = db.Column(db.Integer, default=0, nullable=False)
+
+    __table_args__ = (
+        db.UniqueConstraint('cohort_week', 'role', 'week_offset', 'metric',
+                            name='unique_cohort_retention_cell'),
+    )
+
+    def to_dict(self):
+        return {
+            "cohort_week": self.cohort_week.isoformat(),
+            "role": self.role,
+            "week_offset": self.week_offset,
+            "metric": self.metric,
+            "value": self.value
+        }
+
+
+# -----------------------------------------
+# SAVED SEARCH MODEL (Admin search filters with cached results)
+# -----------------------------------------
+class SavedSearch(db.Model):
+    __tablename__ = "saved_searches"
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False, index=True)
+    name = db.Column(db.String(200), nullable=False)
+    entity_type = db.Column(db.String(40), nullable=False)  # users, programs, applications, meetings, referrals, leads
+    filters = db.Column(db.Text, default="{}")  # JSON filter spec passed to AdminSearchService.filter_*
+
+    # Cached evaluation (matched ids live in saved_search_results)
+    result_count = db.Column(db.Integer, default=0)
+    new_count = db.Column(db.Integer, default=0)  # Results added since last view
+    change_watermark = db.Column(db.Integer, default=0)  # Last search_changes id folded in
+
+    last_run_at = db.Column(db.DateTime)
+    last_full_run_at = db.Column(db.DateTime)
+    last_viewed_at = db.Column(db.DateTime)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "user_id": self.user_id,
+            "name": self.name,
+            "entity_type": self.entity_type,
+            "filters": json.loads(self.filters or "{}"),
+            "result_count": self.result_count or 0,
+            "new_count": self.new_count or 0,
+            "last_run_at": self.last_run_at.isoformat() if self.last_run_at else None,
+            "last_viewed_at": self.last_viewed_at.isoformat() if self.last_viewed_at else None,
+            "created_at": self.created_at.isoformat() if self.created_at else None
+        }
+
+
+# -----------------------------------------
+# SAVED SEARCH RESULT MODEL (One row per id a saved search matched at its last run)
+# -----------------------------------------
+class SavedSearchResult(db.Model):
+    __tablename__ = "saved_search_results"
+
+    id = db.Column(db.Integer, primary_key=True)
+    saved_search_id = db.Column(db.Integer, db.ForeignKey("saved_searches.id"), nullable=False)
+    entity_id = db.Column(db.Integer, nullable=False)
+    is_new = db.Column(db.Boolean, default=False)  # Joined since the owner last opened the search
+    added_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.UniqueConstraint('saved_search_id', 'entity_id', name='unique_saved_search_result'),
+    )
+
+    def to_dict(self):
+        return {
+            "saved_search_id": self.saved_search_id,
+            "entity_id": self.entity_id,
+            "is_new": bool(self.is_new),
+            "added_at": self.added_at.isoformat() if self.added_at else None
+        }
+
+
+# -----------------------------------------
+# SEARCH CHANGE MODEL (Append-only log of rows saved searches may match)
+# -----------------------------------------
+class SearchChange(db.Model):
+    __tablename__ = "search_changes"
+
+    id = db.Column(db.Integer, primary_key=True)
+    entity_type = db.Column(db.String(40), nullable=False)
+    entity_id = db.Column(db.Integer, nullable=False)
+    changed_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+
+    __table_args__ = (
+        db.Index('ix_search_changes_entity_type_id', 'entity_type', 'id'),
+    )
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "entity_type": self.entity_type,
+            "entity_id": self.entity_id,
+            "changed_at": self.changed_at.isoformat() if self.changed_at else None
+        }
+
+
+# -----------------------------------------
+# REFERRAL LSH BUCKET MODEL (MinHash band buckets for near-duplicate referrals)
+# -----------------------------------------
+class ReferralLshBucket(db.Model):
+    __tablename__ = "referral_lsh_buckets"
+
+    id = db.Column(db.Integer, primary_key=True)
+    referral_id = db.Column(db.Integer, nullable=False, index=True)  # No FK: rows are removed after the referral
+    field = db.Column(db.String(20), nullable=False)  # startup_name, startup_email
+    band = db.Column(db.SmallInteger, nullable=False)
+    bucket = db.Column(db.BigInteger, nullable=False)  # Hash of the band's MinHash rows
+
+    __table_args__ = (
+        db.Index('ix_referral_lsh_lookup', 'field', 'band', 'bucket'),
+    )
+
+    def to_dict(self):
+        return {
+            "referral_id": self.referral_id,
+            "field": self.field,
+            "band": self.band,
+            "bucket": self.bucket
+        }
+
+
+# -----------------------------------------
+# MATCH MATRIX CHANGE MODEL (Queue of corporates/startups whose matches need rescoring)
+# -----------------------------------------
+class MatchMatrixChange(db.Model):
+    __tablename__ = "match_matrix_changes"
+
+    id = db.Column(db.Integer, primary_key=True)
+    entity_type = db.Column(db.String(20), nullable=False)  # corporate (users.id), startup
+    entity_id = db.Column(db.Integer, nullable=False)
+    changed_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "entity_type": self.entity_type,
+            "entity_id": self.entity_id,
+            "changed_at": self.changed_at.isoformat() if self.changed_at else None
+        }
+
+
+# -----------------------------------------
+# STARTUP SIMILARITY MODEL (Precomputed TF-IDF nearest neighbours)
+# -----------------------------------------
+class StartupSimilarity(db.Model):
+    __tablename__ = "startup_similarities"
+
+    id = db.Column(db.Integer, primary_key=True)
+    startup_id = db.Column(db.Integer, nullable=False)  # No FKs: rebuilt offline, deleted startups are dropped on the next run
+    similar_startup_id = db.Column(db.Integer, nullable=False)
+    score = db.Column(db.Float, nullable=False)  # Cosine similarity, 0-1
+    rank = db.Column(db.SmallInteger, nullable=False)  # 1 = most similar
+    computed_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.UniqueConstraint('startup_id', 'rank', name='unique_startup_similarity_rank'),
+    )
+
+    def to_dict(self):
+        return {
+            "startup_id": self.startup_id,
+            "similar_startup_id": self.similar_startup_id,
+            "score": self.score,
+            "rank": self.rank,
+            "computed_at": self.computed_at.isoformat() if self.computed_at else None
+        }
+
+
+# -----------------------------------------
+# STARTUP SIMILARITY STATE MODEL (Text fingerprint each neighbour list was computed from)
+# -----------------------------------------
+class StartupSimilarityState(db.Model):
+    __tablename__ = "startup_similarity_state"
+
+    startup_id = db.Column(db.Integer, primary_key=True)
+    text_hash = db.Column(db.String(32), nullable=False)
+    computed_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def to_dict(self):
+        return {
+            "startup_id": self.startup_id,
+            "text_hash": self.text_hash,
+            "computed_at": self.computed_at.isoformat() if self.computed_at else None
+        }
+
+
+# -----------------------------------------
+# MESSAGE THREAD MODEL (Per-participant conversation summary for the inbox)
+# -----------------------------------------
+class MessageThread(db.Model):
+    __tablename__ = "message_threads"
+
+    id = db.Column(db.Integer, primary_key=True)
+    thread_id = db.Column(db.String(100), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)  # Participant this row summarizes for
+    other_user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
+
+    # Latest message visible to user_id (not deleted on their side)
+    last_message_id = db.Column(db.Integer)  # No FK: message rows may be hard-deleted first
+    last_message_at = db.Column(db.DateTime)
+
+    message_count = db.Column(db.Integer, default=0)  # Visible to user_id
+    unread_count = db.Column(db.Integer, default=0)  # Received by user_id, unread
+
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (
+        db.UniqueConstraint('thread_id', 'user_id', name='unique_message_thread_participant'),
+        db.Index('ix_message_threads_user_last', 'user_id', 'last_message_at'),
+    )
+
+    def to_dict(self):
+        return {
+            "thread_id": self.thread_id,
+            "user_id": self.user_id,
+            "other_user_id": self.other_user_id,
+            "last_message_id": self.last_message_id,
+            "last_message_at": self.last_message_at.isoformat() if self.last_message_at else None,
+            "message_count": self.message_count,
+            "unread_count": self.unread_count
+        }
+
+
+# -----------------------------------------
+# USER COUNTER MODEL (Denormalized unread badges, one row per user)
+# -----------------------------------------
+class UserCounter(db.Model):
+    __tablename__ = "user_counters"
+
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id"), primary_key=True)
+
+    unread_messages = db.Column(db.Integer, nullable=False, default=0)  # Received, unread, not deleted by the recipient
+    unread_notifications = db.Column(db.Integer, nullable=False, default=0)
+
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def to_dict(self):
+        return {
+            "user_id": self.user_id,
+            "unread_messages": self.unread_messages,
+            "unread_notifications": self.unread_notifications,
+            "updated_at": self.updated_at.isoformat() if self.updated_at else None
+        }
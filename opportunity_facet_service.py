@@ -0,0 +1,218 @@
+"""
+Opportunity Facet Service
+In-process faceted search over published opportunities
+
+Published opportunities are loaded once into column arrays (newest first) and
+one boolean membership matrix per facet (facet value x opportunity). A request
+turns each active filter into a row mask; every facet's counts are then a
+single vectorized pass over its matrix, masked by all the *other* active
+filters. Each count is therefore the number of results the listing would have
+with that value selected, which is what the filter dropdowns display.
+
+The index is rebuilt lazily after Opportunity writes commit through the ORM,
+and at least every FACET_REBUILD_INTERVAL seconds to catch bulk edits.
+"""
+
+import json
+import threading
+import time
+
+import numpy as np
+from sqlalchemy import or_
+
+from extensions import db
+from models import Opportunity
+from search_index_service import SearchIndexService
+from session_hooks import SessionHooks
+
+
+# facet -> Opportunity column (JSON list columns are multi-valued)
+FACET_FIELDS = {
+    'sector': ('sectors', True),
+    'stage': ('target_stages', True),
+    'country': ('countries', True),
+    'type': ('type', False),
+}
+
+# Values returned per facet, highest count first
+FACET_MAX_VALUES = 50
+
+FACET_REBUILD_INTERVAL = 300
+
+_index = {'built_at': None}
+_lock = threading.Lock()
+
+
+class OpportunityFacetService:
+    """Service for faceted listing of published opportunities"""
+
+    @staticmethod
+    def search(filters=None, query=None, owner_id=None, page=1, per_page=12):
+        """
+        Filter published opportunities and count every facet in the same pass
+
+        Args:
+            filters: {facet: value} for any of sector, stage, country, type
+            query: Optional free-text search (title, description, benefits)
+            owner_id: Only opportunities created by this user
+            page: 1-based page number
+            per_page: Page size
+
+        Returns:
+            dict: ids (the page, newest first), total and facets
+                  ({facet: [{value, label, count, selected}]})
+        """
+        index = OpportunityFacetService._get_index()
+        size = len(index['ids'])
+        filters = {
+            facet: OpportunityFacetService._normalize(value)
+            for facet, value in (filters or {}).items()
+            if facet in FACET_FIELDS and value
+        }
+
+        # One row mask per active filter
+        masks = {}
+        for facet, value in filters.items():
+            row = index['positions'][facet].get(value)
+            masks[facet] = index['matrix'][facet][row] if row is not None else np.zeros(size, dtype=bool)
+        if owner_id is not None:
+            masks['owner'] = index['owners'] == owner_id
+        if query:
+            masks['query'] = np.isin(index['ids'], OpportunityFacetService._text_matches(query, index['ids']))
+
+        everything = np.ones(size, dtype=bool)
+        selected = np.logical_and.reduce(list(masks.values())) if masks else everything
+
+        facets = {}
+        for facet in FACET_FIELDS:
+            others = [mask for name, mask in masks.items() if name != facet]
+            scope = np.logical_and.reduce(others) if others else everything
+            counts = np.count_nonzero(index['matrix'][facet] & scope, axis=1)
+
+            chosen = filters.get(facet)
+            order = np.lexsort((index['labels_lower'][facet], -counts))
+            values = []
+            for row in order:
+                value = index['values'][facet][row]
+                if counts[row] == 0 and value != chosen:
+                    continue
+                values.append({
+                    "value": value,
+                    "label": index['labels'][facet][row],
+                    "count": int(counts[row]),
+                    "selected": value == chosen
+                })
+                if len(values) >= FACET_MAX_VALUES:
+                    break
+            facets[facet] = values
+
+        positions = np.flatnonzero(selected)
+        start = (page - 1) * per_page
+        return {
+            "ids": index['ids'][positions[start:start + per_page]].tolist(),
+            "total": int(len(positions)),
+            "facets": facets
+        }
+
+    @staticmethod
+    def _text_matches(query, ids):
+        """Ids of published opportunities matching the text"""
+        if SearchIndexService.can_search(query):
+            return [row[0] for row in db.session.execute(SearchIndexService.match_ids('program', query))]
+
+        search_term = f"%{query}%"
+        return [
+            row.id for row in db.session.query(Opportunity.id).filter(
+                Opportunity.status == "published",
+                or_(
+                    Opportunity.title.ilike(search_term),
+                    Opportunity.description.ilike(search_term),
+                    Opportunity.benefits.ilike(search_term)
+                )
+            )
+        ]
+
+    @staticmethod
+    def _normalize(value):
+        return str(value).strip().lower()
+
+    # ==========================================
+    # INDEX
+    # ==========================================
+
+    @staticmethod
+    def rebuild():
+        """Reload the facet index from published opportunities"""
+        columns = [getattr(Opportunity, field) for field, _ in FACET_FIELDS.values()]
+        rows = db.session.query(Opportunity.id, Opportunity.owner_id, *columns).filter(
+            Opportunity.status == "published"
+        ).order_by(Opportunity.created_at.desc(), Opportunity.id.desc()).all()
+
+        index = {
+            'ids': np.array([row[0] for row in rows], dtype=np.int64),
+            'owners': np.array([row[1] or 0 for row in rows], dtype=np.int64),
+            'values': {}, 'labels': {}, 'labels_lower': {}, 'positions': {}, 'matrix': {},
+            'built_at': time.monotonic()
+        }
+
+        for offset, (facet, (_, multi)) in enumerate(FACET_FIELDS.items()):
+            positions, labels, cells = {}, [], []
+            for column, row in enumerate(rows):
+                raw = row[2 + offset]
+                for label in OpportunityFacetService._field_values(raw, multi):
+                    value = OpportunityFacetService._normalize(label)
+                    if not value:
+                        continue
+                    if value not in positions:
+                        positions[value] = len(labels)
+                        labels.append(str(label).strip())
+                    cells.append((positions[value], column))
+
+            matrix = np.zeros((len(labels), len(rows)), dtype=bool)
+            if cells:
+                value_rows, value_columns = zip(*cells)
+                matrix[list(value_rows), list(value_columns)] = True
+
+            index['positions'][facet] = positions
+            index['values'][facet] = list(positions)
+            index['labels'][facet] = labels
+            index['labels_lower'][facet] = np.array([label.lower() for label in labels], dtype=str)
+            index['matrix'][facet] = matrix
+
+        with _lock:
+            _index.clear()
+            _index.update(index)
+
+        return len(rows)
+
+    @staticmethod
+    def _get_index():
+        with _lock:
+            built_at = _index['built_at']
+            index = dict(_index)
+        if SessionHooks.is_stale(built_at, FACET_REBUILD_INTERVAL):
+            OpportunityFacetService.rebuild()
+            with _lock:
+                index = dict(_index)
+        return index
+
+    @staticmethod
+    def _field_values(raw, multi):
+        if not raw:
+            return []
+        if not multi:
+            return [raw]
+        try:
+            values = json.loads(raw)
+        except (TypeError, ValueError):
+            return []
+        return values if isinstance(values, list) else [values]
+
+    @staticmethod
+    def _invalidate():
+        """Drop the index; the next read rebuilds it"""
+        with _lock:
+            _index['built_at'] = None
+
+
+SessionHooks.invalidate_on_commit('opportunity_facets', [Opportunity], OpportunityFacetService._invalidate)
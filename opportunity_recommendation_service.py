@@ -0,0 +1,235 @@
+"""
+Opportunity Recommendation Service
+Ranks published, open opportunities for a startup by eligibility fit and urgency
+
+The catalogue (published opportunities whose deadline has not passed) is
+loaded into one boolean membership matrix per eligibility facet (value x
+opportunity) plus a deadline array. A startup's ranking is then a few
+vectorized passes:
+
+    sector   40 if any of its sectors is targeted, 20 if the opportunity is open to all sectors
+    stage    30 if its stage is targeted, 15 if open to all stages
+    country  20 if its country is targeted, 10 if open to all countries
+    urgency  up to 10 as the deadline approaches (last RECOMMENDATION_URGENCY_DAYS days)
+
+Each startup's ranking is cached until its sectors/stage/country change or the
+catalogue is rebuilt: after any committed Opportunity write, and at least
+every RECOMMENDATION_REBUILD_INTERVAL seconds so urgency and expiry stay fresh.
+"""
+
+import json
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+from sqlalchemy import inspect, or_
+
+from extensions import db
+from models import Opportunity, Startup
+from session_hooks import SessionHooks
+
+
+# facet -> (Opportunity JSON list column, Startup column, is the startup column a JSON list)
+RECOMMENDATION_FACETS = {
+    'sector': ('sectors', 'sectors', True),
+    'stage': ('target_stages', 'stage', False),
+    'country': ('countries', 'country', False),
+}
+
+RECOMMENDATION_WEIGHTS = {
+    'sector': 40.0,
+    'stage': 30.0,
+    'country': 20.0,
+    'urgency': 10.0,
+}
+
+# Share of a facet's weight earned when the opportunity does not restrict it
+RECOMMENDATION_OPEN_SHARE = 0.5
+
+# Deadlines closer than this add urgency
+RECOMMENDATION_URGENCY_DAYS = 30
+
+# Ranked opportunities cached per startup
+RECOMMENDATION_CACHE_SIZE = 50
+
+# Catalogue reload at least this often, so urgency and expiry stay fresh
+RECOMMENDATION_REBUILD_INTERVAL = 3600
+
+_index = {'built_at': None, 'version': 0}
+_cache = {}
+_lock = threading.Lock()
+
+
+class OpportunityRecommendationService:
+    """Service for per-startup opportunity recommendations"""
+
+    @staticmethod
+    def recommend(startup, limit=10, exclude_ids=None):
+        """
+        Best open opportunities for a startup
+
+        Args:
+            startup: Startup (sectors, stage and country are used)
+            limit: Max opportunities
+            exclude_ids: Opportunity IDs to skip, e.g. already applied to
+
+        Returns:
+            list: (opportunity_id, score) pairs, best first
+        """
+        index = OpportunityRecommendationService._get_index()
+        exclude_ids = set(exclude_ids or ())
+
+        with _lock:
+            cached = _cache.get(startup.id)
+        if cached is None or cached[0] != index['version']:
+            ranking = OpportunityRecommendationService.rank(startup, index)
+            cached = (index['version'], ranking)
+            with _lock:
+                _cache[startup.id] = cached
+
+        # Deadlines may pass while a ranking is cached
+        now = time.time()
+        results = []
+        for opportunity_id, score, deadline in cached[1]:
+            if opportunity_id in exclude_ids or deadline < now:
+                continue
+            results.append((opportunity_id, score))
+            if len(results) >= limit:
+                break
+        return results
+
+    @staticmethod
+    def rank(startup, index=None):
+        """
+        Score every catalogue opportunity for a startup
+
+        Returns:
+            list: (opportunity_id, score, deadline timestamp) for the best
+                  RECOMMENDATION_CACHE_SIZE, by score, then sooner deadline, then newest
+        """
+        index = index or OpportunityRecommendationService._get_index()
+        size = len(index['ids'])
+        if not size:
+            return []
+
+        scores = np.zeros(size)
+        for facet, (_, startup_field, multi) in RECOMMENDATION_FACETS.items():
+            weight = RECOMMENDATION_WEIGHTS[facet]
+            positions = index['positions'][facet]
+            values = OpportunityRecommendationService._values(getattr(startup, startup_field), multi)
+            rows = [positions[value] for value in values if value in positions]
+            matched = index['matrix'][facet][rows].any(axis=0) if rows else np.zeros(size, dtype=bool)
+            scores += np.where(matched, weight, np.where(index['open'][facet], weight * RECOMMENDATION_OPEN_SHARE, 0.0))
+
+        days_left = (index['deadlines'] - time.time()) / 86400.0
+        urgency = np.clip(1.0 - days_left / RECOMMENDATION_URGENCY_DAYS, 0.0, 1.0)
+        scores += RECOMMENDATION_WEIGHTS['urgency'] * np.where(np.isfinite(days_left), urgency, 0.0)
+
+        order = np.lexsort((-index['ids'], index['deadlines'], -scores))[:RECOMMENDATION_CACHE_SIZE]
+        return [
+            (int(index['ids'][position]), round(float(scores[position]), 1), float(index['deadlines'][position]))
+            for position in order
+        ]
+
+    @staticmethod
+    def _values(raw, multi):
+        """Normalized facet values of a column (JSON list or scalar)"""
+        if not raw:
+            return []
+        if multi:
+            try:
+                raw = json.loads(raw) if isinstance(raw, str) else raw
+            except ValueError:
+                return []
+            if not isinstance(raw, list):
+                raw = [raw]
+        else:
+            raw = [raw]
+        return [str(value).strip().lower() for value in raw if value and str(value).strip()]
+
+    # ==========================================
+    # CATALOGUE
+    # ==========================================
+
+    @staticmethod
+    def rebuild():
+        """Reload the catalogue of published, unexpired opportunities"""
+        columns = [getattr(Opportunity, column) for column, _, _ in RECOMMENDATION_FACETS.values()]
+        rows = db.session.query(Opportunity.id, Opportunity.deadline, *columns).filter(
+            Opportunity.status == "published",
+            or_(Opportunity.deadline.is_(None), Opportunity.deadline >= datetime.utcnow())
+        ).order_by(Opportunity.id).all()
+
+        index = {
+            'ids': np.array([row[0] for row in rows], dtype=np.int64),
+            # Deadlines are stored as naive UTC
+            'deadlines': np.array([
+                (row[1] - datetime(1970, 1, 1)).total_seconds() if row[1] else np.inf for row in rows
+            ], dtype=float),
+            'positions': {}, 'matrix': {}, 'open': {},
+            'built_at': time.monotonic()
+        }
+
+        for offset, facet in enumerate(RECOMMENDATION_FACETS):
+            positions, cells = {}, []
+            for column, row in enumerate(rows):
+                for value in OpportunityRecommendationService._values(row[2 + offset], True):
+                    cells.append((positions.setdefault(value, len(positions)), column))
+
+            matrix = np.zeros((len(positions), len(rows)), dtype=bool)
+            if cells:
+                value_rows, value_columns = zip(*cells)
+                matrix[list(value_rows), list(value_columns)] = True
+
+            index['positions'][facet] = positions
+            index['matrix'][facet] = matrix
+            index['open'][facet] = ~matrix.any(axis=0)
+
+        with _lock:
+            index['version'] = _index['version'] + 1
+            _index.clear()
+            _index.update(index)
+            _cache.clear()
+
+        return len(rows)
+
+    @staticmethod
+    def _get_index():
+        with _lock:
+            built_at = _index['built_at']
+            index = dict(_index)
+        if SessionHooks.is_stale(built_at, RECOMMENDATION_REBUILD_INTERVAL):
+            OpportunityRecommendationService.rebuild()
+            with _lock:
+                index = dict(_index)
+        return index
+
+    @staticmethod
+    def _collect(session, pending):
+        """Note catalogue writes and startups whose eligibility profile changed"""
+        fields = [field for _, field, _ in RECOMMENDATION_FACETS.values()]
+
+        for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+            if isinstance(obj, Opportunity):
+                pending.add('catalogue')
+            elif isinstance(obj, Startup) and (
+                obj in session.new or obj in session.deleted
+                or any(inspect(obj).attrs[field].history.has_changes() for field in fields)
+            ):
+                pending.add(obj.id)
+
+    @staticmethod
+    def _apply(pending):
+        """Drop the catalogue and/or the rankings of committed startups"""
+        with _lock:
+            if 'catalogue' in pending:
+                _index['built_at'] = None
+            for startup_id in pending - {'catalogue'}:
+                _cache.pop(startup_id, None)
+
+
+SessionHooks.on_commit(
+    'opportunity_recommendations', [Opportunity, Startup],
+    OpportunityRecommendationService._collect, OpportunityRecommendationService._apply, pending=set
+)
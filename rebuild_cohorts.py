@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+"""
+Rebuild or catch up weekly cohort retention
+
+Usage:
+  python rebuild_cohorts.py                  # drop and backfill from raw tables
+  python rebuild_cohorts.py --incremental    # only fold rows above the watermarks (cron)
+"""
+
+import sys
+
+from app import create_app
+from extensions import db
+from cohort_service import CohortService
+
+
+def main():
+    incremental = '--incremental' in sys.argv[1:]
+
+    app = create_app()
+
+    with app.app_context():
+        # Ensure cohort tables exist
+        db.create_all()
+
+        if incremental:
+            print("🔄 Catching up cohorts...")
+            processed = CohortService.run_incremental()
+        else:
+            print("🔧 Rebuilding cohorts from raw tables...")
+            processed = CohortService.rebuild()
+
+        for source, count in processed.items():
+            print(f"✅ {source}: {count} rows processed")
+
+    return True
+
+
+if __name__ == "__main__":
+    main()
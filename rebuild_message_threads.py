@@ -0,0 +1,35 @@
+#!/usr/bin/env python3
+"""
+Backfill or repair the message_threads inbox summaries from messages
+
+Summaries are maintained on every message write; run this once after
+deploying the table, or to repair rows after bulk edits made outside the ORM.
+
+Usage:
+  python rebuild_message_threads.py
+"""
+
+import sys
+import time
+
+from app import create_app
+from extensions import db
+from message_thread_service import MessageThreadService
+
+
+def main():
+    app = create_app()
+
+    with app.app_context():
+        db.create_all()
+
+        print("🔧 Rebuilding message thread summaries...")
+        started = time.perf_counter()
+        threads = MessageThreadService.rebuild()
+        print(f"✅ {threads} threads summarized in {time.perf_counter() - started:.1f}s")
+
+    return True
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""
+Rebuild or catch up metric rollups
+
+Usage:
+  python rebuild_rollups.py                  # drop and backfill all sources
+  python rebuild_rollups.py messages         # drop and backfill one source
+  python rebuild_rollups.py --incremental    # only fold rows above the watermark (cron)
+"""
+
+import sys
+
+from app import create_app
+from extensions import db
+from rollup_service import RollupService, ROLLUP_SOURCES
+
+
+def main():
+    args = sys.argv[1:]
+    incremental = '--incremental' in args
+    sources = [arg for arg in args if not arg.startswith('--')] or list(ROLLUP_SOURCES)
+
+    unknown = [source for source in sources if source not in ROLLUP_SOURCES]
+    if unknown:
+        print(f"❌ Unknown source(s): {', '.join(unknown)}")
+        print(f"   Valid sources: {', '.join(ROLLUP_SOURCES)}")
+        return False
+
+    app = create_app()
+
+    with app.app_context():
+        # Ensure rollup tables exist
+        db.create_all()
+
+        if incremental:
+            print("🔄 Catching up rollups...")
+            processed = RollupService.run_incremental(sources)
+        else:
+            print("🔧 Rebuilding rollups from raw tables...")
+            processed = RollupService.rebuild(sources)
+
+        for source, count in processed.items():
+            print(f"✅ {source}: {count} rows aggregated")
+
+    return True
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+"""
+Rebuild the full-text search indexes (SQLite FTS5 / Postgres tsvector + GIN)
+
+Covers admin search (users, programs, meetings, leads, referrals) and messages.
+
+Run once after deploying, and again after bulk edits made outside the ORM.
+
+Usage:
+  python rebuild_search_index.py
+"""
+
+import time
+
+from app import create_app
+from search_index_service import SearchIndexService
+from message_search_service import MessageSearchService
+
+
+def main():
+    app = create_app()
+
+    with app.app_context():
+        print("🔧 Rebuilding search indexes...")
+        started = time.perf_counter()
+
+        counts = SearchIndexService.rebuild()
+
+        for entity_type, count in counts.items():
+            print(f"✅ {entity_type}: {count} documents")
+        print(f"✅ messages: {MessageSearchService.rebuild()} documents")
+        print(f"⏱️  Done in {time.perf_counter() - started:.1f}s")
+
+    return True
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Rebuild unique-visitor HyperLogLog sketches from raw clicks and profile views
+
+Streams referral_clicks and profile_view analytics events in order and writes
+one sketch per (entity, day). Safe to re-run: existing sketches are replaced.
+"""
+
+import json
+
+from app import create_app
+from extensions import db
+from models import AnalyticsEvent, ReferralClick, VisitorSketch
+from export_service import ExportService
+from visitor_sketch_service import VisitorSketchService
+
+
+FLUSH_EVERY = 500
+
+
+def rebuild(entity_type, rows):
+    """Fold (entity_id, timestamp, visitor_key) rows, ordered by entity then time"""
+    VisitorSketch.query.filter_by(entity_type=entity_type).delete(synchronize_session=False)
+
+    current, keys, sketches = None, [], 0
+    for entity_id, ts, visitor_key in rows:
+        if ts is None:
+            continue
+        group = (entity_id, ts.date())
+        if group != current:
+            if current:
+                VisitorSketchService.record_visits(entity_type, current[0], current[1], keys)
+                sketches += 1
+                if sketches % FLUSH_EVERY == 0:
+                    # Keep the identity map small without closing the streaming cursor
+                    db.session.flush()
+                    db.session.expunge_all()
+            current, keys = group, []
+        keys.append(visitor_key)
+
+    if current:
+        VisitorSketchService.record_visits(entity_type, current[0], current[1], keys)
+        sketches += 1
+
+    db.session.commit()
+    return sketches
+
+
+def click_rows():
+    query = db.session.query(
+        ReferralClick.referral_id, ReferralClick.clicked_at,
+        ReferralClick.user_id, ReferralClick.ip_address, ReferralClick.user_agent
+    ).order_by(ReferralClick.referral_id, ReferralClick.clicked_at)
+    for referral_id, clicked_at, user_id, ip_address, user_agent in ExportService.iter_rows(query):
+        yield referral_id, clicked_at, VisitorSketchService.visitor_key(user_id, ip_address, user_agent)
+
+
+def profile_view_rows():
+    query = db.session.query(
+        AnalyticsEvent.startup_id, AnalyticsEvent.created_at,
+        AnalyticsEvent.user_id, AnalyticsEvent.event_metadata
+    ).filter(
+        AnalyticsEvent.event_type == 'profile_view',
+        AnalyticsEvent.startup_id.isnot(None)
+    ).order_by(AnalyticsEvent.startup_id, AnalyticsEvent.created_at)
+    for startup_id, created_at, user_id, metadata in ExportService.iter_rows(query):
+        try:
+            metadata = json.loads(metadata or '{}')
+        except ValueError:
+            metadata = {}
+        yield startup_id, created_at, VisitorSketchService.visitor_key(
+            user_id, metadata.get('ip_address'), metadata.get('user_agent')
+        )
+
+
+if __name__ == "__main__":
+    app = create_app()
+
+    with app.app_context():
+        db.create_all()
+
+        print("🔧 Rebuilding visitor sketches...")
+        print(f"✅ Referral links: {rebuild('referral', click_rows())} daily sketches")
+        print(f"✅ Startup profiles: {rebuild('startup', profile_view_rows())} daily sketches")
@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+"""
+Repair drift in EnablerAnalytics / CorporateAnalytics counters
+
+The counters are maintained by atomic upserts at each event site; this job
+recomputes them from the raw tables for recent days.
+
+Usage:
+  python reconcile_analytics_counters.py          # today and yesterday
+  python reconcile_analytics_counters.py 30       # the last 30 days
+"""
+
+import sys
+from datetime import datetime, timedelta
+
+from app import create_app
+from corporate_service import CorporateService
+from enabler_service import EnablerService
+
+
+def main():
+    days = int(sys.argv[1]) if len(sys.argv) > 1 else 2
+
+    app = create_app()
+
+    with app.app_context():
+        today = datetime.utcnow().date()
+        print(f"🔧 Reconciling analytics counters for the last {days} day(s)...")
+
+        for offset in range(days):
+            day = today - timedelta(days=offset)
+
+            enabler = EnablerService.reconcile_daily_analytics(day)
+            corporate = CorporateService.reconcile_daily_analytics(day)
+
+            if enabler["success"] and corporate["success"]:
+                print(f"✅ {day}: {enabler['rows']} enabler rows, {corporate['rows']} corporate rows")
+            else:
+                error = enabler.get("message") or corporate.get("error")
+                print(f"❌ {day}: {error}")
+                return False
+
+    return True
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
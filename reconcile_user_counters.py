@@ -0,0 +1,36 @@
+#!/usr/bin/env python3
+"""
+Backfill or reconcile the user_counters unread badges
+
+Counters are maintained on every message/notification write; run this once
+after deploying the table, and regularly to correct bulk edits made outside
+the ORM.
+
+Usage:
+  python reconcile_user_counters.py    # backfill, then cron (hourly)
+"""
+
+import sys
+import time
+
+from app import create_app
+from extensions import db
+from user_counter_service import UserCounterService
+
+
+def main():
+    app = create_app()
+
+    with app.app_context():
+        db.create_all()
+
+        print("🔧 Reconciling user unread counters...")
+        started = time.perf_counter()
+        users = UserCounterService.reconcile()
+        print(f"✅ {users} user counters written in {time.perf_counter() - started:.1f}s")
+
+    return True
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,405 @@
+"""
+Referral Dedup Service
+Near-duplicate referral detection with MinHash + LSH
+
+Each referral's startup name and email are normalized, split into character
+shingles and reduced to a MinHash signature. Signatures are cut into LSH
+bands; every band hash is stored in referral_lsh_buckets, so two referrals
+become candidates only if they share a bucket. Candidates are confirmed with
+the exact shingle Jaccard similarity.
+
+With MINHASH_PERMUTATIONS=64 split into LSH_BANDS=16 bands of 4 rows, pairs
+above ~0.5 Jaccard are very likely to collide in at least one band, well under
+the DUPLICATE_THRESHOLD used for confirmation.
+
+Buckets are written by an ORM after_flush hook as referrals are created or
+edited. Bulk inserts that bypass the ORM need `python find_duplicate_referrals.py --rebuild`.
+"""
+
+import hashlib
+import re
+import unicodedata
+import zlib
+
+import numpy as np
+from sqlalchemy import and_, func, inspect
+from sqlalchemy.orm import aliased
+
+from export_service import ExportService
+from extensions import db
+from models import Referral, ReferralLshBucket
+from session_hooks import SessionHooks
+
+
+DEDUP_FIELDS = ('startup_name', 'startup_email')
+
+MINHASH_PERMUTATIONS = 64
+LSH_BANDS = 16
+LSH_ROWS = MINHASH_PERMUTATIONS // LSH_BANDS
+
+SHINGLE_SIZE = 3
+
+# Confirmed near-duplicate: shingle Jaccard similarity at or above this
+DUPLICATE_THRESHOLD = 0.7
+
+# Legal-form words that say nothing about which company it is
+NAME_STOPWORDS = {'inc', 'ltd', 'llc', 'llp', 'pvt', 'private', 'limited', 'corp', 'co', 'the', 'gmbh'}
+
+# Rows per insert during rebuilds; ids per IN (...) when loading referrals
+DEDUP_BATCH_SIZE = 2000
+
+# Fixed seed: signatures are persisted, so the permutations must never change
+_MERSENNE_PRIME = np.uint64(4294967311)
+_random = np.random.RandomState(7919)
+_PERM_A = _random.randint(1, 2 ** 32, size=MINHASH_PERMUTATIONS, dtype=np.uint64)
+_PERM_B = _random.randint(0, 2 ** 32, size=MINHASH_PERMUTATIONS, dtype=np.uint64)
+
+_NON_WORD = re.compile(r'[^a-z0-9]+')
+
+
+class ReferralDedupService:
+    """Service for finding near-duplicate referral submissions"""
+
+    # ==========================================
+    # SIGNATURES
+    # ==========================================
+
+    @staticmethod
+    def normalize(field, value):
+        """Canonical text compared for a field ('' when there is nothing to compare)"""
+        if not value:
+            return ''
+        value = unicodedata.normalize('NFKD', str(value))
+        value = ''.join(ch for ch in value if not unicodedata.combining(ch)).lower().strip()
+
+        if field == 'startup_email':
+            local, _, domain = value.partition('@')
+            # name+tag@x and name@x reach the same inbox
+            return f"{local.split('+', 1)[0]}@{domain}" if domain else local
+
+        words = [word for word in _NON_WORD.split(value) if word and word not in NAME_STOPWORDS]
+        return ' '.join(words)
+
+    @staticmethod
+    def shingles(text):
+        """Character shingles of a normalized value"""
+        if not text:
+            return set()
+        padded = f" {text} "
+        if len(padded) <= SHINGLE_SIZE:
+            return {padded}
+        return {padded[i:i + SHINGLE_SIZE] for i in range(len(padded) - SHINGLE_SIZE + 1)}
+
+    @staticmethod
+    def signature(shingles):
+        """MinHash signature: the minimum of each permutation over the shingle hashes"""
+        hashes = np.array([zlib.crc32(s.encode('utf-8')) for s in shingles], dtype=np.uint64)
+        # a, b and the hashes are all < 2^32, so a * h + b cannot overflow uint64
+        return ((_PERM_A[:, None] * hashes[None, :] + _PERM_B[:, None]) % _MERSENNE_PRIME).min(axis=1)
+
+    @staticmethod
+    def band_buckets(signature):
+        """One signed 64-bit bucket hash per LSH band"""
+        return [
+            int.from_bytes(
+                hashlib.blake2b(signature[band * LSH_ROWS:(band + 1) * LSH_ROWS].tobytes(), digest_size=8).digest(),
+                'big', signed=True
+            )
+            for band in range(LSH_BANDS)
+        ]
+
+    @staticmethod
+    def similarity(a, b):
+        """Exact Jaccard similarity of two shingle sets"""
+        if not a or not b:
+            return 0.0
+        return len(a & b) / len(a | b)
+
+    @staticmethod
+    def group_similar(values, field='startup_name', threshold=DUPLICATE_THRESHOLD):
+        """
+        Group near-duplicate values in memory (no database)
+
+        Args:
+            values: Raw values, e.g. one enabler's startup names
+            field: Field the values come from (controls normalization)
+            threshold: Minimum shingle Jaccard similarity
+
+        Returns:
+            list: Groups (lists of the original values) with 2+ members
+        """
+        shingle_sets = [ReferralDedupService.shingles(ReferralDedupService.normalize(field, v)) for v in values]
+
+        buckets = {}
+        for position, shingle_set in enumerate(shingle_sets):
+            if not shingle_set:
+                continue
+            signature = ReferralDedupService.signature(shingle_set)
+            for band, bucket in enumerate(ReferralDedupService.band_buckets(signature)):
+                buckets.setdefault((band, bucket), []).append(position)
+
+        pairs = ReferralDedupService._bucket_pairs(buckets.values())
+        parents = ReferralDedupService._cluster(
+            (a, b) for a, b in pairs
+            if ReferralDedupService.similarity(shingle_sets[a], shingle_sets[b]) >= threshold
+        )
+
+        groups = {}
+        for position in parents:
+            groups.setdefault(ReferralDedupService._find(parents, position), []).append(values[position])
+        return [group for group in groups.values() if len(group) > 1]
+
+    # ==========================================
+    # PLATFORM-WIDE REPORT
+    # ==========================================
+
+    @staticmethod
+    def duplicate_report(threshold=DUPLICATE_THRESHOLD, cross_enabler_only=False, limit=100):
+        """
+        Clusters of near-duplicate referrals across all enablers
+
+        Args:
+            threshold: Minimum shingle Jaccard similarity on name or email
+            cross_enabler_only: Only clusters spanning more than one enabler
+            limit: Max clusters returned (largest first)
+
+        Returns:
+            dict: clusters (members, enablers, matched fields) and totals
+        """
+        # Only buckets with 2+ referrals can hold a candidate pair
+        shared = db.session.query(
+            ReferralLshBucket.field, ReferralLshBucket.band, ReferralLshBucket.bucket
+        ).group_by(
+            ReferralLshBucket.field, ReferralLshBucket.band, ReferralLshBucket.bucket
+        ).having(func.count() > 1).subquery()
+
+        query = db.session.query(
+            ReferralLshBucket.field, ReferralLshBucket.band, ReferralLshBucket.bucket, ReferralLshBucket.referral_id
+        ).join(
+            shared, and_(
+                ReferralLshBucket.field == shared.c.field,
+                ReferralLshBucket.band == shared.c.band,
+                ReferralLshBucket.bucket == shared.c.bucket
+            )
+        ).order_by(
+            ReferralLshBucket.field, ReferralLshBucket.band, ReferralLshBucket.bucket, ReferralLshBucket.referral_id
+        )
+
+        groups, current, key = {}, [], None
+        for field, band, bucket, referral_id in ExportService.iter_rows(query):
+            if (field, band, bucket) != key:
+                if len(current) > 1:
+                    groups.setdefault(key[0], []).append(current)
+                key, current = (field, band, bucket), []
+            current.append(referral_id)
+        if len(current) > 1:
+            groups.setdefault(key[0], []).append(current)
+
+        candidates = {
+            field: ReferralDedupService._bucket_pairs(members) for field, members in groups.items()
+        }
+        ids = {referral_id for pairs in candidates.values() for pair in pairs for referral_id in pair}
+        referrals = ReferralDedupService._load(ids)
+
+        matched_fields = {}
+        confirmed = []
+        for field, pairs in candidates.items():
+            for a, b in pairs:
+                if a not in referrals or b not in referrals:
+                    continue
+                score = ReferralDedupService.similarity(referrals[a]['shingles'][field], referrals[b]['shingles'][field])
+                if score >= threshold:
+                    confirmed.append((a, b))
+                    for referral_id in (a, b):
+                        matched_fields.setdefault(referral_id, set()).add(field)
+
+        parents = ReferralDedupService._cluster(confirmed)
+        clusters = {}
+        for referral_id in parents:
+            clusters.setdefault(ReferralDedupService._find(parents, referral_id), []).append(referral_id)
+
+        report = []
+        for members in clusters.values():
+            enablers = sorted({referrals[referral_id]['enabler_id'] for referral_id in members})
+            if cross_enabler_only and len(enablers) < 2:
+                continue
+            report.append({
+                "size": len(members),
+                "enabler_ids": enablers,
+                "cross_enabler": len(enablers) > 1,
+                "matched_on": sorted({field for referral_id in members for field in matched_fields.get(referral_id, ())}),
+                "referrals": [referrals[referral_id]['summary'] for referral_id in sorted(members)]
+            })
+
+        report.sort(key=lambda cluster: (cluster["size"], len(cluster["enabler_ids"])), reverse=True)
+        return {
+            "threshold": threshold,
+            "total_clusters": len(report),
+            "total_referrals": sum(cluster["size"] for cluster in report),
+            "clusters": report[:limit]
+        }
+
+    @staticmethod
+    def duplicates_of_enabler(enabler_id, threshold=DUPLICATE_THRESHOLD):
+        """
+        This enabler's referrals that near-duplicate another enabler's referral
+
+        Returns:
+            list: (own referral id, other referral id, field) tuples
+        """
+        own = aliased(ReferralLshBucket)
+        other = aliased(ReferralLshBucket)
+        rows = db.session.query(own.referral_id, other.referral_id, own.field).join(
+            other, and_(
+                own.field == other.field,
+                own.band == other.band,
+                own.bucket == other.bucket,
+                own.referral_id != other.referral_id
+            )
+        ).join(
+            Referral, Referral.id == own.referral_id
+        ).filter(Referral.enabler_id == enabler_id).distinct().all()
+
+        referrals = ReferralDedupService._load({a for a, _, _ in rows} | {b for _, b, _ in rows})
+        return [
+            (a, b, field) for a, b, field in rows
+            if a in referrals and b in referrals
+            and referrals[b]['enabler_id'] != enabler_id
+            and ReferralDedupService.similarity(
+                referrals[a]['shingles'][field], referrals[b]['shingles'][field]
+            ) >= threshold
+        ]
+
+    @staticmethod
+    def _load(ids):
+        """Referral summaries and shingles, keyed by id"""
+        ids = sorted(ids)
+        loaded = {}
+        for start in range(0, len(ids), DEDUP_BATCH_SIZE):
+            for ref in db.session.query(
+                Referral.id, Referral.enabler_id, Referral.startup_name, Referral.startup_email,
+                Referral.status, Referral.created_at
+            ).filter(Referral.id.in_(ids[start:start + DEDUP_BATCH_SIZE])):
+                loaded[ref.id] = {
+                    "enabler_id": ref.enabler_id,
+                    "shingles": {
+                        field: ReferralDedupService.shingles(ReferralDedupService.normalize(field, getattr(ref, field)))
+                        for field in DEDUP_FIELDS
+                    },
+                    "summary": {
+                        "id": ref.id,
+                        "enabler_id": ref.enabler_id,
+                        "startup_name": ref.startup_name,
+                        "startup_email": ref.startup_email,
+                        "status": ref.status,
+                        "created_at": ref.created_at.isoformat() if ref.created_at else None
+                    }
+                }
+        return loaded
+
+    @staticmethod
+    def _bucket_pairs(buckets):
+        """Candidate pairs: each bucket's members paired with its first member (linear, not quadratic)"""
+        pairs = set()
+        for members in buckets:
+            first = members[0]
+            for member in members[1:]:
+                if member != first:
+                    pairs.add((min(first, member), max(first, member)))
+        return pairs
+
+    @staticmethod
+    def _cluster(pairs):
+        """Union-find over confirmed pairs; returns the parent map"""
+        parents = {}
+        for a, b in pairs:
+            parents.setdefault(a, a)
+            parents.setdefault(b, b)
+            root_a, root_b = ReferralDedupService._find(parents, a), ReferralDedupService._find(parents, b)
+            if root_a != root_b:
+                parents[max(root_a, root_b)] = min(root_a, root_b)
+        return parents
+
+    @staticmethod
+    def _find(parents, item):
+        while parents[item] != item:
+            parents[item] = parents[parents[item]]
+            item = parents[item]
+        return item
+
+    # ==========================================
+    # MAINTENANCE
+    # ==========================================
+
+    @staticmethod
+    def rebuild():
+        """
+        Recompute every referral's buckets
+
+        Returns:
+            int: Referrals indexed
+        """
+        connection = db.session.connection()
+        connection.execute(ReferralLshBucket.__table__.delete())
+
+        query = db.session.query(Referral.id, Referral.startup_name, Referral.startup_email).order_by(Referral.id)
+        batch, count = [], 0
+        for row in ExportService.iter_rows(query):
+            batch.extend(ReferralDedupService._bucket_rows(row.id, row.startup_name, row.startup_email))
+            count += 1
+            if len(batch) >= DEDUP_BATCH_SIZE:
+                connection.execute(ReferralLshBucket.__table__.insert(), batch)
+                batch = []
+        if batch:
+            connection.execute(ReferralLshBucket.__table__.insert(), batch)
+
+        db.session.commit()
+        SessionHooks.invalidate_tables(ReferralLshBucket.__tablename__)
+        return count
+
+    @staticmethod
+    def _bucket_rows(referral_id, startup_name, startup_email):
+        rows = []
+        for field, value in zip(DEDUP_FIELDS, (startup_name, startup_email)):
+            shingle_set = ReferralDedupService.shingles(ReferralDedupService.normalize(field, value))
+            if not shingle_set:
+                continue
+            signature = ReferralDedupService.signature(shingle_set)
+            rows.extend(
+                {"referral_id": referral_id, "field": field, "band": band, "bucket": bucket}
+                for band, bucket in enumerate(ReferralDedupService.band_buckets(signature))
+            )
+        return rows
+
+    @staticmethod
+    def _after_flush(session, flush_context):
+        """Bucket new referrals; re-bucket edited ones; drop deleted ones"""
+        changed = [obj for obj in session.new if isinstance(obj, Referral)]
+        changed += [
+            obj for obj in session.dirty
+            if isinstance(obj, Referral) and any(
+                inspect(obj).attrs[field].history.has_changes() for field in DEDUP_FIELDS
+            )
+        ]
+        removed = [obj.id for obj in session.deleted if isinstance(obj, Referral) and obj.id is not None]
+        if not changed and not removed:
+            return
+
+        connection = session.connection()
+        if not SessionHooks.table_ready(connection, ReferralLshBucket.__tablename__):
+            return
+
+        stale = removed + [obj.id for obj in changed if obj not in session.new]
+        if stale:
+            connection.execute(
+                ReferralLshBucket.__table__.delete().where(ReferralLshBucket.referral_id.in_(stale))
+            )
+
+        rows = []
+        for obj in changed:
+            rows.extend(ReferralDedupService._bucket_rows(obj.id, obj.startup_name, obj.startup_email))
+        if rows:
+            connection.execute(ReferralLshBucket.__table__.insert(), rows)
+
+
+SessionHooks.on_flush([Referral], ReferralDedupService._after_flush)
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+Rescore queued corporate-startup matches in startup_matches
+
+Processes the match_matrix_changes queue: changed corporate profiles get their
+row rescored, changed startups their column. --full rescores every corporate
+against every startup (initial backfill, or after bulk imports that bypassed
+the ORM).
+
+Usage:
+  python refresh_match_matrix.py          # process queued changes (cron, every minute)
+  python refresh_match_matrix.py --full   # rescore the whole matrix
+"""
+
+import sys
+import time
+
+from app import create_app
+from extensions import db
+from match_matrix_service import MatchMatrixService
+from models import StartupMatch, MatchMatrixChange
+
+
+def main():
+    full = '--full' in sys.argv[1:]
+
+    app = create_app()
+
+    with app.app_context():
+        db.create_all()
+        # create_all() does not add indexes to an existing startup_matches table
+        for index in StartupMatch.__table__.indexes:
+            index.create(db.engine, checkfirst=True)
+
+        started = time.perf_counter()
+
+        if full:
+            print("🔧 Rescoring the whole match matrix...")
+            MatchMatrixChange.query.delete(synchronize_session=False)
+            db.session.commit()
+            corporates = MatchMatrixService.rebuild()
+            print(f"✅ {corporates} corporates rescored")
+        else:
+            print(f"📥 {MatchMatrixService.pending_count()} queued changes")
+            processed = MatchMatrixService.process_changes()
+            print(f"✅ {processed['corporates']} corporate rows, {processed['startups']} startup columns, "
+                  f"{processed['rebuilds']} full rebuilds")
+
+        print(f"⏱️  {time.perf_counter() - started:.1f}s, {StartupMatch.query.count()} stored matches")
+
+    return True
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
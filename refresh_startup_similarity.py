@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+"""
+Recompute precomputed similar-startup lists (startup_similarities)
+
+Only lists affected by startups whose description/problem/solution changed
+(or that were deleted) since the last run are recomputed; --full recomputes
+every list, which also refreshes term weights for the whole population.
+
+Usage:
+  python refresh_startup_similarity.py          # incremental (cron, hourly)
+  python refresh_startup_similarity.py --full   # recompute everything (nightly)
+"""
+
+import sys
+import time
+
+from app import create_app
+from extensions import db
+from startup_similarity_service import StartupSimilarityService, SIMILAR_TOP_K
+
+
+def main():
+    full = '--full' in sys.argv[1:]
+
+    app = create_app()
+
+    with app.app_context():
+        db.create_all()
+
+        print(f"🔧 Computing top-{SIMILAR_TOP_K} similar startups ({'full' if full else 'incremental'})...")
+        started = time.perf_counter()
+        result = StartupSimilarityService.refresh(full=full)
+
+        print(f"✅ {result['recomputed']} of {result['startups']} lists recomputed "
+              f"({result['changed']} changed, {result['removed']} removed"
+              f"{', full run' if result['full'] else ''}) in {time.perf_counter() - started:.1f}s")
+
+    return True
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
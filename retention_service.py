@@ -0,0 +1,394 @@
+"""
+Retention Service
+Time-based retention and archival for append-only event tables
+
+Rows older than each table's retention (Config.RETENTION_DAYS) leave the live
+table and are appended to gzip-compressed NDJSON files, one per table and
+month, under instance/archive/<table>/.
+
+Strategies:
+  - partition: on Postgres, tables converted with partition_table() are
+    range-partitioned by month; fully expired partitions are exported and
+    then detached and dropped instead of deleted row by row.
+  - batch: everywhere else (SQLite), expired rows are exported and deleted in
+    id-ordered batches of ARCHIVE_BATCH_SIZE, one short transaction each.
+    SQLite has no partitions, and a same-file archive table would keep the
+    database growing, so rows go straight to the compressed archive files.
+
+Tables feeding user_counters (notifications) have the unread badges of the
+owners of archived rows recounted in the same transaction as the delete.
+
+Archival is at-least-once: if a run dies between writing a batch and
+committing its delete, the batch is written again on the next run, so
+restores should de-duplicate on id.
+"""
+
+from datetime import date, datetime, timedelta
+import gzip
+import os
+
+from flask import current_app
+from sqlalchemy import column, func, select, table as table_clause, text
+
+from export_service import ExportService
+from extensions import db
+from models import AnalyticsEvent, ReferralClick, SecurityLog, Notification, RollupWatermark
+from user_counter_service import UserCounterService, USER_COUNTER_SOURCES
+
+
+# table -> (model, timestamp column)
+RETENTION_TABLES = {
+    'analytics_events': (AnalyticsEvent, 'created_at'),
+    'referral_clicks': (ReferralClick, 'clicked_at'),
+    'security_logs': (SecurityLog, 'created_at'),
+    'notifications': (Notification, 'created_at'),
+}
+
+# Aggregates built from raw rows: a row is only archived once every
+# watermark reading its table has moved past it
+RETENTION_WATERMARKS = {
+    'analytics_events': ('analytics_events', 'cohort:analytics_events'),
+    'referral_clicks': ('referral_clicks',),
+}
+
+# Rows exported and deleted per transaction
+ARCHIVE_BATCH_SIZE = 2000
+
+# Future monthly partitions kept ready on Postgres
+PARTITION_MONTHS_AHEAD = 2
+
+
+class RetentionService:
+    """Service for archiving expired event rows"""
+
+    # ==========================================
+    # ARCHIVAL
+    # ==========================================
+
+    @staticmethod
+    def run(tables=None):
+        """
+        Archive expired rows from each table (run daily from cron)
+
+        Args:
+            tables: Tables to process (None = all configured)
+
+        Returns:
+            dict: Per-table strategy and rows archived
+        """
+        results = {}
+        for table in tables or RETENTION_TABLES:
+            try:
+                results[table] = RetentionService.archive_table(table)
+            except Exception as e:
+                db.session.rollback()
+                results[table] = {"success": False, "error": str(e)}
+        return results
+
+    @staticmethod
+    def archive_table(table, cutoff=None):
+        """
+        Move rows older than the table's retention into the archive
+
+        Args:
+            table: Table name (key of RETENTION_TABLES)
+            cutoff: Archive rows strictly older than this (default from config)
+
+        Returns:
+            dict: success, strategy, rows archived and partitions dropped
+        """
+        if table not in RETENTION_TABLES:
+            raise ValueError(f"Unknown retention table: {table}")
+
+        if cutoff is None:
+            days = RetentionService.retention_days(table)
+            if not days:
+                return {"success": True, "strategy": None, "archived": 0, "partitions_dropped": 0}
+            cutoff = datetime.utcnow() - timedelta(days=days)
+
+        max_id = RetentionService._safe_max_id(table)
+        dropped = 0
+        strategy = 'batch'
+
+        if RetentionService.is_partitioned(table):
+            strategy = 'partition'
+            RetentionService.ensure_partitions(table)
+            dropped = RetentionService._archive_partitions(table, cutoff, max_id)
+
+        # Leftovers: unpartitioned tables, the default partition, part-expired months
+        archived = RetentionService._archive_batches(table, cutoff, max_id)
+
+        return {"success": True, "strategy": strategy, "archived": archived, "partitions_dropped": dropped}
+
+    @staticmethod
+    def retention_days(table):
+        """Configured retention for a table in days (0/None = keep forever)"""
+        return current_app.config.get('RETENTION_DAYS', {}).get(table)
+
+    @staticmethod
+    def archive_dir():
+        """Root folder for archive files"""
+        return current_app.config.get('ARCHIVE_FOLDER') or os.path.join(current_app.instance_path, 'archive')
+
+    @staticmethod
+    def _archive_batches(table, cutoff, max_id):
+        """Export and delete expired rows in id order, one short transaction per batch"""
+        model, ts_name = RETENTION_TABLES[table]
+        columns = model.__table__.c
+        header = [col.name for col in columns]
+        ts_index = header.index(ts_name)
+
+        archived = 0
+        after_id = 0
+        while True:
+            query = select(*columns).where(
+                columns.id > after_id,
+                columns[ts_name] < cutoff
+            ).order_by(columns.id).limit(ARCHIVE_BATCH_SIZE)
+            if max_id is not None:
+                query = query.where(columns.id <= max_id)
+
+            rows = db.session.execute(query).all()
+            if not rows:
+                break
+
+            RetentionService._write_rows(table, header, ts_index, rows)
+
+            ids = [row[0] for row in rows]
+            db.session.execute(model.__table__.delete().where(columns.id.in_(ids)))
+            UserCounterService.recount(db.session.connection(), RetentionService._counted_owners(model, rows))
+            db.session.commit()
+
+            archived += len(rows)
+            after_id = ids[-1]
+
+        return archived
+
+    @staticmethod
+    def _counted_owners(model, rows):
+        """Users whose user_counters count any of these rows (raw deletes bypass the ORM hook)"""
+        source = USER_COUNTER_SOURCES.get(model)
+        if source is None:
+            return set()
+        _, owner, flags = source
+        return {
+            row._mapping[owner] for row in rows
+            if row._mapping[owner] is not None and not any(row._mapping[flag] for flag in flags)
+        }
+
+    @staticmethod
+    def _partition_owners(model, name):
+        """Users whose user_counters count any row of a partition"""
+        source = USER_COUNTER_SOURCES.get(model)
+        if source is None:
+            return set()
+        _, owner, flags = source
+        query = select(column(owner)).select_from(table_clause(name)).where(
+            column(owner).isnot(None), *[func.coalesce(column(flag), False) == False for flag in flags]
+        ).distinct()
+        return set(db.session.execute(query).scalars())
+
+    @staticmethod
+    def _write_rows(table, header, ts_index, rows):
+        """Append rows to the table's monthly archive files, durably"""
+        by_month = {}
+        for row in rows:
+            ts = row[ts_index]
+            month = ts.strftime('%Y-%m') if ts else 'undated'
+            by_month.setdefault(month, []).append(row)
+
+        folder = os.path.join(RetentionService.archive_dir(), table)
+        os.makedirs(folder, exist_ok=True)
+
+        for month, month_rows in by_month.items():
+            path = os.path.join(folder, f"{table}-{month}.ndjson.gz")
+            # Each append is a new gzip member; readers decompress them as one stream
+            with open(path, 'ab') as raw:
+                with gzip.GzipFile(fileobj=raw, mode='ab') as archive:
+                    for line in ExportService.stream_ndjson(header, month_rows):
+                        archive.write(line.encode('utf-8'))
+                raw.flush()
+                os.fsync(raw.fileno())
+
+    @staticmethod
+    def _safe_max_id(table):
+        """Highest id every aggregate has consumed (None = table has no aggregates)"""
+        sources = RETENTION_WATERMARKS.get(table)
+        if not sources:
+            return None
+
+        marks = dict(
+            db.session.query(RollupWatermark.source, RollupWatermark.last_id).filter(
+                RollupWatermark.source.in_(sources)
+            ).all()
+        )
+        # An aggregate that never ran has consumed nothing
+        return min(marks.get(source, 0) for source in sources)
+
+    # ==========================================
+    # POSTGRES PARTITIONS
+    # ==========================================
+
+    @staticmethod
+    def is_partitioned(table):
+        """Whether the table is a range-partitioned parent (Postgres only)"""
+        if db.session.get_bind().dialect.name != 'postgresql':
+            return False
+        return db.session.execute(
+            text(
+                "SELECT 1 FROM pg_partitioned_table pt "
+                "JOIN pg_class c ON c.oid = pt.partrelid "
+                "WHERE c.relname = :table AND c.relnamespace = 'public'::regnamespace"
+            ),
+            {"table": table}
+        ).first() is not None
+
+    @staticmethod
+    def partition_table(table):
+        """
+        Convert a table to monthly range partitions (one-off, maintenance window)
+
+        Rows are copied into the new parent in a single transaction, so run
+        this while writes are paused. Existing sequences and ORM indexes are kept.
+
+        Args:
+            table: Table name (key of RETENTION_TABLES)
+
+        Returns:
+            dict: success and partitions created
+        """
+        if db.session.get_bind().dialect.name != 'postgresql':
+            return {"success": False, "error": "Partitioning requires Postgres"}
+        if RetentionService.is_partitioned(table):
+            return {"success": True, "partitions": 0, "message": "Already partitioned"}
+
+        model, ts_name = RETENTION_TABLES[table]
+        legacy = f"{table}_unpartitioned"
+
+        try:
+            first = db.session.execute(text(f"SELECT min({ts_name}) FROM {table}")).scalar()
+            sequence = db.session.execute(
+                text("SELECT pg_get_serial_sequence(:table, 'id')"), {"table": table}
+            ).scalar()
+
+            db.session.execute(text(f"ALTER TABLE {table} RENAME TO {legacy}"))
+            db.session.execute(text(
+                f"CREATE TABLE {table} (LIKE {legacy} INCLUDING DEFAULTS) "
+                f"PARTITION BY RANGE ({ts_name})"
+            ))
+            db.session.execute(text(f"CREATE TABLE {table}_default PARTITION OF {table} DEFAULT"))
+            if sequence:
+                db.session.execute(text(f"ALTER SEQUENCE {sequence} OWNED BY {table}.id"))
+
+            created = RetentionService.ensure_partitions(table, since=first.date() if first else None)
+
+            db.session.execute(text(f"INSERT INTO {table} SELECT * FROM {legacy}"))
+            db.session.execute(text(f"DROP TABLE {legacy}"))
+
+            # The partitioned parent cannot carry a PK without the partition key;
+            # index id for lookups and recreate the ORM-declared indexes
+            db.session.execute(text(f"CREATE INDEX ix_{table}_id ON {table} (id)"))
+            for index in model.__table__.indexes:
+                index.create(db.session.connection())
+
+            db.session.commit()
+            return {"success": True, "partitions": created}
+
+        except Exception as e:
+            db.session.rollback()
+            return {"success": False, "error": str(e)}
+
+    @staticmethod
+    def ensure_partitions(table, since=None, months_ahead=PARTITION_MONTHS_AHEAD):
+        """
+        Create monthly partitions from `since` (default this month) through months_ahead
+
+        Returns:
+            int: Number of partitions attempted
+        """
+        month = RetentionService._month_start(since or datetime.utcnow().date())
+        last = RetentionService._add_months(RetentionService._month_start(datetime.utcnow().date()), months_ahead)
+
+        count = 0
+        while month <= last:
+            following = RetentionService._add_months(month, 1)
+            db.session.execute(text(
+                f"CREATE TABLE IF NOT EXISTS {RetentionService._partition_name(table, month)} "
+                f"PARTITION OF {table} FOR VALUES FROM ('{month.isoformat()}') TO ('{following.isoformat()}')"
+            ))
+            month = following
+            count += 1
+
+        db.session.commit()
+        return count
+
+    @staticmethod
+    def _archive_partitions(table, cutoff, max_id):
+        """Export fully expired monthly partitions, then detach and drop them"""
+        model, ts_name = RETENTION_TABLES[table]
+        header = [col.name for col in model.__table__.c]
+        ts_index = header.index(ts_name)
+
+        partitions = db.session.execute(
+            text(
+                "SELECT child.relname FROM pg_inherits i "
+                "JOIN pg_class parent ON parent.oid = i.inhparent "
+                "JOIN pg_class child ON child.oid = i.inhrelid "
+                "WHERE parent.relname = :table ORDER BY child.relname"
+            ),
+            {"table": table}
+        ).scalars().all()
+
+        dropped = 0
+        for name in partitions:
+            month = RetentionService._partition_month(table, name)
+            if month is None or datetime.combine(RetentionService._add_months(month, 1), datetime.min.time()) > cutoff:
+                continue
+
+            if max_id is not None:
+                highest = db.session.execute(text(f"SELECT max(id) FROM {name}")).scalar()
+                if highest is not None and highest > max_id:
+                    continue
+
+            # Plain reads: writers to the live months are never blocked
+            query = db.session.query(*[column(field) for field in header]).select_from(
+                table_clause(name)
+            ).order_by(column('id'))
+            batch = []
+            for row in ExportService.iter_rows(query, ARCHIVE_BATCH_SIZE):
+                batch.append(row)
+                if len(batch) >= ARCHIVE_BATCH_SIZE:
+                    RetentionService._write_rows(table, header, ts_index, batch)
+                    batch = []
+            if batch:
+                RetentionService._write_rows(table, header, ts_index, batch)
+
+            owners = RetentionService._partition_owners(model, name)
+            db.session.execute(text(f"ALTER TABLE {table} DETACH PARTITION {name}"))
+            db.session.execute(text(f"DROP TABLE {name}"))
+            UserCounterService.recount(db.session.connection(), owners)
+            db.session.commit()
+            dropped += 1
+
+        return dropped
+
+    @staticmethod
+    def _partition_name(table, month):
+        return f"{table}_p{month.strftime('%Y_%m')}"
+
+    @staticmethod
+    def _partition_month(table, name):
+        """Parse the month back out of a partition name (None for the default partition)"""
+        try:
+            return datetime.strptime(name[len(f"{table}_p"):], '%Y_%m').date()
+        except ValueError:
+            return None
+
+    @staticmethod
+    def _month_start(day):
+        return date(day.year, day.month, 1)
+
+    @staticmethod
+    def _add_months(month, count):
+        index = month.year * 12 + month.month - 1 + count
+        return date(index // 12, index % 12 + 1, 1)
@@ -0,0 +1,341 @@
+"""
+Rollup Service
+Incrementally aggregates raw event tables into hourly/daily metric rollups
+"""
+
+from collections import Counter
+from datetime import datetime, timedelta
+import time
+
+from sqlalchemy import func, select, update
+
+from counter_service import CounterService
+from extensions import db
+from models import (
+    AnalyticsEvent, ReferralClick, Referral, Message,
+    MetricRollup, RollupWatermark
+)
+
+
+# Raw rows consumed per aggregation batch
+ROLLUP_BATCH_SIZE = 5000
+
+# Rows newer than this are left for the next run so that ids allocated by
+# still-open transactions are not skipped by the watermark
+ROLLUP_SETTLE_SECONDS = 5
+
+# Dashboards trigger a bounded catch-up at most this often per process
+ROLLUP_REFRESH_INTERVAL = 60
+ROLLUP_REFRESH_MAX_BATCHES = 4
+
+ROLLUP_SOURCES = ('analytics_events', 'referral_clicks', 'messages')
+ROLLUP_GRANULARITIES = ('hour', 'day')
+
+_last_refresh = {'at': 0.0}
+
+
+class RollupService:
+    """Service for maintaining and reading metric rollups"""
+
+    # ==========================================
+    # AGGREGATION
+    # ==========================================
+
+    @staticmethod
+    def run_incremental(sources=None, batch_size=ROLLUP_BATCH_SIZE, max_batches=None):
+        """
+        Fold raw rows above each source's watermark into the rollups
+
+        Args:
+            sources: Sources to process (None = all)
+            batch_size: Raw rows read per batch
+            max_batches: Stop after this many batches per source (None = until caught up)
+
+        Returns:
+            dict: Rows aggregated per source
+        """
+        processed = {}
+        for source in sources or ROLLUP_SOURCES:
+            processed[source] = 0
+            batches = 0
+            while max_batches is None or batches < max_batches:
+                count = RollupService._process_batch(source, batch_size)
+                if not count:
+                    break
+                processed[source] += count
+                batches += 1
+        return processed
+
+    @staticmethod
+    def refresh():
+        """Throttled catch-up used by dashboard reads (see run_throttled)"""
+        RollupService.run_throttled(
+            _last_refresh, ROLLUP_REFRESH_INTERVAL,
+            lambda: RollupService.run_incremental(max_batches=ROLLUP_REFRESH_MAX_BATCHES), 'rollups'
+        )
+
+    @staticmethod
+    def run_throttled(last_run, interval, catch_up, name):
+        """
+        Run a bounded catch-up at most once per interval per process
+
+        catch_up() must do its work on its own connections, so the calling
+        request's session is never committed or rolled back from here.
+        Errors are logged, never raised into the request.
+
+        Args:
+            last_run: Module dict holding the monotonic time of the last run under 'at'
+            interval: Minimum seconds between runs
+            catch_up: Callable doing the work
+            name: What is refreshed, for the error log
+        """
+        now = time.monotonic()
+        if now - last_run['at'] < interval:
+            return
+        last_run['at'] = now
+        try:
+            catch_up()
+        except Exception as e:
+            print(f"Error refreshing {name}: {e}")
+
+    @staticmethod
+    def rebuild(sources=None):
+        """
+        Drop and recompute rollups from the raw tables (backfill)
+
+        Args:
+            sources: Sources to rebuild (None = all)
+
+        Returns:
+            dict: Rows aggregated per source
+        """
+        sources = sources or ROLLUP_SOURCES
+        for source in sources:
+            MetricRollup.query.filter_by(source=source).delete(synchronize_session=False)
+            RollupWatermark.query.filter_by(source=source).delete(synchronize_session=False)
+        db.session.commit()
+        return RollupService.run_incremental(sources)
+
+    @staticmethod
+    def _process_batch(source, batch_size):
+        """Aggregate one batch for a source in its own transaction; returns rows consumed"""
+        with db.engine.connect() as connection:
+            with connection.begin() as transaction:
+                consumed = RollupService._fold_batch(connection, source, batch_size)
+                if not consumed:
+                    transaction.rollback()
+                return consumed
+
+    @staticmethod
+    def _fold_batch(connection, source, batch_size):
+        """Fold the next batch above the watermark through a connection; 0 when nothing was folded"""
+        watermark = RollupService.get_watermark(source, connection)
+        rows = RollupService._fetch_rows(connection, source, watermark, batch_size)
+        if not rows:
+            return 0
+
+        cutoff = datetime.utcnow() - timedelta(seconds=ROLLUP_SETTLE_SECONDS)
+        counts = Counter()
+        last_id = watermark
+        consumed = 0
+
+        for row in rows:
+            if row.ts is not None and row.ts > cutoff:
+                break
+            if row.ts is not None:
+                for entity_type, entity_id, metric in RollupService._row_keys(source, row):
+                    if entity_id is None:
+                        continue
+                    for granularity in ROLLUP_GRANULARITIES:
+                        bucket = RollupService.bucket_start(row.ts, granularity)
+                        counts[(entity_type, entity_id, metric, granularity, bucket)] += 1
+            last_id = row.id
+            consumed += 1
+
+        if not consumed:
+            return 0
+
+        CounterService.upsert_increments(
+            MetricRollup,
+            ['source', 'entity_type', 'entity_id', 'metric', 'granularity', 'bucket'],
+            [
+                {'source': source, 'entity_type': key[0], 'entity_id': key[1],
+                 'metric': key[2], 'granularity': key[3], 'bucket': key[4], 'value': value}
+                for key, value in counts.items()
+            ],
+            ['value'],
+            connection
+        )
+
+        return consumed if RollupService.advance_watermark(connection, source, watermark, last_id) else 0
+
+    # ==========================================
+    # WATERMARKS
+    # ==========================================
+
+    @staticmethod
+    def get_watermark(source, connection=None):
+        """
+        Get the last aggregated id for a source, creating the row if needed
+
+        Args:
+            source: Watermark key
+            connection: Connection to read/write through (None = the request session,
+                        which is left uncommitted)
+        """
+        connection = connection if connection is not None else db.session.connection()
+        table = RollupWatermark.__table__
+        query = select(table.c.last_id).where(table.c.source == source)
+        last_id = connection.execute(query).scalar()
+        if last_id is None:
+            # Adding 0 on conflict makes this an atomic insert-if-missing
+            CounterService.upsert_increments(
+                RollupWatermark, ['source'], [{'source': source, 'last_id': 0}], ['last_id'], connection
+            )
+            last_id = connection.execute(query).scalar()
+        return last_id or 0
+
+    @staticmethod
+    def advance_watermark(connection, source, expected, last_id):
+        """
+        Compare-and-set a watermark, so two workers never fold the same batch twice
+
+        Args:
+            connection: Connection of the transaction that folded the batch
+            source: Watermark key
+            expected: Value read by get_watermark() before the batch
+            last_id: New value
+
+        Returns:
+            bool: False if another worker moved the watermark first (roll the batch back)
+        """
+        return connection.execute(
+            update(RollupWatermark.__table__)
+            .where(RollupWatermark.source == source, RollupWatermark.last_id == expected)
+            .values(last_id=last_id, updated_at=datetime.utcnow())
+        ).rowcount == 1
+
+    @staticmethod
+    def _fetch_rows(connection, source, after_id, limit):
+        """Read the next batch of raw rows as plain tuples"""
+        if source == 'analytics_events':
+            query = select(
+                AnalyticsEvent.id,
+                AnalyticsEvent.created_at.label('ts'),
+                AnalyticsEvent.user_id,
+                AnalyticsEvent.startup_id,
+                AnalyticsEvent.event_type
+            ).where(AnalyticsEvent.id > after_id).order_by(AnalyticsEvent.id)
+        elif source == 'referral_clicks':
+            query = select(
+                ReferralClick.id,
+                ReferralClick.clicked_at.label('ts'),
+                ReferralClick.referral_id,
+                Referral.enabler_id,
+                Referral.startup_id
+            ).outerjoin(
+                Referral, ReferralClick.referral_id == Referral.id
+            ).where(ReferralClick.id > after_id).order_by(ReferralClick.id)
+        elif source == 'messages':
+            query = select(
+                Message.id,
+                Message.created_at.label('ts'),
+                Message.sender_id,
+                Message.recipient_id
+            ).where(Message.id > after_id).order_by(Message.id)
+        else:
+            raise ValueError(f"Unknown rollup source: {source}")
+
+        return connection.execute(query.limit(limit)).all()
+
+    @staticmethod
+    def _row_keys(source, row):
+        """Map a raw row to the (entity_type, entity_id, metric) keys it counts toward"""
+        if source == 'analytics_events':
+            return [
+                ('startup', row.startup_id, row.event_type),
+                ('user', row.user_id, row.event_type)
+            ]
+        if source == 'referral_clicks':
+            return [
+                ('referral', row.referral_id, 'referral_click'),
+                ('enabler', row.enabler_id, 'referral_click'),
+                ('startup', row.startup_id, 'referral_click')
+            ]
+        return [
+            ('user', row.sender_id, 'message_sent'),
+            ('user', row.recipient_id, 'message_received')
+        ]
+
+    @staticmethod
+    def bucket_start(ts, granularity):
+        """Truncate a timestamp to the start of its bucket"""
+        if granularity == 'hour':
+            return ts.replace(minute=0, second=0, microsecond=0)
+        return ts.replace(hour=0, minute=0, second=0, microsecond=0)
+
+    # ==========================================
+    # READS
+    # ==========================================
+
+    @staticmethod
+    def get_total(source, entity_type, entity_id, metric, start=None, end=None):
+        """
+        Sum a metric for one entity from the daily rollups
+
+        Args:
+            source: Rollup source
+            entity_type: startup, user, enabler or referral
+            entity_id: Entity ID
+            metric: Metric name
+            start: Include buckets on/after this date (None = all time)
+            end: Include buckets before this date (None = open)
+
+        Returns:
+            int: Total count
+        """
+        query = RollupService._bucket_query(
+            func.coalesce(func.sum(MetricRollup.value), 0),
+            source, entity_type, entity_id, metric, 'day', start, end
+        )
+        return int(query.scalar() or 0)
+
+    @staticmethod
+    def get_series(source, entity_type, entity_id, metric, start=None, end=None, granularity='day'):
+        """
+        Get a metric time series for one entity
+
+        Returns:
+            list: [(bucket datetime, value), ...] in bucket order
+        """
+        query = RollupService._bucket_query(
+            (MetricRollup.bucket, MetricRollup.value),
+            source, entity_type, entity_id, metric, granularity, start, end
+        ).order_by(MetricRollup.bucket)
+        return [(row.bucket, row.value) for row in query.all()]
+
+    @staticmethod
+    def _bucket_query(columns, source, entity_type, entity_id, metric, granularity, start, end):
+        """Build a filtered rollup query"""
+        if not isinstance(columns, tuple):
+            columns = (columns,)
+        query = db.session.query(*columns).filter(
+            MetricRollup.source == source,
+            MetricRollup.entity_type == entity_type,
+            MetricRollup.entity_id == entity_id,
+            MetricRollup.metric == metric,
+            MetricRollup.granularity == granularity
+        )
+        if start is not None:
+            start = RollupService.bucket_start(RollupService._as_datetime(start), granularity)
+            query = query.filter(MetricRollup.bucket >= start)
+        if end is not None:
+            query = query.filter(MetricRollup.bucket < RollupService._as_datetime(end))
+        return query
+
+    @staticmethod
+    def _as_datetime(value):
+        """Promote a date bound to midnight so it compares against bucket datetimes"""
+        if not isinstance(value, datetime):
+            value = datetime(value.year, value.month, value.day)
+        return value
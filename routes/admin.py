@@ -1,9 +1,10 @@
 # routes/admin.py
-from flask import Blueprint, jsonify, request, current_app, Response
+from flask import Blueprint, jsonify, request, current_app, Response, stream_with_context
 from flask_login import login_required, current_user
 from extensions import db
 from models import User, Startup, Opportunity, Application, Referral
 from admin_analytics_service import AdminAnalyticsService
+from export_service import ExportService, EXPORT_FORMATS
 import json
 from datetime import datetime
 import os
@@ -341,6 +342,29 @@ def get_referrals():
 
     return jsonify({"success": True, "referrals": results})
 
+# ---------------------------------------
+# NEAR-DUPLICATE REFERRALS (fraud screening)
+# ---------------------------------------
+from referral_dedup_service import ReferralDedupService, DUPLICATE_THRESHOLD
+
+@bp.route("/referrals/duplicates", methods=["GET"])
+@login_required
+def get_duplicate_referrals():
+    if require_admin():
+        return require_admin()
+
+    threshold = request.args.get("min_similarity", DUPLICATE_THRESHOLD, type=float)
+    cross_enabler = request.args.get("cross_enabler", "false").lower() == "true"
+    limit = request.args.get("limit", 100, type=int)
+
+    report = ReferralDedupService.duplicate_report(
+        threshold=min(1.0, max(0.3, threshold)),
+        cross_enabler_only=cross_enabler,
+        limit=max(1, min(limit, 500))
+    )
+
+    return jsonify({"success": True, "data": report})
+
 # ---------------------------------------
 # SEED ALL DATA (MOCK USERS & PROGRAMS)
 # ---------------------------------------
@@ -825,6 +849,19 @@ def analytics_revenue():
     return jsonify({"success": True, "data": data})
 
 
+@bp.route("/analytics/cohorts", methods=["GET"])
+@login_required
+def analytics_cohorts():
+    """Get weekly cohort retention by role"""
+    if require_admin():
+        return require_admin()
+    
+    weeks = request.args.get('weeks', 12, type=int)
+    role = request.args.get('role') or None
+    data = AdminAnalyticsService.get_cohort_retention(weeks, role)
+    return jsonify({"success": True, "data": data})
+
+
 @bp.route("/analytics/comprehensive", methods=["GET"])
 @login_required
 def analytics_comprehensive():
@@ -840,22 +877,24 @@ def analytics_comprehensive():
 @bp.route("/analytics/export/<analytics_type>", methods=["GET"])
 @login_required
 def analytics_export(analytics_type):
-    """Export analytics data as CSV"""
+    """Stream analytics data as CSV or NDJSON"""
     if require_admin():
         return require_admin()
     
     days = request.args.get('days', 30, type=int)
+    format = request.args.get('format', 'csv')
     
     try:
-        csv_data = AdminAnalyticsService.export_analytics_csv(analytics_type, days)
-        
-        return Response(
-            csv_data,
-            mimetype="text/csv",
-            headers={"Content-disposition": f"attachment; filename={analytics_type}_analytics.csv"}
-        )
-    except Exception as e:
+        rows = AdminAnalyticsService.export_analytics(analytics_type, days, format)
+    except ValueError as e:
         return jsonify({"success": False, "error": str(e)}), 400
+    
+    filename = ExportService.filename(f"{analytics_type}_analytics", format)
+    return Response(
+        stream_with_context(rows),
+        mimetype=ExportService.mimetype(format),
+        headers={"Content-disposition": f"attachment; filename={filename}"}
+    )
 
 
 # ---------------------------------------
@@ -878,6 +917,7 @@ def search_users():
     status = request.args.get('status')
     limit = request.args.get('limit', 50, type=int)
     offset = request.args.get('offset', 0, type=int)
+    count_mode = request.args.get('count')  # exact, estimated or capped
     
     # Convert date strings to datetime
     if date_from:
@@ -892,7 +932,8 @@ def search_users():
         date_to=date_to,
         status=status,
         limit=limit,
-        offset=offset
+        offset=offset,
+        count_mode=count_mode
     )
     
     return jsonify({"success": True, "data": results})
@@ -912,6 +953,7 @@ def search_programs():
     date_to = request.args.get('date_to')
     limit = request.args.get('limit', 50, type=int)
     offset = request.args.get('offset', 0, type=int)
+    count_mode = request.args.get('count')  # exact, estimated or capped
     
     if date_from:
         date_from = datetime.fromisoformat(date_from)
@@ -925,7 +967,8 @@ def search_programs():
         date_from=date_from,
         date_to=date_to,
         limit=limit,
-        offset=offset
+        offset=offset,
+        count_mode=count_mode
     )
     
     return jsonify({"success": True, "data": results})
@@ -945,6 +988,7 @@ def search_applications():
     date_to = request.args.get('date_to')
     limit = request.args.get('limit', 50, type=int)
     offset = request.args.get('offset', 0, type=int)
+    count_mode = request.args.get('count')  # exact, estimated or capped
     
     if date_from:
         date_from = datetime.fromisoformat(date_from)
@@ -958,7 +1002,8 @@ def search_applications():
         date_from=date_from,
         date_to=date_to,
         limit=limit,
-        offset=offset
+        offset=offset,
+        count_mode=count_mode
     )
     
     return jsonify({"success": True, "data": results})
@@ -978,6 +1023,7 @@ def search_meetings():
     date_to = request.args.get('date_to')
     limit = request.args.get('limit', 50, type=int)
     offset = request.args.get('offset', 0, type=int)
+    count_mode = request.args.get('count')  # exact, estimated or capped
     
     if date_from:
         date_from = datetime.fromisoformat(date_from)
@@ -991,7 +1037,8 @@ def search_meetings():
         date_from=date_from,
         date_to=date_to,
         limit=limit,
-        offset=offset
+        offset=offset,
+        count_mode=count_mode
     )
     
     return jsonify({"success": True, "data": results})
@@ -1011,6 +1058,7 @@ def search_referrals():
     date_to = request.args.get('date_to')
     limit = request.args.get('limit', 50, type=int)
     offset = request.args.get('offset', 0, type=int)
+    count_mode = request.args.get('count')  # exact, estimated or capped
     
     if date_from:
         date_from = datetime.fromisoformat(date_from)
@@ -1024,7 +1072,8 @@ def search_referrals():
         date_from=date_from,
         date_to=date_to,
         limit=limit,
-        offset=offset
+        offset=offset,
+        count_mode=count_mode
     )
     
     return jsonify({"success": True, "data": results})
@@ -1044,6 +1093,7 @@ def search_leads():
     date_to = request.args.get('date_to')
     limit = request.args.get('limit', 50, type=int)
     offset = request.args.get('offset', 0, type=int)
+    count_mode = request.args.get('count')  # exact, estimated or capped
     
     # Convert is_read to boolean
     if is_read is not None:
@@ -1061,7 +1111,8 @@ def search_leads():
         date_from=date_from,
         date_to=date_to,
         limit=limit,
-        offset=offset
+        offset=offset,
+        count_mode=count_mode
     )
     
     return jsonify({"success": True, "data": results})
@@ -1085,6 +1136,68 @@ def global_search():
     return jsonify({"success": True, "data": results})
 
 
+from saved_search_service import SavedSearchService
+
+@bp.route("/search/saved", methods=["POST"])
+@login_required
+def create_saved_search():
+    """Save a search (filters as accepted by the matching /search/<type> endpoint)"""
+    if require_admin():
+        return require_admin()
+    
+    data = request.get_json() or {}
+    
+    result = AdminSearchService.save_search(
+        user_id=current_user.id,
+        name=data.get('name'),
+        entity_type=data.get('entity_type'),
+        filters=data.get('filters', {})
+    )
+    
+    return jsonify(result), (201 if result["success"] else 400)
+
+
+@bp.route("/search/saved", methods=["GET"])
+@login_required
+def list_saved_searches():
+    """List the admin's saved searches with "new since last view" counts"""
+    if require_admin():
+        return require_admin()
+    
+    searches = SavedSearchService.list_for_user(current_user.id)
+    
+    return jsonify({"success": True, "data": searches})
+
+
+@bp.route("/search/saved/<int:search_id>/results", methods=["GET"])
+@login_required
+def run_saved_search(search_id):
+    """Run a saved search and mark its new results as seen"""
+    if require_admin():
+        return require_admin()
+    
+    limit = request.args.get('limit', 50, type=int)
+    offset = request.args.get('offset', 0, type=int)
+    
+    result = SavedSearchService.run(search_id, current_user.id, limit=max(1, min(limit, 200)), offset=max(0, offset))
+    if not result["success"]:
+        return jsonify(result), 404 if result["error"] == "Saved search not found" else 500
+    
+    return jsonify({"success": True, "data": result})
+
+
+@bp.route("/search/saved/<int:search_id>", methods=["DELETE"])
+@login_required
+def delete_saved_search(search_id):
+    """Delete a saved search"""
+    if require_admin():
+        return require_admin()
+    
+    result = SavedSearchService.delete(search_id, current_user.id)
+    
+    return jsonify(result), (200 if result["success"] else 404)
+
+
 @bp.route("/search/filter-options", methods=["GET"])
 @login_required
 def get_filter_options():
@@ -1152,13 +1265,16 @@ def bulk_export_users():
     user_ids = data.get('user_ids')
     format = data.get('format', 'csv')
     
+    if format not in EXPORT_FORMATS and format != 'json':
+        return jsonify({"success": False, "error": f"Unsupported export format: {format}"}), 400
+    
     result = AdminBulkOperationsService.bulk_export_users(user_ids, format)
     
-    if format == 'csv':
+    if format in EXPORT_FORMATS:
         return Response(
-            result,
-            mimetype="text/csv",
-            headers={"Content-disposition": "attachment; filename=users_export.csv"}
+            stream_with_context(result),
+            mimetype=ExportService.mimetype(format),
+            headers={"Content-disposition": f"attachment; filename={ExportService.filename('users_export', format)}"}
         )
     else:
         return jsonify(result)
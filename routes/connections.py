@@ -2,10 +2,12 @@
 from flask import Blueprint, request, jsonify
 from flask_login import login_required, current_user
 from extensions import db
-from models import Connection, User, Notification, Startup
+from models import Connection, User, Notification
 from datetime import datetime
 from analytics_service import AnalyticsService
-from sqlalchemy import or_, and_
+from connection_graph_service import ConnectionGraphService
+from connection_suggestion_service import ConnectionSuggestionService
+from sqlalchemy import or_, and_, func
 
 bp = Blueprint('connections', __name__, url_prefix='/api/connections')
 
@@ -14,24 +16,24 @@ bp = Blueprint('connections', __name__, url_prefix='/api/connections')
 @login_required
 def get_connections():
     """Get all connections for current user"""
-    # Get accepted connections where user is either requester or recipient
-    connections = Connection.query.filter(
-        Connection.status == 'accepted',
-        or_(
-            Connection.requester_id == current_user.id,
-            Connection.recipient_id == current_user.id
-        )
-    ).order_by(Connection.accepted_at.desc()).all()
+    # Accepted connections come from the cached graph, newest first
+    connections = sorted(
+        ConnectionGraphService.connections(current_user.id).items(),
+        key=lambda item: (item[1][1] is not None, item[1][1] or datetime.min, item[1][0]),
+        reverse=True
+    )
+    users = {
+        u.id: u for u in User.query.filter(User.id.in_([user_id for user_id, _ in connections]))
+    } if connections else {}
     
     # Format connections with other user's info
     formatted_connections = []
-    for conn in connections:
-        other_user_id = conn.recipient_id if conn.requester_id == current_user.id else conn.requester_id
-        other_user = User.query.get(other_user_id)
+    for other_user_id, (connection_id, accepted_at) in connections:
+        other_user = users.get(other_user_id)
         
         if other_user:
             formatted_connections.append({
-                'connection_id': conn.id,
+                'connection_id': connection_id,
                 'user': {
                     'id': other_user.id,
                     'name': other_user.name,
@@ -41,7 +43,7 @@ def get_connections():
                     'company': other_user.company,
                     'region': other_user.region
                 },
-                'connected_at': conn.accepted_at.isoformat() if conn.accepted_at else None
+                'connected_at': accepted_at.isoformat() if accepted_at else None
             })
     
     return jsonify({
@@ -77,80 +79,20 @@ def get_connection_requests():
 @bp.route('/suggestions', methods=['GET'])
 @login_required
 def get_suggestions():
-    """Get suggested connections based on user profile and activity"""
+    """Get suggested connections ranked by mutual connections, shared sectors, role and region"""
     limit = request.args.get('limit', 10, type=int)
     
-    # Get users already connected or with pending requests
-    existing_connections = db.session.query(Connection.requester_id, Connection.recipient_id).filter(
-        or_(
-            Connection.requester_id == current_user.id,
-            Connection.recipient_id == current_user.id
-        )
-    ).all()
-    
-    excluded_ids = {current_user.id}
-    for req_id, rec_id in existing_connections:
-        excluded_ids.add(req_id)
-        excluded_ids.add(rec_id)
-    
-    # Suggestion algorithm
-    suggestions = []
-    
-    # 1. Same role users (enablers, corporates, investors)
-    if current_user.role == 'founder':
-        # Suggest enablers and corporates
-        role_matches = User.query.filter(
-            User.role.in_(['enabler', 'corporate']),
-            User.id.notin_(excluded_ids),
-            User.is_active == True
-        ).limit(limit // 2).all()
-        suggestions.extend(role_matches)
-    
-    # 2. Same region/country users
-    if current_user.region:
-        region_matches = User.query.filter(
-            User.region == current_user.region,
-            User.id.notin_(excluded_ids),
-            User.is_active == True,
-            User.id.notin_([u.id for u in suggestions])
-        ).limit(limit // 3).all()
-        suggestions.extend(region_matches)
-    
-    # 3. Users with similar sectors (for founders)
-    if current_user.role == 'founder':
-        startup = Startup.query.filter_by(founder_id=current_user.id).first()
-        if startup and startup.sectors:
-            import json
-            user_sectors = json.loads(startup.sectors or '[]')
-            
-            # Find other startups with overlapping sectors
-            similar_startups = Startup.query.filter(
-                Startup.founder_id.notin_(excluded_ids),
-                Startup.founder_id != current_user.id
-            ).all()
-            
-            for s in similar_startups:
-                s_sectors = json.loads(s.sectors or '[]')
-                if any(sector in s_sectors for sector in user_sectors):
-                    founder = User.query.get(s.founder_id)
-                    if founder and founder not in suggestions:
-                        suggestions.append(founder)
-                        if len(suggestions) >= limit:
-                            break
-    
-    # 4. Fill remaining with random active users
-    if len(suggestions) < limit:
-        remaining = limit - len(suggestions)
-        random_users = User.query.filter(
-            User.id.notin_(excluded_ids),
-            User.id.notin_([u.id for u in suggestions]),
-            User.is_active == True
-        ).limit(remaining).all()
-        suggestions.extend(random_users)
+    suggestions = ConnectionSuggestionService.suggest(current_user.id, limit)
+    users = {
+        u.id: u for u in User.query.filter(User.id.in_([s['user_id'] for s in suggestions]))
+    } if suggestions else {}
     
     # Format suggestions
     formatted_suggestions = []
-    for user in suggestions[:limit]:
+    for suggestion in suggestions:
+        user = users.get(suggestion['user_id'])
+        if not user:
+            continue
         formatted_suggestions.append({
             'id': user.id,
             'name': user.name,
@@ -159,7 +101,9 @@ def get_suggestions():
             'role': user.role,
             'company': user.company,
             'region': user.region,
-            'country': user.country
+            'country': user.country,
+            'mutual_connections': suggestion['mutual_connections'],
+            'shared_sectors': suggestion['shared_sectors']
         })
     
     return jsonify({
@@ -350,13 +294,7 @@ def remove_connection(connection_id):
 def get_connection_stats():
     """Get connection statistics for current user"""
     # Total connections
-    total = Connection.query.filter(
-        Connection.status == 'accepted',
-        or_(
-            Connection.requester_id == current_user.id,
-            Connection.recipient_id == current_user.id
-        )
-    ).count()
+    friend_ids = list(ConnectionGraphService.connections(current_user.id))
     
     # Pending requests (received)
     pending_received = Connection.query.filter(
@@ -371,28 +309,51 @@ def get_connection_stats():
     ).count()
     
     # Connections by role
-    connections = Connection.query.filter(
-        Connection.status == 'accepted',
-        or_(
-            Connection.requester_id == current_user.id,
-            Connection.recipient_id == current_user.id
-        )
-    ).all()
-    
-    role_breakdown = {}
-    for conn in connections:
-        other_user_id = conn.recipient_id if conn.requester_id == current_user.id else conn.requester_id
-        other_user = User.query.get(other_user_id)
-        if other_user:
-            role = other_user.role
-            role_breakdown[role] = role_breakdown.get(role, 0) + 1
+    role_breakdown = dict(
+        db.session.query(User.role, func.count(User.id)).filter(
+            User.id.in_(friend_ids)
+        ).group_by(User.role).all()
+    ) if friend_ids else {}
     
     return jsonify({
         'success': True,
         'stats': {
-            'total_connections': total,
+            'total_connections': len(friend_ids),
             'pending_received': pending_received,
             'pending_sent': pending_sent,
             'by_role': role_breakdown
         }
     })
+
+
+@bp.route('/<int:user_id>/mutual', methods=['GET'])
+@login_required
+def get_mutual_connections(user_id):
+    """Get connections the current user shares with another user"""
+    limit = request.args.get('limit', 20, type=int)
+    
+    if not User.query.get(user_id):
+        return jsonify({'success': False, 'message': 'User not found'}), 404
+    
+    mutual_ids = ConnectionGraphService.mutual(current_user.id, user_id)
+    users = {
+        u.id: u for u in User.query.filter(User.id.in_(mutual_ids[:limit]))
+    } if mutual_ids else {}
+    
+    return jsonify({
+        'success': True,
+        'user_id': user_id,
+        'count': len(mutual_ids),
+        'connected': ConnectionGraphService.is_connected(current_user.id, user_id),
+        'degree': ConnectionGraphService.degree(user_id),
+        'mutual': [
+            {
+                'id': u.id,
+                'name': u.name,
+                'profile_pic': u.profile_pic,
+                'role': u.role,
+                'company': u.company
+            }
+            for u in (users.get(mutual_id) for mutual_id in mutual_ids[:limit]) if u
+        ]
+    })
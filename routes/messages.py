@@ -1,10 +1,15 @@
 # routes/messages.py
 from flask import Blueprint, request, jsonify, render_template
 from flask_login import login_required, current_user
-from extensions import db
+from flask_socketio import join_room
+from extensions import db, socketio
 from models import Message, User, Notification
 from datetime import datetime
 from analytics_service import AnalyticsService
+from message_search_service import MessageSearchService
+from message_thread_service import MessageThreadService
+from user_counter_service import UserCounterService
+from message_event_service import MessageEventService, MESSAGE_EVENTS_NAMESPACE
 import uuid
 
 bp = Blueprint('messages', __name__, url_prefix='/api/messages')
@@ -48,49 +53,21 @@ def get_messages():
 @bp.route('/threads', methods=['GET'])
 @login_required
 def get_threads():
-    """Get all conversation threads for current user"""
-    # Get all unique thread IDs
-    threads_query = db.session.query(Message.thread_id).filter(
-        db.or_(
-            db.and_(Message.sender_id == current_user.id, Message.is_deleted_by_sender == False),
-            db.and_(Message.recipient_id == current_user.id, Message.is_deleted_by_recipient == False)
-        )
-    ).distinct()
-    
+    """Get all conversation threads for current user, latest activity first"""
     threads = []
-    for (thread_id,) in threads_query:
-        # Get latest message in thread
-        latest_msg = Message.query.filter(
-            Message.thread_id == thread_id
-        ).order_by(Message.created_at.desc()).first()
-        
-        if latest_msg:
-            # Get other participant
-            other_user_id = latest_msg.recipient_id if latest_msg.sender_id == current_user.id else latest_msg.sender_id
-            other_user = User.query.get(other_user_id)
-            
-            # Count unread messages in thread
-            unread_count = Message.query.filter(
-                Message.thread_id == thread_id,
-                Message.recipient_id == current_user.id,
-                Message.is_read == False
-            ).count()
-            
-            threads.append({
-                'thread_id': thread_id,
-                'other_user': {
-                    'id': other_user.id,
-                    'name': other_user.name,
-                    'profile_pic': other_user.profile_pic,
-                    'role': other_user.role,
-                    'company': other_user.company
-                },
-                'latest_message': latest_msg.to_dict(),
-                'unread_count': unread_count
-            })
-    
-    # Sort by latest message time
-    threads.sort(key=lambda x: x['latest_message']['created_at'], reverse=True)
+    for summary, other_user, latest_msg in MessageThreadService.list_threads(current_user.id):
+        threads.append({
+            'thread_id': summary.thread_id,
+            'other_user': {
+                'id': other_user.id,
+                'name': other_user.name,
+                'profile_pic': other_user.profile_pic,
+                'role': other_user.role,
+                'company': other_user.company
+            },
+            'latest_message': latest_msg.to_dict(),
+            'unread_count': summary.unread_count
+        })
     
     return jsonify({
         'success': True,
@@ -234,39 +211,41 @@ def delete_message(message_id):
 @login_required
 def get_unread_count():
     """Get count of unread messages"""
-    count = Message.query.filter(
-        Message.recipient_id == current_user.id,
-        Message.is_read == False,
-        Message.is_deleted_by_recipient == False
-    ).count()
-    
     return jsonify({
         'success': True,
-        'unread_count': count
+        'unread_count': UserCounterService.unread_messages(current_user.id)
     })
 
 
 @bp.route('/search', methods=['GET'])
 @login_required
 def search_messages():
-    """Search messages by keyword"""
+    """Search messages by keyword, best matches first (cursor-paginated)"""
     query = request.args.get('q', '')
+    cursor = request.args.get('cursor')
+    limit = request.args.get('limit', 20, type=int)
     
     if not query:
         return jsonify({'success': False, 'message': 'Search query required'}), 400
     
-    messages = Message.query.filter(
-        db.or_(
-            db.and_(Message.sender_id == current_user.id, Message.is_deleted_by_sender == False),
-            db.and_(Message.recipient_id == current_user.id, Message.is_deleted_by_recipient == False)
-        ),
-        db.or_(
-            Message.subject.ilike(f'%{query}%'),
-            Message.body.ilike(f'%{query}%')
-        )
-    ).order_by(Message.created_at.desc()).limit(50).all()
+    try:
+        results = MessageSearchService.search(current_user.id, query, cursor, limit)
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
     
     return jsonify({
         'success': True,
-        'messages': [msg.to_dict() for msg in messages]
+        'messages': results['messages'],
+        'next_cursor': results['next_cursor'],
+        'has_more': results['has_more']
     })
+
+
+# ==================== SOCKET.IO EVENTS ====================
+
+@socketio.on('connect', namespace=MESSAGE_EVENTS_NAMESPACE)
+def handle_messages_connect():
+    """Join the user's private room; rooms are never chosen by the client"""
+    if not current_user.is_authenticated:
+        return False
+    join_room(MessageEventService.room(current_user.id))
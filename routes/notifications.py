@@ -2,6 +2,7 @@ from flask import Blueprint, jsonify
 from flask_login import login_required, current_user
 from models import Notification
 from extensions import db
+from user_counter_service import UserCounterService
 
 bp = Blueprint('notifications', __name__, url_prefix='/api/notifications')
 
@@ -11,7 +12,16 @@ def get_notifications():
     notifs = Notification.query.filter_by(user_id=current_user.id).order_by(Notification.created_at.desc()).all()
     return jsonify({
         "success": True,
-        "notifications": [n.to_dict() for n in notifs]
+        "notifications": [n.to_dict() for n in notifs],
+        "unread_count": UserCounterService.unread_notifications(current_user.id)
+    })
+
+@bp.route('/unread-count', methods=['GET'])
+@login_required
+def get_unread_count():
+    return jsonify({
+        "success": True,
+        "unread_count": UserCounterService.unread_notifications(current_user.id)
     })
 
 @bp.route('/<int:id>/read', methods=['POST'])
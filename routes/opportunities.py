@@ -3,6 +3,7 @@ from flask import Blueprint, request, jsonify
 from flask_login import login_required, current_user
 from extensions import db
 from models import Opportunity
+from opportunity_facet_service import OpportunityFacetService
 import json
 from datetime import datetime
 
@@ -90,35 +91,37 @@ def get_opportunity(id):
 # ---------------------------------------
 @bp.route("/", methods=["GET"])
 def list_opportunities():
-    q = Opportunity.query.filter_by(status="published")
-
     # Filters
-    sector = request.args.get("sector")
-    stage = request.args.get("stage")
-    country = request.args.get("country")
+    filters = {
+        "sector": request.args.get("sector"),
+        "stage": request.args.get("stage"),
+        "country": request.args.get("country"),
+        "type": request.args.get("type"),
+    }
+    query = (request.args.get("q") or "").strip()
     owner = request.args.get("owner")
 
-    if sector:
-        q = q.filter(Opportunity.sectors.like(f"%{sector}%"))
-    if stage:
-        q = q.filter(Opportunity.target_stages.like(f"%{stage}%"))
-    if country:
-        q = q.filter(Opportunity.countries.like(f"%{country}%"))
+    owner_id = None
     if owner:
         try:
-            o_id = int(owner)
-            q = q.filter_by(owner_id=o_id)
+            owner_id = int(owner)
         except:
             pass
 
     # Pagination
-    page = int(request.args.get("page", 1))
-    per = int(request.args.get("per", 12))
-    
-    total_items = q.count()
+    page = max(1, int(request.args.get("page", 1)))
+    per = max(1, min(int(request.args.get("per", request.args.get("per_page", 12))), 100))
+
+    # Page of ids plus every facet's counts for the same filters
+    result = OpportunityFacetService.search(
+        filters=filters, query=query or None, owner_id=owner_id, page=page, per_page=per
+    )
+
+    total_items = result["total"]
     total_pages = (total_items + per - 1) // per
-    
-    items = q.order_by(Opportunity.created_at.desc()).offset((page - 1) * per).limit(per).all()
+
+    opps = {o.id: o for o in Opportunity.query.filter(Opportunity.id.in_(result["ids"])).all()} if result["ids"] else {}
+    items = [opps[i] for i in result["ids"] if i in opps]
 
     items_data = []
     for i in items:
@@ -132,6 +135,7 @@ def list_opportunities():
         "success": True,
         "data": {
             "items": items_data,
+            "facets": result["facets"],
             "pagination": {
                 "page": page,
                 "per_page": per,
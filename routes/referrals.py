@@ -5,9 +5,15 @@ from models import Referral, User, Startup, Opportunity, Application
 import json
 from datetime import datetime
 import uuid
+from sqlalchemy import func, case
+from enabler_service import EnablerService
+from visitor_sketch_service import VisitorSketchService
 
 bp = Blueprint("referrals", __name__, url_prefix="/api/referrals")
 
+# Most recent clicks returned alongside link stats
+RECENT_CLICKS_LIMIT = 50
+
 # ---------------------------------------
 # ENABLER: Create a Referral
 # ---------------------------------------
@@ -48,6 +54,7 @@ def create_referral():
     )
 
     db.session.add(referral)
+    EnablerService.record_referral_created(referral)
     db.session.commit()
 
     return jsonify({
@@ -88,6 +95,7 @@ def generate_link():
     )
 
     db.session.add(referral)
+    EnablerService.record_referral_created(referral)
     db.session.commit()
 
     # The join URL
@@ -119,16 +127,24 @@ def join_via_link(token):
     # Track the click
     click = ReferralClick(
         referral_id=referral.id,
+        user_id=current_user.id if current_user.is_authenticated else None,
         ip_address=request.remote_addr,
         user_agent=request.headers.get('User-Agent', '')[:500],
         viewed_opportunity=False,
         applied=False
     )
     db.session.add(click)
+    EnablerService.record_referral_click(referral)
+    VisitorSketchService.record_visit(
+        'referral', referral.id,
+        VisitorSketchService.visitor_key(click.user_id, click.ip_address, click.user_agent)
+    )
     
     # Update referral status if it's still pending_link
+    previous_status = referral.status
     if referral.status == "pending_link":
         referral.status = "link_clicked"
+    EnablerService.record_referral_status_change(referral, previous_status)
     
     db.session.commit()
     
@@ -189,6 +205,7 @@ def referral_action(id):
 
     data = request.json or {}
     action = data.get("action") # 'accept' or 'reject'
+    previous_status = referral.status
 
     if action == 'accept':
         referral.status = 'accepted'
@@ -204,6 +221,7 @@ def referral_action(id):
     else:
         return jsonify({"error": "Invalid action"}), 400
 
+    EnablerService.record_referral_status_change(referral, previous_status)
     db.session.commit()
     return jsonify({"success": True, "message": f"Referral {action}ed."})
 
@@ -277,13 +295,19 @@ def get_link_stats(referral_id):
     if current_user.role != "admin" and referral.enabler_id != current_user.id:
         return jsonify({"error": "Not your referral"}), 403
 
-    # Get click statistics
-    clicks = ReferralClick.query.filter_by(referral_id=referral_id).all()
+    # Get click statistics as aggregates rather than loading every click
+    total_clicks, viewed_count, applied_count = db.session.query(
+        func.count(ReferralClick.id),
+        func.coalesce(func.sum(case((ReferralClick.viewed_opportunity == True, 1), else_=0)), 0),
+        func.coalesce(func.sum(case((ReferralClick.applied == True, 1), else_=0)), 0)
+    ).filter(ReferralClick.referral_id == referral_id).one()
+    
+    # Unique visitors come from the merged daily HyperLogLog sketches
+    visitors = VisitorSketchService.unique_visitors('referral', referral_id)
     
-    total_clicks = len(clicks)
-    unique_users = len(set([c.user_id for c in clicks if c.user_id]))
-    viewed_count = sum([1 for c in clicks if c.viewed_opportunity])
-    applied_count = sum([1 for c in clicks if c.applied])
+    recent_clicks = ReferralClick.query.filter_by(referral_id=referral_id).order_by(
+        ReferralClick.id.desc()
+    ).limit(RECENT_CLICKS_LIMIT).all()
     
     # Get opportunity details
     opp = Opportunity.query.get(referral.opportunity_id)
@@ -305,10 +329,12 @@ def get_link_stats(referral_id):
         "application": application,
         "stats": {
             "total_clicks": total_clicks,
-            "unique_users": unique_users,
+            "unique_visitors": visitors["estimate"],
+            "unique_visitors_error": visitors["standard_error"],
+            "unique_users": visitors["estimate"],  # Kept for older clients
             "viewed_opportunity": viewed_count,
             "applied": applied_count,
             "conversion_rate": (applied_count / total_clicks * 100) if total_clicks > 0 else 0
         },
-        "clicks": [c.to_dict() for c in clicks]
+        "clicks": [c.to_dict() for c in recent_clicks]
     })
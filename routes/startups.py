@@ -7,6 +7,8 @@ from werkzeug.utils import secure_filename
 import json
 import os
 from datetime import datetime
+from opportunity_recommendation_service import OpportunityRecommendationService
+from startup_similarity_service import StartupSimilarityService
 
 bp = Blueprint('startups', __name__, url_prefix='/api/startups')
 
@@ -397,10 +399,13 @@ def dashboard():
             'type': 'referral'
         })
     
-    # Fetch Available Programs (Opportunities)
-    all_programs = Opportunity.query.filter_by(status='open').order_by(Opportunity.created_at.desc()).limit(10).all()
+    # Fetch Available Programs (Opportunities), best eligibility fit first
     applied_opp_ids = [app.opportunity_id for app in raw_applications]
-    available_programs = [p for p in all_programs if p.id not in applied_opp_ids]
+    recommended = OpportunityRecommendationService.recommend(startup, limit=10, exclude_ids=applied_opp_ids)
+    programs_by_id = {
+        p.id: p for p in Opportunity.query.filter(Opportunity.id.in_([opp_id for opp_id, _ in recommended]))
+    } if recommended else {}
+    available_programs = [programs_by_id[opp_id] for opp_id, _ in recommended if opp_id in programs_by_id]
 
     # Fetch Network Connections (Suggested)
     suggested_connections = User.query.filter(User.role.in_(['enabler', 'corporate'])).filter(User.id != current_user.id).limit(4).all()
@@ -663,6 +668,24 @@ def get_startup(id):
     s = Startup.query.get_or_404(id)
     return jsonify(s.to_dict())
 
+@bp.route('/<int:id>/similar', methods=['GET'])
+def get_similar_startups(id):
+    """Most similar startups by description/problem/solution text (precomputed offline)"""
+    Startup.query.get_or_404(id)
+    limit = request.args.get('limit', 5, type=int)
+    
+    similar = []
+    for startup, score in StartupSimilarityService.similar(id, limit):
+        item = startup.to_dict()
+        item['similarity'] = round(score, 3)
+        similar.append(item)
+    
+    return jsonify({
+        "success": True,
+        "startup_id": id,
+        "similar": similar
+    })
+
 @bp.route('/', methods=['GET'])
 def list_startups():
     q = Startup.query
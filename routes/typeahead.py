@@ -0,0 +1,30 @@
+# routes/typeahead.py
+from flask import Blueprint, request, jsonify
+from flask_login import login_required, current_user
+from typeahead_service import TypeaheadService, TYPEAHEAD_TYPES, TYPEAHEAD_DEFAULT_LIMIT
+
+bp = Blueprint('typeahead', __name__, url_prefix='/api/typeahead')
+
+
+@bp.route('', methods=['GET'])
+@login_required
+def typeahead():
+    """Autocomplete users and startups by name, email or company prefix"""
+    query = request.args.get('q', '').strip()
+    types = [t for t in request.args.get('types', ','.join(TYPEAHEAD_TYPES)).split(',') if t in TYPEAHEAD_TYPES]
+    role = request.args.get('role') or None
+    limit = request.args.get('limit', TYPEAHEAD_DEFAULT_LIMIT, type=int)
+    include_self = request.args.get('include_self', 'false').lower() == 'true'
+    
+    if not query:
+        return jsonify({'success': True, 'results': []})
+    
+    results = TypeaheadService.lookup(
+        query,
+        types=types,
+        role=role,
+        exclude_user_id=None if include_self else current_user.id,
+        limit=limit
+    )
+    
+    return jsonify({'success': True, 'results': results})
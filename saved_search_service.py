@@ -0,0 +1,451 @@
+"""
+Saved Search Service
+Admin saved searches with cached, incrementally refreshed results
+
+A saved search stores its filter spec, and the ids it matched at the last
+run are rows of saved_search_results. Every ORM insert/update/delete of a
+searchable row appends to search_changes, so a re-run only re-evaluates the
+filter against rows changed since the search's watermark:
+
+    results = (results - changed) | (changed rows that still match)
+
+Only the membership delta is written: result rows are inserted for ids that
+joined and deleted for ids that left, and result_count/new_count are adjusted
+by the same delta, so a run costs O(changed rows) rather than O(results).
+
+Ids that joined the results since the owner last opened the search are
+flagged is_new, which is what the dashboard's "N new since last view" badge
+reads.
+
+Filters that depend on other tables (application startup name, referral
+enabler name) and bulk query.update() calls are not seen by the change log;
+a full re-evaluation every SAVED_SEARCH_FULL_REFRESH seconds picks them up.
+"""
+
+from datetime import datetime, timedelta
+import json
+
+from sqlalchemy import func
+
+from admin_search_service import AdminSearchService
+from extensions import db
+from models import (
+    User, Opportunity, Application, Meeting, Referral, Lead,
+    SavedSearch, SavedSearchResult, SearchChange
+)
+from rollup_service import RollupService, ROLLUP_SETTLE_SECONDS
+from session_hooks import SessionHooks
+
+
+# entity type -> (model, filter builder, accepted filter keys)
+SAVED_SEARCH_TYPES = {
+    'users': (User, AdminSearchService.filter_users, ('query', 'role', 'date_from', 'date_to', 'status')),
+    'programs': (Opportunity, AdminSearchService.filter_programs, ('query', 'type', 'status', 'date_from', 'date_to')),
+    'applications': (Application, AdminSearchService.filter_applications, ('query', 'status', 'program_id', 'date_from', 'date_to')),
+    'meetings': (Meeting, AdminSearchService.filter_meetings, ('query', 'status', 'access_type', 'date_from', 'date_to')),
+    'referrals': (Referral, AdminSearchService.filter_referrals, ('query', 'status', 'enabler_id', 'date_from', 'date_to')),
+    'leads': (Lead, AdminSearchService.filter_leads, ('query', 'type', 'is_read', 'date_from', 'date_to')),
+}
+
+# Re-evaluate from scratch at least this often
+SAVED_SEARCH_FULL_REFRESH = 86400
+
+# More changed rows than this since the last run: a full run is cheaper
+SAVED_SEARCH_MAX_INCREMENTAL = 5000
+
+# Ids per IN (...) clause when re-checking changed rows
+SAVED_SEARCH_ID_CHUNK = 500
+
+SAVED_SEARCH_MAX_PER_USER = 50
+
+# Change log rows older than this are pruned by archive_events.py
+SEARCH_CHANGE_RETENTION_DAYS = 30
+
+# RollupWatermark row holding the highest pruned change id
+SEARCH_CHANGE_PRUNED_KEY = 'search_changes:pruned'
+
+
+class SavedSearchService:
+    """Service for saved admin searches"""
+
+    # ==========================================
+    # SAVED SEARCHES
+    # ==========================================
+
+    @staticmethod
+    def create(user_id, name, entity_type, filters):
+        """
+        Save a search and evaluate it once
+
+        Args:
+            user_id: Admin user ID
+            name: Name for the saved search
+            entity_type: users, programs, applications, meetings, referrals or leads
+            filters: Filter parameters accepted by the matching search_* method
+
+        Returns:
+            dict: success and the saved search
+        """
+        if not name:
+            return {"success": False, "error": "Name is required"}
+        try:
+            filters = SavedSearchService._clean_filters(entity_type, filters or {})
+        except ValueError as e:
+            return {"success": False, "error": str(e)}
+
+        if SavedSearch.query.filter_by(user_id=user_id).count() >= SAVED_SEARCH_MAX_PER_USER:
+            return {"success": False, "error": f"Limit of {SAVED_SEARCH_MAX_PER_USER} saved searches reached"}
+
+        try:
+            saved = SavedSearch(
+                user_id=user_id,
+                name=name[:200],
+                entity_type=entity_type,
+                filters=json.dumps(filters)
+            )
+            db.session.add(saved)
+            db.session.flush()
+            SavedSearchService.refresh(saved, full=True)
+            db.session.commit()
+            return {
+                "success": True,
+                "message": "Search saved successfully",
+                "search_id": saved.id,
+                "search": saved.to_dict()
+            }
+        except Exception as e:
+            db.session.rollback()
+            return {"success": False, "error": str(e)}
+
+    @staticmethod
+    def list_for_user(user_id):
+        """
+        List a user's saved searches with fresh "new since last view" counts
+
+        Only searches whose entity type has logged changes since their
+        watermark are re-evaluated.
+
+        Returns:
+            list: Saved search dicts, newest first
+        """
+        searches = SavedSearch.query.filter_by(user_id=user_id).order_by(SavedSearch.created_at.desc()).all()
+        if not searches:
+            return []
+
+        latest = dict(
+            db.session.query(SearchChange.entity_type, func.max(SearchChange.id))
+            .group_by(SearchChange.entity_type).all()
+        )
+        full_before = datetime.utcnow() - timedelta(seconds=SAVED_SEARCH_FULL_REFRESH)
+
+        try:
+            for saved in searches:
+                stale = saved.last_full_run_at is None or saved.last_full_run_at < full_before
+                if stale or latest.get(saved.entity_type, 0) > (saved.change_watermark or 0):
+                    SavedSearchService.refresh(saved)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            print(f"Error refreshing saved searches: {e}")
+
+        return [saved.to_dict() for saved in searches]
+
+    @staticmethod
+    def run(search_id, user_id, limit=50, offset=0):
+        """
+        Refresh a saved search and return a page of its results
+
+        Opening a search marks its new results as seen.
+
+        Args:
+            search_id: Saved search ID
+            user_id: Owner (admins only see their own searches)
+            limit: Results per page
+            offset: Pagination offset
+
+        Returns:
+            dict: success, search, results (with is_new flags) and paging info
+        """
+        saved = SavedSearch.query.filter_by(id=search_id, user_id=user_id).first()
+        if not saved:
+            return {"success": False, "error": "Saved search not found"}
+
+        try:
+            SavedSearchService.refresh(saved)
+
+            page = db.session.query(SavedSearchResult.entity_id, SavedSearchResult.is_new).filter(
+                SavedSearchResult.saved_search_id == saved.id
+            ).order_by(SavedSearchResult.entity_id.desc()).offset(offset).limit(limit).all()
+            page_ids = [entity_id for entity_id, _ in page]
+
+            model = SAVED_SEARCH_TYPES[saved.entity_type][0]
+            rows = {row.id: row for row in model.query.filter(model.id.in_(page_ids)).all()} if page_ids else {}
+            results = [
+                {**rows[entity_id].to_dict(), "is_new": bool(is_new)}
+                for entity_id, is_new in page if entity_id in rows
+            ]
+
+            total = saved.result_count or 0
+            new_count = saved.new_count or 0
+            if new_count:
+                SavedSearchResult.query.filter(
+                    SavedSearchResult.saved_search_id == saved.id,
+                    SavedSearchResult.is_new.is_(True)
+                ).update({"is_new": False}, synchronize_session=False)
+            saved.new_count = 0
+            saved.last_viewed_at = datetime.utcnow()
+            db.session.commit()
+
+            return {
+                "success": True,
+                "search": saved.to_dict(),
+                "results": results,
+                "new_since_last_view": new_count,
+                "total": total,
+                "limit": limit,
+                "offset": offset,
+                "has_more": total > offset + limit
+            }
+        except Exception as e:
+            db.session.rollback()
+            return {"success": False, "error": str(e)}
+
+    @staticmethod
+    def delete(search_id, user_id):
+        """Delete one of the user's saved searches"""
+        saved = SavedSearch.query.filter_by(id=search_id, user_id=user_id).first()
+        if not saved:
+            return {"success": False, "error": "Saved search not found"}
+        SavedSearchResult.query.filter_by(saved_search_id=saved.id).delete(synchronize_session=False)
+        db.session.delete(saved)
+        db.session.commit()
+        return {"success": True, "message": "Saved search deleted"}
+
+    # ==========================================
+    # EVALUATION
+    # ==========================================
+
+    @staticmethod
+    def refresh(saved, full=False):
+        """
+        Bring a saved search's cached results up to date (caller commits)
+
+        Args:
+            saved: SavedSearch instance
+            full: Re-evaluate every row instead of only changed ones
+
+        Returns:
+            int: Results added since the previous run
+        """
+        model, builder, _ = SAVED_SEARCH_TYPES[saved.entity_type]
+        filters = SavedSearchService._parse_filters(saved)
+        watermark = saved.change_watermark or 0
+        now = datetime.utcnow()
+        settled_before = now - timedelta(seconds=ROLLUP_SETTLE_SECONDS)
+        first_run = saved.last_run_at is None
+
+        changes = []
+        if not full:
+            pruned = RollupService.get_watermark(SEARCH_CHANGE_PRUNED_KEY)
+            stale = saved.last_full_run_at is None or (
+                now - saved.last_full_run_at > timedelta(seconds=SAVED_SEARCH_FULL_REFRESH)
+            )
+            if stale or watermark < pruned:
+                full = True
+            else:
+                changes = db.session.query(SearchChange.id, SearchChange.entity_id, SearchChange.changed_at).filter(
+                    SearchChange.entity_type == saved.entity_type,
+                    SearchChange.id > watermark
+                ).order_by(SearchChange.id).limit(SAVED_SEARCH_MAX_INCREMENTAL + 1).all()
+                full = len(changes) > SAVED_SEARCH_MAX_INCREMENTAL
+
+        if full:
+            latest = db.session.query(func.max(SearchChange.id)).filter(
+                SearchChange.entity_type == saved.entity_type,
+                SearchChange.changed_at <= settled_before
+            ).scalar() or 0
+            matching = {row[0] for row in builder(**filters).with_entities(model.id)}
+            # entity id -> is_new for every stored result; the counts are
+            # rebuilt from them, which also corrects any drift
+            previous = SavedSearchService._stored_results(saved)
+            result_count = len(previous)
+            new_count = sum(1 for is_new in previous.values() if is_new)
+            new_watermark = latest
+            saved.last_full_run_at = now
+        else:
+            if not changes:
+                saved.last_run_at = now
+                return 0
+
+            changed = {entity_id for _, entity_id, _ in changes}
+            ordered = sorted(changed)
+            matching = set()
+            for start in range(0, len(ordered), SAVED_SEARCH_ID_CHUNK):
+                chunk = ordered[start:start + SAVED_SEARCH_ID_CHUNK]
+                matching.update(
+                    row[0] for row in builder(**filters).filter(model.id.in_(chunk)).with_entities(model.id)
+                )
+            # Only the changed ids can join or leave the results
+            previous = SavedSearchService._stored_results(saved, ordered)
+            result_count = saved.result_count or 0
+            new_count = saved.new_count or 0
+
+            # A change committed late can carry a lower id than one already
+            # read; only move past changes old enough to have settled, and
+            # re-check the rest next time (re-evaluation is idempotent)
+            new_watermark = watermark
+            for change_id, _, changed_at in changes:
+                if changed_at is not None and changed_at > settled_before:
+                    break
+                new_watermark = change_id
+
+        added = matching - previous.keys()
+        removed = previous.keys() - matching
+        # The first evaluation defines the baseline; nothing is "new" yet
+        mark_new = not first_run
+
+        table = SavedSearchResult.__table__
+        removed_ids = sorted(removed)
+        for start in range(0, len(removed_ids), SAVED_SEARCH_ID_CHUNK):
+            db.session.execute(table.delete().where(
+                table.c.saved_search_id == saved.id,
+                table.c.entity_id.in_(removed_ids[start:start + SAVED_SEARCH_ID_CHUNK])
+            ))
+        if added:
+            db.session.execute(table.insert(), [
+                {"saved_search_id": saved.id, "entity_id": entity_id, "is_new": mark_new, "added_at": now}
+                for entity_id in sorted(added)
+            ])
+
+        saved.result_count = result_count + len(added) - len(removed)
+        saved.new_count = (
+            new_count
+            - sum(1 for entity_id in removed if previous[entity_id])
+            + (len(added) if mark_new else 0)
+        )
+        saved.change_watermark = new_watermark
+        saved.last_run_at = now
+        return 0 if first_run else len(added)
+
+    @staticmethod
+    def _stored_results(saved, entity_ids=None):
+        """
+        Stored results of a saved search
+
+        Args:
+            saved: SavedSearch instance
+            entity_ids: Only look these ids up (default: every result)
+
+        Returns:
+            dict: entity id -> is_new
+        """
+        query = db.session.query(SavedSearchResult.entity_id, SavedSearchResult.is_new).filter(
+            SavedSearchResult.saved_search_id == saved.id
+        )
+        if entity_ids is None:
+            return {entity_id: bool(is_new) for entity_id, is_new in query}
+
+        stored = {}
+        for start in range(0, len(entity_ids), SAVED_SEARCH_ID_CHUNK):
+            chunk = entity_ids[start:start + SAVED_SEARCH_ID_CHUNK]
+            stored.update(
+                (entity_id, bool(is_new))
+                for entity_id, is_new in query.filter(SavedSearchResult.entity_id.in_(chunk))
+            )
+        return stored
+
+    @staticmethod
+    def _clean_filters(entity_type, filters):
+        """Validate a filter spec; returns the JSON-safe subset"""
+        if entity_type not in SAVED_SEARCH_TYPES:
+            raise ValueError(f"Unknown entity type: {entity_type}")
+        allowed = SAVED_SEARCH_TYPES[entity_type][2]
+
+        # search routes take the text as ?q=
+        if 'q' in filters and 'query' not in filters:
+            filters = {**filters, 'query': filters['q']}
+
+        cleaned = {}
+        for key in allowed:
+            value = filters.get(key)
+            if value in (None, ''):
+                continue
+            if key in ('date_from', 'date_to'):
+                value = datetime.fromisoformat(str(value)).isoformat()
+            elif key in ('program_id', 'enabler_id'):
+                value = int(value)
+            elif key == 'is_read' and isinstance(value, str):
+                value = value.lower() == 'true'
+            cleaned[key] = value
+        return cleaned
+
+    @staticmethod
+    def _parse_filters(saved):
+        """Stored filter spec as keyword arguments for the filter builder"""
+        filters = json.loads(saved.filters or "{}")
+        for key in ('date_from', 'date_to'):
+            if filters.get(key):
+                filters[key] = datetime.fromisoformat(filters[key])
+        return filters
+
+    # ==========================================
+    # CHANGE LOG
+    # ==========================================
+
+    @staticmethod
+    def prune_changes(days=SEARCH_CHANGE_RETENTION_DAYS):
+        """
+        Delete change log rows older than `days`
+
+        Searches whose watermark falls below the pruned range do a full run
+        on their next refresh.
+
+        Returns:
+            int: Rows deleted
+        """
+        cutoff = datetime.utcnow() - timedelta(days=days)
+        highest = db.session.query(func.max(SearchChange.id)).filter(SearchChange.changed_at < cutoff).scalar()
+        if not highest:
+            return 0
+
+        connection = db.session.connection()
+        pruned = RollupService.get_watermark(SEARCH_CHANGE_PRUNED_KEY, connection)
+        deleted = SearchChange.query.filter(SearchChange.id <= highest).delete(synchronize_session=False)
+        RollupService.advance_watermark(connection, SEARCH_CHANGE_PRUNED_KEY, pruned, max(pruned, highest))
+        db.session.commit()
+        return deleted
+
+    @staticmethod
+    def _after_flush(session, flush_context):
+        """Log inserted, modified and deleted searchable rows"""
+        changes = []
+        for obj in list(session.new) + list(session.deleted):
+            entity_type = _MODEL_TYPES.get(type(obj))
+            if entity_type and obj.id is not None:
+                changes.append((entity_type, obj.id))
+        for obj in session.dirty:
+            entity_type = _MODEL_TYPES.get(type(obj))
+            if entity_type and obj.id is not None and session.is_modified(obj, include_collections=False):
+                changes.append((entity_type, obj.id))
+
+        if not changes:
+            return
+
+        connection = session.connection()
+        if not SessionHooks.table_ready(connection, SearchChange.__tablename__):
+            return
+
+        now = datetime.utcnow()
+        connection.execute(
+            SearchChange.__table__.insert(),
+            [
+                {"entity_type": entity_type, "entity_id": entity_id, "changed_at": now}
+                for entity_type, entity_id in dict.fromkeys(changes)
+            ]
+        )
+
+
+# model class -> entity type
+_MODEL_TYPES = {model: entity_type for entity_type, (model, _, _) in SAVED_SEARCH_TYPES.items()}
+
+SessionHooks.on_flush(_MODEL_TYPES, SavedSearchService._after_flush)
@@ -0,0 +1,289 @@
+"""
+Search Index Service
+Full-text index for admin search: SQLite FTS5 or Postgres tsvector + GIN
+
+One index table holds a document per searchable row (users, programs,
+meetings, leads, referrals). The document id packs the entity id and type
+(entity_id * 8 + type code), so updates and deletes are primary-key lookups
+on both backends.
+
+The index is kept current by an ORM after_flush hook. Bulk query.update() /
+delete() calls bypass the ORM and need `python rebuild_search_index.py`.
+Until the index has been built, callers fall back to ILIKE scans.
+"""
+
+import re
+
+from sqlalchemy import Integer, column, inspect, text
+
+from export_service import ExportService
+from extensions import db
+from models import User, Opportunity, Meeting, Lead, Referral
+from session_hooks import SessionHooks
+
+
+SEARCH_INDEX_TABLE = 'search_index'
+
+# entity type -> (type code, model, title fields, body fields)
+SEARCH_ENTITIES = {
+    'user': (1, User, ('name',), ('email', 'company')),
+    'program': (2, Opportunity, ('title',), ('description', 'benefits')),
+    'meeting': (3, Meeting, ('title',), ('description',)),
+    'lead': (4, Lead, ('name',), ('email', 'company', 'subject', 'message')),
+    'referral': (5, Referral, ('startup_name',), ('startup_email', 'notes')),
+}
+
+# Title matches outrank body matches
+SEARCH_TITLE_WEIGHT = 10.0
+
+# Query terms considered (each is prefix-matched)
+SEARCH_MAX_TERMS = 8
+
+# Rows per insert during rebuilds
+SEARCH_REBUILD_BATCH = 2000
+
+_TOKEN = re.compile(r'\w+', re.UNICODE)
+
+
+class SearchIndexService:
+    """Service for maintaining and querying the full-text search index"""
+
+    # ==========================================
+    # QUERIES
+    # ==========================================
+
+    @staticmethod
+    def available():
+        """Whether the index exists on this database"""
+        return SearchIndexService._ready(db.session.get_bind())
+
+    @staticmethod
+    def can_search(query):
+        """Whether a query can be answered from the index (else fall back to ILIKE)"""
+        return bool(SearchIndexService.tokens(query)) and SearchIndexService.available()
+
+    @staticmethod
+    def search(entity_type, query, limit=20):
+        """
+        Ranked prefix search within one entity type
+
+        Args:
+            entity_type: user, program, meeting, lead or referral
+            query: Free-text search (every term is prefix-matched)
+            limit: Max results
+
+        Returns:
+            list: Entity ids, best match first
+        """
+        match = SearchIndexService._match_expression(query)
+        if not match:
+            return []
+
+        code = SEARCH_ENTITIES[entity_type][0]
+        if SearchIndexService._dialect() == 'sqlite':
+            sql = (
+                f"SELECT rowid / 8 FROM {SEARCH_INDEX_TABLE} "
+                f"WHERE {SEARCH_INDEX_TABLE} MATCH :match AND rowid % 8 = :code "
+                f"ORDER BY bm25({SEARCH_INDEX_TABLE}, {SEARCH_TITLE_WEIGHT}, 1.0) LIMIT :limit"
+            )
+        else:
+            sql = (
+                f"SELECT doc_id / 8 FROM {SEARCH_INDEX_TABLE} "
+                f"WHERE document @@ to_tsquery('simple', :match) AND entity_code = :code "
+                f"ORDER BY ts_rank(document, to_tsquery('simple', :match)) DESC LIMIT :limit"
+            )
+
+        rows = db.session.execute(text(sql), {"match": match, "code": code, "limit": limit})
+        return [row[0] for row in rows]
+
+    @staticmethod
+    def match_ids(entity_type, query):
+        """
+        Selectable of all matching entity ids, for Model.id.in_(...) filters
+
+        Args:
+            entity_type: user, program, meeting, lead or referral
+            query: Free-text search
+
+        Returns:
+            TextualSelect with one entity_id column
+        """
+        code = SEARCH_ENTITIES[entity_type][0]
+        match = SearchIndexService._match_expression(query)
+
+        if SearchIndexService._dialect() == 'sqlite':
+            sql = (
+                f"SELECT rowid / 8 AS entity_id FROM {SEARCH_INDEX_TABLE} "
+                f"WHERE {SEARCH_INDEX_TABLE} MATCH :match_{entity_type} AND rowid % 8 = {code}"
+            )
+        else:
+            sql = (
+                f"SELECT doc_id / 8 AS entity_id FROM {SEARCH_INDEX_TABLE} "
+                f"WHERE document @@ to_tsquery('simple', :match_{entity_type}) AND entity_code = {code}"
+            )
+
+        return text(sql).bindparams(**{f"match_{entity_type}": match}).columns(column('entity_id', Integer))
+
+    @staticmethod
+    def _match_expression(query):
+        """Turn user input into a prefix query: 'ann sm' -> ann* AND sm*"""
+        terms = SearchIndexService.tokens(query)[:SEARCH_MAX_TERMS]
+        if not terms:
+            return None
+        if SearchIndexService._dialect() == 'sqlite':
+            return ' '.join(f'"{term}"*' for term in terms)
+        return ' & '.join(f"{term}:*" for term in terms)
+
+    @staticmethod
+    def tokens(value):
+        """Lower-cased word tokens, as indexed"""
+        return _TOKEN.findall((value or '').lower())
+
+    @staticmethod
+    def _dialect():
+        return db.session.get_bind().dialect.name
+
+    # ==========================================
+    # MAINTENANCE
+    # ==========================================
+
+    @staticmethod
+    def rebuild():
+        """
+        Drop, recreate and repopulate the index from the source tables
+
+        Returns:
+            dict: Documents indexed per entity type
+        """
+        connection = db.session.connection()
+        dialect = connection.dialect.name
+        if dialect not in ('sqlite', 'postgresql'):
+            raise ValueError(f"Full-text search is not supported on {dialect}")
+
+        connection.execute(text(f"DROP TABLE IF EXISTS {SEARCH_INDEX_TABLE}"))
+        if dialect == 'sqlite':
+            connection.execute(text(
+                f"CREATE VIRTUAL TABLE {SEARCH_INDEX_TABLE} USING fts5("
+                f"title, body, prefix='2 3', tokenize='unicode61 remove_diacritics 2')"
+            ))
+        else:
+            connection.execute(text(
+                f"CREATE TABLE {SEARCH_INDEX_TABLE} ("
+                f"doc_id BIGINT PRIMARY KEY, "
+                f"entity_code SMALLINT NOT NULL, "
+                f"title TEXT, body TEXT, "
+                f"document TSVECTOR GENERATED ALWAYS AS ("
+                f"setweight(to_tsvector('simple', coalesce(title, '')), 'A') || "
+                f"setweight(to_tsvector('simple', coalesce(body, '')), 'B')) STORED)"
+            ))
+
+        counts = {}
+        for entity_type, (code, model, title_fields, body_fields) in SEARCH_ENTITIES.items():
+            fields = title_fields + body_fields
+            query = db.session.query(model.id, *[getattr(model, field) for field in fields]).order_by(model.id)
+
+            batch, counts[entity_type] = [], 0
+            for row in ExportService.iter_rows(query):
+                batch.append(SearchIndexService._document(
+                    entity_type, row[0], dict(zip(fields, row[1:]))
+                ))
+                if len(batch) >= SEARCH_REBUILD_BATCH:
+                    SearchIndexService._insert(connection, batch)
+                    counts[entity_type] += len(batch)
+                    batch = []
+            if batch:
+                SearchIndexService._insert(connection, batch)
+                counts[entity_type] += len(batch)
+
+        # Build the GIN index after the bulk load; cheaper than maintaining it row by row
+        if dialect == 'postgresql':
+            connection.execute(text(
+                f"CREATE INDEX ix_{SEARCH_INDEX_TABLE}_document ON {SEARCH_INDEX_TABLE} USING GIN (document)"
+            ))
+
+        db.session.commit()
+        SessionHooks.invalidate_tables(SEARCH_INDEX_TABLE)
+        return counts
+
+    @staticmethod
+    def _ready(bind):
+        return bind.dialect.name in ('sqlite', 'postgresql') and SessionHooks.table_ready(bind, SEARCH_INDEX_TABLE)
+
+    @staticmethod
+    def _document(entity_type, entity_id, values):
+        """Build an index row from field values"""
+        code, _, title_fields, body_fields = SEARCH_ENTITIES[entity_type]
+        join = lambda fields: ' '.join(SearchIndexService.tokens(
+            ' '.join(str(values[field]) for field in fields if values.get(field))
+        ))
+        return {
+            "doc_id": entity_id * 8 + code,
+            "code": code,
+            "title": join(title_fields),
+            "body": join(body_fields)
+        }
+
+    @staticmethod
+    def _insert(connection, documents):
+        if connection.dialect.name == 'sqlite':
+            sql = f"INSERT INTO {SEARCH_INDEX_TABLE} (rowid, title, body) VALUES (:doc_id, :title, :body)"
+        else:
+            sql = (
+                f"INSERT INTO {SEARCH_INDEX_TABLE} (doc_id, entity_code, title, body) "
+                f"VALUES (:doc_id, :code, :title, :body)"
+            )
+        connection.execute(text(sql), documents)
+
+    @staticmethod
+    def _delete(connection, doc_ids):
+        key = 'rowid' if connection.dialect.name == 'sqlite' else 'doc_id'
+        connection.execute(
+            text(f"DELETE FROM {SEARCH_INDEX_TABLE} WHERE {key} = :doc_id"),
+            [{"doc_id": doc_id} for doc_id in doc_ids]
+        )
+
+    @staticmethod
+    def _after_flush(session, flush_context):
+        """Re-index rows whose searchable fields were inserted, changed or deleted"""
+        changed, removed = [], []
+        for obj in session.new:
+            if type(obj) in _MODEL_ENTITIES:
+                changed.append(obj)
+        for obj in session.dirty:
+            entity_type = _MODEL_ENTITIES.get(type(obj))
+            if entity_type and SearchIndexService._fields_changed(obj, entity_type):
+                changed.append(obj)
+        for obj in session.deleted:
+            entity_type = _MODEL_ENTITIES.get(type(obj))
+            if entity_type and obj.id is not None:
+                removed.append(obj.id * 8 + SEARCH_ENTITIES[entity_type][0])
+
+        if not changed and not removed:
+            return
+
+        connection = session.connection()
+        if not SearchIndexService._ready(connection):
+            return
+
+        documents = []
+        for obj in changed:
+            entity_type = _MODEL_ENTITIES[type(obj)]
+            _, _, title_fields, body_fields = SEARCH_ENTITIES[entity_type]
+            values = {field: getattr(obj, field) for field in title_fields + body_fields}
+            documents.append(SearchIndexService._document(entity_type, obj.id, values))
+
+        SearchIndexService._delete(connection, removed + [doc["doc_id"] for doc in documents])
+        if documents:
+            SearchIndexService._insert(connection, documents)
+
+    @staticmethod
+    def _fields_changed(obj, entity_type):
+        _, _, title_fields, body_fields = SEARCH_ENTITIES[entity_type]
+        state = inspect(obj)
+        return any(state.attrs[field].history.has_changes() for field in title_fields + body_fields)
+
+
+# model class -> entity type
+_MODEL_ENTITIES = {model: entity_type for entity_type, (_, model, _, _) in SEARCH_ENTITIES.items()}
+
+SessionHooks.on_flush(_MODEL_ENTITIES, SearchIndexService._after_flush)
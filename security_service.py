@@ -7,6 +7,7 @@ Handles fraud detection, rate limiting, and security monitoring
 from datetime import datetime, timedelta
 from extensions import db
 from models import Referral, ReferralClick, RewardTransaction, User, EnablerLevel
+from referral_dedup_service import ReferralDedupService
 from sqlalchemy import func
 import hashlib
 import re
@@ -56,7 +57,14 @@ class SecurityService:
                 flags.append(f"Similar names detected: {len(similar_names)} groups")
                 risk_score += 15
 
-            # Check 4: Referrals without clicks (link referrals)
+            # Check 4: Same startups already referred by other enablers
+            cross_duplicates = ReferralDedupService.duplicates_of_enabler(enabler_id)
+            duplicated = {own_id for own_id, _, _ in cross_duplicates}
+            if len(duplicated) > 3:
+                flags.append(f"Duplicate submissions: {len(duplicated)} referrals match other enablers' referrals")
+                risk_score += 15
+
+            # Check 5: Referrals without clicks (link referrals)
             link_referrals = [r for r in referrals if r.is_link_referral]
             no_click_referrals = []
             for r in link_referrals:
@@ -68,7 +76,7 @@ class SecurityService:
                 flags.append(f"Suspicious: {len(no_click_referrals)} successful referrals with no clicks")
                 risk_score += 25
 
-            # Check 5: Conversion rate too high
+            # Check 6: Conversion rate too high
             successful = len([r for r in referrals if r.status == "successful"])
             if len(referrals) > 10:
                 conversion_rate = successful / len(referrals)
@@ -76,7 +84,7 @@ class SecurityService:
                     flags.append(f"Unusually high conversion: {conversion_rate*100:.1f}%")
                     risk_score += 20
 
-            # Check 6: IP address patterns for clicks
+            # Check 7: IP address patterns for clicks
             ip_patterns = SecurityService._analyze_ip_patterns(enabler_id)
             if ip_patterns["suspicious"]:
                 flags.append(f"Suspicious IP patterns: {ip_patterns['message']}")
@@ -107,44 +115,8 @@ class SecurityService:
 
     @staticmethod
     def _find_similar_names(names):
-        """Find groups of similar names"""
-        similar_groups = []
-        checked = set()
-
-        for i, name1 in enumerate(names):
-            if name1 in checked:
-                continue
-
-            group = [name1]
-            for name2 in names[i+1:]:
-                if name2 in checked:
-                    continue
-
-                # Simple similarity check
-                similarity = SecurityService._string_similarity(name1.lower(), name2.lower())
-                if similarity > 0.7:
-                    group.append(name2)
-                    checked.add(name2)
-
-            if len(group) > 1:
-                similar_groups.append(group)
-                checked.add(name1)
-
-        return similar_groups
-
-    @staticmethod
-    def _string_similarity(s1, s2):
-        """Calculate string similarity (simple Jaccard similarity)"""
-        set1 = set(s1.split())
-        set2 = set(s2.split())
-        
-        if not set1 or not set2:
-            return 0
-
-        intersection = len(set1.intersection(set2))
-        union = len(set1.union(set2))
-        
-        return intersection / union if union > 0 else 0
+        """Find groups of similar names (MinHash/LSH, near-linear in len(names))"""
+        return ReferralDedupService.group_similar([name for name in names if name], field='startup_name')
 
     @staticmethod
     def _analyze_ip_patterns(enabler_id):
@@ -0,0 +1,185 @@
+"""
+Session Hooks
+One set of ORM Session listeners shared by every incrementally maintained structure
+
+Services register here instead of adding their own global listeners:
+
+- on_flush handlers write derived rows inside the flushing transaction (index
+  tables, counters), so they commit or roll back with the change itself.
+- on_commit caches collect a snapshot after each flush into session.info; the
+  snapshot is applied once the commit succeeds and dropped on rollback.
+
+Handlers only run for flushes that touched one of their models. Derived tables
+created after startup (rebuild scripts, migrations) are found through
+table_ready(), whose negative answers expire, and which rebuild() invalidates.
+"""
+
+from itertools import chain
+import time
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+
+# Full rebuild of in-process caches at most this often, to catch writes that bypassed the ORM
+CACHE_REBUILD_INTERVAL = 3600
+
+# A missing derived table is probed for again after this many seconds
+TABLE_PROBE_RETRY = 60
+
+# session.info key holding each cache's uncommitted snapshot
+PENDING_KEY = 'session_hooks_pending'
+
+# (models, handler) in registration order
+_flush_handlers = []
+
+# name -> (models, collect, apply, pending factory)
+_caches = {}
+
+# (bind url, table) -> (exists, probed_at)
+_tables = {}
+
+
+class SessionHooks:
+    """Dispatcher for flush/commit/rollback hooks and derived-table probes"""
+
+    # ==========================================
+    # REGISTRATION
+    # ==========================================
+
+    @staticmethod
+    def on_flush(models, handler):
+        """
+        Run handler(session, flush_context) after flushes that touch any of models
+
+        Args:
+            models: Model classes the handler cares about
+            handler: Callable writing through session.connection()
+        """
+        _flush_handlers.append((tuple(models), handler))
+
+    @staticmethod
+    def on_commit(name, models, collect, apply, pending=dict):
+        """
+        Snapshot changes on flush and apply them only once the commit succeeds
+
+        Snapshots are applied in registration order, so a cache may read
+        another one it imports from inside apply().
+
+        Args:
+            name: Unique cache name (keys the snapshot in session.info)
+            models: Model classes the cache is derived from
+            collect: collect(session, pending) adds the flush's changes to pending
+            apply: apply(pending) patches the cache after commit
+            pending: Factory for an empty snapshot
+        """
+        _caches[name] = (tuple(models), collect, apply, pending)
+
+    @staticmethod
+    def invalidate_on_commit(name, models, invalidate):
+        """Call invalidate() after each commit that wrote any of models"""
+        SessionHooks.on_commit(name, models, lambda session, pending: None, lambda pending: invalidate())
+
+    @staticmethod
+    def touch(session, name):
+        """
+        Mark an on_commit cache as changed by the current transaction
+
+        For writes no flush sees (bulk UPDATEs, raw SQL): the cache's apply()
+        runs on commit, and nothing happens on rollback.
+
+        Returns:
+            The cache's snapshot for this transaction, for the caller to fill in
+        """
+        pending = session.info.setdefault(PENDING_KEY, {})
+        if name not in pending:
+            pending[name] = _caches[name][3]()
+        return pending[name]
+
+    @staticmethod
+    def track_previous(*attributes):
+        """
+        Load the old value when one of these attributes is set on an expired
+        instance, so flush handlers always find it in history.deleted
+
+        Args:
+            attributes: Mapped attributes, e.g. Message.recipient_id
+        """
+        for attribute in attributes:
+            event.listen(attribute, 'set', SessionHooks._keep_previous, active_history=True)
+
+    @staticmethod
+    def is_stale(built_at, interval=CACHE_REBUILD_INTERVAL):
+        """Whether a cache built at built_at (monotonic, None = never) needs a full rebuild"""
+        return built_at is None or time.monotonic() - built_at > interval
+
+    # ==========================================
+    # DERIVED TABLES
+    # ==========================================
+
+    @staticmethod
+    def table_ready(bind, table_name):
+        """
+        Whether a derived table exists on this database
+
+        Args:
+            bind: Engine or Connection
+            table_name: Table to probe
+
+        Returns:
+            bool: True once found (until invalidated); misses are re-probed after TABLE_PROBE_RETRY
+        """
+        key = (str(bind.engine.url), table_name)
+        exists, probed_at = _tables.get(key, (False, None))
+        if exists:
+            return True
+        if probed_at is None or time.monotonic() - probed_at > TABLE_PROBE_RETRY:
+            exists = inspect(bind).has_table(table_name)
+            _tables[key] = (exists, time.monotonic())
+        return exists
+
+    @staticmethod
+    def invalidate_tables(*table_names):
+        """Forget probe results for these tables (all tables when none given)"""
+        for key in list(_tables):
+            if not table_names or key[1] in table_names:
+                del _tables[key]
+
+    # ==========================================
+    # LISTENERS
+    # ==========================================
+
+    @staticmethod
+    def _keep_previous(target, value, oldvalue, initiator):
+        pass
+
+    @staticmethod
+    def _touched(session, models):
+        return any(isinstance(obj, models) for obj in chain(session.new, session.dirty, session.deleted))
+
+    @staticmethod
+    def _after_flush(session, flush_context):
+        for models, handler in _flush_handlers:
+            if SessionHooks._touched(session, models):
+                handler(session, flush_context)
+
+        for name, (models, collect, _, factory) in _caches.items():
+            if SessionHooks._touched(session, models):
+                collect(session, SessionHooks.touch(session, name))
+
+    @staticmethod
+    def _after_commit(session):
+        pending = session.info.pop(PENDING_KEY, None)
+        if not pending:
+            return
+        for name, snapshot in pending.items():
+            _caches[name][2](snapshot)
+
+    @staticmethod
+    def _after_rollback(session):
+        session.info.pop(PENDING_KEY, None)
+
+
+event.listen(Session, 'after_flush', SessionHooks._after_flush)
+event.listen(Session, 'after_commit', SessionHooks._after_commit)
+event.listen(Session, 'after_rollback', SessionHooks._after_rollback)
@@ -0,0 +1,175 @@
+"""
+Startup Search Service
+In-process BM25 index over startup profiles for corporate discovery
+
+Each startup's name, description, problem, solution and traction are tokenized
+into one inverted index (term -> {startup_id: weighted term frequency}), with
+per-field weights folded into the term frequencies and document lengths
+(BM25F-style). A query scores every startup containing any query term by
+walking only those terms' posting lists.
+
+The index is built lazily on first use and patched on commit for Startup
+writes made through the ORM. A periodic full rebuild (CACHE_REBUILD_INTERVAL)
+picks up bulk edits that bypass the ORM.
+"""
+
+from collections import Counter
+import math
+import threading
+import time
+
+from sqlalchemy import inspect
+
+from extensions import db
+from models import Startup
+from search_index_service import SearchIndexService
+from session_hooks import SessionHooks
+
+
+# Indexed field -> weight applied to its term frequencies and length
+STARTUP_SEARCH_FIELDS = {
+    'name': 3.0,
+    'description': 1.0,
+    'problem': 1.5,
+    'solution': 1.5,
+    'traction': 1.0,
+}
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Query terms considered
+STARTUP_SEARCH_MAX_TERMS = 12
+
+# term -> {startup_id: weighted tf}; startup_id -> (Counter of weighted tfs, weighted length)
+_index = {'postings': {}, 'docs': {}, 'total_length': 0.0, 'built_at': None}
+_lock = threading.Lock()
+
+
+class StartupSearchService:
+    """Service for BM25 relevance over startup profiles"""
+
+    @staticmethod
+    def score(query):
+        """
+        BM25 score of every startup matching at least one query term
+
+        Args:
+            query: Free-text search
+
+        Returns:
+            dict: {startup_id: score} (empty when the query has no terms)
+        """
+        terms = list(dict.fromkeys(SearchIndexService.tokens(query)))[:STARTUP_SEARCH_MAX_TERMS]
+        if not terms:
+            return {}
+
+        StartupSearchService._ensure_built()
+
+        scores = Counter()
+        with _lock:
+            docs = _index['docs']
+            count = len(docs)
+            if not count:
+                return {}
+            average = _index['total_length'] / count or 1.0
+
+            for term in terms:
+                postings = _index['postings'].get(term)
+                if not postings:
+                    continue
+                # BM25+ style IDF, never negative for very common terms
+                idf = math.log(1.0 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+                for startup_id, tf in postings.items():
+                    norm = BM25_K1 * (1.0 - BM25_B + BM25_B * docs[startup_id][1] / average)
+                    scores[startup_id] += idf * tf * (BM25_K1 + 1.0) / (tf + norm)
+
+        return dict(scores)
+
+    # ==========================================
+    # INDEX MAINTENANCE
+    # ==========================================
+
+    @staticmethod
+    def rebuild():
+        """Reload the whole index from the database"""
+        columns = [getattr(Startup, field) for field in STARTUP_SEARCH_FIELDS]
+        postings, docs, total_length = {}, {}, 0.0
+
+        for row in db.session.query(Startup.id, *columns).yield_per(1000):
+            doc = StartupSearchService._document(dict(zip(STARTUP_SEARCH_FIELDS, row[1:])))
+            docs[row[0]] = doc
+            total_length += doc[1]
+            for term, tf in doc[0].items():
+                postings.setdefault(term, {})[row[0]] = tf
+
+        with _lock:
+            _index['postings'] = postings
+            _index['docs'] = docs
+            _index['total_length'] = total_length
+            _index['built_at'] = time.monotonic()
+
+        return len(docs)
+
+    @staticmethod
+    def _ensure_built():
+        if SessionHooks.is_stale(_index['built_at']):
+            StartupSearchService.rebuild()
+
+    @staticmethod
+    def _document(values):
+        """Weighted term frequencies and weighted length of one startup"""
+        tfs = Counter()
+        length = 0.0
+        for field, weight in STARTUP_SEARCH_FIELDS.items():
+            tokens = SearchIndexService.tokens(values.get(field))
+            length += weight * len(tokens)
+            for token in tokens:
+                tfs[token] += weight
+        return tfs, length
+
+    @staticmethod
+    def _apply(changes):
+        """Patch the index with committed documents (None = deleted)"""
+        with _lock:
+            if _index['built_at'] is None:
+                return
+            postings, docs = _index['postings'], _index['docs']
+
+            for startup_id, doc in changes.items():
+                old = docs.pop(startup_id, None)
+                if old:
+                    _index['total_length'] -= old[1]
+                    for term in old[0]:
+                        term_postings = postings.get(term)
+                        if term_postings is not None:
+                            term_postings.pop(startup_id, None)
+                            if not term_postings:
+                                del postings[term]
+
+                if doc:
+                    docs[startup_id] = doc
+                    _index['total_length'] += doc[1]
+                    for term, tf in doc[0].items():
+                        postings.setdefault(term, {})[startup_id] = tf
+
+    @staticmethod
+    def _collect(session, pending):
+        """Snapshot changed startups; applied only once the commit succeeds"""
+        for obj in list(session.new) + list(session.dirty):
+            if not isinstance(obj, Startup):
+                continue
+            if obj not in session.new and not any(
+                inspect(obj).attrs[field].history.has_changes() for field in STARTUP_SEARCH_FIELDS
+            ):
+                continue
+            pending[obj.id] = StartupSearchService._document(
+                {field: getattr(obj, field) for field in STARTUP_SEARCH_FIELDS}
+            )
+
+        for obj in session.deleted:
+            if isinstance(obj, Startup):
+                pending[obj.id] = None
+
+
+SessionHooks.on_commit('startup_search', [Startup], StartupSearchService._collect, StartupSearchService._apply)
@@ -0,0 +1,304 @@
+"""
+Startup Similarity Service
+Precomputed "similar startups" from TF-IDF vectors over startup text
+
+Each startup's description, problem and solution are turned into a sparse,
+L2-normalized TF-IDF vector (sublinear tf, smoothed idf; terms used by more
+than SIMILARITY_MAX_DF of startups are dropped). Vectors are held as NumPy
+CSR (startup -> terms) and CSC (term -> startups) arrays; cosine scores for a
+block of startups against everyone are accumulated by expanding the block's
+terms over their posting lists into one bincount. The top SIMILAR_TOP_K
+neighbours per startup are persisted in startup_similarities.
+
+refresh() runs offline (refresh_startup_similarity.py). It fingerprints every
+startup's text and only recomputes the lists that can have changed: startups
+whose text changed, startups whose list contains a changed or deleted one,
+and startups a changed startup now outranks a current neighbour of.
+"""
+
+from collections import Counter
+from datetime import datetime
+import hashlib
+import math
+
+import numpy as np
+from sqlalchemy import func
+
+from counter_service import CounterService
+from extensions import db
+from models import Startup, StartupSimilarity, StartupSimilarityState
+from search_index_service import SearchIndexService
+
+
+SIMILARITY_FIELDS = ('description', 'problem', 'solution')
+
+SIMILAR_TOP_K = 10
+
+# Neighbours below this cosine are not stored
+SIMILARITY_MIN_SCORE = 0.05
+
+# Terms in more than this share of startups carry no signal
+SIMILARITY_MAX_DF = 0.5
+
+# Per block: dense score cells (block x startups) and expanded posting entries
+SIMILARITY_BLOCK_CELLS = 4_000_000
+SIMILARITY_BLOCK_POSTINGS = 4_000_000
+
+# More than this share of startups changed -> recompute every list
+SIMILARITY_FULL_SHARE = 0.2
+
+# Rows per DELETE ... IN (...) / INSERT batch
+SIMILARITY_WRITE_CHUNK = 500
+
+
+class StartupSimilarityService:
+    """Service for TF-IDF nearest-neighbour startups"""
+
+    @staticmethod
+    def similar(startup_id, limit=SIMILAR_TOP_K):
+        """
+        Precomputed most similar startups
+
+        Args:
+            startup_id: Startup ID
+            limit: Max neighbours (up to SIMILAR_TOP_K)
+
+        Returns:
+            list: (Startup, score) pairs, most similar first
+        """
+        return db.session.query(Startup, StartupSimilarity.score).join(
+            StartupSimilarity, StartupSimilarity.similar_startup_id == Startup.id
+        ).filter(
+            StartupSimilarity.startup_id == startup_id
+        ).order_by(StartupSimilarity.rank).limit(max(1, min(limit, SIMILAR_TOP_K))).all()
+
+    # ==========================================
+    # OFFLINE REFRESH
+    # ==========================================
+
+    @staticmethod
+    def refresh(full=False):
+        """
+        Recompute neighbour lists whose inputs changed since the last run
+
+        Args:
+            full: Recompute every list
+
+        Returns:
+            dict: startups vectorized, lists recomputed, startups changed/removed, full
+        """
+        rows = db.session.query(Startup.id, *[getattr(Startup, f) for f in SIMILARITY_FIELDS]).order_by(Startup.id).all()
+        texts = {row[0]: '\n'.join(value or '' for value in row[1:]) for row in rows}
+        hashes = {startup_id: hashlib.md5(text.encode('utf-8')).hexdigest() for startup_id, text in texts.items()}
+
+        state = dict(db.session.query(StartupSimilarityState.startup_id, StartupSimilarityState.text_hash))
+        changed = {startup_id for startup_id, digest in hashes.items() if state.get(startup_id) != digest}
+        removed = set(state) - set(hashes)
+
+        vectors = StartupSimilarityService.vectorize(texts)
+        full = full or not state or len(changed) + len(removed) > SIMILARITY_FULL_SHARE * max(len(hashes), 1)
+
+        if full:
+            targets = set(hashes)
+        else:
+            targets = StartupSimilarityService._affected(vectors, changed, removed)
+
+        neighbours = StartupSimilarityService.top_neighbours(vectors, sorted(targets))
+        StartupSimilarityService._save(neighbours, {t: hashes[t] for t in targets}, removed, full)
+        db.session.commit()
+
+        return {
+            "startups": len(hashes),
+            "recomputed": len(targets),
+            "changed": len(changed),
+            "removed": len(removed),
+            "full": full
+        }
+
+    @staticmethod
+    def _affected(vectors, changed, removed):
+        """Startups whose neighbour list may differ after changed/removed startups"""
+        targets = set(changed)
+        gone = changed | removed
+        if not gone:
+            return targets
+
+        # Lists that contain a changed or removed startup
+        gone_list = list(gone)
+        for start in range(0, len(gone_list), SIMILARITY_WRITE_CHUNK):
+            chunk = gone_list[start:start + SIMILARITY_WRITE_CHUNK]
+            targets |= {
+                row.startup_id for row in db.session.query(StartupSimilarity.startup_id).filter(
+                    StartupSimilarity.similar_startup_id.in_(chunk)
+                )
+            }
+
+        # Lists a changed startup now beats the weakest entry of
+        ids = vectors['ids']
+        kth = np.full(len(ids), SIMILARITY_MIN_SCORE)
+        for startup_id, entries, weakest in db.session.query(
+            StartupSimilarity.startup_id, func.count(StartupSimilarity.id), func.min(StartupSimilarity.score)
+        ).group_by(StartupSimilarity.startup_id):
+            position = vectors['positions'].get(startup_id)
+            if position is not None and entries >= SIMILAR_TOP_K:
+                kth[position] = weakest
+
+        positions = [vectors['positions'][startup_id] for startup_id in changed]
+        beaten = np.zeros(len(ids), dtype=bool)
+        for block in StartupSimilarityService._blocks(vectors, positions):
+            beaten |= (StartupSimilarityService._block_scores(vectors, block) > kth).any(axis=0)
+        targets |= set(ids[beaten].tolist())
+
+        return targets - removed
+
+    @staticmethod
+    def _save(neighbours, hashes, removed, full):
+        """Replace the stored lists of the recomputed startups"""
+        now = datetime.utcnow()
+        if full:
+            StartupSimilarity.query.delete(synchronize_session=False)
+            StartupSimilarityState.query.delete(synchronize_session=False)
+        else:
+            stale = list(set(hashes) | removed)
+            for start in range(0, len(stale), SIMILARITY_WRITE_CHUNK):
+                chunk = stale[start:start + SIMILARITY_WRITE_CHUNK]
+                StartupSimilarity.query.filter(StartupSimilarity.startup_id.in_(chunk)).delete(synchronize_session=False)
+            if removed:
+                StartupSimilarityState.query.filter(
+                    StartupSimilarityState.startup_id.in_(list(removed))
+                ).delete(synchronize_session=False)
+
+        records = [
+            {"startup_id": startup_id, "similar_startup_id": similar_id, "score": round(score, 4), "rank": rank, "computed_at": now}
+            for startup_id, entries in neighbours.items()
+            for rank, (similar_id, score) in enumerate(entries, 1)
+        ]
+        for start in range(0, len(records), SIMILARITY_WRITE_CHUNK):
+            db.session.execute(StartupSimilarity.__table__.insert(), records[start:start + SIMILARITY_WRITE_CHUNK])
+
+        CounterService.upsert_replace(
+            StartupSimilarityState, ["startup_id"],
+            [{"startup_id": startup_id, "text_hash": digest, "computed_at": now} for startup_id, digest in hashes.items()],
+            ["text_hash", "computed_at"]
+        )
+
+    # ==========================================
+    # VECTORS
+    # ==========================================
+
+    @staticmethod
+    def vectorize(texts):
+        """
+        TF-IDF vectors for {startup_id: text}
+
+        Returns:
+            dict: ids, positions, CSR (doc_ptr, doc_terms, doc_weights) and
+                  CSC (term_ptr, term_docs, term_weights) arrays
+        """
+        ids = np.array(sorted(texts), dtype=np.int64)
+        counts = [Counter(SearchIndexService.tokens(texts[startup_id])) for startup_id in ids.tolist()]
+        df = Counter(term for tfs in counts for term in tfs)
+
+        limit = SIMILARITY_MAX_DF * len(ids)
+        vocab = {term: i for i, term in enumerate(sorted(t for t, n in df.items() if n <= limit))}
+        idf = {term: math.log((1 + len(ids)) / (1 + df[term])) + 1.0 for term in vocab}
+
+        doc_ptr, doc_terms, doc_weights = [0], [], []
+        for tfs in counts:
+            entries = sorted((vocab[t], (1.0 + math.log(n)) * idf[t]) for t, n in tfs.items() if t in vocab)
+            norm = math.sqrt(sum(w * w for _, w in entries)) or 1.0
+            doc_terms.extend(term for term, _ in entries)
+            doc_weights.extend(w / norm for _, w in entries)
+            doc_ptr.append(len(doc_terms))
+
+        doc_ptr = np.array(doc_ptr, dtype=np.int64)
+        doc_terms = np.array(doc_terms, dtype=np.int64)
+        doc_weights = np.array(doc_weights, dtype=np.float64)
+        doc_of_entry = np.repeat(np.arange(len(ids)), np.diff(doc_ptr))
+
+        # Same entries, grouped by term
+        order = np.argsort(doc_terms, kind='stable')
+        term_ptr = np.zeros(len(vocab) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(doc_terms, minlength=len(vocab)), out=term_ptr[1:])
+
+        term_lengths = np.diff(term_ptr)
+        return {
+            'ids': ids,
+            'positions': {int(startup_id): position for position, startup_id in enumerate(ids)},
+            'doc_ptr': doc_ptr, 'doc_terms': doc_terms, 'doc_weights': doc_weights,
+            'term_ptr': term_ptr, 'term_docs': doc_of_entry[order], 'term_weights': doc_weights[order],
+            # Posting entries each startup expands to when scored
+            'work': np.bincount(doc_of_entry, weights=term_lengths[doc_terms], minlength=len(ids))
+        }
+
+    @staticmethod
+    def top_neighbours(vectors, startup_ids, k=SIMILAR_TOP_K):
+        """
+        Top-k cosine neighbours of each startup, computed in blocks
+
+        Returns:
+            dict: {startup_id: [(similar_id, score), ...] best first}
+        """
+        ids = vectors['ids']
+        positions = [vectors['positions'][startup_id] for startup_id in startup_ids]
+        results = {}
+
+        for block in StartupSimilarityService._blocks(vectors, positions):
+            scores = StartupSimilarityService._block_scores(vectors, block)
+            scores[np.arange(len(block)), block] = 0.0
+
+            take = min(k, len(ids) - 1)
+            if take <= 0:
+                results.update({int(ids[p]): [] for p in block})
+                continue
+            best = np.argpartition(-scores, take - 1, axis=1)[:, :take]
+            for row, position in enumerate(block):
+                candidates = best[row][scores[row, best[row]] >= SIMILARITY_MIN_SCORE]
+                candidates = candidates[np.lexsort((ids[candidates], -scores[row, candidates]))]
+                results[int(ids[position])] = [(int(ids[c]), float(scores[row, c])) for c in candidates]
+
+        return results
+
+    @staticmethod
+    def _blocks(vectors, positions):
+        """Split positions into blocks bounded by score cells and posting work"""
+        max_rows = max(1, SIMILARITY_BLOCK_CELLS // max(len(vectors['ids']), 1))
+        block, work = [], 0
+        for position in positions:
+            cost = int(vectors['work'][position])
+            if block and (len(block) >= max_rows or work + cost > SIMILARITY_BLOCK_POSTINGS):
+                yield np.array(block, dtype=np.int64)
+                block, work = [], 0
+            block.append(position)
+            work += cost
+        if block:
+            yield np.array(block, dtype=np.int64)
+
+    @staticmethod
+    def _block_scores(vectors, block):
+        """Dense (len(block) x startups) cosine scores"""
+        size = len(vectors['ids'])
+        starts = vectors['doc_ptr'][block]
+        lengths = vectors['doc_ptr'][block + 1] - starts
+
+        entries = StartupSimilarityService._ranges(starts, lengths)
+        rows = np.repeat(np.arange(len(block)), lengths)
+        terms = vectors['doc_terms'][entries]
+        weights = vectors['doc_weights'][entries]
+
+        posting_starts = vectors['term_ptr'][terms]
+        posting_lengths = vectors['term_ptr'][terms + 1] - posting_starts
+        postings = StartupSimilarityService._ranges(posting_starts, posting_lengths)
+
+        cells = np.repeat(rows, posting_lengths) * size + vectors['term_docs'][postings]
+        values = np.repeat(weights, posting_lengths) * vectors['term_weights'][postings]
+        return np.bincount(cells, weights=values, minlength=len(block) * size).reshape(len(block), size)
+
+    @staticmethod
+    def _ranges(starts, lengths):
+        """Concatenation of range(start, start + length) for each pair"""
+        total = int(lengths.sum())
+        if not total:
+            return np.zeros(0, dtype=np.int64)
+        offsets = np.repeat(np.cumsum(lengths) - lengths, lengths)
+        return np.repeat(starts, lengths) + np.arange(total) - offsets
@@ -254,6 +254,7 @@ async function showBulkActionModal(action) {
                     <select id="exportFormat" class="form-select" style="width: 100%; padding: 8px 12px; border: 1px solid #d1d5db; border-radius: 4px;">
                         <option value="csv">CSV (Excel Compatible)</option>
                         <option value="json">JSON</option>
+                        <option value="ndjson">NDJSON (streamed, one record per line)</option>
                     </select>
                 </div>
                 <div style="display: flex; gap: 12px; justify-content: flex-end;">
@@ -459,12 +460,12 @@ async function executeBulkExport() {
             })
         });
         
-        if (format === 'csv') {
+        if (format === 'csv' || format === 'ndjson') {
             const blob = await response.blob();
             const url = window.URL.createObjectURL(blob);
             const a = document.createElement('a');
             a.href = url;
-            a.download = `${currentEntityType}_export.csv`;
+            a.download = `${currentEntityType}_export.${format}`;
             document.body.appendChild(a);
             a.click();
             window.URL.revokeObjectURL(url);
@@ -4,21 +4,90 @@ let currentRecipientId = null;
 let threads = [];
 let messages = [];
 
+let socket = null;
+let pollTimers = [];
+let threadsRefreshTimer = null;
+
 // Initialize on page load
 document.addEventListener('DOMContentLoaded', () => {
     loadThreads();
     setupEventListeners();
+    connectRealtime();
+});
+
+// Real-time updates over Socket.IO; polling only while the socket is down
+function connectRealtime() {
+    if (typeof io === 'undefined') {
+        startPolling();
+        return;
+    }
+    
+    socket = io('/messages');
+    
+    socket.on('connect', () => {
+        stopPolling();
+        
+        // Catch up on anything missed while disconnected
+        loadThreads();
+        if (currentThreadId) {
+            loadThread(currentThreadId, false);
+        }
+    });
+    
+    socket.on('disconnect', startPolling);
+    socket.on('connect_error', startPolling);
+    
+    socket.on('message_new', (data) => {
+        const message = data.message;
+        
+        // First message of a new conversation we just started
+        if (!currentThreadId && message.recipient_id === currentRecipientId
+                && message.sender_id === parseInt(document.body.dataset.userId || '0')) {
+            currentThreadId = message.thread_id;
+        }
+        
+        if (message.thread_id === currentThreadId) {
+            loadThread(currentThreadId);
+        }
+        scheduleThreadsRefresh();
+    });
+    
+    socket.on('message_read', (data) => {
+        // Only our own reads change unread counts in the list
+        if (data.reader_id === parseInt(document.body.dataset.userId || '0')) {
+            scheduleThreadsRefresh();
+        }
+    });
+}
+
+function isRealtimeConnected() {
+    return socket !== null && socket.connected;
+}
+
+function startPolling() {
+    if (pollTimers.length) return;
     
     // Auto-refresh threads every 30 seconds
-    setInterval(loadThreads, 30000);
+    pollTimers.push(setInterval(loadThreads, 30000));
     
     // Auto-refresh current conversation every 10 seconds
-    setInterval(() => {
+    pollTimers.push(setInterval(() => {
         if (currentThreadId) {
             loadThread(currentThreadId, false);
         }
-    }, 10000);
-});
+    }, 10000));
+}
+
+function stopPolling() {
+    pollTimers.forEach(clearInterval);
+    pollTimers = [];
+}
+
+// Coalesce bursts of events (e.g. mark-all-read) into one reload
+function scheduleThreadsRefresh() {
+    clearTimeout(threadsRefreshTimer);
+    threadsRefreshTimer = setTimeout(loadThreads, 300);
+}
 
 function setupEventListeners() {
     // Search functionality
@@ -248,11 +317,14 @@ async function sendMessage() {
             messageInput.value = '';
             messageInput.style.height = 'auto';
             
-            // Reload thread to show new message
-            await loadThread(currentThreadId);
-            
-            // Reload threads to update preview
-            await loadThreads();
+            // Without the socket, message_new will not arrive: reload now
+            if (!isRealtimeConnected()) {
+                // Reload thread to show new message
+                await loadThread(currentThreadId);
+                
+                // Reload threads to update preview
+                await loadThreads();
+            }
         } else {
             showError(data.message || 'Failed to send message');
         }
@@ -10,6 +10,11 @@ import sys
 # Add parent directory to path
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
+# Config reads DATABASE_URL at import time: set it before the app is imported,
+# otherwise the fixtures would create_all/drop_all the development database
+os.environ['FLASK_ENV'] = 'testing'
+os.environ['DATABASE_URL'] = 'sqlite:///:memory:'  # In-memory database for tests
+
 from app import create_app
 from extensions import db
 from models import User, Startup, Opportunity, Meeting, MeetingParticipant, Notification
@@ -19,14 +24,9 @@ from datetime import datetime, timedelta
 @pytest.fixture(scope='session')
 def app():
     """Create application for testing"""
-    # Set testing configuration
-    os.environ['FLASK_ENV'] = 'testing'
-    os.environ['DATABASE_URL'] = 'sqlite:///:memory:'  # In-memory database for tests
-    
     app = create_app()
     app.config['TESTING'] = True
     app.config['WTF_CSRF_ENABLED'] = False  # Disable CSRF for testing
-    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
     
     return app
 
@@ -0,0 +1,44 @@
+"""
+Tests for admin search count modes
+"""
+
+import pytest
+
+import admin_search_service
+from admin_search_service import AdminSearchService
+from models import Lead
+
+
+@pytest.fixture
+def leads(db_session, monkeypatch):
+    monkeypatch.setattr(admin_search_service, 'SEARCH_COUNT_CAP', 10)
+    monkeypatch.setattr(admin_search_service, '_count_cache', {})
+    db_session.session.add_all([
+        Lead(type='demo' if i % 2 else 'contact', name=f"Lead {i}", email=f"lead{i}@example.com")
+        for i in range(25)
+    ])
+    db_session.session.commit()
+
+
+@pytest.mark.unit
+class TestAdminSearchCounts:
+
+    def test_last_page_total_needs_no_count(self, leads):
+        result = AdminSearchService.search_leads(type='demo', limit=20)
+        assert (result['total'], result['total_mode'], result['has_more']) == (12, 'exact', False)
+
+    def test_exact_and_capped_modes(self, leads):
+        exact = AdminSearchService.search_leads(limit=5, count_mode='exact')
+        assert (exact['total'], exact['total_display'], exact['has_more']) == (25, '25', True)
+
+        capped = AdminSearchService.search_leads(limit=5, count_mode='capped')
+        assert (capped['total'], capped['total_mode'], capped['total_display']) == (10, 'capped', '10+')
+
+        under_cap = AdminSearchService.search_leads(query='Lead 2', limit=5)
+        assert (under_cap['total'], under_cap['total_mode'], under_cap['total_display']) == (6, 'capped', '6')
+
+    def test_totals_are_cached(self, db_session, leads):
+        assert AdminSearchService.search_leads(limit=5, count_mode='exact')['total'] == 25
+        db_session.session.add(Lead(type='demo', name="Late", email="late@example.com"))
+        db_session.session.commit()
+        assert AdminSearchService.search_leads(limit=5, count_mode='exact')['total'] == 25
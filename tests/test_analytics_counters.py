@@ -0,0 +1,111 @@
+"""
+Tests for EnablerAnalytics counters maintained by atomic upserts
+"""
+
+import random
+from datetime import datetime
+
+import pytest
+
+import enabler_service
+from enabler_service import EnablerService
+from models import EnablerAnalytics, Referral, ReferralClick, User
+
+
+COUNTED = ("referrals_count", "referrals_accepted", "referrals_rejected", "referrals_successful", "clicks_count")
+
+
+def snapshot():
+    return sorted(
+        (row.enabler_id, row.date) + tuple(getattr(row, column) or 0 for column in COUNTED)
+        for row in EnablerAnalytics.query.all()
+    )
+
+
+@pytest.fixture
+def enablers(db_session):
+    rows = [User(name=f"Enabler {i}", email=f"enabler{i}@example.com", role="enabler") for i in range(3)]
+    db_session.session.add_all(rows)
+    db_session.session.commit()
+    return rows
+
+
+def create_referral(session, enabler, opportunity):
+    referral = Referral(enabler_id=enabler.id, opportunity_id=opportunity.id, startup_name="S", status="pending")
+    session.add(referral)
+    session.flush()
+    EnablerService.record_referral_created(referral)
+    session.commit()
+    return referral
+
+
+@pytest.mark.unit
+class TestEnablerAnalyticsCounters:
+
+    def test_counters_match_reconcile(self, db_session, enablers, test_opportunity):
+        session = db_session.session
+        rng = random.Random(3)
+        referrals = []
+
+        for _ in range(120):
+            op = rng.random()
+            if op < 0.35 or not referrals:
+                referrals.append(create_referral(session, rng.choice(enablers), test_opportunity))
+            elif op < 0.7:
+                referral = rng.choice(referrals)
+                previous = referral.status
+                referral.status = rng.choice(["pending", "accepted", "rejected", "successful"])
+                EnablerService.record_referral_status_change(referral, previous)
+                session.commit()
+            elif op < 0.8:
+                batch = rng.sample(referrals, min(4, len(referrals)))
+                status = rng.choice(["accepted", "rejected"])
+                EnablerService.record_bulk_status_change(
+                    [(r.enabler_id, r.created_at, r.status) for r in batch], status
+                )
+                for referral in batch:
+                    referral.status = status
+                session.commit()
+            elif op < 0.9:
+                referral = rng.choice(referrals)
+                session.add(ReferralClick(referral_id=referral.id, clicked_at=datetime.utcnow()))
+                EnablerService.record_referral_click(referral)
+                session.commit()
+            else:
+                # Rolled back together with the write it describes
+                referral = Referral(enabler_id=enablers[0].id, opportunity_id=test_opportunity.id, status="pending")
+                session.add(referral)
+                session.flush()
+                EnablerService.record_referral_created(referral)
+                session.rollback()
+
+        incremental = snapshot()
+        assert EnablerService.reconcile_daily_analytics()["success"]
+        assert snapshot() == incremental
+
+    def test_analytics_cache_drops_on_commit_only(self, db_session, enablers, test_opportunity):
+        session = db_session.session
+        enabler = enablers[0]
+        EnablerService.invalidate_analytics_cache()
+
+        def submitted():
+            return EnablerService.get_analytics(enabler.id)["data"]["referral_stats"]["submitted"]
+
+        referral = create_referral(session, enabler, test_opportunity)
+        assert submitted() == 1
+
+        # Uncommitted, then rolled back: the cached result stays
+        session.add(Referral(enabler_id=enabler.id, opportunity_id=test_opportunity.id, status="pending"))
+        session.flush()
+        session.rollback()
+        assert enabler.id in enabler_service._analytics_cache
+
+        # A bulk UPDATE no flush sees still drops the cache on commit
+        EnablerService.record_bulk_status_change([(enabler.id, referral.created_at, "pending")], "rejected")
+        Referral.query.filter_by(id=referral.id).update({"status": "rejected"}, synchronize_session=False)
+        assert enabler.id in enabler_service._analytics_cache
+        session.commit()
+        assert submitted() == 0
+
+        create_referral(session, enabler, test_opportunity)
+        assert submitted() == 1
@@ -0,0 +1,106 @@
+"""
+Tests for incrementally maintained cohort retention
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+import cohort_service
+from cohort_service import CohortService
+from models import AnalyticsEvent, CohortRetention, Message, Notification, User
+
+
+def snapshot():
+    return sorted(
+        (row.cohort_week, row.role, row.week_offset, row.metric, row.value)
+        for row in CohortRetention.query.all()
+    )
+
+
+def add_activity(session, users, start, count):
+    for i in range(count):
+        session.add(AnalyticsEvent(
+            user_id=users[i % len(users)].id,
+            event_type='login',
+            created_at=start + timedelta(hours=29 * i)
+        ))
+        session.add(Message(
+            sender_id=users[(i * 3) % len(users)].id,
+            recipient_id=users[(i + 1) % len(users)].id,
+            body='hi',
+            created_at=start + timedelta(hours=41 * i)
+        ))
+    session.commit()
+
+
+@pytest.fixture
+def users(db_session):
+    base = datetime.utcnow() - timedelta(weeks=8)
+    rows = [
+        User(
+            name=f"User {i}", email=f"cohort{i}@example.com",
+            role=['startup', 'enabler', 'corporate'][i % 3],
+            created_at=base + timedelta(days=5 * i)
+        )
+        for i in range(6)
+    ]
+    db_session.session.add_all(rows)
+    db_session.session.commit()
+    return rows
+
+
+@pytest.mark.unit
+class TestCohortService:
+
+    def test_incremental_batches_match_rebuild(self, db_session, users):
+        start = datetime.utcnow() - timedelta(weeks=7)
+        add_activity(db_session.session, users, start, 30)
+        CohortService.run_incremental(batch_size=4)
+
+        add_activity(db_session.session, users, start + timedelta(weeks=2), 20)
+        CohortService.run_incremental(batch_size=3)
+        incremental = snapshot()
+
+        CohortService.rebuild()
+        assert snapshot() == incremental
+
+    def test_repeat_activity_counts_once_per_week(self, db_session, users):
+        user = users[0]
+        when = user.created_at + timedelta(days=8)
+        db_session.session.add(AnalyticsEvent(user_id=user.id, event_type='login', created_at=when))
+        db_session.session.add(AnalyticsEvent(user_id=user.id, event_type='login', created_at=when + timedelta(hours=1)))
+        db_session.session.add(Message(sender_id=user.id, recipient_id=users[1].id, body='x', created_at=when))
+        db_session.session.commit()
+
+        CohortService.run_incremental(batch_size=1)
+        cohort_week = CohortService._week_date(CohortService._week_index([user.created_at])[0])
+        active = CohortRetention.query.filter_by(cohort_week=cohort_week, role=user.role, metric='active').all()
+        assert sum(row.value for row in active) == 1
+
+    def test_rolled_back_rows_are_never_counted(self, db_session, users):
+        CohortService.run_incremental()
+        before = snapshot()
+
+        db_session.session.add(AnalyticsEvent(
+            user_id=users[0].id, event_type='login', created_at=datetime.utcnow() - timedelta(days=1)
+        ))
+        db_session.session.flush()
+        db_session.session.rollback()
+
+        CohortService.run_incremental()
+        assert snapshot() == before
+
+    def test_refresh_leaves_request_session_alone(self, db_session, users, monkeypatch):
+        add_activity(db_session.session, users, datetime.utcnow() - timedelta(weeks=3), 5)
+        monkeypatch.setitem(cohort_service._last_refresh, 'at', 0.0)
+
+        pending = Notification(user_id=users[0].id, title='t', message='m')
+        db_session.session.add(pending)
+        CohortService.refresh()
+
+        # Still pending: refresh neither flushed/committed nor rolled it back
+        assert pending in db_session.session.new
+        db_session.session.rollback()
+        assert Notification.query.count() == 0
+        assert snapshot()
@@ -0,0 +1,71 @@
+"""
+Tests for the cached accepted-connection graph
+"""
+
+from datetime import datetime
+
+import pytest
+
+import connection_graph_service
+from connection_graph_service import ConnectionGraphService
+from models import Connection, User
+
+
+@pytest.fixture
+def users(db_session):
+    rows = [User(name=f"User {i}", email=f"graph{i}@example.com", role="startup") for i in range(5)]
+    db_session.session.add_all(rows)
+    db_session.session.commit()
+    return rows
+
+
+def check():
+    """The patched adjacency equals a fresh rebuild"""
+    incremental = {user: dict(friends) for user, friends in connection_graph_service._graph['adjacency'].items()}
+    ConnectionGraphService.rebuild()
+    assert connection_graph_service._graph['adjacency'] == incremental
+
+
+@pytest.mark.unit
+class TestConnectionGraphService:
+
+    def test_incremental_graph_matches_rebuild(self, db_session, users):
+        session = db_session.session
+        a, b, c, d, e = [user.id for user in users]
+        ConnectionGraphService.rebuild()
+
+        request = Connection(requester_id=a, recipient_id=b)
+        session.add_all([
+            request,
+            Connection(requester_id=a, recipient_id=c, status='accepted', accepted_at=datetime(2026, 1, 1)),
+            Connection(requester_id=c, recipient_id=b, status='accepted', accepted_at=datetime(2026, 1, 2)),
+            Connection(requester_id=d, recipient_id=c, status='accepted', accepted_at=datetime(2026, 1, 3)),
+        ])
+        session.commit()
+        check()
+        assert ConnectionGraphService.degree(c) == 3
+        assert not ConnectionGraphService.is_connected(a, b)
+
+        # Accept
+        request.status = 'accepted'
+        request.accepted_at = datetime(2026, 2, 1)
+        session.commit()
+        check()
+        assert ConnectionGraphService.mutual(a, b) == [c]
+        assert ConnectionGraphService.mutual_counts(d) == {a: 1, b: 1}
+
+        # Reject an accepted connection, then delete one
+        request.status = 'rejected'
+        session.commit()
+        check()
+        session.delete(Connection.query.filter_by(requester_id=d).one())
+        session.commit()
+        check()
+        assert ConnectionGraphService.connections(d) == {}
+
+        # Rolled-back writes never reach the graph
+        session.add(Connection(requester_id=e, recipient_id=a, status='accepted'))
+        session.flush()
+        session.rollback()
+        check()
+        assert ConnectionGraphService.degree(e) == 0
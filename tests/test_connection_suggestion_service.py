@@ -0,0 +1,136 @@
+"""
+Tests for cached connection suggestions
+"""
+
+import pytest
+
+import connection_suggestion_service
+from connection_graph_service import ConnectionGraphService
+from connection_suggestion_service import ConnectionSuggestionService
+from models import Connection, Startup, User
+
+
+def state():
+    """The engine's indexes, ignoring containers emptied by removals"""
+    def prune(value):
+        if isinstance(value, dict):
+            return {k: prune(v) for k, v in value.items() if v or v == 0 or not isinstance(v, (dict, set, list))}
+        return value
+    indexes = {
+        key: value for key, value in connection_suggestion_service._state.items()
+        if key not in ('cache', 'built_at')
+    }
+    return prune(indexes)
+
+
+def suggestions(users):
+    return {user.id: ConnectionSuggestionService.suggest(user.id, 50) for user in users}
+
+
+def rebuild():
+    ConnectionGraphService.rebuild()
+    ConnectionSuggestionService.rebuild()
+
+
+@pytest.fixture
+def people(db_session):
+    session = db_session.session
+    rows = {
+        'founder': User(name="Founder", email="f@example.com", role="startup", region="South"),
+        'legacy': User(name="Legacy Founder", email="lf@example.com", role="founder", region="North"),
+        'enabler': User(name="Enabler", email="e@example.com", role="enabler", region="South"),
+        'corporate': User(name="Corporate", email="c@example.com", role="corporate"),
+        'admin': User(name="Admin", email="a@example.com", role="admin", region="South"),
+        'inactive': User(name="Inactive", email="i@example.com", role="enabler", is_active=False),
+        'friend': User(name="Friend", email="fr@example.com", role="startup"),
+    }
+    session.add_all(rows.values())
+    session.commit()
+    return rows
+
+
+@pytest.mark.unit
+class TestConnectionSuggestionService:
+
+    def test_startup_role_founders_get_role_fit(self, people):
+        rebuild()
+        for key in ('founder', 'legacy'):
+            scored = {s['user_id']: s['score'] for s in ConnectionSuggestionService.suggest(people[key].id, 50)}
+            assert scored[people['enabler'].id] >= 3.0
+            assert scored[people['corporate'].id] == 3.0
+
+    def test_padding_excludes_admins_inactive_and_linked_users(self, db_session, people):
+        session = db_session.session
+        session.add_all([
+            Connection(requester_id=people['founder'].id, recipient_id=people['friend'].id, status='accepted'),
+            Connection(requester_id=people['corporate'].id, recipient_id=people['founder'].id, status='pending'),
+        ])
+        session.commit()
+        rebuild()
+
+        suggested = {s['user_id'] for s in ConnectionSuggestionService.suggest(people['founder'].id, 50)}
+        assert suggested == {people['legacy'].id, people['enabler'].id}
+
+        # Region match plus padding; the admin shares the region but is never suggested
+        padded = {s['user_id'] for s in ConnectionSuggestionService.suggest(people['enabler'].id, 50)}
+        assert padded == {people['founder'].id, people['legacy'].id, people['corporate'].id, people['friend'].id}
+
+    def test_incremental_state_matches_rebuild(self, db_session, people):
+        session = db_session.session
+        everyone = list(people.values())
+        rebuild()
+
+        def check():
+            # Cached lists that survived the commit must equal freshly computed ones
+            incremental = state(), suggestions(everyone)
+            rebuild()
+            assert (state(), suggestions(everyone)) == incremental
+
+        check()
+        request = Connection(requester_id=people['founder'].id, recipient_id=people['enabler'].id)
+        session.add_all([
+            request,
+            Connection(requester_id=people['friend'].id, recipient_id=people['enabler'].id, status='accepted'),
+            Startup(founder_id=people['founder'].id, name="A", sectors='["AI", "Health"]'),
+            Startup(founder_id=people['legacy'].id, name="B", sectors='["AI"]'),
+        ])
+        session.commit()
+        check()
+
+        # The founder now shares the enabler's friend as a mutual connection
+        request.status = 'accepted'
+        people['corporate'].region = "South"
+        people['inactive'].is_active = True
+        session.commit()
+        check()
+        mutual = {s['user_id']: s['mutual_connections'] for s in ConnectionSuggestionService.suggest(people['friend'].id, 50)}
+        assert mutual[people['founder'].id] == 1
+
+        session.delete(request)
+        session.commit()
+        check()
+
+        session.add(Connection(requester_id=people['legacy'].id, recipient_id=people['friend'].id, status='accepted'))
+        people['admin'].role = 'enabler'
+        session.flush()
+        session.rollback()
+        check()
+
+    def test_user_registered_with_startup_is_indexed(self, db_session, people):
+        session = db_session.session
+        session.add(Startup(founder_id=people['legacy'].id, name="B", sectors='["AI"]'))
+        session.commit()
+        rebuild()
+
+        # Registration commits the founder and their startup together
+        joined = User(name="New Founder", email="nf@example.com", role="startup")
+        session.add(joined)
+        session.flush()
+        session.add(Startup(founder_id=joined.id, name="N", sectors='["AI", "Fintech"]'))
+        session.commit()
+
+        shared = {s['user_id']: s['shared_sectors'] for s in ConnectionSuggestionService.suggest(joined.id, 50)}
+        assert shared[people['legacy'].id] == 1
+        incremental = state(), suggestions(list(people.values()) + [joined])
+        rebuild()
+        assert (state(), suggestions(list(people.values()) + [joined])) == incremental
@@ -0,0 +1,52 @@
+"""
+Tests for vectorized ecosystem-fit scoring and peer percentiles
+"""
+
+import math
+import random
+
+import numpy as np
+import pytest
+
+from ecosystem_fit_service import EcosystemFitService, FIT_COLUMNS
+from models import EcosystemFitScore, Startup, User
+
+
+@pytest.mark.unit
+class TestEcosystemFit:
+
+    def test_top_percent_matches_brute_force(self):
+        rng = random.Random(11)
+        groups = np.array([rng.choice(['ai', 'health', 'fintech']) for _ in range(300)])
+        totals = np.array([rng.randint(300, 500) for _ in range(300)])
+
+        top, peers = EcosystemFitService.top_percent(groups, totals)
+        for i in range(len(totals)):
+            same = totals[groups == groups[i]]
+            assert peers[i] == len(same)
+            assert top[i] == math.ceil((same >= totals[i]).sum() * 100.0 / len(same))
+
+    def test_batch_scores_match_single_startup_scoring(self, db_session):
+        founder = User(name="Founder", email="fit@example.com", role="startup")
+        db_session.session.add(founder)
+        db_session.session.flush()
+
+        rng = random.Random(5)
+        for i in range(25):
+            db_session.session.add(Startup(
+                founder_id=founder.id,
+                name=f"Startup {i}",
+                sectors=rng.choice(['["AI"]', '["AI", "Health"]', '["AI", "Health", "Fintech", "Ed"]', None]),
+                stage=rng.choice(['seed', 'idea', 'series_a', None]),
+                team_size=rng.choice(['1-2', '3-4', '5-10', None]),
+                team_info='x' * rng.choice([0, 150]),
+                funding=rng.choice(['Seed', 'Series A', None]),
+                traction='y' * rng.choice([0, 200]),
+                demo_url=rng.choice([None, 'https://demo.example.com'])
+            ))
+        db_session.session.commit()
+
+        assert EcosystemFitService.refresh() == {"success": True, "scored": 25}
+        for startup in Startup.query.all():
+            stored = db_session.session.get(EcosystemFitScore, startup.id)
+            assert [getattr(stored, column) for column in FIT_COLUMNS] == EcosystemFitService.score_startup(startup)
@@ -0,0 +1,87 @@
+"""
+Tests for streaming CSV/NDJSON exports
+"""
+
+import csv
+import json
+from io import StringIO
+
+import pytest
+
+from export_service import ExportService
+from models import User
+
+
+@pytest.fixture
+def users(db_session):
+    """A handful of users, one of them inactive"""
+    rows = [
+        User(name=f"User {i}", email=f"user{i}@example.com", role="startup", company=f"Co {i}", country="IN")
+        for i in range(5)
+    ]
+    rows[2].is_active = False
+    db_session.session.add_all(rows)
+    db_session.session.commit()
+    return rows
+
+
+@pytest.mark.unit
+class TestExportService:
+
+    def test_csv_streams_header_then_one_chunk_per_row(self):
+        chunks = list(ExportService.stream(['a', 'b'], iter([(1, None), (2, 'x')]), 'csv'))
+        assert chunks == ['a,b\r\n', '1,\r\n', '2,x\r\n']
+
+    def test_csv_labels_replace_header_only(self):
+        chunks = list(ExportService.stream(['a', 'b'], iter([(1, 2)]), 'csv', ['A', 'B']))
+        assert chunks[0] == 'A,B\r\n'
+
+    def test_ndjson_uses_keys(self):
+        chunks = list(ExportService.stream(['a', 'b'], iter([(1, None)]), 'ndjson', ['A', 'B']))
+        assert [json.loads(chunk) for chunk in chunks] == [{'a': 1, 'b': None}]
+
+    def test_unknown_format_rejected(self):
+        with pytest.raises(ValueError):
+            ExportService.stream(['a'], iter([]), 'xml')
+
+
+@pytest.mark.api
+class TestUserExport:
+
+    def test_csv_keeps_original_header(self, admin_client, users):
+        response = admin_client.post('/api/admin/bulk/users/export', json={'format': 'csv'})
+        assert response.status_code == 200
+        assert response.mimetype == 'text/csv'
+
+        rows = list(csv.reader(StringIO(response.get_data(as_text=True))))
+        assert rows[0] == ['ID', 'Full Name', 'Email', 'Role', 'Company', 'Country', 'Created At', 'Status']
+        # Admin fixture + 5 users
+        assert len(rows) == 1 + 6
+        statuses = {row[2]: row[7] for row in rows[1:]}
+        assert statuses['user2@example.com'] == 'inactive'
+        assert statuses['user0@example.com'] == 'active'
+
+    def test_ndjson_matches_json_keys(self, admin_client, users):
+        response = admin_client.post('/api/admin/bulk/users/export', json={
+            'format': 'ndjson', 'user_ids': [users[0].id, users[1].id]
+        })
+        records = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+        assert [record['full_name'] for record in records] == ['User 0', 'User 1']
+
+        listed = admin_client.post('/api/admin/bulk/users/export', json={
+            'format': 'json', 'user_ids': [users[0].id, users[1].id]
+        }).get_json()
+        assert set(listed['users'][0]) <= set(records[0])
+
+    def test_unsupported_format_is_400(self, admin_client, users):
+        response = admin_client.post('/api/admin/bulk/users/export', json={'format': 'xml'})
+        assert response.status_code == 400
+
+    def test_analytics_export_streams_rows(self, admin_client, users):
+        response = admin_client.get('/api/admin/analytics/export/users?format=csv')
+        assert response.status_code == 200
+        rows = list(csv.reader(StringIO(response.get_data(as_text=True))))
+        assert rows[0][:3] == ['id', 'name', 'email']
+        assert len(rows) == 1 + 6
+
+        assert admin_client.get('/api/admin/analytics/export/nope').status_code == 400
@@ -0,0 +1,107 @@
+"""
+Tests for the persisted corporate-startup match matrix
+"""
+
+import pytest
+
+import match_matrix_service
+from match_matrix_service import MatchMatrixService
+from match_scoring_service import MatchScoringService
+from models import CorporateProfile, Notification, Startup, StartupMatch, User
+
+
+def snapshot():
+    return sorted(
+        (row.corporate_id, row.startup_id, row.match_score, row.status) for row in StartupMatch.query.all()
+    )
+
+
+@pytest.fixture
+def corporates(db_session):
+    session = db_session.session
+    users = [User(name=f"Corp {i}", email=f"corp{i}@example.com", role="corporate") for i in range(2)]
+    session.add_all(users)
+    session.flush()
+    session.add_all([
+        CorporateProfile(user_id=users[0].id, innovation_focus='["AI"]', preferred_stages='["seed"]'),
+        CorporateProfile(user_id=users[1].id, innovation_focus='["Health", "AI"]',
+                         investment_range_min=1, investment_range_max=5),
+    ])
+    session.commit()
+    MatchScoringService.rebuild()
+    return users
+
+
+@pytest.mark.unit
+class TestMatchMatrixService:
+
+    def test_queued_changes_match_rebuild(self, db_session, test_user, corporates):
+        session = db_session.session
+        startups = [
+            Startup(founder_id=test_user.id, name="A", sectors='["AI"]', stage="seed", country="IN"),
+            Startup(founder_id=test_user.id, name="B", sectors='["Health"]', stage="idea", country="IN"),
+            Startup(founder_id=test_user.id, name="C", sectors='["Fintech"]', stage="seed"),
+        ]
+        session.add_all(startups)
+        session.commit()
+        MatchMatrixService.process_changes(batch_size=2)
+
+        # An interacted pair is kept (and rescored) even once it stops matching
+        contacted = StartupMatch.query.filter_by(corporate_id=corporates[0].id, startup_id=startups[0].id).one()
+        contacted.status = 'contacted'
+        startups[0].sectors = '["Fintech"]'
+        startups[2].sectors = '["AI", "Health"]'
+        profile = CorporateProfile.query.filter_by(user_id=corporates[1].id).one()
+        profile.preferred_stages = '["idea"]'
+        session.commit()
+
+        session.add(Startup(founder_id=test_user.id, name="Gone", sectors='["AI"]', stage="seed"))
+        startups[1].sectors = '["AI"]'
+        session.flush()
+        session.rollback()
+
+        MatchMatrixService.process_changes(batch_size=2)
+        assert MatchMatrixService.pending_count() == 0
+        incremental = snapshot()
+        assert (corporates[0].id, startups[0].id) in {(c, s) for c, s, _, status in incremental if status == 'contacted'}
+
+        MatchMatrixService.rebuild()
+        assert snapshot() == incremental
+
+    def test_corporate_rescore_reads_startups_from_the_database(self, db_session, test_user, corporates, monkeypatch):
+        session = db_session.session
+        startup = Startup(founder_id=test_user.id, name="A", sectors='["AI"]', stage="seed", country="IN")
+        session.add(startup)
+        session.commit()
+        MatchMatrixService.process_changes()
+        before = snapshot()
+        assert (corporates[0].id, startup.id) in {(c, s) for c, s, _, _ in before}
+
+        # As if the startup had been written by another process: this
+        # process's scoring cache has never seen it
+        monkeypatch.setattr(MatchScoringService, 'features', staticmethod(lambda: MatchScoringService.encode([])))
+        profile = CorporateProfile.query.filter_by(user_id=corporates[0].id).one()
+        profile.investment_range_min = 1
+        session.commit()
+        MatchMatrixService.process_changes()
+
+        assert snapshot() == before
+
+    def test_refresh_leaves_request_session_alone(self, db_session, test_user, corporates, monkeypatch):
+        session = db_session.session
+        startup = Startup(founder_id=test_user.id, name="A", sectors='["AI"]', stage="seed", country="IN")
+        session.add(startup)
+        session.commit()
+        monkeypatch.setitem(match_matrix_service._last_refresh, 'at', 0.0)
+
+        pending = Notification(user_id=test_user.id, title='t', message='m')
+        session.add(pending)
+        MatchMatrixService.refresh()
+
+        # Still pending: refresh neither flushed/committed nor rolled it back
+        assert pending in session.new
+        session.rollback()
+        assert Notification.query.count() == 0
+        assert MatchMatrixService.pending_count() == 0
+        # 40 sector + 30 stage + 10 country for the first corporate; the second scores 45
+        assert snapshot() == [(corporates[0].id, startup.id, 80.0, 'discovered')]
@@ -0,0 +1,71 @@
+"""
+Tests for vectorized corporate-startup match scoring
+"""
+
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from corporate_service import CorporateService
+from match_scoring_service import MatchScoringService
+from models import Startup
+
+
+PROFILES = [
+    SimpleNamespace(innovation_focus='["AI", "Health"]', preferred_stages='["seed"]',
+                    investment_range_min=10, investment_range_max=100),
+    SimpleNamespace(innovation_focus='["Fintech"]', preferred_stages=None,
+                    investment_range_min=None, investment_range_max=None),
+]
+
+
+def scores(profile):
+    features = MatchScoringService.features()
+    values = MatchScoringService.score_all(profile, features)
+    return {
+        int(startup_id): pytest.approx(float(score))
+        for startup_id, score, alive in zip(features['ids'], values, features['alive']) if alive
+    }
+
+
+@pytest.mark.unit
+class TestMatchScoringService:
+
+    def test_incremental_features_match_rebuild(self, db_session, test_user):
+        session = db_session.session
+        MatchScoringService.rebuild()
+
+        startups = [
+            Startup(founder_id=test_user.id, name="A", sectors='["AI"]', stage="seed", country="IN"),
+            Startup(founder_id=test_user.id, name="B", sectors='["Health", "AI"]', stage="idea"),
+            Startup(founder_id=test_user.id, name="C", sectors=None, stage=None, country="US"),
+        ]
+        session.add_all(startups)
+        session.commit()
+
+        # New sector and stage vocabulary arrive through a patch
+        startups[2].sectors = '["Fintech", "Climate"]'
+        startups[2].stage = "series_a"
+        startups[0].name = "Renamed"  # Not a feature
+        session.delete(startups[1])
+        session.commit()
+
+        session.add(Startup(founder_id=test_user.id, name="Gone", sectors='["Fintech"]'))
+        startups[0].stage = "idea"
+        session.flush()
+        session.rollback()
+
+        incremental = [scores(profile) for profile in PROFILES]
+        MatchScoringService.rebuild()
+        assert [scores(profile) for profile in PROFILES] == incremental
+
+        for profile, expected in zip(PROFILES, incremental):
+            for startup_id, score in expected.items():
+                startup = session.get(Startup, startup_id)
+                assert score == CorporateService.calculate_match_score(profile, startup)
+
+    def test_top_k_breaks_ties_by_id(self):
+        ids = [5, 3, 9, 1]
+        positions = MatchScoringService.top_k(np.array([10.0, 20.0, 20.0, 5.0]), np.array(ids), 2)
+        assert [ids[p] for p in positions] == [3, 9]
@@ -0,0 +1,56 @@
+"""
+Tests for commit-time message events
+"""
+
+import pytest
+
+from message_event_service import MessageEventService
+from models import Message, User
+
+
+@pytest.fixture
+def emitted(monkeypatch):
+    events = []
+    monkeypatch.setattr(
+        MessageEventService, 'emit',
+        staticmethod(lambda name, payload, user_ids: events.append((name, payload, set(user_ids))))
+    )
+    return events
+
+
+@pytest.mark.unit
+class TestMessageEventService:
+
+    def test_events_follow_committed_writes_only(self, db_session, emitted):
+        session = db_session.session
+        alice, bob = User(name="Alice", email="alice@example.com"), User(name="Bob", email="bob@example.com")
+        session.add_all([alice, bob])
+        session.commit()
+
+        first = Message(sender_id=alice.id, recipient_id=bob.id, subject="Hi", body="Hello", thread_id="t1")
+        second = Message(sender_id=alice.id, recipient_id=bob.id, subject="Hi", body="Again", thread_id="t1")
+        session.add_all([first, second])
+        session.flush()
+        assert emitted == []
+        session.commit()
+        assert sorted((name, payload['message']['id'], tuple(sorted(users))) for name, payload, users in emitted) == [
+            ('message_new', first.id, (alice.id, bob.id)),
+            ('message_new', second.id, (alice.id, bob.id)),
+        ]
+
+        # A bulk read is one event per (reader, sender)
+        del emitted[:]
+        first.is_read = second.is_read = True
+        session.commit()
+        [(name, payload, users)] = emitted
+        assert (name, users) == ('message_read', {alice.id, bob.id})
+        assert payload['reader_id'] == bob.id and payload['thread_ids'] == ['t1']
+        assert sorted(payload['message_ids']) == [first.id, second.id]
+
+        # Nothing for rolled-back writes
+        del emitted[:]
+        session.add(Message(sender_id=bob.id, recipient_id=alice.id, subject="Re", body="Hi", thread_id="t1"))
+        session.flush()
+        session.rollback()
+        session.commit()
+        assert emitted == []
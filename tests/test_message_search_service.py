@@ -0,0 +1,85 @@
+"""
+Tests for participant-scoped message search
+"""
+
+import pytest
+from sqlalchemy import text
+
+from extensions import db
+from message_search_service import MessageSearchService, MESSAGE_INDEX_TABLE
+from models import Message, User
+from session_hooks import SessionHooks
+
+
+def snapshot():
+    rows = db.session.execute(text(
+        f"SELECT rowid, participants, subject, body FROM {MESSAGE_INDEX_TABLE} ORDER BY rowid"
+    ))
+    return [tuple(row) for row in rows]
+
+
+@pytest.fixture
+def users(db_session):
+    rows = [User(name=f"User {i}", email=f"search{i}@example.com", role="startup") for i in range(3)]
+    db_session.session.add_all(rows)
+    db_session.session.commit()
+    yield rows
+    db.session.rollback()
+    db.session.execute(text(f"DROP TABLE IF EXISTS {MESSAGE_INDEX_TABLE}"))
+    db.session.commit()
+    SessionHooks.invalidate_tables(MESSAGE_INDEX_TABLE)
+
+
+def send(session, sender, recipient, subject, body):
+    message = Message(sender_id=sender.id, recipient_id=recipient.id, subject=subject, body=body)
+    session.add(message)
+    session.commit()
+    return message
+
+
+@pytest.mark.unit
+class TestMessageSearchService:
+
+    def test_incremental_index_matches_rebuild(self, db_session, users):
+        session = db_session.session
+        assert not MessageSearchService.available()
+        MessageSearchService.rebuild()
+
+        first = send(session, users[0], users[1], "Pitch deck", "Solar pitch attached")
+        second = send(session, users[1], users[0], "Re: deck", "Thanks")
+        third = send(session, users[2], users[0], "Intro", "Meet our robotics team")
+
+        second.body = "Thanks, solar looks great"
+        session.delete(third)
+        session.commit()
+
+        session.add(Message(sender_id=users[0].id, recipient_id=users[2].id, body="rolled back solar"))
+        first.subject = "Never saved"
+        session.flush()
+        session.rollback()
+
+        incremental = snapshot()
+        MessageSearchService.rebuild()
+        assert snapshot() == incremental
+
+        found = MessageSearchService.search(users[0].id, "solar")["messages"]
+        assert {m["id"] for m in found} == {first.id, second.id}
+
+    def test_search_is_scoped_and_paginates(self, db_session, users):
+        session = db_session.session
+        MessageSearchService.rebuild()
+        for i in range(5):
+            send(session, users[0], users[1], f"Update {i}", "quarterly numbers")
+        send(session, users[2], users[1], "Update", "quarterly numbers")
+
+        # users[2] only sees their own message
+        assert len(MessageSearchService.search(users[2].id, "quarterly")["messages"]) == 1
+
+        seen, cursor = [], None
+        while True:
+            page = MessageSearchService.search(users[0].id, "quarter", cursor=cursor, limit=2)
+            seen += [m["id"] for m in page["messages"]]
+            cursor = page["next_cursor"]
+            if not page["has_more"]:
+                break
+        assert len(seen) == len(set(seen)) == 5
@@ -0,0 +1,87 @@
+"""
+Tests for incrementally maintained inbox thread summaries
+"""
+
+import pytest
+
+from message_thread_service import MessageThreadService
+from models import Message, MessageThread, User
+
+
+def summaries():
+    return sorted(
+        (row.thread_id, row.user_id, row.other_user_id, row.last_message_id, row.message_count, row.unread_count)
+        for row in MessageThread.query.all()
+    )
+
+
+def check(session):
+    """Summaries maintained on flush equal a rebuild from messages"""
+    session.expire_all()
+    incremental = summaries()
+    MessageThreadService.rebuild()
+    assert summaries() == incremental
+    return incremental
+
+
+@pytest.fixture
+def pair(db_session):
+    users = [User(name="Alice", email="alice@example.com"), User(name="Bob", email="bob@example.com")]
+    db_session.session.add_all(users)
+    db_session.session.commit()
+    return users
+
+
+def message(sender, recipient, thread_id="t1", **fields):
+    return Message(sender_id=sender.id, recipient_id=recipient.id, subject="Hi", body="Hello", thread_id=thread_id, **fields)
+
+
+@pytest.mark.unit
+class TestMessageThreadService:
+
+    def test_incremental_summaries_match_rebuild(self, db_session, pair):
+        session = db_session.session
+        alice, bob = pair
+        MessageThreadService.rebuild()
+
+        first, second, third = message(alice, bob), message(alice, bob), message(bob, alice)
+        session.add_all([first, second, third, message(bob, bob, thread_id="self")])
+        session.commit()
+        rows = check(session)
+        assert ("t1", bob.id, alice.id, third.id, 3, 2) in rows
+
+        # Read, and a read flag set back to the value it already had
+        first.is_read = True
+        third.is_read = True
+        session.commit()
+        third.is_read = False
+        third.is_read = True
+        session.commit()
+        check(session)
+
+        # Soft delete on one side, hard delete, then a rolled-back send
+        second.is_deleted_by_recipient = True
+        session.commit()
+        check(session)
+        session.delete(first)
+        session.commit()
+        session.add(message(bob, alice))
+        session.flush()
+        session.rollback()
+        rows = check(session)
+        assert ("t1", bob.id, alice.id, third.id, 1, 0) in rows
+
+    def test_read_flag_without_loaded_value_recomputes(self, db_session, pair):
+        session = db_session.session
+        alice, bob = pair
+        read, unread = message(alice, bob, is_read=True), message(alice, bob)
+        session.add_all([read, unread])
+        session.commit()
+        MessageThreadService.rebuild()
+
+        # The old value is unknown, so no -1 may be applied
+        session.expire(read, ['is_read'])
+        read.is_read = True
+        session.commit()
+        rows = check(session)
+        assert ("t1", bob.id, alice.id, unread.id, 2, 1) in rows
@@ -0,0 +1,79 @@
+"""
+Tests for faceted opportunity listing
+"""
+
+import json
+import random
+
+import pytest
+
+import opportunity_facet_service
+from models import Opportunity
+from opportunity_facet_service import OpportunityFacetService
+
+
+SECTORS = ['AI', 'Health', 'Fintech']
+
+
+def brute_force(opportunities, filters):
+    """Facet counts with every other filter applied, straight from the rows"""
+    def matches(opp, skip):
+        for facet, value in filters.items():
+            if facet == skip:
+                continue
+            if facet == 'sector' and value not in [s.lower() for s in json.loads(opp.sectors or '[]')]:
+                return False
+            if facet == 'type' and (opp.type or '').lower() != value:
+                return False
+        return True
+
+    published = [opp for opp in opportunities if opp.status == 'published']
+    counts = {'sector': {}, 'type': {}}
+    for opp in published:
+        if matches(opp, 'sector'):
+            for sector in json.loads(opp.sectors or '[]'):
+                counts['sector'][sector.lower()] = counts['sector'].get(sector.lower(), 0) + 1
+        if matches(opp, 'type') and opp.type:
+            counts['type'][opp.type.lower()] = counts['type'].get(opp.type.lower(), 0) + 1
+    return counts, sum(matches(opp, None) for opp in published)
+
+
+@pytest.mark.unit
+class TestOpportunityFacetService:
+
+    def test_counts_match_brute_force(self, db_session, test_user):
+        rng = random.Random(9)
+        opportunities = [
+            Opportunity(
+                owner_id=test_user.id, title=f"Program {i}",
+                status=rng.choice(['published', 'published', 'draft']),
+                type=rng.choice(['grant', 'accelerator']),
+                sectors=json.dumps(rng.sample(SECTORS, rng.randint(0, 2)))
+            )
+            for i in range(40)
+        ]
+        db_session.session.add_all(opportunities)
+        db_session.session.commit()
+
+        for filters in ({}, {'sector': 'ai'}, {'sector': 'health', 'type': 'grant'}):
+            result = OpportunityFacetService.search(filters=filters, per_page=100)
+            expected, total = brute_force(opportunities, filters)
+            assert result['total'] == total
+            for facet in ('sector', 'type'):
+                counts = {v['value']: v['count'] for v in result['facets'][facet] if v['count']}
+                assert counts == expected[facet]
+
+    def test_commit_invalidates_and_rollback_does_not(self, db_session, test_user):
+        session = db_session.session
+        OpportunityFacetService.rebuild()
+        assert OpportunityFacetService.search()['total'] == 0
+
+        session.add(Opportunity(owner_id=test_user.id, title="Rolled back", status='published'))
+        session.flush()
+        session.rollback()
+        assert opportunity_facet_service._index['built_at'] is not None
+
+        session.add(Opportunity(owner_id=test_user.id, title="Kept", status='published', type='grant'))
+        session.commit()
+        assert opportunity_facet_service._index['built_at'] is None
+        assert OpportunityFacetService.search()['total'] == 1
@@ -0,0 +1,75 @@
+"""
+Tests for cached per-startup opportunity recommendations
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+import opportunity_recommendation_service
+from models import Opportunity, Startup
+from opportunity_recommendation_service import OpportunityRecommendationService
+
+
+def fresh(startup):
+    """Ranking from a rebuilt catalogue with no cached lists"""
+    OpportunityRecommendationService.rebuild()
+    return OpportunityRecommendationService.recommend(startup, limit=50)
+
+
+@pytest.fixture
+def catalogue(db_session, test_user):
+    rows = [
+        Opportunity(owner_id=test_user.id, title="AI grant", status="published", sectors='["AI"]'),
+        Opportunity(owner_id=test_user.id, title="Open call", status="published"),
+        Opportunity(owner_id=test_user.id, title="Seed India", status="published",
+                    target_stages='["seed"]', countries='["IN"]',
+                    deadline=datetime.utcnow() + timedelta(days=3)),
+        Opportunity(owner_id=test_user.id, title="Draft", status="draft", sectors='["AI"]'),
+        Opportunity(owner_id=test_user.id, title="Closed", status="published",
+                    deadline=datetime.utcnow() - timedelta(days=1)),
+    ]
+    db_session.session.add_all(rows)
+    db_session.session.commit()
+    return rows
+
+
+@pytest.mark.unit
+class TestOpportunityRecommendationService:
+
+    def test_scores_follow_the_weights(self, db_session, test_user, catalogue):
+        startup = Startup(founder_id=test_user.id, name="S", sectors='["AI"]', stage="seed", country="IN")
+        db_session.session.add(startup)
+        db_session.session.commit()
+
+        scores = dict(fresh(startup))
+        assert set(scores) == {catalogue[0].id, catalogue[1].id, catalogue[2].id}
+        # sector match + open stage + open country
+        assert scores[catalogue[0].id] == 40 + 15 + 10
+        assert scores[catalogue[1].id] == 20 + 15 + 10
+        # open sector + stage + country + ~9 urgency three days out
+        assert 20 + 30 + 20 + 8.9 <= scores[catalogue[2].id] <= 20 + 30 + 20 + 9.1
+
+    def test_cached_rankings_match_rebuild(self, db_session, test_user, catalogue):
+        session = db_session.session
+        startup = Startup(founder_id=test_user.id, name="S", sectors='["Health"]')
+        session.add(startup)
+        session.commit()
+        OpportunityRecommendationService.recommend(startup)
+
+        startup.sectors = '["AI"]'
+        session.commit()
+        assert OpportunityRecommendationService.recommend(startup, limit=50) == fresh(startup)
+
+        catalogue[3].status = "published"
+        session.delete(catalogue[1])
+        session.commit()
+        assert OpportunityRecommendationService.recommend(startup, limit=50) == fresh(startup)
+
+        # A rolled-back edit leaves the cached ranking in place
+        OpportunityRecommendationService.recommend(startup)
+        startup.stage = "seed"
+        session.flush()
+        session.rollback()
+        assert startup.id in opportunity_recommendation_service._cache
+        assert OpportunityRecommendationService.recommend(startup, limit=50) == fresh(startup)
@@ -0,0 +1,69 @@
+"""
+Tests for MinHash/LSH near-duplicate referral detection
+"""
+
+import pytest
+
+from models import Referral, ReferralLshBucket, User
+from referral_dedup_service import ReferralDedupService
+
+
+def snapshot():
+    return sorted(
+        (row.referral_id, row.field, row.band, row.bucket) for row in ReferralLshBucket.query.all()
+    )
+
+
+@pytest.fixture
+def enablers(db_session):
+    rows = [User(name=f"Enabler {i}", email=f"dedup{i}@example.com", role="enabler") for i in range(2)]
+    db_session.session.add_all(rows)
+    db_session.session.commit()
+    return rows
+
+
+def refer(session, enabler, opportunity, name, email=None):
+    referral = Referral(
+        enabler_id=enabler.id, opportunity_id=opportunity.id,
+        startup_name=name, startup_email=email, status="pending"
+    )
+    session.add(referral)
+    session.commit()
+    return referral
+
+
+@pytest.mark.unit
+class TestReferralDedupService:
+
+    def test_incremental_buckets_match_rebuild(self, db_session, enablers, test_opportunity):
+        session = db_session.session
+        first = refer(session, enablers[0], test_opportunity, "Sunrise Solar Pvt Ltd", "hello@sunrise.io")
+        second = refer(session, enablers[1], test_opportunity, "Sunrise Solar", "team@sunrise.io")
+        third = refer(session, enablers[1], test_opportunity, "CarePath Health")
+
+        third.startup_email = "care@path.in"
+        second.status = "accepted"  # Not a dedup field
+        session.delete(first)
+        session.commit()
+
+        session.add(Referral(enabler_id=enablers[0].id, opportunity_id=test_opportunity.id, startup_name="Gone"))
+        second.startup_name = "Never Renamed"
+        session.flush()
+        session.rollback()
+
+        incremental = snapshot()
+        assert ReferralDedupService.rebuild() == 2
+        assert snapshot() == incremental
+
+    def test_report_clusters_near_duplicates(self, db_session, enablers, test_opportunity):
+        session = db_session.session
+        a = refer(session, enablers[0], test_opportunity, "Sunrise Solar Pvt Ltd")
+        b = refer(session, enablers[1], test_opportunity, "The Sunrise Solar")
+        refer(session, enablers[1], test_opportunity, "CarePath Health")
+
+        report = ReferralDedupService.duplicate_report(cross_enabler_only=True)
+        assert report["total_clusters"] == 1
+        assert [r["id"] for r in report["clusters"][0]["referrals"]] == [a.id, b.id]
+        assert report["clusters"][0]["matched_on"] == ["startup_name"]
+
+        assert ReferralDedupService.duplicates_of_enabler(enablers[0].id) == [(a.id, b.id, "startup_name")]
@@ -0,0 +1,85 @@
+"""
+Tests for archiving expired event rows
+"""
+
+import gzip
+import json
+import os
+from datetime import datetime, timedelta
+
+import pytest
+
+from cohort_service import CohortService
+from models import AnalyticsEvent, Notification, UserCounter
+from retention_service import RetentionService
+from rollup_service import RollupService
+from user_counter_service import UserCounterService
+
+
+@pytest.fixture
+def archive_dir(app, tmp_path, monkeypatch):
+    monkeypatch.setitem(app.config, 'ARCHIVE_FOLDER', str(tmp_path))
+    return tmp_path
+
+
+def read_archive(folder, table):
+    records = []
+    for name in sorted(os.listdir(os.path.join(folder, table))):
+        with gzip.open(os.path.join(folder, table, name), 'rt') as archive:
+            records.extend(json.loads(line) for line in archive)
+    return records
+
+
+@pytest.mark.unit
+class TestRetentionService:
+
+    def test_expired_rows_move_to_archive(self, db_session, test_user, archive_dir):
+        now = datetime.utcnow()
+        for days in (200, 120, 10):
+            db_session.session.add(Notification(
+                user_id=test_user.id, title=f'{days}', message='m', created_at=now - timedelta(days=days)
+            ))
+        db_session.session.commit()
+
+        result = RetentionService.archive_table('notifications', cutoff=now - timedelta(days=90))
+        assert result == {"success": True, "strategy": 'batch', "archived": 2, "partitions_dropped": 0}
+
+        assert [n.title for n in Notification.query.all()] == ['10']
+        assert sorted(record['title'] for record in read_archive(archive_dir, 'notifications')) == ['120', '200']
+
+    def test_rows_wait_for_aggregate_watermarks(self, db_session, test_user, archive_dir):
+        old = datetime.utcnow() - timedelta(days=400)
+        for i in range(3):
+            db_session.session.add(AnalyticsEvent(user_id=test_user.id, event_type='login', created_at=old))
+        db_session.session.commit()
+
+        # Neither the rollup nor the cohort watermark has moved yet
+        assert RetentionService.archive_table('analytics_events', cutoff=old + timedelta(days=1))["archived"] == 0
+
+        RollupService.run_incremental(sources=['analytics_events'])
+        assert RetentionService.archive_table('analytics_events', cutoff=old + timedelta(days=1))["archived"] == 0
+
+        CohortService.run_incremental(sources=['analytics_events'])
+        total = RollupService.get_total('analytics_events', 'user', test_user.id, 'login')
+        assert RetentionService.archive_table('analytics_events', cutoff=old + timedelta(days=1))["archived"] == 3
+
+        # Aggregates keep what they counted before the rows left
+        assert AnalyticsEvent.query.count() == 0
+        assert RollupService.get_total('analytics_events', 'user', test_user.id, 'login') == total == 3
+
+    def test_unconfigured_retention_keeps_rows(self, app, db_session, monkeypatch):
+        monkeypatch.setitem(app.config, 'RETENTION_DAYS', {})
+        assert RetentionService.archive_table('security_logs')["archived"] == 0
+
+    def test_archived_unread_notifications_leave_the_badge(self, db_session, test_user, archive_dir):
+        now = datetime.utcnow()
+        for days, is_read in ((200, False), (150, True), (10, False)):
+            db_session.session.add(Notification(
+                user_id=test_user.id, title=f'{days}', message='m', is_read=is_read, created_at=now - timedelta(days=days)
+            ))
+        db_session.session.commit()
+        assert UserCounterService.unread_notifications(test_user.id) == 2
+
+        assert RetentionService.archive_table('notifications', cutoff=now - timedelta(days=90))["archived"] == 2
+        db_session.session.expire_all()
+        assert db_session.session.get(UserCounter, test_user.id).unread_notifications == 1
@@ -0,0 +1,100 @@
+"""
+Tests for incremental metric rollups
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+import rollup_service
+from rollup_service import RollupService
+from models import AnalyticsEvent, Message, MetricRollup, Notification, User
+
+
+def snapshot():
+    return sorted(
+        (row.source, row.entity_type, row.entity_id, row.metric, row.granularity, row.bucket, row.value)
+        for row in MetricRollup.query.all()
+    )
+
+
+def add_events(session, users, start, count):
+    for i in range(count):
+        session.add(AnalyticsEvent(
+            user_id=users[i % len(users)].id,
+            event_type='profile_view' if i % 3 else 'login',
+            created_at=start + timedelta(minutes=37 * i)
+        ))
+        session.add(Message(
+            sender_id=users[i % len(users)].id,
+            recipient_id=users[(i + 1) % len(users)].id,
+            body='hello',
+            created_at=start + timedelta(minutes=53 * i)
+        ))
+    session.commit()
+
+
+@pytest.fixture
+def users(db_session):
+    rows = [User(name=f"User {i}", email=f"rollup{i}@example.com", role="startup") for i in range(3)]
+    db_session.session.add_all(rows)
+    db_session.session.commit()
+    return rows
+
+
+@pytest.mark.unit
+class TestRollupService:
+
+    def test_incremental_runs_match_rebuild(self, db_session, users):
+        start = datetime.utcnow() - timedelta(days=3)
+        add_events(db_session.session, users, start, 40)
+        RollupService.run_incremental(batch_size=7)
+
+        add_events(db_session.session, users, start + timedelta(days=1), 25)
+        RollupService.run_incremental(batch_size=7)
+        incremental = snapshot()
+
+        RollupService.rebuild()
+        assert snapshot() == incremental
+
+    def test_totals_match_raw_counts(self, db_session, users):
+        add_events(db_session.session, users, datetime.utcnow() - timedelta(days=2), 30)
+        RollupService.run_incremental()
+
+        raw = AnalyticsEvent.query.filter_by(user_id=users[0].id, event_type='profile_view').count()
+        assert RollupService.get_total('analytics_events', 'user', users[0].id, 'profile_view') == raw
+
+        sent = Message.query.filter_by(sender_id=users[1].id).count()
+        assert RollupService.get_total('messages', 'user', users[1].id, 'message_sent') == sent
+
+    def test_unsettled_rows_wait_for_next_run(self, db_session, users):
+        db_session.session.add(AnalyticsEvent(user_id=users[0].id, event_type='login', created_at=datetime.utcnow()))
+        db_session.session.commit()
+
+        RollupService.run_incremental(sources=['analytics_events'])
+        assert RollupService.get_total('analytics_events', 'user', users[0].id, 'login') == 0
+        assert RollupService.get_watermark('analytics_events') == 0
+
+    def test_rolled_back_rows_are_never_counted(self, db_session, users):
+        db_session.session.add(AnalyticsEvent(
+            user_id=users[0].id, event_type='login', created_at=datetime.utcnow() - timedelta(hours=1)
+        ))
+        db_session.session.flush()
+        db_session.session.rollback()
+
+        RollupService.run_incremental(sources=['analytics_events'])
+        assert RollupService.get_total('analytics_events', 'user', users[0].id, 'login') == 0
+
+    def test_refresh_leaves_request_session_alone(self, db_session, users, monkeypatch):
+        add_events(db_session.session, users, datetime.utcnow() - timedelta(days=1), 5)
+        monkeypatch.setitem(rollup_service._last_refresh, 'at', 0.0)
+
+        pending = Notification(user_id=users[0].id, title='t', message='m')
+        db_session.session.add(pending)
+        RollupService.refresh()
+
+        # Still pending: refresh neither flushed/committed nor rolled it back
+        assert pending in db_session.session.new
+        db_session.session.rollback()
+        assert Notification.query.count() == 0
+        assert RollupService.get_total('messages', 'user', users[0].id, 'message_sent') > 0
@@ -0,0 +1,72 @@
+"""
+Tests for saved searches refreshed from the change log
+"""
+
+import pytest
+
+from models import SavedSearch, SavedSearchResult, SearchChange, User
+from saved_search_service import SavedSearchService
+
+
+def stored(saved):
+    """entity id -> is_new for every stored result"""
+    rows = SavedSearchResult.query.filter_by(saved_search_id=saved.id).all()
+    return {row.entity_id: bool(row.is_new) for row in rows}
+
+
+@pytest.mark.unit
+class TestSavedSearchService:
+
+    def test_incremental_refresh_matches_full_run(self, db_session, test_admin):
+        session = db_session.session
+        enablers = [User(name=f"Enabler {i}", email=f"en{i}@example.com", role="enabler") for i in range(3)]
+        session.add_all(enablers)
+        session.commit()
+
+        created = SavedSearchService.create(test_admin.id, "Enablers", "users", {"role": "enabler"})
+        assert created["success"]
+        saved = session.get(SavedSearch, created["search_id"])
+        assert stored(saved) == {u.id: False for u in enablers}
+
+        joined = User(name="New Enabler", email="new@example.com", role="enabler")
+        session.add(joined)
+        enablers[0].role = "corporate"
+        session.delete(enablers[1])
+        session.commit()
+
+        session.add(User(name="Rolled Back", email="rb@example.com", role="enabler"))
+        enablers[2].role = "startup"
+        session.flush()
+        session.rollback()
+
+        assert SavedSearchService.refresh(saved) == 1
+        session.commit()
+        incremental = stored(saved)
+        assert incremental == {joined.id: True, enablers[2].id: False}
+        assert (saved.result_count, saved.new_count) == (2, 1)
+
+        SavedSearchService.refresh(saved, full=True)
+        session.commit()
+        assert stored(saved) == incremental
+        assert (saved.result_count, saved.new_count) == (2, 1)
+
+        opened = SavedSearchService.run(saved.id, test_admin.id)
+        assert opened["success"]
+        assert opened["total"] == 2 and opened["new_since_last_view"] == 1
+        assert [(r["id"], r["is_new"]) for r in opened["results"]] == [(joined.id, True), (enablers[2].id, False)]
+        assert stored(saved) == {joined.id: False, enablers[2].id: False}
+        assert saved.new_count == 0
+
+        assert SavedSearchService.delete(saved.id, test_admin.id)["success"]
+        assert SavedSearchResult.query.filter_by(saved_search_id=saved.id).count() == 0
+
+    def test_only_real_changes_are_logged(self, db_session, test_user):
+        before = SearchChange.query.count()
+        test_user.name = test_user.name  # No net change
+        db_session.session.commit()
+        assert SearchChange.query.count() == before
+
+        test_user.company = "Acme"
+        db_session.session.commit()
+        assert SearchChange.query.count() == before + 1
+        assert SearchChange.query.order_by(SearchChange.id.desc()).first().entity_id == test_user.id
@@ -0,0 +1,67 @@
+"""
+Tests for the full-text admin search index
+"""
+
+import pytest
+from sqlalchemy import text
+
+from extensions import db
+from models import Lead, User
+from search_index_service import SearchIndexService, SEARCH_INDEX_TABLE
+from session_hooks import SessionHooks
+
+
+def snapshot():
+    rows = db.session.execute(text(f"SELECT rowid, title, body FROM {SEARCH_INDEX_TABLE} ORDER BY rowid"))
+    return [tuple(row) for row in rows]
+
+
+@pytest.fixture
+def index(db_session):
+    """The index table is not part of the models' metadata: drop it explicitly"""
+    yield SearchIndexService
+    db.session.rollback()
+    db.session.execute(text(f"DROP TABLE IF EXISTS {SEARCH_INDEX_TABLE}"))
+    db.session.commit()
+    SessionHooks.invalidate_tables(SEARCH_INDEX_TABLE)
+
+
+@pytest.mark.unit
+class TestSearchIndexService:
+
+    def test_incremental_index_matches_rebuild(self, db_session, index):
+        session = db_session.session
+        index.rebuild()
+
+        users = [User(name=f"Priya Shah {i}", email=f"priya{i}@solar.com", role="startup") for i in range(4)]
+        lead = Lead(type='demo', name="Arjun Rao", email="arjun@acme.com", company="Acme Robotics")
+        session.add_all(users + [lead])
+        session.commit()
+
+        users[0].company = "Solar Energy"
+        lead.message = "Wants a robotics demo"
+        users[1].country = "IN"  # Not a searchable field
+        session.delete(users[2])
+        session.commit()
+
+        session.add(User(name="Rolled Back", email="gone@example.com", role="startup"))
+        users[3].name = "Never Renamed"
+        session.flush()
+        session.rollback()
+
+        incremental = snapshot()
+        index.rebuild()
+        assert snapshot() == incremental
+        assert index.search('user', 'solar en') == [users[0].id]
+        assert index.search('user', 'never') == []
+
+    def test_index_created_after_startup_is_picked_up(self, db_session, index):
+        # Probed before the table exists, e.g. by an early request
+        assert not index.available()
+
+        index.rebuild()
+        assert index.available()
+
+        db_session.session.add(Lead(type='contact', name="Meera Iyer", email="meera@example.com"))
+        db_session.session.commit()
+        assert len(index.search('lead', 'meera')) == 1
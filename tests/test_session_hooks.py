@@ -0,0 +1,67 @@
+"""
+Tests for the shared session hook dispatcher and table probes
+"""
+
+import pytest
+from sqlalchemy import text
+
+import session_hooks
+from extensions import db
+from models import Notification, Startup
+from session_hooks import SessionHooks
+
+
+@pytest.fixture
+def recorder():
+    """Register a throwaway commit cache over Notification"""
+    applied = []
+    SessionHooks.on_commit(
+        'test_recorder', [Notification],
+        lambda session, pending: pending.extend(n.title for n in session.new if isinstance(n, Notification)),
+        applied.append, pending=list
+    )
+    yield applied
+    session_hooks._caches.pop('test_recorder')
+
+
+@pytest.mark.unit
+class TestSessionHooks:
+
+    def test_commit_applies_and_rollback_drops(self, db_session, test_user, recorder):
+        session = db_session.session
+        session.add(Notification(user_id=test_user.id, title='a', message='m'))
+        session.flush()
+        session.add(Notification(user_id=test_user.id, title='b', message='m'))
+        session.commit()
+        assert recorder == [['a', 'b']]
+
+        session.add(Notification(user_id=test_user.id, title='c', message='m'))
+        session.flush()
+        session.rollback()
+        session.commit()
+        assert recorder == [['a', 'b']]
+
+    def test_untouched_models_are_skipped(self, db_session, test_user, recorder):
+        db_session.session.add(Startup(founder_id=test_user.id, name='S'))
+        db_session.session.commit()
+        assert recorder == []
+
+    def test_missing_table_is_reprobed(self, db_session, monkeypatch):
+        engine = db.engine
+        assert not SessionHooks.table_ready(engine, 'probe_later')
+
+        with engine.begin() as connection:
+            connection.execute(text("CREATE TABLE probe_later (id INTEGER PRIMARY KEY)"))
+        try:
+            # Cached miss until the retry interval passes or the table is invalidated
+            assert not SessionHooks.table_ready(engine, 'probe_later')
+            monkeypatch.setattr(session_hooks, 'TABLE_PROBE_RETRY', -1)
+            assert SessionHooks.table_ready(engine, 'probe_later')
+        finally:
+            with engine.begin() as connection:
+                connection.execute(text("DROP TABLE probe_later"))
+
+        # Hits are kept until invalidated
+        assert SessionHooks.table_ready(engine, 'probe_later')
+        SessionHooks.invalidate_tables('probe_later')
+        assert not SessionHooks.table_ready(engine, 'probe_later')
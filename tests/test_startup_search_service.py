@@ -0,0 +1,48 @@
+"""
+Tests for the in-process BM25 startup index
+"""
+
+import pytest
+
+import startup_search_service
+from models import Startup
+from startup_search_service import StartupSearchService
+
+
+def snapshot():
+    index = startup_search_service._index
+    return index['postings'], index['docs'], pytest.approx(index['total_length'])
+
+
+@pytest.mark.unit
+class TestStartupSearchService:
+
+    def test_incremental_index_matches_rebuild(self, db_session, test_user):
+        session = db_session.session
+        StartupSearchService.rebuild()
+
+        solar = Startup(founder_id=test_user.id, name="Sunrise Solar", description="Solar panels for farms")
+        health = Startup(founder_id=test_user.id, name="CarePath", problem="Rural health access")
+        robots = Startup(founder_id=test_user.id, name="Botworks", solution="Warehouse robots")
+        session.add_all([solar, health, robots])
+        session.commit()
+
+        health.traction = "Solar powered clinics in 40 villages"
+        solar.stage = "seed"  # Not indexed
+        session.delete(robots)
+        session.commit()
+
+        session.add(Startup(founder_id=test_user.id, name="Rolled Back Solar"))
+        solar.name = "Never Renamed"
+        session.flush()
+        session.rollback()
+
+        incremental = snapshot()
+        StartupSearchService.rebuild()
+        assert snapshot() == incremental
+
+        scores = StartupSearchService.score("solar")
+        assert set(scores) == {solar.id, health.id}
+        # Name matches are weighted above body matches
+        assert scores[solar.id] > scores[health.id]
+        assert StartupSearchService.score("warehouse") == {}
@@ -0,0 +1,76 @@
+"""
+Tests for precomputed TF-IDF similar startups
+"""
+
+import random
+
+import pytest
+
+from models import Startup, StartupSimilarity
+from startup_similarity_service import StartupSimilarityService
+
+
+TOPICS = [
+    ['payments', 'ledger', 'invoices', 'banking', 'lending', 'credit', 'wallet'],
+    ['clinic', 'patients', 'diagnosis', 'hospital', 'nurses', 'imaging', 'pharmacy'],
+    ['farmers', 'irrigation', 'harvest', 'soil', 'crops', 'seeds', 'tractors'],
+    ['students', 'classroom', 'tutors', 'exams', 'curriculum', 'lessons', 'teachers'],
+]
+
+
+def text(rng, topic, extra=''):
+    return ' '.join(rng.sample(TOPICS[topic], 4)) + ' ' + extra
+
+
+def stored():
+    """{startup_id: [similar ids, by rank]} as persisted"""
+    lists = {}
+    for row in StartupSimilarity.query.order_by(StartupSimilarity.startup_id, StartupSimilarity.rank):
+        lists.setdefault(row.startup_id, []).append(row.similar_startup_id)
+    return lists
+
+
+@pytest.mark.unit
+class TestStartupSimilarityService:
+
+    def test_incremental_refresh_matches_full(self, db_session, test_user):
+        session = db_session.session
+        rng = random.Random(3)
+        startups = []
+        for i in range(24):
+            startup = Startup(founder_id=test_user.id, name=f"S{i}", description=text(rng, i % 4, f"unique{i}"))
+            startups.append(startup)
+        session.add_all(startups)
+        session.commit()
+
+        assert StartupSimilarityService.refresh()["full"] is True
+        # Same-topic startups only
+        assert set(stored()[startups[1].id]) == {s.id for s in startups[1::4]} - {startups[1].id}
+
+        def check():
+            result = StartupSimilarityService.refresh()
+            assert not result["full"]
+            assert result["recomputed"] < result["startups"]
+            incremental = stored()
+            StartupSimilarityService.refresh(full=True)
+            assert incremental == stored()
+
+        # Update: a payments startup moves to farming
+        startups[0].description = text(rng, 2, "unique0")
+        session.commit()
+        check()
+
+        # Create
+        session.add(Startup(founder_id=test_user.id, name="New", problem=text(rng, 1)))
+        session.commit()
+        check()
+
+        # Delete
+        deleted_id = startups[5].id
+        session.delete(startups[5])
+        session.commit()
+        check()
+        assert deleted_id not in stored()
+        assert all(deleted_id not in ids for ids in stored().values())
+
+        assert [s.id for s, _ in StartupSimilarityService.similar(startups[0].id, limit=3)] == stored()[startups[0].id][:3]
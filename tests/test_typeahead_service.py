@@ -0,0 +1,61 @@
+"""
+Tests for the in-process typeahead prefix index
+"""
+
+import pytest
+
+import typeahead_service
+from models import Startup, User
+from typeahead_service import TypeaheadService
+
+
+def snapshot():
+    index = typeahead_service._index
+    assert index['keys'] == sorted(index['keys'])
+    return sorted(zip(index['keys'], index['refs'])), index['entities']
+
+
+@pytest.mark.unit
+class TestTypeaheadService:
+
+    def test_incremental_index_matches_rebuild(self, db_session):
+        session = db_session.session
+        TypeaheadService.rebuild()
+
+        anita = User(name="Anita Shah", email="anita@acme.com", role="startup", company="Acme")
+        ravi = User(name="Ravi Kumar", email="ravi@example.com", role="enabler")
+        session.add_all([anita, ravi])
+        session.commit()
+        startup = Startup(founder_id=anita.id, name="Anita Solar")
+        session.add(startup)
+        session.commit()
+
+        ravi.company = "Shah Capital"
+        anita.country = "IN"  # Not indexed
+        startup.name = "Sunrise Solar"
+        session.commit()
+        session.delete(ravi)
+        session.commit()
+
+        session.add(User(name="Rolled Back", email="rb@example.com", role="startup"))
+        anita.name = "Never Renamed"
+        session.flush()
+        session.rollback()
+
+        incremental = snapshot()
+        TypeaheadService.rebuild()
+        assert snapshot() == incremental
+
+        assert [r['id'] for r in TypeaheadService.lookup("sha")] == [anita.id]
+        assert [r['name'] for r in TypeaheadService.lookup("sol", types=['startup'])] == ["Sunrise Solar"]
+        assert TypeaheadService.lookup("never") == []
+
+    def test_lookup_filters(self, db_session, test_user):
+        db_session.session.add(Startup(founder_id=test_user.id, name="Test Robotics"))
+        db_session.session.add(User(name="Test Enabler", email="te@example.com", role="enabler"))
+        db_session.session.commit()
+        TypeaheadService.rebuild()
+
+        assert {r['name'] for r in TypeaheadService.lookup("test", role="enabler")} == {"Test Enabler", "Test Robotics"}
+        assert {r['name'] for r in TypeaheadService.lookup("test", exclude_user_id=test_user.id)} == {"Test Enabler"}
+        assert TypeaheadService.lookup("te rob") == [TypeaheadService.lookup("robotics")[0]]
@@ -0,0 +1,97 @@
+"""
+Tests for the denormalized unread badges in user_counters
+"""
+
+import pytest
+
+from models import Message, Notification, User, UserCounter
+from user_counter_service import UserCounterService, USER_COUNTER_COLUMNS
+
+
+def counters(session):
+    session.expire_all()
+    return sorted((row.user_id,) + tuple(getattr(row, c) for c in USER_COUNTER_COLUMNS) for row in UserCounter.query)
+
+
+def check(session):
+    """Counters maintained on flush equal an exact reconcile"""
+    incremental = counters(session)
+    UserCounterService.reconcile()
+    assert counters(session) == incremental
+    return incremental
+
+
+@pytest.fixture
+def sender(db_session):
+    user = User(name="Sender", email="sender@example.com")
+    db_session.session.add(user)
+    db_session.session.commit()
+    return user
+
+
+def message(sender, recipient, **fields):
+    return Message(sender_id=sender.id, recipient_id=recipient.id, subject="Hi", body="Hello", **fields)
+
+
+@pytest.mark.unit
+class TestUserCounterService:
+
+    def test_delete_while_unread_decrements(self, db_session, authenticated_client, test_user, sender):
+        session = db_session.session
+        unread = message(sender, test_user, is_deleted_by_sender=True)
+        session.add(unread)
+        session.commit()
+        UserCounterService.reconcile()
+
+        assert authenticated_client.get('/api/messages/unread-count').get_json()['unread_count'] == 1
+        # Sender already deleted it: the recipient's delete flags and hard-deletes in one flush
+        assert authenticated_client.delete(f'/api/messages/{unread.id}').get_json()['success']
+        assert authenticated_client.get('/api/messages/unread-count').get_json()['unread_count'] == 0
+        check(session)
+
+    def test_incremental_counters_match_reconcile(self, db_session, test_user, sender):
+        session = db_session.session
+        UserCounterService.reconcile()
+
+        first, second = message(sender, test_user), message(sender, test_user)
+        notification = Notification(user_id=test_user.id, title="T", message="M")
+        session.add_all([first, second, notification, message(test_user, sender)])
+        session.commit()
+        assert (test_user.id, 2, 1) in check(session)
+
+        first.is_read = True
+        notification.is_read = True
+        session.commit()
+        check(session)
+
+        # Reassigned, then deleted unread
+        second.recipient_id = sender.id
+        session.commit()
+        check(session)
+        session.delete(second)
+        session.commit()
+        check(session)
+
+        session.add(Notification(user_id=test_user.id, title="T", message="M"))
+        first.is_read = False
+        session.flush()
+        session.rollback()
+        assert (test_user.id, 0, 0) in check(session)
+
+    def test_first_read_leaves_the_session_alone(self, db_session, test_user, sender):
+        session = db_session.session
+        session.add(message(sender, test_user))
+        session.commit()
+        UserCounter.query.delete()
+        session.commit()
+
+        pending = User(name="Pending", email="pending@example.com")
+        session.add(pending)
+        with session.no_autoflush:
+            assert UserCounterService.get(test_user.id) == {'unread_messages': 1, 'unread_notifications': 0}
+
+        # Still pending: the first count neither committed nor rolled it back
+        assert pending in session.new
+        session.rollback()
+        assert User.query.filter_by(email="pending@example.com").count() == 0
+        assert session.get(UserCounter, test_user.id).unread_messages == 1
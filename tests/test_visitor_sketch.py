@@ -0,0 +1,69 @@
+"""
+Tests for the HyperLogLog unique-visitor sketches
+"""
+
+from datetime import date, timedelta
+
+import pytest
+
+from visitor_sketch_service import HyperLogLog, VisitorSketchService, HLL_STANDARD_ERROR
+
+
+# Three standard errors: ~4.9% at 4096 registers
+ERROR_BOUND = 3 * HLL_STANDARD_ERROR
+
+
+def sketch_of(keys):
+    hll = HyperLogLog()
+    for key in keys:
+        hll.add(key)
+    return hll
+
+
+@pytest.mark.unit
+class TestHyperLogLog:
+
+    @pytest.mark.parametrize("distinct", [
+        100,
+        10_000,
+        pytest.param(1_000_000, marks=pytest.mark.slow),
+    ])
+    def test_estimate_within_error_bound(self, distinct):
+        # Repeats must not move the estimate
+        hll = sketch_of(f"u:{i % distinct}" for i in range(distinct + distinct // 10))
+        assert abs(hll.count() - distinct) / distinct <= ERROR_BOUND
+
+    def test_merge_equals_union(self):
+        first = sketch_of(f"u:{i}" for i in range(0, 6000))
+        second = sketch_of(f"u:{i}" for i in range(4000, 12000))
+        union = sketch_of(f"u:{i}" for i in range(0, 12000))
+
+        merged = HyperLogLog(first.registers).merge(second)
+        assert merged.registers == union.registers
+        assert merged.count() == union.count()
+
+    def test_zlib_round_trip_is_lossless(self):
+        for hll in (HyperLogLog(), sketch_of(["u:1", "u:2"]), sketch_of(f"u:{i}" for i in range(50_000))):
+            restored = HyperLogLog.from_bytes(hll.to_bytes())
+            assert restored.registers == hll.registers
+            assert restored.count() == hll.count()
+
+
+@pytest.mark.unit
+class TestVisitorSketchService:
+
+    def test_days_merge_on_read(self, db_session):
+        start = date(2026, 1, 1)
+        for offset in range(3):
+            day = start + timedelta(days=offset)
+            # Visitor 0..39 every day, plus 20 new visitors per day
+            keys = [f"u:{i}" for i in range(40)] + [f"a:{offset}-{i}" for i in range(20)]
+            VisitorSketchService.record_visits("referral", 7, day, keys)
+        VisitorSketchService.record_visit("referral", 7, "u:0")
+        db_session.session.commit()
+
+        result = VisitorSketchService.unique_visitors("referral", 7, start, start + timedelta(days=2))
+        assert result["days"] == 3
+        assert abs(result["estimate"] - 100) <= 100 * ERROR_BOUND
+
+        assert VisitorSketchService.unique_visitors("referral", 8)["estimate"] == 0
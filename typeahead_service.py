@@ -0,0 +1,240 @@
+"""
+Typeahead Service
+In-process prefix index for user and startup autocomplete
+
+Every normalized token of a user's name, email and company, and of a startup's
+name, is kept in one sorted array alongside a reference to its entity. A prefix
+lookup is two binary searches plus a short scan, so recipient pickers never
+have to download the user list.
+
+The index is built lazily on first use and patched on commit for User/Startup
+writes made through the ORM. A periodic full rebuild (CACHE_REBUILD_INTERVAL)
+picks up bulk edits that bypass the ORM.
+"""
+
+from bisect import bisect_left
+import re
+import threading
+import time
+import unicodedata
+
+from sqlalchemy import inspect
+
+from extensions import db
+from models import User, Startup
+from session_hooks import SessionHooks
+
+
+TYPEAHEAD_TYPES = ('user', 'startup')
+TYPEAHEAD_DEFAULT_LIMIT = 10
+TYPEAHEAD_MAX_LIMIT = 25
+
+# Index entries scanned per lookup before giving up on filling the page
+TYPEAHEAD_MAX_SCAN = 5000
+
+# Fields whose change requires re-indexing
+TYPEAHEAD_FIELDS = {
+    'user': ('name', 'email', 'company', 'role', 'profile_pic'),
+    'startup': ('name', 'founder_id', 'stage', 'logo_url'),
+}
+
+_TOKEN = re.compile(r'\w+', re.UNICODE)
+
+# Sorted token keys, the (type, id) each belongs to, and entity records
+_index = {'keys': [], 'refs': [], 'entities': {}, 'built_at': None}
+_lock = threading.Lock()
+
+
+class TypeaheadService:
+    """Service for prefix autocomplete over users and startups"""
+
+    @staticmethod
+    def lookup(query, types=None, role=None, exclude_user_id=None, limit=TYPEAHEAD_DEFAULT_LIMIT):
+        """
+        Find users/startups whose tokens start with every query term
+
+        Args:
+            query: Typed text, e.g. "ani sh"
+            types: Entity types to include (None = user and startup)
+            role: Only users with this role (startups are unaffected)
+            exclude_user_id: Drop this user (and their startups), e.g. the caller
+            limit: Max results
+
+        Returns:
+            list: Matching entity records, in token order
+        """
+        terms = TypeaheadService.normalize_tokens(query)
+        if not terms:
+            return []
+
+        TypeaheadService._ensure_built()
+        types = set(types or TYPEAHEAD_TYPES)
+        limit = max(1, min(limit, TYPEAHEAD_MAX_LIMIT))
+
+        # Scan the longest term's range: it is the most selective
+        anchor = max(terms, key=len)
+        others = [term for term in terms if term != anchor]
+
+        with _lock:
+            keys, refs, entities = _index['keys'], _index['refs'], _index['entities']
+            start = bisect_left(keys, anchor)
+            end = bisect_left(keys, anchor + '\uffff', start)
+
+            results, seen = [], set()
+            for i in range(start, min(end, start + TYPEAHEAD_MAX_SCAN)):
+                ref = refs[i]
+                if ref in seen:
+                    continue
+                seen.add(ref)
+
+                entity = entities.get(ref)
+                if entity is None or entity['type'] not in types:
+                    continue
+                if role and entity['type'] == 'user' and entity['role'] != role:
+                    continue
+                if exclude_user_id and entity['owner_id'] == exclude_user_id:
+                    continue
+                if not all(any(token.startswith(term) for token in entity['tokens']) for term in others):
+                    continue
+
+                results.append(entity['result'])
+                if len(results) >= limit:
+                    break
+
+        return results
+
+    @staticmethod
+    def normalize_tokens(value):
+        """Lower-case, accent-stripped word tokens"""
+        if not value:
+            return []
+        value = unicodedata.normalize('NFKD', str(value))
+        value = ''.join(ch for ch in value if not unicodedata.combining(ch))
+        return _TOKEN.findall(value.lower())
+
+    # ==========================================
+    # INDEX MAINTENANCE
+    # ==========================================
+
+    @staticmethod
+    def rebuild():
+        """Reload the whole index from the database"""
+        entities = {}
+        for row in db.session.query(
+            User.id, User.name, User.email, User.company, User.role, User.profile_pic
+        ):
+            entity = TypeaheadService._user_entity(dict(row._mapping))
+            entities[('user', row.id)] = entity
+        for row in db.session.query(
+            Startup.id, Startup.name, Startup.founder_id, Startup.stage, Startup.logo_url
+        ):
+            entity = TypeaheadService._startup_entity(dict(row._mapping))
+            entities[('startup', row.id)] = entity
+
+        pairs = sorted(
+            (token, ref) for ref, entity in entities.items() for token in set(entity['tokens'])
+        )
+
+        with _lock:
+            _index['keys'] = [token for token, _ in pairs]
+            _index['refs'] = [ref for _, ref in pairs]
+            _index['entities'] = entities
+            _index['built_at'] = time.monotonic()
+
+        return len(entities)
+
+    @staticmethod
+    def _ensure_built():
+        if SessionHooks.is_stale(_index['built_at']):
+            TypeaheadService.rebuild()
+
+    @staticmethod
+    def _apply(changes):
+        """Patch the index with committed entity records (None = deleted)"""
+        with _lock:
+            if _index['built_at'] is None:
+                return
+            keys, refs, entities = _index['keys'], _index['refs'], _index['entities']
+
+            for ref, entity in changes.items():
+                old = entities.pop(ref, None)
+                if old:
+                    for token in set(old['tokens']):
+                        i = bisect_left(keys, token)
+                        while i < len(keys) and keys[i] == token:
+                            if refs[i] == ref:
+                                del keys[i]
+                                del refs[i]
+                            else:
+                                i += 1
+
+                if entity:
+                    entities[ref] = entity
+                    for token in set(entity['tokens']):
+                        i = bisect_left(keys, token)
+                        keys.insert(i, token)
+                        refs.insert(i, ref)
+
+    @staticmethod
+    def _user_entity(values):
+        email = values.get('email') or ''
+        return {
+            'type': 'user',
+            'role': values.get('role'),
+            'owner_id': values['id'],
+            'tokens': TypeaheadService.normalize_tokens(
+                ' '.join([values.get('name') or '', email, values.get('company') or ''])
+            ),
+            'result': {
+                'type': 'user',
+                'id': values['id'],
+                'name': values.get('name'),
+                'company': values.get('company'),
+                'role': values.get('role'),
+                'profile_pic': values.get('profile_pic')
+            }
+        }
+
+    @staticmethod
+    def _startup_entity(values):
+        return {
+            'type': 'startup',
+            'role': None,
+            'owner_id': values.get('founder_id'),
+            'tokens': TypeaheadService.normalize_tokens(values.get('name')),
+            'result': {
+                'type': 'startup',
+                'id': values['id'],
+                'name': values.get('name'),
+                'founder_id': values.get('founder_id'),
+                'stage': values.get('stage'),
+                'logo_url': values.get('logo_url')
+            }
+        }
+
+    @staticmethod
+    def _collect(session, pending):
+        """Snapshot changed users/startups; applied only once the commit succeeds"""
+        for obj in list(session.new) + list(session.dirty):
+            entity_type = 'user' if isinstance(obj, User) else 'startup' if isinstance(obj, Startup) else None
+            if entity_type is None:
+                continue
+            fields = TYPEAHEAD_FIELDS[entity_type]
+            if obj not in session.new and not any(
+                inspect(obj).attrs[field].history.has_changes() for field in fields
+            ):
+                continue
+            values = {'id': obj.id, **{field: getattr(obj, field) for field in fields}}
+            pending[(entity_type, obj.id)] = (
+                TypeaheadService._user_entity(values) if entity_type == 'user'
+                else TypeaheadService._startup_entity(values)
+            )
+
+        for obj in session.deleted:
+            if isinstance(obj, User):
+                pending[('user', obj.id)] = None
+            elif isinstance(obj, Startup):
+                pending[('startup', obj.id)] = None
+
+
+SessionHooks.on_commit('typeahead', [User, Startup], TypeaheadService._collect, TypeaheadService._apply)
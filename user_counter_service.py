@@ -0,0 +1,233 @@
+"""
+User Counter Service
+Denormalized per-user unread badges in user_counters
+
+Each user has one row holding how many received messages they have not read
+(and not deleted) and how many notifications they have not read. Badge reads
+are a primary-key lookup instead of a COUNT(*) over messages/notifications.
+
+Counters are adjusted from an after_flush hook, in the same transaction as
+the rows they count, with atomic "col = col + delta" UPDATEs:
+
+    insert of an unread row          +1
+    read / deleted / reassigned      -1 (and +1 on the new owner)
+    marked unread again              +1
+
+Deletes subtract using the flags as they were before the flush, so a row
+flagged and deleted in one flush is counted once. A user without a counter
+row yet gets one with exact counts, written on its own connection when the
+first badge read finds none. Writes that bypass the ORM (bulk UPDATEs, raw
+SQL) are corrected offline by reconcile() (reconcile_user_counters.py).
+"""
+
+from datetime import datetime
+
+from sqlalchemy import inspect, case, func, select, update
+
+from counter_service import CounterService
+from extensions import db
+from models import Message, Notification, User, UserCounter
+from session_hooks import SessionHooks
+
+
+# model -> (counter column, owner column, flags that must all be falsy for the row to count)
+USER_COUNTER_SOURCES = {
+    Message: ('unread_messages', 'recipient_id', ('is_read', 'is_deleted_by_recipient')),
+    Notification: ('unread_notifications', 'user_id', ('is_read',)),
+}
+
+USER_COUNTER_COLUMNS = tuple(column for column, _, _ in USER_COUNTER_SOURCES.values())
+
+# Users recounted per query
+USER_COUNTER_CHUNK = 500
+
+
+class UserCounterService:
+    """Service for unread message and notification badges"""
+
+    @staticmethod
+    def get(user_id):
+        """
+        Unread counters of a user (primary-key lookup)
+
+        Returns:
+            dict: unread_messages, unread_notifications
+        """
+        counter = db.session.get(UserCounter, user_id)
+        if counter is not None:
+            return {column: getattr(counter, column) or 0 for column in USER_COUNTER_COLUMNS}
+
+        # First read for this user: count once, then maintained incrementally.
+        # Written on its own connection so the request session is left alone.
+        with db.engine.connect() as connection:
+            with connection.begin():
+                return UserCounterService._store(connection, [user_id])[user_id]
+
+    @staticmethod
+    def unread_messages(user_id):
+        return UserCounterService.get(user_id)['unread_messages']
+
+    @staticmethod
+    def unread_notifications(user_id):
+        return UserCounterService.get(user_id)['unread_notifications']
+
+    # ==========================================
+    # RECONCILIATION
+    # ==========================================
+
+    @staticmethod
+    def reconcile(user_ids=None):
+        """
+        Overwrite counters with exact counts
+
+        Args:
+            user_ids: Users to recount (None = every user)
+
+        Returns:
+            int: Counters written
+        """
+        if user_ids is None:
+            user_ids = [row[0] for row in db.session.query(User.id)]
+        user_ids = list(user_ids)
+
+        UserCounterService.recount(db.session.connection(), user_ids)
+        db.session.commit()
+        return len(user_ids)
+
+    @staticmethod
+    def recount(connection, user_ids):
+        """
+        Overwrite counters with exact counts inside the caller's transaction
+
+        For code that deletes or updates counted rows without the ORM (bulk
+        deletes, archival), so badges change in the same commit.
+
+        Args:
+            connection: Connection of the transaction that wrote the rows
+            user_ids: Users whose counted rows were written
+        """
+        user_ids = list(user_ids)
+        for start in range(0, len(user_ids), USER_COUNTER_CHUNK):
+            UserCounterService._store(connection, user_ids[start:start + USER_COUNTER_CHUNK])
+
+    @staticmethod
+    def _count(connection, user_ids):
+        """Exact unread counts of users, from the source tables"""
+        counts = {user_id: dict.fromkeys(USER_COUNTER_COLUMNS, 0) for user_id in user_ids}
+        for model, (column, owner, flags) in USER_COUNTER_SOURCES.items():
+            owner_column = getattr(model, owner)
+            conditions = [func.coalesce(getattr(model, flag), False) == False for flag in flags]
+            rows = connection.execute(
+                select(owner_column, func.count()).where(owner_column.in_(user_ids), *conditions).group_by(owner_column)
+            )
+            for user_id, count in rows:
+                counts[user_id][column] = count
+        return counts
+
+    @staticmethod
+    def _store(connection, user_ids):
+        """
+        Write exact counts for users, creating missing rows
+
+        Returns:
+            dict: {user_id: {counter column: count}}
+        """
+        if not user_ids:
+            return {}
+        now = datetime.utcnow()
+        counts = UserCounterService._count(connection, user_ids)
+        CounterService.upsert_replace(
+            UserCounter, ['user_id'],
+            [dict(values, user_id=user_id, updated_at=now) for user_id, values in counts.items()],
+            list(USER_COUNTER_COLUMNS) + ['updated_at'],
+            connection
+        )
+        return counts
+
+    # ==========================================
+    # INCREMENTAL MAINTENANCE
+    # ==========================================
+
+    @staticmethod
+    def _increment(connection, user_id, deltas):
+        """Atomically add deltas to an existing counter row (never below 0); False if there is none"""
+        table = UserCounter.__table__
+        values = {
+            column: case((table.c[column] + delta < 0, 0), else_=table.c[column] + delta)
+            for column, delta in deltas.items() if delta
+        }
+        if not values:
+            return True
+        values['updated_at'] = datetime.utcnow()
+        result = connection.execute(update(table).where(table.c.user_id == user_id).values(**values))
+        return result.rowcount > 0
+
+    @staticmethod
+    def _after_flush(session, flush_context):
+        """Apply unread deltas of this flush to user_counters, in the same transaction"""
+        deltas, recount = {}, set()
+
+        def counted(values):
+            # (owner, *flags): owned and no flag set
+            return values[0] is not None and not any(values[1:])
+
+        def add(user_id, column, amount):
+            change = deltas.setdefault(user_id, dict.fromkeys(USER_COUNTER_COLUMNS, 0))
+            change[column] += amount
+
+        for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+            source = USER_COUNTER_SOURCES.get(type(obj))
+            if source is None:
+                continue
+            column, owner, flags = source
+            fields = (owner,) + flags
+            current = tuple(getattr(obj, field) for field in fields)
+
+            if obj in session.new:
+                if counted(current):
+                    add(current[0], column, 1)
+                continue
+
+            state = inspect(obj)
+            histories = [state.attrs[field].history for field in fields]
+            if not any(history.has_changes() for history in histories) and obj not in session.deleted:
+                continue
+            if any(history.has_changes() and not history.deleted for history in histories):
+                # Previous value unknown (set before tracking applied): count this owner exactly
+                recount.add(current[0])
+                continue
+            # Values as of the last flush (a delete may follow a flag change in the same flush)
+            previous = tuple(
+                history.deleted[0] if history.has_changes() else value
+                for history, value in zip(histories, current)
+            )
+            if counted(previous):
+                add(previous[0], column, -1)
+            if obj not in session.deleted and counted(current):
+                add(current[0], column, 1)
+
+        deltas = {user_id: change for user_id, change in deltas.items() if any(change.values())}
+        recount.discard(None)
+        if not deltas and not recount:
+            return
+
+        connection = session.connection()
+        if not SessionHooks.table_ready(connection, UserCounter.__tablename__):
+            return
+
+        for user_id, change in deltas.items():
+            if user_id in recount:
+                continue
+            if not UserCounterService._increment(connection, user_id, change):
+                # No counter yet: exact counts already include this flush
+                recount.add(user_id)
+
+        recount = list(recount)
+        for start in range(0, len(recount), USER_COUNTER_CHUNK):
+            UserCounterService._store(connection, recount[start:start + USER_COUNTER_CHUNK])
+
+
+SessionHooks.on_flush(list(USER_COUNTER_SOURCES), UserCounterService._after_flush)
+SessionHooks.track_previous(*(
+    getattr(model, field) for model, (_, owner, flags) in USER_COUNTER_SOURCES.items() for field in (owner,) + flags
+))